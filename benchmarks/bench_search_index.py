@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark building the search index written by the generate command.
+
+Usage:
+    bench_search_index.py [--validation-json=<path>] [--analyses=<n>] [--repeat=<n>]
+
+Options:
+    --validation-json=<path>    Validation JSON (tmp.json) of the full corpus. A synthetic corpus is used when omitted.
+    --analyses=<n>              Number of analyses in the synthetic corpus [default: 7200].
+    --repeat=<n>                Number of timed builds, the best is reported [default: 5].
+"""
+import json
+import os
+import sys
+import timeit
+
+import docopt
+
+sys.path.insert(0, os.path.dirname(__file__))
+import synthetic
+from mwFileStatusWebsite import compress, constructor, search
+
+
+def main(args):
+    if args["--validation-json"]:
+        validation_dict = constructor.load_json(args["--validation-json"])
+    else:
+        validation_dict = synthetic.make_validation_dict(int(args["--analyses"]))
+
+    num_analyses = sum(len(validation_dict[study_id]["analyses"]) for study_id in validation_dict)
+    build_time = min(timeit.repeat(lambda: search.build_search_index(validation_dict), number=1, repeat=int(args["--repeat"])))
+    search_index = search.build_search_index(validation_dict)
+    index_bytes = json.dumps(search_index, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    query_time = min(timeit.repeat(lambda: search.query_search_index(search_index, "json:validation_error univ"), number=1, repeat=int(args["--repeat"])))
+
+    print("studies:          {}".format(len(validation_dict)))
+    print("analyses:         {}".format(num_analyses))
+    print("terms:            {}".format(len(search_index["terms"])))
+    print("build time:       {:.3f} s".format(build_time))
+    print("query time (py):  {:.3f} ms".format(query_time * 1000))
+    print("index size raw:   {} bytes".format(len(index_bytes)))
+    print("index size gzip:  {} bytes".format(len(compress.gzip_bytes(index_bytes))))
+    if compress.brotli is not None:
+        print("index size br:    {} bytes".format(len(compress.brotli_bytes(index_bytes))))
+
+
+if __name__ == "__main__":
+    main(docopt.docopt(__doc__))
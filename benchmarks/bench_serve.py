@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the local server (serve command): requests per second and latency under concurrent load.
+
+A server is started in-process on a free port and every client thread keeps one connection alive. The first pass over
+the URLs (cold) renders every response; the following passes (warm) are served from the LRU cache, half of them as
+conditional requests answered with 304 Not Modified.
+
+Usage:
+    bench_serve.py [--validation-json=<path>] [--analyses=<n>] [--requests=<n>] [--concurrency=<n>...]
+
+Options:
+    --validation-json=<path>    Validation JSON (tmp.json) of the full corpus. A synthetic corpus is used when omitted.
+    --analyses=<n>              Number of analyses in the synthetic corpus [default: 7200].
+    --requests=<n>              Number of warm requests per concurrency level [default: 2000].
+    --concurrency=<n>...        Numbers of concurrent clients [default: 1 8 32].
+"""
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import docopt
+
+sys.path.insert(0, os.path.dirname(__file__))
+import synthetic
+from mwFileStatusWebsite import constructor, serve
+from mwFileStatusWebsite.cli import create_pages
+
+
+def percentile(latencies, fraction):
+    return sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+
+def run_clients(address, targets, concurrency, etags=None):
+    """Request every target once, spread over concurrency threads. Returns (elapsed seconds, latencies, etags)."""
+    latencies = []
+    found_etags = {}
+    lock = threading.Lock()
+
+    def client(client_targets):
+        connection = http.client.HTTPConnection(*address)
+        client_latencies = []
+        for target in client_targets:
+            headers = {"Accept-Encoding": "gzip"}
+            if etags and target in etags and len(client_latencies) % 2:
+                headers["If-None-Match"] = etags[target]
+            start = time.perf_counter()
+            connection.request("GET", target, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            client_latencies.append(time.perf_counter() - start)
+            with lock:
+                found_etags[target] = response.getheader("ETag")
+        connection.close()
+        with lock:
+            latencies.extend(client_latencies)
+
+    threads = [threading.Thread(target=client, args=(targets[number::concurrency],)) for number in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, found_etags
+
+
+def main(args):
+    if args["--validation-json"]:
+        validation_dict = constructor.load_json(args["--validation-json"])
+    else:
+        validation_dict = synthetic.make_validation_dict(int(args["--analyses"]))
+    study_ids = list(validation_dict)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        validation_path = os.path.join(tmp_dir, "tmp.json")
+        with open(validation_path, "w") as fh:
+            fh.write(json.dumps(validation_dict))
+
+        targets = ["/", "/parsing_error", "/missing", "/api/summary.json", "/api/manifest.json", "/search_index.json",
+                   "/view?q=comparison%20%3D%20Inconsistent%20and%20issue%20%3D%20value"]
+        targets += ["/studies/{}.html".format(study_id) for study_id in study_ids[:100]]
+        targets += ["/api/studies/{}.json".format(study_id) for study_id in study_ids[:100]]
+
+        print("analyses: {}, distinct URLs: {}".format(sum(len(validation_dict[study_id]["analyses"]) for study_id in study_ids), len(targets)))
+        print("{:<12} {:>6} {:>10} {:>10} {:>10} {:>10}".format("pass", "conc.", "req/s", "p50 (ms)", "p95 (ms)", "p99 (ms)"))
+        for concurrency in [int(number) for number in args["--concurrency"]]:
+            site = serve.Site(validation_path, "owner", "repo", logs_path=tmp_dir, create_pages=create_pages, cache_size=len(targets))
+            server = serve.create_server(site, port=0)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                site.state()  # load the results before timing
+                for name, pass_targets in (("cold", targets), ("warm", (targets * (int(args["--requests"]) // len(targets) + 1))[:int(args["--requests"])])):
+                    elapsed, latencies, etags = run_clients(server.server_address[:2], pass_targets, concurrency,
+                                                            etags if name == "warm" else None)
+                    print("{:<12} {:>6} {:>10.0f} {:>10.2f} {:>10.2f} {:>10.2f}".format(
+                        name, concurrency, len(latencies) / elapsed,
+                        percentile(latencies, 0.5) * 1e3, percentile(latencies, 0.95) * 1e3, percentile(latencies, 0.99) * 1e3))
+            finally:
+                server.shutdown()
+                server.server_close()
+
+
+if __name__ == "__main__":
+    main(docopt.docopt(__doc__))
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark loading the binary snapshot against loading the validation JSON: the whole file (what generate and serve
+load), and one study of a memory-mapped snapshot.
+
+Usage:
+    bench_snapshot.py [--validation-json=<path>] [--analyses=<n>] [--repeat=<n>]
+
+Options:
+    --validation-json=<path>    Validation JSON (tmp.json) of the full corpus. A synthetic corpus is used when omitted.
+    --analyses=<n>              Number of analyses in the synthetic corpus [default: 7200].
+    --repeat=<n>                Number of timed runs, the best is reported [default: 5].
+"""
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+import docopt
+
+sys.path.insert(0, os.path.dirname(__file__))
+import synthetic
+from mwFileStatusWebsite import constructor, snapshot
+
+
+def best(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(args):
+    if args["--validation-json"]:
+        validation_dict = constructor.load_json(args["--validation-json"])
+    else:
+        validation_dict = synthetic.make_validation_dict(int(args["--analyses"]))
+    repeat = int(args["--repeat"])
+    study_id = list(validation_dict)[len(validation_dict) // 2]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # written the same way the validator writes them
+        json_path = os.path.join(tmp_dir, "tmp.json")
+        with open(json_path, "w") as fh:
+            fh.write(json.dumps(validation_dict, indent=4))
+        snapshot_path = snapshot.snapshot_path(json_path)
+        snapshot.save_snapshot(validation_dict, snapshot_path, json_path=json_path)
+
+        def load_study():
+            with snapshot.Snapshot(snapshot_path) as study_snapshot:
+                return study_snapshot[study_id]
+
+        rows = [
+            ("load whole JSON", lambda: constructor.load_json(json_path)),
+            ("load whole snapshot", lambda: snapshot.load_snapshot(snapshot_path)),
+            ("load_validation_dict (snapshot)", lambda: snapshot.load_validation_dict(json_path)),
+            ("open snapshot + load one study", load_study),
+            ("save snapshot", lambda: snapshot.save_snapshot(validation_dict, snapshot_path, json_path=json_path)),
+        ]
+
+        print("studies: {}, JSON: {} bytes, snapshot: {} bytes".format(
+            len(validation_dict), os.path.getsize(json_path), os.path.getsize(snapshot_path)))
+        print("{:<34} {:>12}".format("operation", "time (ms)"))
+        for name, function in rows:
+            print("{:<34} {:>12.2f}".format(name, best(function, repeat) * 1e3))
+
+
+if __name__ == "__main__":
+    main(docopt.docopt(__doc__))
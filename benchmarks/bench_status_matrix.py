@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark the columnar StatusMatrix against the dictionary loops in constructor.
+
+Usage:
+    bench_status_matrix.py [--validation-json=<path>] [--analyses=<n>] [--repeat=<n>]
+
+Options:
+    --validation-json=<path>    Validation JSON (tmp.json) of the full corpus. A synthetic corpus is used when omitted.
+    --analyses=<n>              Number of analyses in the synthetic corpus [default: 7200].
+    --repeat=<n>                Number of timed runs, the best is reported [default: 5].
+"""
+import os
+import sys
+import timeit
+
+import docopt
+
+sys.path.insert(0, os.path.dirname(__file__))
+import synthetic
+from mwFileStatusWebsite import constructor
+from mwFileStatusWebsite.status_matrix import StatusMatrix
+
+
+def best(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def main(args):
+    if args["--validation-json"]:
+        validation_dict = constructor.load_json(args["--validation-json"])
+    else:
+        validation_dict = synthetic.make_validation_dict(int(args["--analyses"]))
+    repeat = int(args["--repeat"])
+    status_matrix = StatusMatrix(validation_dict)
+
+    rows = [
+        ("build StatusMatrix", None, lambda: StatusMatrix(validation_dict)),
+        ("validation stats summary",
+         lambda: constructor.generate_validation_stats_summary(validation_dict),
+         lambda: status_matrix.validation_stats_summary()),
+        ("comparison stats summary",
+         lambda: constructor.generate_comparison_stats_summary(validation_dict),
+         lambda: status_matrix.comparison_stats_summary()),
+        ("status mask (Parsing Error)",
+         lambda: constructor.filter_analyses_by_status(validation_dict, "Parsing Error"),
+         lambda: status_matrix.status_mask("Parsing Error")),
+        ("filter by status (Parsing Error)",
+         lambda: constructor.filter_analyses_by_status(validation_dict, "Parsing Error"),
+         lambda: status_matrix.filter_analyses_by_status("Parsing Error")),
+        ("issue mask (value)",
+         lambda: constructor.filter_analyses_by_issues(validation_dict, "value"),
+         lambda: status_matrix.issue_mask("value")),
+        ("filter by issues (value)",
+         lambda: constructor.filter_analyses_by_issues(validation_dict, "value"),
+         lambda: status_matrix.filter_analyses_by_issues("value")),
+    ]
+
+    print("analyses: {}".format(len(status_matrix)))
+    print("{:<34} {:>14} {:>14}".format("operation", "dict (us)", "matrix (us)"))
+    for name, dict_function, matrix_function in rows:
+        print("{:<34} {:>14} {:>14.1f}".format(
+            name,
+            "{:.1f}".format(best(dict_function, repeat) * 1e6) if dict_function else "-",
+            best(matrix_function, repeat) * 1e6
+        ))
+
+
+if __name__ == "__main__":
+    main(docopt.docopt(__doc__))
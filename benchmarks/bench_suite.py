@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark suite of the validator, compare and constructor hot paths. Results are saved as JSON, so runs on
+different commits can be compared.
+
+Inputs are synthetic (see synthetic.py: a validation dictionary of --analyses analyses, and mwTab files of --samples
+samples by --metabolites metabolites) or recorded (the validation logs in validation_logs/ and the mwTab files in
+tests/test_files/). Every benchmark reports the best and the median time per call over --repeat runs.
+
+Usage:
+    bench_suite.py [--analyses=<n>] [--samples=<n>] [--metabolites=<n>] [--repeat=<n>] [--filter=<text>] [--output=<path>] [--compare=<path>]
+    bench_suite.py --diff <old-results> <new-results>
+
+Options:
+    --analyses=<n>      Number of analyses in the synthetic validation dictionary [default: 10000].
+    --samples=<n>       Number of samples in the synthetic mwTab files [default: 100].
+    --metabolites=<n>   Number of metabolites in the synthetic mwTab files [default: 500].
+    --repeat=<n>        Number of timed runs of each benchmark [default: 5].
+    --filter=<text>     Only run the benchmarks whose name contains this text.
+    --output=<path>     JSON file to save the results to. Defaults to results/<commit>.json next to this script.
+    --compare=<path>    Results JSON of an earlier run to compare this run to.
+    --diff              Compare two saved results files instead of running the benchmarks.
+"""
+import copy
+import json
+import os
+import random
+import subprocess
+import sys
+import timeit
+from datetime import datetime
+
+import docopt
+
+sys.path.insert(0, os.path.dirname(__file__))
+import synthetic
+from mwFileStatusWebsite import compare, constructor, validator
+
+
+RESULTS_VERSION = 1
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDED_LOGS_PATH = os.path.join(REPO_PATH, "validation_logs")
+RECORDED_LOGS = 2000
+FIXTURE_PATH = os.path.join(REPO_PATH, "tests", "test_files")
+FIXTURE_ANALYSIS = "AN000023"
+COMPARE_FUNCTIONS = ("compare_blocks", "compare_block_items", "compare_subject_sample_factors", "compare_data", "compare")
+
+
+def git_commit():
+    """Method for describing the checked out commit.
+
+    :return: Tuple of the short commit hash ("unknown" outside of a git checkout) and whether the tree has changes.
+    :rtype: tuple
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_PATH, capture_output=True,
+                                encoding="utf-8", check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_PATH,
+                                capture_output=True, encoding="utf-8", check=True).stdout.strip()
+        return commit, bool(status)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def time_function(function, repeat):
+    """Method for timing a function, calling it enough times per run for the run to take at least 0.2 seconds.
+
+    :param function: Function called without arguments.
+    :type function: callable
+    :param repeat: Number of timed runs.
+    :type repeat: int
+    :return: Dictionary of the best and median seconds per call, the number of calls per run, and the number of runs.
+    :rtype: dict
+    """
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = sorted(seconds / number for seconds in timer.repeat(repeat=repeat, number=number))
+    return {"best": times[0], "median": times[len(times) // 2], "number": number, "repeat": repeat}
+
+
+def load_recorded_logs(limit=RECORDED_LOGS):
+    """Method for loading recorded validation logs of files that mwtab could parse, with issue lists rebuilt from their
+    issue log (the issue tags are not recorded, so each issue is given one).
+
+    :param limit: Maximum number of logs to load.
+    :type limit: int
+    :return: List of (validation log, issue list) tuples.
+    :rtype: list
+    """
+    rng = random.Random(0)
+    recorded = []
+    for filename in sorted(os.listdir(RECORDED_LOGS_PATH)) if os.path.isdir(RECORDED_LOGS_PATH) else []:
+        if filename.endswith(("_txt.log", "_json.log")):
+            with open(os.path.join(RECORDED_LOGS_PATH, filename), encoding="utf-8") as fh:
+                validation_log = fh.read()
+            # logs of missing or unparsable files are written by the validator itself and never parsed
+            if "Number of Issues:" in validation_log:
+                validation_json = [{"message": line, "tags": [rng.choice(synthetic.ISSUE_TYPES)]}
+                                   for line in validation_log.splitlines() if line.startswith(("Error:", "Warning:"))]
+                recorded.append((validation_log, validation_json))
+                if len(recorded) == limit:
+                    break
+    return recorded
+
+
+def load_fixture_pair(analysis_id=FIXTURE_ANALYSIS):
+    """Method for reading the txt and json fixture files of an analysis.
+
+    :param analysis_id: Analysis ID of the fixture files.
+    :type analysis_id: str
+    :return: Tuple of the txt and json ~mwtab.mwtab.MWTabFile objects.
+    :rtype: tuple
+    """
+    import mwtab
+    mwtabfiles = []
+    for file_format in ("txt", "json"):
+        filepath = os.path.join(FIXTURE_PATH, "https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F"
+                                "{0}%2Fmwtab%2F{1}.{1}".format(analysis_id, file_format))
+        mwtabfiles.append(next(mwtab.read_files(filepath)))
+    return tuple(mwtabfiles)
+
+
+def create_benchmarks(args):
+    """Method for creating the benchmarks. Each benchmark is a setup function returning the function to time, so only
+    the inputs of the selected benchmarks are created.
+
+    :param args: Command line arguments.
+    :type args: dict
+    :return: List of (name, setup function) tuples.
+    :rtype: list
+    """
+    num_analyses = int(args["--analyses"])
+    num_samples = int(args["--samples"])
+    num_metabolites = int(args["--metabolites"])
+    cache = dict()
+
+    def cached(key, function):
+        if key not in cache:
+            cache[key] = function()
+        return cache[key]
+
+    def validation_dict():
+        return cached("validation_dict", lambda: synthetic.make_validation_dict(num_analyses))
+
+    def synthetic_pair(inconsistent=False):
+        mwtab_dict = cached("mwtab_dict", lambda: synthetic.make_mwtab_dict(num_samples, num_metabolites))
+        other_dict = copy.deepcopy(mwtab_dict)
+        if inconsistent:
+            # a difference in the last value, so the whole data block is compared
+            last_row = other_dict["MS_METABOLITE_DATA"]["Data"][-1]
+            last_row[list(last_row)[-1]] = "-1"
+        return mwtab_dict, other_dict
+
+    def create_validation_dict():
+        study_analysis_dict = synthetic.make_study_analysis_dict(num_analyses)
+        return lambda: validator.create_validation_dict(study_analysis_dict)
+
+    def parse_all(load_outputs):
+        def setup():
+            outputs = load_outputs()
+            return lambda: [validator.parse_validation_status(validation_log, validation_json)
+                            for validation_log, validation_json in outputs]
+        return setup
+
+    def compare_pair(function, load_pair):
+        def setup():
+            pair = load_pair()
+            return lambda: _call_ignoring_assertion(function, *pair)
+        return setup
+
+    def create_html():
+        # rendered to the null device, so the benchmark does not depend on the disk
+        return lambda: constructor.create_html(validation_dict(), "MoseleyBioinformaticsLab", "mwFileStatusWebsite", os.devnull)
+
+    suffix = "[{} analyses]".format(num_analyses)
+    data_suffix = "[{}x{}]".format(num_samples, num_metabolites)
+    benchmarks = [
+        ("validator.create_validation_dict" + suffix, create_validation_dict),
+        ("validator.parse_validation_status[recorded logs]", parse_all(load_recorded_logs)),
+        ("validator.parse_validation_status[synthetic 1000 outputs]", parse_all(
+            lambda: [synthetic.make_validation_output(random.Random(number), number % 50, number % 7) for number in range(1000)])),
+    ]
+    for function_name in COMPARE_FUNCTIONS:
+        function = getattr(compare, function_name)
+        benchmarks.extend([
+            ("compare.{}{}".format(function_name, data_suffix), compare_pair(function, synthetic_pair)),
+            ("compare.{}{}[inconsistent]".format(function_name, data_suffix),
+             compare_pair(function, lambda: synthetic_pair(inconsistent=True))),
+            ("compare.{}[{}]".format(function_name, FIXTURE_ANALYSIS),
+             compare_pair(function, lambda: cached("fixture_pair", load_fixture_pair))),
+        ])
+    benchmarks.extend([
+        ("constructor.generate_validation_stats_summary" + suffix,
+         lambda: lambda: constructor.generate_validation_stats_summary(validation_dict())),
+        ("constructor.generate_comparison_stats_summary" + suffix,
+         lambda: lambda: constructor.generate_comparison_stats_summary(validation_dict())),
+        ("constructor.filter_analyses_by_status[Parsing Error]" + suffix,
+         lambda: lambda: constructor.filter_analyses_by_status(validation_dict(), "Parsing Error")),
+        ("constructor.filter_analyses_by_status[Parsing Error, all formats]" + suffix,
+         lambda: lambda: constructor.filter_analyses_by_status(validation_dict(), "Parsing Error", match_all_formats=True)),
+        ("constructor.filter_analyses_by_issues[value]" + suffix,
+         lambda: lambda: constructor.filter_analyses_by_issues(validation_dict(), "value")),
+        ("constructor.create_html" + suffix, create_html),
+    ])
+    return benchmarks
+
+
+def _call_ignoring_assertion(function, *args):
+    # compare_blocks and compare_subject_sample_factors raise AssertionError on a difference
+    try:
+        return function(*args)
+    except AssertionError as e:
+        return e
+
+
+def compare_results(old_results, new_results):
+    """Method for formatting the comparison of two results dictionaries.
+
+    :param old_results: Results dictionary of the baseline run.
+    :type old_results: dict
+    :param new_results: Results dictionary of the run to compare.
+    :type new_results: dict
+    :return: Comparison table.
+    :rtype: str
+    """
+    lines = ["{} -> {}".format(old_results["commit"], new_results["commit"]),
+             "{:<72} {:>12} {:>12} {:>8}".format("benchmark", "old (us)", "new (us)", "ratio")]
+    for name, result in new_results["results"].items():
+        old_result = old_results["results"].get(name)
+        lines.append("{:<72} {:>12} {:>12.1f} {:>8}".format(
+            name,
+            "{:.1f}".format(old_result["median"] * 1e6) if old_result else "-",
+            result["median"] * 1e6,
+            "{:.2f}x".format(result["median"] / old_result["median"]) if old_result and old_result["median"] else "-",
+        ))
+    return "\n".join(lines)
+
+
+def load_results(filepath):
+    with open(filepath, "r") as fh:
+        return json.loads(fh.read())
+
+
+def main(args):
+    if args["--diff"]:
+        print(compare_results(load_results(args["<old-results>"]), load_results(args["<new-results>"])))
+        return
+
+    commit, dirty = git_commit()
+    repeat = int(args["--repeat"])
+    results = dict()
+    print("{:<72} {:>12} {:>12}".format("benchmark", "best (us)", "median (us)"))
+    for name, setup in create_benchmarks(args):
+        if args["--filter"] and args["--filter"] not in name:
+            continue
+        results[name] = time_function(setup(), repeat)
+        print("{:<72} {:>12.1f} {:>12.1f}".format(name, results[name]["best"] * 1e6, results[name]["median"] * 1e6))
+
+    import mwtab
+    results_dict = {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit + ("-dirty" if dirty else ""),
+        "python": "{}.{}.{}".format(*sys.version_info[:3]),
+        "mwtab_version": mwtab.__version__,
+        "parameters": {"analyses": int(args["--analyses"]), "samples": int(args["--samples"]),
+                       "metabolites": int(args["--metabolites"]), "repeat": repeat},
+        "results": results,
+    }
+    output_path = args["--output"] or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                                   results_dict["commit"] + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as fh:
+        fh.write(json.dumps(results_dict, indent=4))
+    print("Results saved to", output_path)
+
+    if args["--compare"]:
+        print()
+        print(compare_results(load_results(args["--compare"]), results_dict))
+
+
+if __name__ == "__main__":
+    main(docopt.docopt(__doc__))
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark validate's throughput with the validation logs written in the validation loop against written by the
+background writer, on a simulated slow disk.
+
+Every analysis is the --analysis test fixture, read from tests/test_files/ and validated by validate_analysis() as in
+a run. The fixtures take from a few hundredths of a second (AN003788) to over a second (AN000023) to validate. The
+slow disk adds --latency milliseconds to every file written and --sync-latency milliseconds to every file fsynced (see
+mwFileStatusWebsite.writer.write_file() and sync_files()), eg. the round trips of an NFS volume.
+
+Usage:
+    bench_writer.py [--analyses=<n>] [--analysis=<id>] [--latency=<ms>] [--sync-latency=<ms>] [--checkpoint-interval=<n>] [--save]
+
+Options:
+    --analyses=<n>              Number of analyses validated per mode [default: 50].
+    --analysis=<id>             Test fixture validated as every analysis [default: AN002319].
+    --latency=<ms>              Milliseconds added to every file written [default: 20].
+    --sync-latency=<ms>         Milliseconds added to every file fsynced [default: 5].
+    --checkpoint-interval=<n>   Number of files the background writer writes between fsyncs [default: 300].
+    --save                      Also save the mwTab files, as validate --to-path does.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import docopt
+
+from mwFileStatusWebsite import validator, writer
+
+
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_PATH = os.path.join(REPO_PATH, "tests", "test_files")
+
+
+def slow_disk(latency, sync_latency):
+    """Method for slowing down the writes and fsyncs of the validator and the background writer.
+
+    :param latency: Seconds added to every file written.
+    :type latency: float
+    :param sync_latency: Seconds added to every file fsynced.
+    :type sync_latency: float
+    :return: None
+    """
+    write_file, sync_files = writer.write_file, writer.sync_files
+
+    def slow_write_file(path, text):
+        time.sleep(latency)
+        return write_file(path, text)
+
+    def slow_sync_files(paths):
+        paths = list(paths)
+        time.sleep(sync_latency * len(paths))
+        sync_files(paths)
+
+    writer.write_file = slow_write_file
+    writer.sync_files = slow_sync_files
+
+
+def run(fixture_analysis, analyses, logs_path, save_path=None, background=None):
+    """Method for validating a fixture as the given number of analyses, the way validate_mwtab_rest() does.
+
+    :param fixture_analysis: Analysis ID of the fixture files.
+    :type fixture_analysis: str
+    :param analyses: Number of analyses.
+    :type analyses: int
+    :param logs_path: Directory the validation logs are written to.
+    :type logs_path: str
+    :param save_path: Directory the mwTab files are saved to, if any.
+    :type save_path: str
+    :param background: Background writer the files are written through, if any.
+    :type background: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
+    :return: Seconds taken, until every file is written.
+    :rtype: float
+    """
+    study_analysis_dict = {"ST000009": ["AN9{:05d}".format(number) for number in range(analyses)]}
+    validation_dict = validator.create_validation_dict(study_analysis_dict)
+    sources = {file_format: os.path.join(FIXTURE_PATH, "https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2F"
+                                         "analysis_id%2F{0}%2Fmwtab%2F{1}.{1}".format(fixture_analysis, file_format))
+               for file_format in ("txt", "json")}
+    start = time.perf_counter()
+    for analysis_id in study_analysis_dict["ST000009"]:
+        validator.validate_analysis(validation_dict, "ST000009", analysis_id, logs_path, save_path=save_path,
+                                    sources=sources, writer=background)
+    if background is not None:
+        background.close()
+    return time.perf_counter() - start
+
+
+def main(args):
+    analyses = int(args["--analyses"])
+    slow_disk(float(args["--latency"]) / 1e3, float(args["--sync-latency"]) / 1e3)
+
+    rows = []
+    for name in ("in the validation loop", "background writer"):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            save_path = None
+            if args["--save"]:
+                save_path = os.path.join(tmp_dir, "mirror")
+                os.mkdir(save_path)
+            background = None
+            if name == "background writer":
+                background = writer.BackgroundWriter(checkpoint_interval=int(args["--checkpoint-interval"]))
+            seconds = run(args["--analysis"], analyses, tmp_dir, save_path, background)
+            rows.append((name, seconds, background.summary() if background is not None else None))
+
+    print("analyses: {} x {}, write latency: {} ms, fsync latency: {} ms".format(
+        analyses, args["--analysis"], args["--latency"], args["--sync-latency"]))
+    print("{:<24} {:>10} {:>14}".format("writes", "time (s)", "analyses/s"))
+    for name, seconds, _ in rows:
+        print("{:<24} {:>10.2f} {:>14.1f}".format(name, seconds, analyses / seconds))
+    print("speedup: {:.2f}x".format(rows[0][1] / rows[1][1]))
+    print(writer.BackgroundWriter.format_summary(rows[1][2]))
+
+
+if __name__ == "__main__":
+    sys.exit(main(docopt.docopt(__doc__)))
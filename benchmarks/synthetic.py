@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+synthetic.py
+~~~~~~~~~~~~
+
+This script contains methods for generating synthetic validation dictionaries (in the same structure as the tmp.json
+written by the validate command) of arbitrary size for benchmarking.
+"""
+import random
+
+
+STATUSES = ["Passing", "Warnings Only", "Validation Error", "Parsing Error", "Missing/Blank"]
+STATUS_WEIGHTS = [5, 10, 70, 10, 5]
+COMPARISONS = ["Consistent", "Inconsistent", "Not Checked"]
+ISSUE_TYPES = ["value", "consistency", "format"]
+WORDS = [
+    "metabolomics", "plasma", "serum", "urine", "liver", "mouse", "human", "lipidomics", "profiling", "cancer",
+    "diabetes", "treatment", "exposure", "tissue", "cell", "untargeted", "targeted", "analysis", "response", "diet",
+]
+INSTITUTES = ["University of Kentucky", "University of Michigan", "UC Davis", "Mayo Clinic", "University of Florida"]
+LAST_NAMES = ["Smith", "Jones", "Garcia", "Chen", "Patel", "Kim", "Moseley", "Powell"]
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Casey", "Robin"]
+
+
+def make_study_params(rng, study_id):
+    """Method for creating the STUDY block parameters of a synthetic study.
+
+    :param rng: Random number generator.
+    :type rng: :py:class:`random.Random`
+    :param study_id: Study ID string.
+    :type study_id: str
+    :return: STUDY block parameters.
+    :rtype: dict
+    """
+    return {
+        "STUDY_TITLE": " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 12))).capitalize(),
+        "STUDY_SUMMARY": " ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 300))),
+        "INSTITUTE": rng.choice(INSTITUTES),
+        "DEPARTMENT": "Department of " + rng.choice(WORDS).capitalize(),
+        "LAST_NAME": rng.choice(LAST_NAMES),
+        "FIRST_NAME": rng.choice(FIRST_NAMES),
+        "ADDRESS": "{} Main Street".format(rng.randint(1, 999)),
+        "EMAIL": study_id.lower() + "@example.org",
+        "PHONE": "555-{:04d}".format(rng.randint(0, 9999)),
+        "SUBMIT_DATE": "20{:02d}-{:02d}-{:02d}".format(rng.randint(10, 25), rng.randint(1, 12), rng.randint(1, 28)),
+    }
+
+
+def make_analysis(rng, analysis_id):
+    """Method for creating the validation dictionary entry of a synthetic analysis.
+
+    :param rng: Random number generator.
+    :type rng: :py:class:`random.Random`
+    :param analysis_id: Analysis ID string.
+    :type analysis_id: str
+    :return: Analysis section of a validation dictionary.
+    :rtype: dict
+    """
+    txt_status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+    json_status = txt_status if rng.random() < 0.8 else rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+    comparable = txt_status not in ("Parsing Error", "Missing/Blank") and json_status not in ("Parsing Error", "Missing/Blank")
+    return {
+        "params": {"ANALYSIS_ID": analysis_id},
+        "status": {
+            "txt": txt_status,
+            "json": json_status,
+            "comparison": rng.choice(COMPARISONS[:2]) if comparable else "Not Checked",
+        },
+        "issues": {
+            file_format: {issue_type: status == "Validation Error" and rng.random() < 0.5 for issue_type in ISSUE_TYPES}
+            for file_format, status in (("txt", txt_status), ("json", json_status))
+        },
+    }
+
+
+def make_validation_dict(num_analyses=7000, max_analyses_per_study=6, seed=0):
+    """Method for creating a synthetic validation dictionary.
+
+    :param num_analyses: Total number of analyses.
+    :type num_analyses: int
+    :param max_analyses_per_study: Maximum number of analyses per study.
+    :type max_analyses_per_study: int
+    :param seed: Random seed so runs are reproducible.
+    :type seed: int
+    :return: Structured dictionary containing analyses statuses and other study information.
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    validation_dict = dict()
+    analysis_number = 0
+    study_number = 0
+    while analysis_number < num_analyses:
+        study_number += 1
+        study_id = "ST{:06d}".format(study_number)
+        validation_dict[study_id] = {"params": make_study_params(rng, study_id), "analyses": dict()}
+        for _ in range(min(rng.randint(1, max_analyses_per_study), num_analyses - analysis_number)):
+            analysis_number += 1
+            analysis_id = "AN{:06d}".format(analysis_number)
+            validation_dict[study_id]["analyses"][analysis_id] = make_analysis(rng, analysis_id)
+
+    return validation_dict
+
+
+def make_study_analysis_dict(num_analyses=7000, max_analyses_per_study=6, seed=0):
+    """Method for creating a synthetic dictionary of study IDs and their analysis IDs, in the structure returned by
+    mwtab.mwrest._pull_study_analysis().
+
+    :param num_analyses: Total number of analyses.
+    :type num_analyses: int
+    :param max_analyses_per_study: Maximum number of analyses per study.
+    :type max_analyses_per_study: int
+    :param seed: Random seed so runs are reproducible.
+    :type seed: int
+    :return: Dictionary of study IDs (keys) and their lists of analysis IDs (values).
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    study_analysis_dict = dict()
+    analysis_number = 0
+    while analysis_number < num_analyses:
+        num_study_analyses = min(rng.randint(1, max_analyses_per_study), num_analyses - analysis_number)
+        study_analysis_dict["ST{:06d}".format(len(study_analysis_dict) + 1)] = [
+            "AN{:06d}".format(analysis_number + number) for number in range(1, num_study_analyses + 1)
+        ]
+        analysis_number += num_study_analyses
+    return study_analysis_dict
+
+
+def make_mwtab_dict(num_samples=100, num_metabolites=500, study_id="ST000001", analysis_id="AN000001", seed=0):
+    """Method for creating the sections of a synthetic mwTab file (in the structure of ~mwtab.mwtab.MWTabFile) with an
+    MS_METABOLITE_DATA block of num_samples by num_metabolites values.
+
+    :param num_samples: Number of samples.
+    :type num_samples: int
+    :param num_metabolites: Number of metabolites.
+    :type num_metabolites: int
+    :param study_id: Study ID string.
+    :type study_id: str
+    :param analysis_id: Analysis ID string.
+    :type analysis_id: str
+    :param seed: Random seed so runs are reproducible.
+    :type seed: int
+    :return: Dictionary of mwTab sections.
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    sample_ids = ["S{:05d}".format(number) for number in range(num_samples)]
+    metabolites = ["{} {}".format(rng.choice(WORDS), number) for number in range(num_metabolites)]
+
+    def section(prefix, num_items):
+        return {"{}_{}".format(prefix, rng.choice(WORDS).upper() + str(number)): " ".join(rng.choice(WORDS) for _ in range(5))
+                for number in range(num_items)}
+
+    subject_sample_factors = [
+        {"Subject ID": "-", "Sample ID": sample_id, "Factors": {"Treatment": rng.choice(["Control", "Treated"])},
+         "Additional sample data": {"RAW_FILE_NAME": sample_id + ".raw"}}
+        for sample_id in sample_ids
+    ]
+    # the order of SUBJECT_SAMPLE_FACTORS is not significant, compare sorts it
+    rng.shuffle(subject_sample_factors)
+
+    return {
+        "METABOLOMICS WORKBENCH": {"STUDY_ID": study_id, "ANALYSIS_ID": analysis_id, "VERSION": "1", "CREATED_ON": "2024-01-01"},
+        "PROJECT": section("PR", 10),
+        "STUDY": dict(make_study_params(rng, study_id), STUDY_ID=study_id),
+        "SUBJECT": section("SU", 5),
+        "SUBJECT_SAMPLE_FACTORS": subject_sample_factors,
+        "COLLECTION": section("CO", 8),
+        "TREATMENT": section("TR", 5),
+        "SAMPLEPREP": section("SP", 5),
+        "CHROMATOGRAPHY": section("CH", 8),
+        "ANALYSIS": {"ANALYSIS_TYPE": "MS"},
+        "MS": section("MS", 8),
+        "MS_METABOLITE_DATA": {
+            "Units": "uM",
+            "Data": [dict({"Metabolite": metabolite}, **{sample_id: "{:.4f}".format(rng.random() * 1000) for sample_id in sample_ids})
+                     for metabolite in metabolites],
+            "Metabolites": [{"Metabolite": metabolite, "pubchem_id": str(rng.randint(1, 10 ** 6))} for metabolite in metabolites],
+        },
+    }
+
+
+def make_validation_output(rng, num_issues=20, num_warnings=5):
+    """Method for creating a synthetic mwtab.validate_file() output (validation log and issue list).
+
+    :param rng: Random number generator.
+    :type rng: :py:class:`random.Random`
+    :param num_issues: Number of issues, including warnings.
+    :type num_issues: int
+    :param num_warnings: Number of warnings.
+    :type num_warnings: int
+    :return: Tuple of the validation log and the list of issue dictionaries.
+    :rtype: tuple
+    """
+    validation_json = [
+        {"message": ("Warning: " if number < num_warnings else "Error: ") + " ".join(rng.choice(WORDS) for _ in range(12)),
+         "tags": [rng.choice(ISSUE_TYPES)]}
+        for number in range(num_issues)
+    ]
+    validation_log = "Validation Log\nStatus: {}\nNumber of Issues: {}\n\nNumber of Warnings: {}\n\nIssue Log:\n{}".format(
+        "Contains Validation Issues" if num_issues else "Passing", num_issues, num_warnings,
+        "\n".join(issue["message"] for issue in validation_json)
+    )
+    return validation_log, validation_json
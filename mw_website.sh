@@ -34,7 +34,12 @@ python3 -m pip install -e ../mwFilesStatusWebsite
 #python3 -m validator/validator.py
 #python3 -m validator/constructor.py
 python3 -m mwFileStatusWebsite validate
-python3 -m mwFileStatusWebsite generate
+# with the custom pages of pages.json, if the repository has one
+if [ -f pages.json ]; then
+    python3 -m mwFileStatusWebsite generate --pages=pages.json
+else
+    python3 -m mwFileStatusWebsite generate
+fi
 
 ###################
 # start ssh agent #
@@ -45,7 +50,8 @@ ssh-add /root/.ssh/id_ed25519_github
 #############################
 # add updated files to repo #
 #############################
-git add validation_logs index.html missing.html parsing_error.html passing.html validation_error.html warnings_only.html value.html consistency.html format.html
+# every generated page (*.html), so new pages such as timed_out.html and the pages of pages.json are published too
+git add validation_logs history.jsonl page_manifest.json search_index.json search.js details.js studies api *.html
 now=$(date +'%Y/%m/%d')
 git commit -m "Weekly update for $now"
 git push
@@ -1,13 +1,36 @@
-from . import validator, constructor, compare
-
-
-try:
-    # -- Distribution mode --
-    # import from _version.py generated by setuptools_scm during release
-    from ._version import version as __version__
-except ImportError:
-    # -- Source mode --
-    # use setuptools_scm to get the current version from src using git
-    from setuptools_scm import get_version as _gv
-    from os import path as _path
-    __version__ = _gv(_path.join(_path.dirname(__file__), _path.pardir))
+import importlib
+
+
+# submodules are imported on first access (eg. mwFileStatusWebsite.validator), so commands only pay for the modules
+# they use; validator imports mwtab, which in turn imports pandas
+SUBMODULES = ("validator", "constructor", "compare", "compress", "search", "history", "status_matrix", "query", "api",
+              "watch", "serve", "progress", "profiling",
+              "reindex", "schedule", "throttle", "workers", "versions", "sampling", "writer", "rundiff", "snapshot")
+
+
+def _get_version():
+    try:
+        # -- Distribution mode --
+        # import from _version.py generated by setuptools_scm during release
+        from ._version import version
+    except ImportError:
+        # -- Source mode --
+        # use setuptools_scm to get the current version from src using git
+        from setuptools_scm import get_version as _gv
+        from os import path as _path
+        version = _gv(_path.join(_path.dirname(__file__), _path.pardir))
+    return version
+
+
+def __getattr__(name):
+    if name in SUBMODULES:
+        return importlib.import_module("." + name, __name__)
+    if name == "__version__":
+        # only looked up when asked for, as setuptools_scm runs git in source checkouts
+        globals()["__version__"] = _get_version()
+        return globals()["__version__"]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(list(globals()) + list(SUBMODULES) + ["__version__"])
@@ -1,16 +1,22 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import sys
+
 import docopt
 
 from . import cli
-from . import __version__
 
 
 def main():
 
-    args = docopt.docopt(cli.__doc__, version=__version__)
-    cli.cli(args)
+    # the version is only looked up when asked for, see __init__.__getattr__
+    version = None
+    if "--version" in sys.argv[1:]:
+        from . import __version__ as version
+    args = docopt.docopt(cli.__doc__, version=version)
+    # cli() returns 1 for invalid combinations of options and None otherwise
+    sys.exit(cli.cli(args))
 
 
 if __name__ == "__main__":
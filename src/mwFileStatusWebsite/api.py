@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+api.py
+~~~~~~
+
+This script contains methods for creating a static, sharded JSON API of the validation results, so consumers can fetch
+the status of a single study or analysis instead of the whole validation JSON.
+
+API layout (under API_DIRNAME):
+    summary.json            Number of studies and analyses and the status, issue, and comparison counts.
+    manifest.json           {"version": 1, "shard": "studies/{}.json", "studies": [study_id, ...],
+                             "analyses": {analysis_id: study_id, ...}}
+    studies/<study ID>.json {"study_id": ..., "params": {...},
+                             "analyses": {analysis_id: {"status": {...}, "issues": {...}, "logs": {...}}, ...}}
+
+To look up an analysis, fetch manifest.json, find its study ID, and fetch that study's shard.
+"""
+import hashlib
+import json
+import os
+
+from .status_matrix import StatusMatrix, COMPARISONS
+
+
+API_VERSION = 1
+API_DIRNAME = "api"
+SUMMARY_FILENAME = "summary.json"
+SHARD_MANIFEST_FILENAME = "manifest.json"
+STUDY_SHARD_DIRNAME = "studies"
+LOG_URL_TEMPLATE = "https://raw.githubusercontent.com/{0}/{1}/master/validation_logs/{2}_{3}.log"
+
+
+def create_summary(validation_dict, status_matrix=None):
+    """Method for creating the top-level summary of the API.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param status_matrix: Columnar view of validation_dict, built if not given.
+    :type status_matrix: :py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`
+    :return: Summary dictionary.
+    :rtype: dict
+    """
+    status_matrix = status_matrix if status_matrix is not None else StatusMatrix(validation_dict)
+    num_studies, num_analyses, error_num_dict, issue_num_dict = status_matrix.validation_stats_summary()
+    return {
+        "version": API_VERSION,
+        "studies": num_studies,
+        "analyses": num_analyses,
+        "status": error_num_dict,
+        "issues": issue_num_dict,
+        "comparison": dict(zip(COMPARISONS, status_matrix.comparison_stats_summary())),
+        "manifest": SHARD_MANIFEST_FILENAME,
+    }
+
+
+def create_shard_manifest(validation_dict):
+    """Method for creating the manifest mapping study and analysis IDs to their shards.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :return: Manifest dictionary.
+    :rtype: dict
+    """
+    return {
+        "version": API_VERSION,
+        "shard": STUDY_SHARD_DIRNAME + "/{}.json",
+        "studies": list(validation_dict),
+        "analyses": {analysis_id: study_id for study_id in validation_dict for analysis_id in validation_dict[study_id]["analyses"]},
+    }
+
+
+def create_study_shard(study_id, study_dict, owner, repo):
+    """Method for creating the shard of a single study.
+
+    :param study_id: Metabolomics Workbench study ID string (eg. ST000001).
+    :type study_id: str
+    :param study_dict: The study's section of the validation dictionary.
+    :type study_dict: dict
+    :param owner: The GitHub account name that owns the repo the validation logs are committed to.
+    :type owner: str
+    :param repo: The name of the repo the validation logs are committed to.
+    :type repo: str
+    :return: Shard dictionary.
+    :rtype: dict
+    """
+    analyses = dict()
+    for analysis_id, analysis_dict in study_dict["analyses"].items():
+        status = analysis_dict.get("status", {})
+        logs = {file_format: LOG_URL_TEMPLATE.format(owner, repo, analysis_id, file_format) for file_format in ("txt", "json")}
+        # comparison logs are only written when both formats could be compared
+        if status.get("comparison") in ("Consistent", "Inconsistent"):
+            logs["comparison"] = LOG_URL_TEMPLATE.format(owner, repo, analysis_id, "comparison")
+        analyses[analysis_id] = {"status": status, "issues": analysis_dict.get("issues", {}), "logs": logs}
+    return {"study_id": study_id, "params": study_dict["params"], "analyses": analyses}
+
+
+def save_json(json_dict, filepath, manifest=None, manifest_key=None):
+    """Method for saving compact JSON, skipping the write when its content is unchanged since the last run.
+
+    :param json_dict: Dictionary to be saved.
+    :type json_dict: dict
+    :param filepath: Path to the JSON file.
+    :type filepath: str
+    :param manifest: Page manifest (see constructor.load_manifest()). When given, the file is only written if its
+    digest differs from the one recorded under manifest_key, and the manifest is updated.
+    :type manifest: dict
+    :param manifest_key: Key of the file in the manifest.
+    :type manifest_key: str
+    :return: Whether the file was written.
+    :rtype: bool
+    """
+    json_bytes = json.dumps(json_dict, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if manifest is not None:
+        digest = hashlib.sha256(json_bytes).hexdigest()
+        if manifest.get(manifest_key) == digest and os.path.isfile(filepath):
+            return False
+        manifest[manifest_key] = digest
+
+    with open(filepath, "wb") as fh:
+        fh.write(json_bytes)
+    return True
+
+
+def create_api(validation_dict, owner, repo, html_path, manifest=None, status_matrix=None):
+    """Method for creating the static JSON API.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param owner: The GitHub account name that owns the repo the validation logs are committed to.
+    :type owner: str
+    :param repo: The name of the repo the validation logs are committed to.
+    :type repo: str
+    :param html_path: Directory the html files are saved to. The API is saved in its API_DIRNAME directory.
+    :type html_path: str
+    :param manifest: Page manifest (see constructor.load_manifest()). When given, only files whose content changed are
+    written, and shards of studies that no longer exist are removed.
+    :type manifest: dict
+    :param status_matrix: Columnar view of validation_dict, built if not given.
+    :type status_matrix: :py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`
+    :return: List of the written file paths.
+    :rtype: list
+    """
+    api_path = os.path.join(html_path, API_DIRNAME)
+    os.makedirs(os.path.join(api_path, STUDY_SHARD_DIRNAME), exist_ok=True)
+
+    files = [
+        (SUMMARY_FILENAME, create_summary(validation_dict, status_matrix)),
+        (SHARD_MANIFEST_FILENAME, create_shard_manifest(validation_dict)),
+    ]
+    files.extend((STUDY_SHARD_DIRNAME + "/" + study_id + ".json", create_study_shard(study_id, validation_dict[study_id], owner, repo))
+                 for study_id in validation_dict)
+
+    written_files = []
+    for filename, json_dict in files:
+        filepath = os.path.join(api_path, *filename.split("/"))
+        if save_json(json_dict, filepath, manifest, API_DIRNAME + "/" + filename):
+            written_files.append(filepath)
+
+    # remove shards of studies that are no longer present
+    if manifest is not None:
+        shard_prefix = API_DIRNAME + "/" + STUDY_SHARD_DIRNAME + "/"
+        for manifest_key in [key for key in manifest if key.startswith(shard_prefix)]:
+            if manifest_key[len(shard_prefix):-len(".json")] not in validation_dict:
+                del manifest[manifest_key]
+                for filepath in [os.path.join(html_path, manifest_key + suffix) for suffix in ("", ".gz", ".br")]:
+                    if os.path.isfile(filepath):
+                        os.remove(filepath)
+
+    return written_files
@@ -7,8 +7,14 @@ The mwFileStatusWebsite command-line interface
 Usage:
     mwFileStatusWebsite -h | --help
     mwFileStatusWebsite --version
-    mwFileStatusWebsite validate [--to-path=<path>] [--logs-path=<path>] [--output-path=<path>] [--verbose]
-    mwFileStatusWebsite generate [--html-path=<path>] [--owner=<owner>] [--repo-name=<name>] [--validation-json=<path>]
+    mwFileStatusWebsite validate [--to-path=<path>] [--logs-path=<path>] [--output-path=<path>] [--studies=<ids>] [--analyses=<ids>] [--only-status=<statuses>] [--status-from=<path>] [--progress] [--progress-json=<path>] [--progress-interval=<seconds>] [--time-budget=<seconds>] [--adaptive] [--concurrency-limits=<min,max>] [--rate-limits=<min,max>] [--connect-timeout=<seconds>] [--read-timeout=<seconds>] [--deadline=<seconds>] [--workers=<n>] [--max-tasks=<n>] [--memory-ceiling=<MB>] [--memory-threshold=<MB>] [--mwtab-versions=<versions>] [--mwtab-envs=<path>] [--sample=<n>] [--seed=<seed>] [--background-writes] [--checkpoint-interval=<n>] [--verbose]
+    mwFileStatusWebsite watch [--interval=<seconds>] [--concurrency=<n>] [--state=<path>] [--recheck-status=<statuses>] [--logs-path=<path>] [--output-path=<path>] [--html-path=<path>] [--owner=<owner>] [--repo-name=<name>] [--once] [--verbose]
+    mwFileStatusWebsite serve [--host=<host>] [--port=<port>] [--validation-json=<path>] [--logs-path=<path>] [--html-path=<path>] [--owner=<owner>] [--repo-name=<name>] [--history=<path>] [--pages=<path>] [--cache-size=<n>] [--verbose]
+    mwFileStatusWebsite profile <mirror-path> [--sample=<n>] [--seed=<seed>] [--top=<n>] [--report=<path>] [--owner=<owner>] [--repo-name=<name>] [--verbose]
+    mwFileStatusWebsite profile --diff <old-report> <new-report> [--top=<n>]
+    mwFileStatusWebsite diff <old-results> <new-results> [--report=<path>] [--json] [--ids-only] [--by-study]
+    mwFileStatusWebsite reindex [--logs-path=<path>] [--output-path=<path>] [--mirror=<path>] [--processes=<n>] [--verbose]
+    mwFileStatusWebsite generate [--html-path=<path>] [--owner=<owner>] [--repo-name=<name>] [--validation-json=<path>] [--minify] [--compress] [--size-report=<path>] [--force] [--history=<path>] [--pages=<path>] [--verbose]
 
 Options:
     -h, --help                      Show this screen.
@@ -16,75 +22,439 @@ Options:
     --verbose                       Enable verbose processing.
     --to-path=<path>                Directory to save the downloaded mwTab analysis files to. Files are not saved unless this is given.
     --logs-path=<path>              Directory to save the validation log files to [default: validation_logs].
-    --output-path=<path>            Directory to save the validation summary JSON file to. Defaults to the CWD.
+    --output-path=<path>            Directory to save the validation summary JSON file and the history archive (history.jsonl) of validation runs to. Defaults to the CWD.
+    --studies=<ids>                 Only validate analyses of these studies, given as comma separated IDs and ID ranges (eg. ST000001,ST000100-ST000150). The results are merged into the existing validation JSON.
+    --analyses=<ids>                Only validate these analyses, given as comma separated IDs and ID ranges (eg. AN000001,AN000100-AN000120). The results are merged into the existing validation JSON.
+    --only-status=<statuses>        Only validate analyses whose txt, json, or comparison status is one of these comma separated statuses (eg. "Parsing Error,Missing/Blank"). The results are merged into the existing validation JSON.
+    --status-from=<path>            The validation JSON the statuses for --only-status are read from. Defaults to the validation JSON in --output-path.
+    --progress                      Periodically print the number of validated analyses, throughput, ETA, fetches in flight, retries and status histogram.
+    --progress-json=<path>          Append the periodic progress reports as JSON lines to this file ("-" for stdout).
+    --progress-interval=<seconds>   Number of seconds between progress reports [default: 10].
+    --time-budget=<seconds>         Stop validating once this many seconds are spent. Analyses are validated new first, then those that failed to be retrieved or parsed, then recently modified, then the longest unvalidated, and the rest keep their previous results (see mwFileStatusWebsite.schedule).
+    --adaptive                      Validate analyses concurrently, adapting the number of requests in flight and the request rate to the server's latency and errors (see mwFileStatusWebsite.throttle) instead of pausing a second after every request.
+    --concurrency-limits=<min,max>  Floor and ceiling of the number of requests in flight with --adaptive [default: 1,8].
+    --rate-limits=<min,max>         Floor and ceiling of the number of requests started per second with --adaptive [default: 0.2,10].
+    --connect-timeout=<seconds>     Fail a request to the Metabolomics Workbench (to be retried) when connecting takes longer than this. No timeout unless given.
+    --read-timeout=<seconds>        Fail a request to the Metabolomics Workbench (to be retried) when the server sends nothing for this long. No timeout unless given.
+    --deadline=<seconds>            Validate every analysis in a worker process that is killed when the analysis takes longer than this. Such analyses are retried one at a time at the end of the run with three times the deadline, and are recorded as timed out if they exceed it again (see mwFileStatusWebsite.workers). Cannot be combined with --adaptive.
+    --workers=<n>                   Number of analyses validated at the same time, each in its own worker process (see --deadline). Defaults to 1.
+    --max-tasks=<n>                 Replace a worker process with a fresh one after this many analyses. Unlimited unless given.
+    --memory-ceiling=<MB>           Replace a worker process with a fresh one once its resident memory exceeds this many megabytes. Unlimited unless given.
+    --memory-threshold=<MB>         While the validating process and its workers use more than this many megabytes, replace idle workers and hold back large analyses (by the size of their files in --to-path from an earlier run) until the others finished. Unlimited unless given.
+    --mwtab-versions=<versions>     Download the files once and validate them under each of these comma separated mwtab versions in parallel (eg. 2.1.1,2.2.0), each run by the Python of its environment in --mwtab-envs or given as <version>=<python>. Saves tmp_mwtab-<version>.json per version and a report of the status transitions from the first version (mwtab_versions.json) to --output-path, and the logs to mwtab-<version>/ in --logs-path (see mwFileStatusWebsite.versions).
+    --mwtab-envs=<path>             Directory of the Python environments of the mwtab versions, named mwtab-<version> [default: mwtab_envs].
+    --background-writes             Write the validation logs (and the files saved to --to-path) from a background thread, off the validation loop, fsyncing them at checkpoints (see mwFileStatusWebsite.writer).
+    --checkpoint-interval=<n>       Number of files the background writer writes between fsyncs (defaults to 300).
+    --interval=<seconds>            Number of seconds between polls of the Metabolomics Workbench for new analyses [default: 3600].
+    --concurrency=<n>               Number of analyses to validate at the same time [default: 1].
+    --state=<path>                  The path to the watcher state file (known and pending analyses). Defaults to watch_state.json in --output-path.
+    --recheck-status=<statuses>     Comma separated statuses of known analyses to validate again on every poll [default: Missing/Blank].
+    --once                          Poll once and exit instead of polling until interrupted.
+    --host=<host>                   Host name or address the local server listens on [default: 127.0.0.1].
+    --port=<port>                   Port the local server listens on [default: 8000].
+    --cache-size=<n>                Maximum number of rendered responses the local server keeps in memory [default: 256].
+    --sample=<n>                    Number of analyses to sample: validate only a stratified random sample of the (selected) analyses, saved to sample.json in --output-path instead of tmp.json with the logs in sample/ in --logs-path, and estimate the corpus-wide status proportions from it (sample_estimates.json, see mwFileStatusWebsite.sampling). profile samples the mirror directory and defaults to 20.
+    --seed=<seed>                   Seed of the random sample [default: 0].
+    --top=<n>                       Number of functions and allocation sites listed in the profile report [default: 25].
+    --report=<path>                 Save the profile report as JSON to this file, to be diffed against a later report with --diff. diff saves its transition report to it.
+    --diff                          Diff two saved profile reports instead of profiling.
+    --json                          Print the diff report as JSON instead of text.
+    --ids-only                      Only print the IDs of the analyses that changed status, were added, removed or otherwise updated, one per line, eg. to regenerate their pages.
+    --by-study                      With --ids-only, print the IDs of their studies (and of the studies whose STUDY parameters changed) instead.
+    --mirror=<path>                 Directory of mwTab files (eg. saved with validate --to-path) to read the STUDY parameters of the reindexed studies from.
+    --processes=<n>                 Number of processes parsing the validation logs. Defaults to the number of CPUs.
     --html-path=<path>              Directory to save html files to. Defaults to the CWD.
     --owner=<owner>                 The GitHub account name that owns the repo where the html files will be committed to [default: MoseleyBioinformaticsLab].
     --repo-name=<name>              The name of the repo where the html files will be committed to [default: mwFileStatusWebsite].
-    --validation-json=<path>        The path to the validation JSON summary output by the validate command [default: tmp.json].
+    --validation-json=<path>        The path to the validation JSON summary output by the validate command. [default: tmp.json].
+    --minify                        Strip indentation and inter-tag whitespace from the generated html files.
+    --compress                      Write precompressed .gz and .br (requires the brotli package) siblings of the html files and styles/styles.css and report their sizes.
+    --size-report=<path>            Save the raw and compressed file sizes to this JSON file (only used with --compress).
+    --force                         Regenerate every html file even if its input is unchanged since the last run.
+    --history=<path>                The path to the history archive of validation runs appended to by the validate command. Defaults to history.jsonl next to --validation-json, where validate saves it.
+    --pages=<path>                  JSON file listing additional named pages, each selecting its analyses with a query (see mwFileStatusWebsite.query).
 """
-from . import validator, constructor
+# the modules each command uses are imported in its branch of cli(), so that, e.g., generate never imports mwtab
+import json
 import os
+import time
 
-def cli(cmdargs):
 
-    if cmdargs['validate']:
-        validator.validate_mwtab_rest(logs_path = cmdargs['--logs-path'], 
-                                      output_file = os.path.join(cmdargs['--output-path'] if cmdargs['--output-path'] else '', 'tmp.json'),
-                                      save_path = cmdargs['--to-path'], verbose = cmdargs.get('--verbose', False))
+HISTORY_FILENAME = 'history.jsonl'
 
-    elif cmdargs['generate']:
-        html_path = cmdargs['--html-path'] if cmdargs['--html-path'] else ''
-        validation_path = cmdargs['--validation-json']
-        owner = cmdargs['--owner']
-        repo = cmdargs['--repo-name']
-        
+
+def history_path(cmdargs):
+    """Method for finding the history archive of the generate and serve commands: --history if given, and otherwise the
+    archive validate saves next to the validation JSON.
+
+    :param cmdargs: Parsed command line arguments.
+    :type cmdargs: dict
+    :return: Path to the history archive.
+    :rtype: str
+    """
+    return cmdargs.get('--history') or os.path.join(os.path.dirname(cmdargs['--validation-json']), HISTORY_FILENAME)
+
+
+def create_pages(validation_dict, status_matrix=None, pages_path=None):
+    """Method for creating the (filtered) validation dictionary of every page of the website.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param status_matrix: Columnar view of validation_dict, built if not given.
+    :type status_matrix: :py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`
+    :param pages_path: Path to a page configuration file listing additional pages (see query.load_page_config()).
+    :type pages_path: str
+    :return: List of (filename, page dictionary) tuples.
+    :rtype: list
+    """
+    from .status_matrix import StatusMatrix
+    status_matrix = status_matrix if status_matrix is not None else StatusMatrix(validation_dict)
+    pages = [
         # create the main webpage (index.html)
-        validation_dict = constructor.load_json(validation_path)
-        
-        constructor.create_html(validation_dict, owner, repo, os.path.join(html_path, 'index.html'))
+        ('index.html', validation_dict),
 
         # create the passing.html page
         # contains only analyses which one or both formats (mwTab and JSON) are passing
-        passing = constructor.filter_analyses_by_status(validation_dict, 'Passing', True)
-        constructor.create_html(passing, owner, repo, os.path.join(html_path, 'passing.html'))
-        
+        ('passing.html', status_matrix.filter_analyses_by_status('Passing', True)),
+
         # create the warnings_only.html page
         # contains analyses which both formats (mwTab and JSON) have only warnings.
-        warnings = constructor.filter_analyses_by_status(validation_dict, 'Warnings Only')
-        constructor.create_html(warnings, owner, repo, os.path.join(html_path, 'warnings_only.html'))
+        ('warnings_only.html', status_matrix.filter_analyses_by_status('Warnings Only')),
 
         # create the validation_error.html page
         # contains analyses which both formats (mwTab and JSON) have validation errors.
-        validation = constructor.filter_analyses_by_status(validation_dict, 'Validation Error')
-        constructor.create_html(validation, owner, repo, os.path.join(html_path, 'validation_error.html'))
+        ('validation_error.html', status_matrix.filter_analyses_by_status('Validation Error')),
 
         # create the parsing_error.html page
         # contains analyses which both formats (mwTab and JSON) have parsing errors.
-        parsing = constructor.filter_analyses_by_status(validation_dict, 'Parsing Error')
-        constructor.create_html(parsing, owner, repo, os.path.join(html_path, 'parsing_error.html'))
+        ('parsing_error.html', status_matrix.filter_analyses_by_status('Parsing Error')),
 
         # create the missing.html page
         # contains analyses which both formats (mwTab and JSON) are missing.
-        missing = constructor.filter_analyses_by_status(validation_dict, 'Missing/Blank')
-        constructor.create_html(missing, owner, repo, os.path.join(html_path, 'missing.html'))
-        
-        
+        ('missing.html', status_matrix.filter_analyses_by_status('Missing/Blank')),
+
+        # create the timed_out.html page
+        # contains analyses which did not finish validating within the deadline of validate --deadline.
+        ('timed_out.html', status_matrix.filter_analyses_by_status('Timed Out')),
+
         # create the value.html page
         # contains analyses where one or both formats (mwTab and JSON) have value errors.
-        passing = constructor.filter_analyses_by_issues(validation_dict, 'value')
-        constructor.create_html(passing, owner, repo, os.path.join(html_path, 'value.html'))
+        ('value.html', status_matrix.filter_analyses_by_issues('value')),
 
         # create the consistency.html page
         # contains analyses where one or both formats (mwTab and JSON) have consistency errors.
-        consistency = constructor.filter_analyses_by_issues(validation_dict, 'consistency')
-        constructor.create_html(consistency, owner, repo, os.path.join(html_path, 'consistency.html'))
+        ('consistency.html', status_matrix.filter_analyses_by_issues('consistency')),
 
         # create the format.html page
         # contains analyses where one or both formats (mwTab and JSON) have format errors.
-        format_dict = constructor.filter_analyses_by_issues(validation_dict, 'format')
-        constructor.create_html(format_dict, owner, repo, os.path.join(html_path, 'format.html'))
+        ('format.html', status_matrix.filter_analyses_by_issues('format')),
 
         # create the warning.html page
         # contains analyses where one or both formats (mwTab and JSON) have warnings.
-        # warning = constructor.filter_analyses_by_issues(validation_dict, 'warnings')
-        # constructor.create_html(warning, owner, repo, os.path.join(html_path, 'warning.html'))
+        # ('warning.html', status_matrix.filter_analyses_by_issues('warnings')),
+    ]
+
+    # create the pages listed in the page configuration file
+    # each contains the analyses matching the page's query
+    if pages_path:
+        from .query import QueryIndex, load_page_config
+        query_index = QueryIndex(validation_dict, status_matrix)
+        pages.extend((filename, query_index.select(tree)) for filename, tree in load_page_config(pages_path))
+
+    return pages
+
+
+def cli(cmdargs):
+
+    if cmdargs['validate']:
+        from . import validator, history
+        output_path = cmdargs['--output-path'] if cmdargs['--output-path'] else ''
+        output_file = os.path.join(output_path, 'tmp.json')
+
+        # reject incompatible options before anything is downloaded
+        worker_options = ('--deadline', '--workers', '--max-tasks', '--memory-ceiling', '--memory-threshold')
+        if any(cmdargs.get(option) for option in worker_options):
+            if cmdargs.get('--adaptive'):
+                print("{} cannot be combined with --adaptive.".format(", ".join(worker_options)))
+                return 1
+            if cmdargs.get('--background-writes'):
+                print("--background-writes cannot be combined with {}.".format(", ".join(worker_options)))
+                return 1
+
+        # validate only the selected subset of analyses and merge the results into the existing validation JSON
+        input_dict = None
+        subset = bool(cmdargs.get('--studies') or cmdargs.get('--analyses') or cmdargs.get('--only-status'))
+        if subset:
+            status_dict = None
+            if cmdargs.get('--only-status'):
+                status_path = cmdargs.get('--status-from') or output_file
+                if not os.path.isfile(status_path):
+                    print("--only-status needs the results of a previous run, but {} does not exist.".format(status_path))
+                    return 1
+                with open(status_path, 'r') as fh:
+                    status_dict = json.loads(fh.read())
+            input_dict = validator.select_analyses(
+                validator.retrieve_mwtab_files(cmdargs.get('--verbose', False)),
+                study_ids = validator.parse_id_list(cmdargs['--studies']) if cmdargs.get('--studies') else None,
+                analysis_ids = validator.parse_id_list(cmdargs['--analyses']) if cmdargs.get('--analyses') else None,
+                status_dict = status_dict,
+                statuses = [status.strip() for status in cmdargs['--only-status'].split(',')] if cmdargs.get('--only-status') else None
+            )
+            if not input_dict:
+                print("No analyses match the given selection.")
+                return
+            if cmdargs.get('--verbose'):
+                print("{} analyses selected".format(sum(len(analysis_ids) for analysis_ids in input_dict.values())))
+
+        timeouts = None
+        if cmdargs.get('--connect-timeout') or cmdargs.get('--read-timeout'):
+            timeouts = tuple(float(cmdargs[option]) if cmdargs.get(option) else None
+                             for option in ('--connect-timeout', '--read-timeout'))
+
+        # validate under several mwtab versions instead, from a single download
+        if cmdargs.get('--mwtab-versions'):
+            from . import versions
+            interpreters = versions.resolve_versions(cmdargs['--mwtab-versions'],
+                                                     cmdargs.get('--mwtab-envs') or versions.MWTAB_ENVS_PATH)
+            results, fetch_errors = versions.validate_versions(
+                input_dict or validator.retrieve_mwtab_files(cmdargs.get('--verbose', False)), interpreters,
+                logs_path = cmdargs['--logs-path'], output_path = output_path, mirror_path = cmdargs.get('--to-path'),
+                timeouts = timeouts, verbose = cmdargs.get('--verbose', False))
+            report = versions.transition_report(results, fetch_errors)
+            versions.save_report(report, os.path.join(output_path, versions.REPORT_FILENAME))
+            print(versions.format_report(report))
+            return
+
+        # validate only a stratified random sample, into its own file and logs directory (the logs behind tmp.json are
+        # left as they are), and estimate the statuses of the whole corpus
+        strata_dict = None
+        logs_path = cmdargs['--logs-path']
+        if cmdargs.get('--sample'):
+            from . import sampling
+            logs_path = os.path.join(logs_path, sampling.LOGS_DIRNAME)
+            os.makedirs(logs_path, exist_ok = True)
+            input_dict, strata_dict = sampling.draw_sample(
+                input_dict or validator.retrieve_mwtab_files(cmdargs.get('--verbose', False)), int(cmdargs['--sample']),
+                seed = int(cmdargs.get('--seed') or 0), previous_dict = validator.load_validation_json(output_file))
+            if cmdargs.get('--verbose'):
+                print("{} analyses sampled".format(sum(len(analysis_ids) for analysis_ids in input_dict.values())))
+
+        limiter = None
+        if cmdargs.get('--adaptive'):
+            from . import throttle
+            min_concurrency, max_concurrency = throttle.parse_limits(cmdargs.get('--concurrency-limits') or '1,8', int)
+            min_rate, max_rate = throttle.parse_limits(cmdargs.get('--rate-limits') or '0.2,10')
+            limiter = throttle.AdaptiveLimiter(min_concurrency, max_concurrency, min_rate, max_rate)
+
+        progress = None
+        if cmdargs.get('--progress') or cmdargs.get('--progress-json'):
+            from .progress import Progress
+            progress = Progress(stream = cmdargs.get('--progress', False), json_path = cmdargs.get('--progress-json'),
+                                interval = float(cmdargs.get('--progress-interval') or 10), limiter = limiter)
+
+        watchdog = None
+        if any(cmdargs.get(option) for option in worker_options):
+            from .workers import Watchdog
+
+            def megabytes(option):
+                return int(float(cmdargs[option]) * 1024 ** 2) if cmdargs.get(option) else None
+
+            # the sizes of the files saved by an earlier run tell which analyses are large
+            sizes = None
+            if cmdargs.get('--memory-threshold') and cmdargs.get('--to-path') and os.path.isdir(cmdargs['--to-path']):
+                sizes = {analysis_id: sum(os.path.getsize(filepath) for filepath in format_dict.values())
+                         for analysis_id, format_dict in validator.find_mirror_files(cmdargs['--to-path']).items()}
+            watchdog = Watchdog(float(cmdargs['--deadline']) if cmdargs.get('--deadline') else None,
+                                processes = int(cmdargs.get('--workers') or 1),
+                                max_tasks = int(cmdargs['--max-tasks']) if cmdargs.get('--max-tasks') else None,
+                                memory_ceiling = megabytes('--memory-ceiling'),
+                                memory_threshold = megabytes('--memory-threshold'), sizes = sizes)
+
+        writer = None
+        if cmdargs.get('--background-writes'):
+            from .writer import BackgroundWriter, CHECKPOINT_INTERVAL
+            writer = BackgroundWriter(checkpoint_interval = int(cmdargs.get('--checkpoint-interval') or CHECKPOINT_INTERVAL))
+
+        schedule = None
+        if cmdargs.get('--time-budget'):
+            from .schedule import Schedule
+            schedule = Schedule(float(cmdargs['--time-budget']), previous_dict = validator.load_validation_json(output_file),
+                                logs_path = cmdargs['--logs-path'], history_path = os.path.join(output_path, HISTORY_FILENAME))
+
+        completed = False
+        try:
+            validation_dict = validator.validate_mwtab_rest(input_dict = input_dict, logs_path = logs_path, 
+                                                            output_file = os.path.join(output_path, sampling.SAMPLE_FILENAME) if strata_dict else output_file,
+                                                            save_path = cmdargs.get('--to-path'), verbose = cmdargs.get('--verbose', False),
+                                                            merge = subset and not strata_dict, progress = progress, schedule = schedule,
+                                                            limiter = limiter, timeouts = timeouts, watchdog = watchdog,
+                                                            writer = writer)
+            completed = True
+        finally:
+            if progress is not None:
+                progress.close()
+            if watchdog is not None:
+                watchdog.close()
+            if writer is not None:
+                # a failed write must not mask the error the run failed with
+                writer.close(raise_error = completed)
+
+        if schedule is not None:
+            print(schedule.format_summary(schedule.summary()))
+        if watchdog is not None:
+            print(watchdog.format_summary(watchdog.summary()))
+        if writer is not None and cmdargs.get('--verbose'):
+            print(writer.format_summary(writer.summary()))
+
+        if strata_dict is not None:
+            estimates = sampling.estimate_proportions(validation_dict, strata_dict, seed = int(cmdargs.get('--seed') or 0))
+            sampling.save_estimates(estimates, os.path.join(output_path, sampling.ESTIMATES_FILENAME))
+            print(sampling.format_estimates(estimates))
+            return
+
+        # record the run's summary counts and status changes in the history archive
+        history.append_run(os.path.join(output_path, HISTORY_FILENAME), validation_dict, partial = subset)
+
+    elif cmdargs.get('watch'):
+        from . import watch
+        output_path = cmdargs['--output-path'] if cmdargs['--output-path'] else ''
+        output_file = os.path.join(output_path, 'tmp.json')
+        # only pages whose content changed are rewritten when the website is regenerated
+        generate_args = dict(cmdargs, watch=False, generate=True, **{'--validation-json': output_file})
+
+        watch.watch(output_file, cmdargs['--logs-path'], cmdargs.get('--state') or os.path.join(output_path, watch.WATCH_STATE_FILENAME),
+                    interval = float(cmdargs['--interval']), concurrency = int(cmdargs['--concurrency']),
+                    recheck_statuses = tuple(status.strip() for status in (cmdargs.get('--recheck-status') or '').split(',') if status.strip()),
+                    regenerate = lambda: cli(generate_args), once = cmdargs.get('--once', False),
+                    save_path = cmdargs.get('--to-path'), verbose = cmdargs.get('--verbose', False))
+
+    elif cmdargs.get('serve'):
+        from . import serve
+        # pages are rendered from the validation results on request instead of being generated ahead of time
+        site = serve.Site(cmdargs['--validation-json'], cmdargs['--owner'], cmdargs['--repo-name'],
+                          logs_path = cmdargs['--logs-path'], static_path = cmdargs['--html-path'] or '',
+                          history_path = history_path(cmdargs), create_pages = create_pages,
+                          pages_path = cmdargs.get('--pages'), cache_size = int(cmdargs['--cache-size']))
+        server = serve.create_server(site, cmdargs['--host'], int(cmdargs['--port']), verbose = cmdargs.get('--verbose', False))
+        print("Serving on http://{}:{}/".format(*server.server_address[:2]))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    elif cmdargs.get('profile'):
+        from . import profiling
+        top = int(cmdargs.get('--top') or profiling.PROFILE_TOP)
+        if cmdargs.get('--diff'):
+            diff = profiling.diff_reports(profiling.load_report(cmdargs['<old-report>']), profiling.load_report(cmdargs['<new-report>']), top)
+            print(profiling.format_diff(diff))
+            return
+
+        report = profiling.create_report(cmdargs['<mirror-path>'], sample_size = int(cmdargs.get('--sample') or profiling.PROFILE_SAMPLE_SIZE),
+                                         seed = int(cmdargs.get('--seed') or 0), owner = cmdargs.get('--owner') or 'MoseleyBioinformaticsLab',
+                                         repo = cmdargs.get('--repo-name') or 'mwFileStatusWebsite', top = top,
+                                         verbose = cmdargs.get('--verbose', False))
+        if cmdargs.get('--report'):
+            with open(cmdargs['--report'], 'w') as fh:
+                fh.write(json.dumps(report, indent=4))
+        print(profiling.format_report(report))
+
+    elif cmdargs.get('diff'):
+        from . import rundiff
+        report = rundiff.diff_results(cmdargs['<old-results>'], cmdargs['<new-results>'])
+        if cmdargs.get('--report'):
+            rundiff.save_report(report, cmdargs['--report'])
+        if cmdargs.get('--ids-only'):
+            for changed_id in rundiff.changed_ids(report, by_study = cmdargs.get('--by-study', False)):
+                print(changed_id)
+        elif cmdargs.get('--json'):
+            print(json.dumps(report, indent=4))
+        else:
+            print(rundiff.format_report(report))
+
+    elif cmdargs.get('reindex'):
+        from . import reindex, validator
+        output_path = cmdargs['--output-path'] if cmdargs['--output-path'] else ''
+        output_file = os.path.join(output_path, 'tmp.json')
+
+        # the validation JSON is rebuilt from the logs alone, so no run is appended to the history archive
+        start = time.perf_counter()
+        validation_dict = reindex.reindex(cmdargs['--logs-path'], mirror_path = cmdargs.get('--mirror'),
+                                          processes = int(cmdargs['--processes']) if cmdargs.get('--processes') else None,
+                                          verbose = cmdargs.get('--verbose', False))
+        validator.save_validation_dict(validation_dict, output_file)
+        print("Reindexed {} studies, {} analyses in {:.1f} seconds to {}".format(
+            len(validation_dict), sum(len(study_dict['analyses']) for study_dict in validation_dict.values()),
+            time.perf_counter() - start, output_file))
+
+    elif cmdargs['generate']:
+        from . import constructor, compress, search, history, api, snapshot
+        from .status_matrix import StatusMatrix
+        html_path = cmdargs['--html-path'] if cmdargs['--html-path'] else ''
+        validation_path = cmdargs['--validation-json']
+        owner = cmdargs['--owner']
+        repo = cmdargs['--repo-name']
+        minify = cmdargs.get('--minify', False)
+
+        validation_dict = snapshot.load_validation_dict(validation_path)
+        # columnar view of the statuses used to filter the pages
+        status_matrix = StatusMatrix(validation_dict)
+
+        pages = create_pages(validation_dict, status_matrix, cmdargs.get('--pages'))
+
+        # only pages whose filtered input changed since the last run are rewritten
+        manifest_path = os.path.join(html_path, constructor.MANIFEST_FILENAME)
+        manifest = {} if cmdargs.get('--force') else constructor.load_manifest(manifest_path)
+
+        # STUDY parameters are written once per study and loaded on demand by the pages
+        written_files = set(constructor.create_study_details(validation_dict, html_path, minify=minify, manifest=manifest))
+        script_files = [os.path.join(html_path, constructor.DETAILS_SCRIPT_FILENAME)]
+        constructor.write_details_script(script_files[0])
+        written_files.update(script_files)
+
+        html_files = []
+        for filename, page_dict in pages:
+            html_files.append(os.path.join(html_path, filename))
+            if constructor.create_html(page_dict, owner, repo, html_files[-1], minify=minify, manifest=manifest, manifest_key=filename,
+                                       lazy_details=True, status_matrix=status_matrix):
+                written_files.add(html_files[-1])
+            elif cmdargs.get('--verbose'):
+                print("Unchanged, skipping:", filename)
+
+        # write the static JSON API (summary, ID -> shard manifest, and one shard per study)
+        written_files.update(api.create_api(validation_dict, owner, repo, html_path, manifest=manifest, status_matrix=status_matrix))
+        api_files = [os.path.join(html_path, api.API_DIRNAME, filename) for filename in (api.SUMMARY_FILENAME, api.SHARD_MANIFEST_FILENAME)]
+
+        constructor.save_manifest(manifest_path, manifest)
+
+        # create the trends.html page from the history archive of validation runs
+        if os.path.isfile(history_path(cmdargs)):
+            html_files.append(os.path.join(html_path, 'trends.html'))
+            history.create_trends_html(history_path(cmdargs), owner, repo, html_files[-1], minify=minify)
+            written_files.add(html_files[-1])
+
+        # write the prebuilt search index and the script that queries it
+        search_files = [os.path.join(html_path, search.SEARCH_INDEX_FILENAME), os.path.join(html_path, search.SEARCH_SCRIPT_FILENAME)]
+        search.save_search_index(search.build_search_index(validation_dict), search_files[0])
+        search.write_search_script(search_files[1])
+        written_files.update(search_files)
+
+        # write precompressed siblings of every page and the stylesheet and report the transfer sizes
+        if cmdargs.get('--compress'):
+            static_files = html_files + search_files + script_files + api_files + [path for path in [os.path.join(html_path, 'styles', 'styles.css')] if os.path.isfile(path)]
+            size_dict = {path: compress.precompress_file(path, path in written_files) for path in static_files}
+            # the per-study fragments are reported as a single row
+            size_dict[os.path.join(html_path, constructor.STUDY_DETAILS_DIRNAME, '*.html')] = compress.sum_sizes([
+                compress.precompress_file(path, path in written_files)
+                for path in [os.path.join(html_path, constructor.STUDY_DETAILS_DIRNAME, study_id + '.html') for study_id in validation_dict]
+            ])
+            size_dict[os.path.join(html_path, api.API_DIRNAME, api.STUDY_SHARD_DIRNAME, '*.json')] = compress.sum_sizes([
+                compress.precompress_file(path, path in written_files)
+                for path in [os.path.join(html_path, api.API_DIRNAME, api.STUDY_SHARD_DIRNAME, study_id + '.json') for study_id in validation_dict]
+            ])
+            print(compress.format_size_report(size_dict))
+            if cmdargs.get('--size-report'):
+                with open(cmdargs['--size-report'], 'w') as fh:
+                    fh.write(json.dumps(size_dict, indent=4))
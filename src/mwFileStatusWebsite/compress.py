@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+compress.py
+~~~~~~~~~~~
+
+This script contains methods for minifying generated HTML pages and writing precompressed (gzip and brotli) siblings of
+static files so they can be served without on-the-fly compression.
+"""
+import gzip
+import io
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # brotli is an optional dependency
+    brotli = None
+
+
+def minify_html(html_str):
+    """Method for removing the indentation and inter-tag whitespace from a generated HTML page.
+
+    Whitespace between tags is removed, and a line break with the whitespace around it becomes a single line break.
+    Runs of spaces within a line of text are kept as they are.
+
+    :param html_str: HTML page to be minified.
+    :type html_str: str
+    :return: Minified HTML page.
+    :rtype: str
+    """
+    html_str = re.sub(r">\s+<", "><", html_str)
+    html_str = re.sub(r"\s*\n\s*", "\n", html_str)
+    return html_str.strip() + "\n"
+
+
+def gzip_bytes(data):
+    """Method for gzip compressing bytes deterministically (the header timestamp is zeroed so unchanged inputs produce
+    byte-identical outputs).
+
+    :param data: Bytes to be compressed.
+    :type data: bytes
+    :return: Gzip compressed bytes.
+    :rtype: bytes
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=9, mtime=0) as fh:
+        fh.write(data)
+    return buffer.getvalue()
+
+
+def brotli_bytes(data):
+    """Method for brotli compressing bytes.
+
+    :param data: Bytes to be compressed.
+    :type data: bytes
+    :return: Brotli compressed bytes or None if the optional ``brotli`` package is not installed.
+    :rtype: bytes or None
+    """
+    if brotli is None:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def precompress_file(filepath, force=True):
+    """Method for writing ".gz" and ".br" siblings of the given file.
+
+    The ".br" sibling is skipped when the optional ``brotli`` package is not installed.
+
+    :param filepath: Path to the file to be compressed.
+    :type filepath: str
+    :param force: Whether to recompress the file even if its siblings are up to date (see is_precompressed()).
+    :type force: bool
+    :return: Dictionary of the raw, gzip, and brotli sizes in bytes (brotli is None when skipped).
+    :rtype: dict
+    """
+    if not force and is_precompressed(filepath):
+        return file_sizes(filepath)
+
+    with open(filepath, "rb") as fh:
+        data = fh.read()
+
+    sizes = {"raw": len(data), "gz": None, "br": None}
+
+    gz_data = gzip_bytes(data)
+    with open(filepath + ".gz", "wb") as fh:
+        fh.write(gz_data)
+    sizes["gz"] = len(gz_data)
+
+    br_data = brotli_bytes(data)
+    if br_data is not None:
+        with open(filepath + ".br", "wb") as fh:
+            fh.write(br_data)
+        sizes["br"] = len(br_data)
+
+    return sizes
+
+
+def is_precompressed(filepath):
+    """Method for checking whether the compressed siblings of a file exist and are at least as new as the file.
+
+    :param filepath: Path to the uncompressed file.
+    :type filepath: str
+    :return: Whether precompress_file() would not change anything.
+    :rtype: bool
+    """
+    mtime = os.path.getmtime(filepath)
+    suffixes = (".gz", ".br") if brotli is not None else (".gz",)
+    return all(os.path.isfile(filepath + suffix) and os.path.getmtime(filepath + suffix) >= mtime for suffix in suffixes)
+
+
+def file_sizes(filepath):
+    """Method for collecting the sizes of an already precompressed file and its siblings.
+
+    :param filepath: Path to the uncompressed file.
+    :type filepath: str
+    :return: Dictionary of the raw, gzip, and brotli sizes in bytes (None for missing siblings).
+    :rtype: dict
+    """
+    return {
+        "raw": os.path.getsize(filepath),
+        "gz": os.path.getsize(filepath + ".gz") if os.path.isfile(filepath + ".gz") else None,
+        "br": os.path.getsize(filepath + ".br") if os.path.isfile(filepath + ".br") else None,
+    }
+
+
+def sum_sizes(size_list):
+    """Method for adding up the size dictionaries of several files.
+
+    :param size_list: List of size dictionaries as returned by precompress_file().
+    :type size_list: list
+    :return: Dictionary of the total raw, gzip, and brotli sizes in bytes (None if a size is missing for every file).
+    :rtype: dict
+    """
+    totals = dict()
+    for key in ("raw", "gz", "br"):
+        values = [sizes[key] for sizes in size_list if sizes[key] is not None]
+        totals[key] = sum(values) if values else None
+    return totals
+
+
+def format_size_report(size_dict):
+    """Method for creating a human readable table of raw versus compressed file sizes.
+
+    :param size_dict: Dictionary of file paths (keys) and their size dictionaries as returned by precompress_file().
+    :type size_dict: dict
+    :return: Formatted table including a totals row.
+    :rtype: str
+    """
+    lines = ["{:<40} {:>12} {:>12} {:>12}".format("File", "Raw", "Gzip", "Brotli")]
+    # the totals of a size that is missing for every file are printed as "-" too (see sum_sizes())
+    for filepath, sizes in list(size_dict.items()) + [("Total", sum_sizes(list(size_dict.values())))]:
+        lines.append("{:<40} {:>12} {:>12} {:>12}".format(
+            filepath, *(sizes[key] if sizes[key] is not None else "-" for key in ("raw", "gz", "br"))
+        ))
+    return "\n".join(lines)
@@ -6,10 +6,16 @@ constructor.py
 
 This script contains methods for generating HTML pages from validation dictionaries.
 """
+import hashlib
+import io
+import functools
 import json
+import os
 from datetime import datetime
 import pkgutil
 
+from . import compress
+
 
 MESSAGE_COLOR = {
     "Passing": "brightgreen",
@@ -17,6 +23,7 @@ MESSAGE_COLOR = {
     "Validation Error": "orange",
     "Parsing Error": "red",
     "Missing/Blank": "brightred",
+    "Timed Out": "purple",
     'Consistent': 'brightgreen',
     'Inconsistent': 'orange',
     'Not Checked': 'lightgrey'
@@ -27,21 +34,53 @@ MESSAGE_TO_LEVEL = {
     "Validation Error": 2,
     "Parsing Error": 3,
     "Missing/Blank": 4,
+    "Timed Out": 5,
 }
 LEVEL_TO_MESSAGE = {
     MESSAGE_TO_LEVEL[k]: k for k in MESSAGE_TO_LEVEL
 }
-# load in all the necessary HTML templates
-INDEX_HEADER_TEMPLATE = pkgutil.get_data(__name__, 'templates/index_header_template.txt').decode('utf-8')
-INDEX_TEMPLATE = pkgutil.get_data(__name__, 'templates/index_template.txt').decode('utf-8')
-STATUS_STATS_TEMPLATE = pkgutil.get_data(__name__, 'templates/statistics_template_status.txt').decode('utf-8')
-ISSUES_STATS_TEMPLATE = pkgutil.get_data(__name__, 'templates/statistics_template_issues.txt').decode('utf-8')
-COMP_STATS_TEMPLATE = pkgutil.get_data(__name__, 'templates/comparison_stats_template.txt').decode('utf-8')
-HEADER_TEMPLATE = pkgutil.get_data(__name__, 'templates/header_template.txt').decode('utf-8')
-GRID_TEMPLATE = pkgutil.get_data(__name__, 'templates/grid_template.txt').decode('utf-8')
-GRID_ITEM_TEMPLATE = pkgutil.get_data(__name__, 'templates/grid_item_template.txt').decode('utf-8')
-BADGE_TEMPLATE = pkgutil.get_data(__name__, 'templates/badge_template.txt').decode('utf-8')
-DESC_TEMPLATE = "<div class=\"desc__grid__item\"{0}>{1}</div>"
+# HTML templates (in the templates directory), loaded by get_template() on first use
+TEMPLATE_FILENAMES = {
+    "INDEX_HEADER_TEMPLATE": "index_header_template.txt",
+    "INDEX_TEMPLATE": "index_template.txt",
+    "STATUS_STATS_TEMPLATE": "statistics_template_status.txt",
+    "ISSUES_STATS_TEMPLATE": "statistics_template_issues.txt",
+    "COMP_STATS_TEMPLATE": "comparison_stats_template.txt",
+    "HEADER_TEMPLATE": "header_template.txt",
+    "GRID_TEMPLATE": "grid_template.txt",
+    "GRID_ITEM_TEMPLATE": "grid_item_template.txt",
+    "BADGE_TEMPLATE": "badge_template.txt",
+    # used by history.render_trends_html()
+    "TRENDS_TEMPLATE": "trends_template.txt",
+}
+DESC_TEMPLATE = "<div class=\"desc__grid__item{0}\">{1}</div>"
+LAZY_DESC_TEMPLATE = " data-details=\"{0}/{1}.html\""
+# directory (relative to the html files) holding the per-study detail fragments loaded by details.js
+STUDY_DETAILS_DIRNAME = "studies"
+DETAILS_SCRIPT_FILENAME = "details.js"
+# name of the file (saved alongside the html files) holding the input digest of every generated page
+MANIFEST_FILENAME = "page_manifest.json"
+# increment when a change to the rendering code (rather than the templates) changes the generated html
+RENDER_VERSION = 1
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(name):
+    """Method for loading an HTML template. Templates are read once, on first use, rather than at import time.
+
+    :param name: Template name, one of the TEMPLATE_FILENAMES keys (eg. "HEADER_TEMPLATE").
+    :type name: str
+    :return: The template.
+    :rtype: str
+    """
+    return pkgutil.get_data(__name__, 'templates/' + TEMPLATE_FILENAMES[name]).decode('utf-8')
+
+
+def __getattr__(name):
+    # the templates used to be module level constants, keep them accessible as such
+    if name in TEMPLATE_FILENAMES:
+        return get_template(name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
 
 
 def load_json(filepath):
@@ -73,7 +112,7 @@ def generate_validation_stats_summary(validation_dict):
     num_studies = 0
     num_analyses = 0
     error_num_dict = {
-        key: {"txt": 0, "json": 0} for key in ["Passing", "Warnings Only", "Validation Error", "Parsing Error", "Missing/Blank"]
+        key: {"txt": 0, "json": 0} for key in MESSAGE_TO_LEVEL
     }
     issue_types = ["value", "consistency", "format"]
     issue_num_dict = {
@@ -132,12 +171,176 @@ def create_desc(params, tabs="\t"*6):
     desc_items = list()
     for k in params:
         desc_items.append(tabs + DESC_TEMPLATE.format("", k))
-        desc_items.append(tabs + DESC_TEMPLATE.format(" style=\"white-space:nowrap;overflow:hidden;text-overflow:ellipsis;width:calc(100%);\"", params.get(k)))
+        desc_items.append(tabs + DESC_TEMPLATE.format(" desc__grid__value", params.get(k)))
 
     return "\n".join(desc_items)
 
 
-def create_html(validation_dict, owner, repo, output_filename):
+def render_html(validation_dict, owner, repo, lazy_details=False, status_matrix=None):
+    """Renders the HTML page for the given validation dictionary.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param owner: The GitHub account name that owns the repo where the html files will be committed to. Used to build links between html pages.
+    :type owner: str
+    :param repo: The name of the repo where the html files will be committed to. Used to build links between html pages.
+    :type repo: str
+    :param lazy_details: Whether to leave out the STUDY parameters, which details.js then loads from the fragments
+    written by create_study_details() when a study is expanded.
+    :type lazy_details: bool
+    :param status_matrix: Columnar view of validation_dict, or of the dictionary it was filtered from, that the
+    statistics are counted with. Built if not given.
+    :type status_matrix: :py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`
+    :return: The HTML page.
+    :rtype: str
+    """
+    page = io.StringIO()
+
+    #####################################
+    # write the HTML header information #
+    #####################################
+    page.write(get_template("INDEX_HEADER_TEMPLATE").format(
+        owner,
+        repo,
+        str(datetime.now()),
+    ))
+
+    #####################################################
+    # collect and write validation and comparison stats #
+    #####################################################
+    # collect general statistics for the run (number of available studies and analyses).
+    if status_matrix is None:
+        from .status_matrix import StatusMatrix
+        status_matrix = StatusMatrix(validation_dict)
+    mask = status_matrix.mask_of(validation_dict)
+    num_studies, num_analyses, error_dict, issue_dict = status_matrix.validation_stats_summary(mask)
+
+    # Fill out the statistics_template and comparison_stats_template.
+    num_errors = list()
+    for error_type in error_dict:
+        for file_format in error_dict[error_type]:
+            num_errors.append(error_dict[error_type][file_format])
+    issue_errors = []
+    for issue_type in issue_dict:
+        for file_format in issue_dict[issue_type]:
+            issue_errors.append(issue_dict[issue_type][file_format])
+
+    # writes the validation and comparison stats sections to the HTML file
+    page.write(get_template("STATUS_STATS_TEMPLATE").format(num_studies, num_analyses, *num_errors, owner, repo))
+    page.write(get_template("ISSUES_STATS_TEMPLATE").format(*issue_errors, owner, repo))
+    page.write(get_template("COMP_STATS_TEMPLATE").format(*status_matrix.comparison_stats_summary(mask)))
+
+    ################################
+    # generate file status section #
+    ################################
+    # file_status_list = []
+    num_of_analyses = 0
+    for i, study_id in enumerate(validation_dict):
+        # Add study header
+        # Adds header line (grid)
+        # Adds study meta data
+        height = 1*len(validation_dict[study_id]["params"])
+        study_description = get_template("HEADER_TEMPLATE").format(
+            study_id,
+            validation_dict[study_id]["params"].get("STUDY_TITLE"),
+            validation_dict[study_id]["params"].get("INSTITUTE"),
+            validation_dict[study_id]["params"].get("LAST_NAME"),
+            validation_dict[study_id]["params"].get("FIRST_NAME"),
+            " style=\"height:" + str(height) + "em;max-height:" + str(height) + "\"",
+            "" if lazy_details else create_desc(validation_dict[study_id]["params"]),
+            i,
+            LAZY_DESC_TEMPLATE.format(STUDY_DETAILS_DIRNAME, study_id) if lazy_details else ""
+        )
+        page.write(study_description)
+
+        grid_item_list = []
+        for analysis_id in validation_dict[study_id]["analyses"]:
+            num_of_analyses += 1
+
+            badge_list = []
+            for format_type in validation_dict[study_id]["analyses"][analysis_id]["status"]:
+
+                badge_list.append(get_template("BADGE_TEMPLATE").format(
+                    analysis_id,
+                    format_type,
+                    MESSAGE_COLOR[validation_dict[study_id]["analyses"][analysis_id]["status"][format_type]],
+                    validation_dict[study_id]["analyses"][analysis_id]["status"][format_type],
+                    owner,
+                    repo
+                ))
+
+            # adds the colored analysis button
+            grid_item_list.append(get_template("GRID_ITEM_TEMPLATE").format(
+                analysis_id,
+                MESSAGE_COLOR[LEVEL_TO_MESSAGE[max([
+                    MESSAGE_TO_LEVEL[value] for value in validation_dict[study_id]["analyses"][analysis_id]["status"].values() if value in MESSAGE_TO_LEVEL.keys()
+                ])]],
+                "\n".join(badge_list),
+                create_desc(validation_dict[study_id]["analyses"][analysis_id]["params"]),
+                num_of_analyses
+            ))
+
+        page.write(get_template("GRID_TEMPLATE").format("\n".join(grid_item_list)))
+
+        page.write("\t\t\t<br>")
+
+    # close the page
+    page.write("\t\t</div>\n\t</body>\n</html>\n")
+
+    return page.getvalue()
+
+
+def load_manifest(filepath):
+    """Method for loading a page manifest created by save_manifest().
+
+    :param filepath: Path to the manifest JSON file.
+    :type filepath: str
+    :return: Dictionary of page names (keys) and the digests of their inputs (values). Empty if the manifest does not
+    exist or cannot be read.
+    :rtype: dict
+    """
+    try:
+        return load_json(filepath)
+    except (OSError, ValueError):
+        return dict()
+
+
+def save_manifest(filepath, manifest):
+    """Method for saving a page manifest.
+
+    :param filepath: Path to the manifest JSON file.
+    :type filepath: str
+    :param manifest: Dictionary of page names (keys) and the digests of their inputs (values).
+    :type manifest: dict
+    :return: None
+    """
+    with open(filepath, "w") as fh:
+        fh.write(json.dumps(manifest, indent=4, sort_keys=True))
+
+
+def page_digest(page_dict, *args):
+    """Method for computing a digest of everything that determines the content of a generated page, except for its
+    "Last Updated" timestamp.
+
+    :param page_dict: The (filtered) validation dictionary the page is rendered from.
+    :type page_dict: dict
+    :param args: Any additional rendering arguments (eg. owner, repo, minify).
+    :return: Hex digest string.
+    :rtype: str
+    """
+    hasher = hashlib.sha256()
+    hasher.update(str(RENDER_VERSION).encode("utf-8"))
+    for name in ("INDEX_HEADER_TEMPLATE", "STATUS_STATS_TEMPLATE", "ISSUES_STATS_TEMPLATE", "COMP_STATS_TEMPLATE",
+                 "HEADER_TEMPLATE", "GRID_TEMPLATE", "GRID_ITEM_TEMPLATE", "BADGE_TEMPLATE"):
+        hasher.update(get_template(name).encode("utf-8"))
+    hasher.update(DESC_TEMPLATE.encode("utf-8"))
+    # not sorted: the pages are rendered in the iteration order of the dictionaries, which has to change the digest too
+    hasher.update(json.dumps([page_dict, args], separators=(",", ":"), default=str).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def create_html(validation_dict, owner, repo, output_filename, minify=False, manifest=None, manifest_key=None,
+                lazy_details=False, status_matrix=None):
     """Creates and saves HTML file based on given validation and config dictionaries.
 
     :param validation_dict: Structured dictionary containing analyses statuses and other study information.
@@ -148,95 +351,94 @@ def create_html(validation_dict, owner, repo, output_filename):
     :type repo: str
     :param output_filename: Filename of HTML file to be created.
     :type output_filename: str
-    :return: None
+    :param minify: Whether to strip indentation and inter-tag whitespace from the page.
+    :type minify: bool
+    :param manifest: Page manifest (see load_manifest()). When given, the page is only written if the digest of its
+    input differs from the one recorded in the manifest or the file is missing, and the manifest is updated in place.
+    :type manifest: dict
+    :param manifest_key: Name of the page in the manifest. Defaults to the basename of output_filename.
+    :type manifest_key: str
+    :param lazy_details: Whether to leave out the STUDY parameters so they are loaded on demand (see render_html()).
+    :type lazy_details: bool
+    :param status_matrix: Columnar view the statistics are counted with (see render_html()).
+    :type status_matrix: :py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`
+    :return: Whether the page was written.
+    :rtype: bool
     """
+    if manifest is not None:
+        manifest_key = manifest_key if manifest_key else os.path.basename(output_filename)
+        digest = page_digest(validation_dict, owner, repo, minify, lazy_details)
+        if manifest.get(manifest_key) == digest and os.path.isfile(output_filename):
+            return False
+        manifest[manifest_key] = digest
+
+    html_str = render_html(validation_dict, owner, repo, lazy_details, status_matrix)
+    if minify:
+        html_str = compress.minify_html(html_str)
+
     with open(output_filename, "w", encoding='utf-8') as fh:
+        fh.write(html_str)
 
-        #####################################
-        # write the HTML header information #
-        #####################################
-        fh.write(INDEX_HEADER_TEMPLATE.format(
-            owner,
-            repo,
-            str(datetime.now()),
-        ))
-
-        #####################################################
-        # collect and write validation and comparison stats #
-        #####################################################
-        # collect general statistics for the run (number of available studies and analyses).
-        num_studies, num_analyses, error_dict, issue_dict = generate_validation_stats_summary(validation_dict)
-
-        # Fill out the statistics_template and comparison_stats_template.
-        num_errors = list()
-        for error_type in error_dict:
-            for file_format in error_dict[error_type]:
-                num_errors.append(error_dict[error_type][file_format])
-        issue_errors = []
-        for issue_type in issue_dict:
-            for file_format in issue_dict[issue_type]:
-                issue_errors.append(issue_dict[issue_type][file_format])
-
-        # writes the validation and comparison stats sections to the HTML file
-        fh.write(STATUS_STATS_TEMPLATE.format(num_studies, num_analyses, *num_errors, owner, repo))
-        fh.write(ISSUES_STATS_TEMPLATE.format(*issue_errors, owner, repo))
-        fh.write(COMP_STATS_TEMPLATE.format(*generate_comparison_stats_summary(validation_dict)))
-
-        ################################
-        # generate file status section #
-        ################################
-        # file_status_list = []
-        num_of_analyses = 0
-        for i, study_id in enumerate(validation_dict):
-            # Add study header
-            # Adds header line (grid)
-            # Adds study meta data
-            height = 1*len(validation_dict[study_id]["params"])
-            study_description = HEADER_TEMPLATE.format(
-                study_id,
-                validation_dict[study_id]["params"].get("STUDY_TITLE"),
-                validation_dict[study_id]["params"].get("INSTITUTE"),
-                validation_dict[study_id]["params"].get("LAST_NAME"),
-                validation_dict[study_id]["params"].get("FIRST_NAME"),
-                " style=\"height:" + str(height) + "em;max-height:" + str(height) + "\"",
-                create_desc(validation_dict[study_id]["params"]),
-                i
-            )
-            fh.write(study_description)
-
-            grid_item_list = []
-            for analysis_id in validation_dict[study_id]["analyses"]:
-                num_of_analyses += 1
-
-                badge_list = []
-                for format_type in validation_dict[study_id]["analyses"][analysis_id]["status"]:
-
-                    badge_list.append(BADGE_TEMPLATE.format(
-                        analysis_id,
-                        format_type,
-                        MESSAGE_COLOR[validation_dict[study_id]["analyses"][analysis_id]["status"][format_type]],
-                        validation_dict[study_id]["analyses"][analysis_id]["status"][format_type],
-                        owner,
-                        repo
-                    ))
-
-                # adds the colored analysis button
-                grid_item_list.append(GRID_ITEM_TEMPLATE.format(
-                    analysis_id,
-                    MESSAGE_COLOR[LEVEL_TO_MESSAGE[max([
-                        MESSAGE_TO_LEVEL[value] for value in validation_dict[study_id]["analyses"][analysis_id]["status"].values() if value in MESSAGE_TO_LEVEL.keys()
-                    ])]],
-                    "\n".join(badge_list),
-                    create_desc(validation_dict[study_id]["analyses"][analysis_id]["params"]),
-                    num_of_analyses
-                ))
+    return True
 
-            fh.write(GRID_TEMPLATE.format("\n".join(grid_item_list)))
 
-            fh.write("\t\t\t<br>")
+def create_study_details(validation_dict, html_path, minify=False, manifest=None):
+    """Creates one HTML fragment per study containing its STUDY parameters. The fragments are written once and loaded
+    on demand by every page rendered with lazy_details, instead of being inlined into each of them.
 
-        # close file
-        fh.write("\t\t</div>\n\t</body>\n</html>\n")
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param html_path: Directory the html files are saved to. Fragments are saved in its STUDY_DETAILS_DIRNAME directory.
+    :type html_path: str
+    :param minify: Whether to strip indentation and inter-tag whitespace from the fragments.
+    :type minify: bool
+    :param manifest: Page manifest (see load_manifest()). When given, only fragments whose STUDY parameters changed are
+    written, and fragments of studies that no longer exist are removed.
+    :type manifest: dict
+    :return: List of the written fragment paths.
+    :rtype: list
+    """
+    details_path = os.path.join(html_path, STUDY_DETAILS_DIRNAME)
+    os.makedirs(details_path, exist_ok=True)
+
+    written_files = []
+    for study_id in validation_dict:
+        manifest_key = STUDY_DETAILS_DIRNAME + "/" + study_id + ".html"
+        output_filename = os.path.join(details_path, study_id + ".html")
+        if manifest is not None:
+            digest = page_digest(validation_dict[study_id]["params"], minify)
+            if manifest.get(manifest_key) == digest and os.path.isfile(output_filename):
+                continue
+            manifest[manifest_key] = digest
+
+        html_str = create_desc(validation_dict[study_id]["params"], tabs="") + "\n"
+        if minify:
+            html_str = compress.minify_html(html_str)
+        with open(output_filename, "w", encoding="utf-8") as fh:
+            fh.write(html_str)
+        written_files.append(output_filename)
+
+    # remove fragments of studies that are no longer present
+    if manifest is not None:
+        for manifest_key in [key for key in manifest if key.startswith(STUDY_DETAILS_DIRNAME + "/")]:
+            if manifest_key[len(STUDY_DETAILS_DIRNAME) + 1:-len(".html")] not in validation_dict:
+                del manifest[manifest_key]
+                for filepath in [os.path.join(html_path, manifest_key + suffix) for suffix in ("", ".gz", ".br")]:
+                    if os.path.isfile(filepath):
+                        os.remove(filepath)
+
+    return written_files
+
+
+def write_details_script(filepath):
+    """Method for writing the client-side script that loads study detail fragments when a study is expanded.
+
+    :param filepath: Path to the JavaScript file.
+    :type filepath: str
+    :return: None
+    """
+    with open(filepath, "wb") as fh:
+        fh.write(pkgutil.get_data(__name__, "templates/details.js"))
 
 
 def filter_analyses_by_status(validation_dict, status_str, match_all_formats = False):
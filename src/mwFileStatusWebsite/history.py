@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+history.py
+~~~~~~~~~~
+
+This script contains methods for keeping an append-only archive of validation runs. Every run is one JSON line holding
+the run's summary counts and only the analyses whose statuses changed since the previous run (deltas, not full
+snapshots). Statuses are stored as a three character code of the txt, json and comparison statuses (eg. "VVC").
+
+Example line:
+{"run": "2026-10-19T03:00:00", "summary": {...}, "changes": {"AN000001": "PVC", ...}, "removed": ["AN000002"]}
+
+The latest full state is cached in a sidecar file (<history>.state) so appending a run does not replay the archive. The
+sidecar is rebuilt from the archive whenever it is missing or out of date.
+"""
+import collections
+import json
+import os
+from datetime import datetime
+
+from . import compress, constructor
+
+
+STATUS_CODES = {
+    "Passing": "P",
+    "Warnings Only": "W",
+    "Validation Error": "V",
+    "Parsing Error": "E",
+    "Missing/Blank": "M",
+    "Timed Out": "T",
+    None: "-",
+}
+COMPARISON_CODES = {
+    "Consistent": "C",
+    "Inconsistent": "I",
+    "Not Checked": "N",
+    None: "-",
+}
+CODE_TO_STATUS = {STATUS_CODES[k]: k for k in STATUS_CODES}
+CODE_TO_COMPARISON = {COMPARISON_CODES[k]: k for k in COMPARISON_CODES}
+STATE_SUFFIX = ".state"
+# status counts of runs recorded before a status existed (eg. "Timed Out")
+NO_COUNTS = {"txt": 0, "json": 0}
+CELL_TEMPLATE = "\t\t\t\t<div class=\"stats__grid__item{0}\">{1}</div>"
+# SVG stroke colors of the css color classes used in constructor.MESSAGE_COLOR
+CHART_COLORS = {
+    "brightgreen": "#50ca22",
+    "yellow": "#cfcf00",
+    "orange": "#f78344",
+    "red": "#cd6d58",
+    "brightred": "#ff0000",
+    "purple": "#8e44ad",
+    "lightgrey": "#a1a1a1",
+}
+
+
+def encode_status(status_dict):
+    """Method for encoding the statuses of an analysis into its three character history code.
+
+    :param status_dict: The "status" section of an analysis in the validation dictionary.
+    :type status_dict: dict
+    :return: Status code (eg. "PVC").
+    :rtype: str
+    """
+    return STATUS_CODES.get(status_dict.get("txt"), "-") + \
+        STATUS_CODES.get(status_dict.get("json"), "-") + \
+        COMPARISON_CODES.get(status_dict.get("comparison"), "-")
+
+
+def decode_status(code):
+    """Method for decoding a three character history code back into a status dictionary.
+
+    :param code: Status code (eg. "PVC").
+    :type code: str
+    :return: Dictionary with "txt", "json", and "comparison" statuses.
+    :rtype: dict
+    """
+    return {"txt": CODE_TO_STATUS[code[0]], "json": CODE_TO_STATUS[code[1]], "comparison": CODE_TO_COMPARISON[code[2]]}
+
+
+def summarize(validation_dict):
+    """Method for creating the summary counts stored for each run.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :return: Dictionary of the number of studies and analyses, and the status, issue, and comparison counts.
+    :rtype: dict
+    """
+    from .status_matrix import StatusMatrix
+    status_matrix = StatusMatrix(validation_dict)
+    num_studies, num_analyses, error_dict, issue_dict = status_matrix.validation_stats_summary()
+    consistent, inconsistent, not_checked = status_matrix.comparison_stats_summary()
+    return {
+        "studies": num_studies,
+        "analyses": num_analyses,
+        "status": error_dict,
+        "issues": issue_dict,
+        "comparison": {"Consistent": consistent, "Inconsistent": inconsistent, "Not Checked": not_checked},
+    }
+
+
+def read_runs(history_path):
+    """Method for iterating over the runs stored in a history archive, oldest first.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :return: Generator of run dictionaries.
+    """
+    if not os.path.isfile(history_path):
+        return
+    with open(history_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def replay(history_path):
+    """Method for rebuilding the latest state of every analysis from a history archive.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :return: Tuple of the number of runs and the dictionary of analysis IDs (keys) and their status codes (values).
+    :rtype: tuple
+    """
+    state = dict()
+    num_runs = 0
+    for run in read_runs(history_path):
+        num_runs += 1
+        state.update(run["changes"])
+        for analysis_id in run.get("removed", []):
+            state.pop(analysis_id, None)
+    return num_runs, state
+
+
+def load_state(history_path):
+    """Method for loading the latest state of every analysis, preferring the sidecar file over replaying the archive.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :return: Tuple of the number of runs and the dictionary of analysis IDs (keys) and their status codes (values).
+    :rtype: tuple
+    """
+    history_size = os.path.getsize(history_path) if os.path.isfile(history_path) else 0
+    try:
+        with open(history_path + STATE_SUFFIX, "r") as fh:
+            sidecar = json.loads(fh.read())
+        if sidecar["size"] == history_size:
+            return sidecar["runs"], sidecar["state"]
+    except (OSError, ValueError, KeyError):
+        pass
+    return replay(history_path)
+
+
+def save_state(history_path, num_runs, state):
+    """Method for saving the sidecar file caching the latest state of every analysis.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :param num_runs: Number of runs in the archive.
+    :type num_runs: int
+    :param state: Dictionary of analysis IDs (keys) and their status codes (values).
+    :type state: dict
+    :return: None
+    """
+    tmp_path = history_path + STATE_SUFFIX + ".tmp"
+    with open(tmp_path, "w") as fh:
+        fh.write(json.dumps({"runs": num_runs, "size": os.path.getsize(history_path), "state": state}, separators=(",", ":")))
+    os.replace(tmp_path, history_path + STATE_SUFFIX)
+
+
+def append_run(history_path, validation_dict, run_time=None, partial=False):
+    """Method for appending a validation run to a history archive.
+
+    :param history_path: Path to the history archive. Created if it does not exist.
+    :type history_path: str
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param run_time: Time of the run. Defaults to now.
+    :type run_time: :py:class:`datetime.datetime`
+    :param partial: The run only validated a subset of the analyses, so the analyses missing from validation_dict keep
+    their last status instead of being recorded as removed.
+    :type partial: bool
+    :return: The appended run dictionary.
+    :rtype: dict
+    """
+    num_runs, state = load_state(history_path)
+
+    current = {
+        analysis_id: encode_status(analysis_dict["status"])
+        for study_id in validation_dict
+        for analysis_id, analysis_dict in validation_dict[study_id]["analyses"].items()
+    }
+    run = {
+        "run": (run_time if run_time else datetime.now()).isoformat(timespec="seconds"),
+        "summary": summarize(validation_dict),
+        "changes": {analysis_id: code for analysis_id, code in current.items() if state.get(analysis_id) != code},
+        "removed": [] if partial else sorted(analysis_id for analysis_id in state if analysis_id not in current),
+    }
+    if partial:
+        current = dict(state, **current)
+
+    with open(history_path, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(run, separators=(",", ":")) + "\n")
+    save_state(history_path, num_runs + 1, current)
+
+    return run
+
+
+def is_regression(old_status, new_status):
+    """Method for checking whether a status transition made an analysis worse.
+
+    :param old_status: Decoded status before the transition.
+    :type old_status: dict
+    :param new_status: Decoded status after the transition.
+    :type new_status: dict
+    :return: Whether either file format got a worse status or the formats became inconsistent.
+    :rtype: bool
+    """
+    for file_format in ("txt", "json"):
+        if old_status[file_format] in constructor.MESSAGE_TO_LEVEL and new_status[file_format] in constructor.MESSAGE_TO_LEVEL and \
+           constructor.MESSAGE_TO_LEVEL[new_status[file_format]] > constructor.MESSAGE_TO_LEVEL[old_status[file_format]]:
+            return True
+    return old_status["comparison"] == "Consistent" and new_status["comparison"] == "Inconsistent"
+
+
+def transitions(history_path, analysis_ids=None):
+    """Method for listing the status transitions recorded in a history archive. The first appearance of an analysis is
+    not a transition.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :param analysis_ids: Only list transitions of these analyses.
+    :type analysis_ids: set
+    :return: List of (run time, analysis ID, old status, new status) tuples, oldest first.
+    :rtype: list
+    """
+    state = dict()
+    transition_list = []
+    for run in read_runs(history_path):
+        for analysis_id, code in run["changes"].items():
+            if analysis_id in state and (analysis_ids is None or analysis_id in analysis_ids):
+                transition_list.append((run["run"], analysis_id, decode_status(state[analysis_id]), decode_status(code)))
+            state[analysis_id] = code
+        for analysis_id in run.get("removed", []):
+            state.pop(analysis_id, None)
+    return transition_list
+
+
+def render_chart(series, width=800, height=200):
+    """Method for rendering an inline SVG line chart.
+
+    :param series: List of (label, status) tuples and their values, ie. [(label, status, [value, ...]), ...]. The status
+    selects the line color through constructor.MESSAGE_COLOR.
+    :type series: list
+    :param width: Width of the plot area.
+    :type width: int
+    :param height: Height of the plot area.
+    :type height: int
+    :return: SVG element string.
+    :rtype: str
+    """
+    num_points = max([len(values) for _, _, values in series] + [1])
+    max_value = max([max(values) for _, _, values in series if values] + [1])
+    legend_height = 20
+    lines = ["\t\t\t<svg class=\"trends__chart\" viewBox=\"0 0 {} {}\" xmlns=\"http://www.w3.org/2000/svg\">".format(
+        width, height + legend_height)]
+
+    for position, (label, status, values) in enumerate(series):
+        color = CHART_COLORS[constructor.MESSAGE_COLOR[status]]
+        points = " ".join(
+            "{:.1f},{:.1f}".format(
+                index * width / (num_points - 1) if num_points > 1 else width / 2,
+                height - value * (height - 4) / max_value - 2
+            ) for index, value in enumerate(values)
+        )
+        lines.append("\t\t\t\t<polyline fill=\"none\" stroke=\"{}\" stroke-width=\"2\" points=\"{}\"><title>{}</title></polyline>".format(
+            color, points, label))
+        lines.append("\t\t\t\t<text x=\"{}\" y=\"{}\" fill=\"{}\" font-size=\"12\">{}</text>".format(
+            5 + position * width // len(series), height + legend_height - 5, color, label))
+
+    lines.append("\t\t\t</svg>")
+    return "\n".join(lines)
+
+
+def render_trends_html(history_path, owner, repo, max_runs=None, max_regressions=100):
+    """Method for rendering the trends page of a history archive in a single pass over the archive.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :param owner: The GitHub account name that owns the repo where the html files will be committed to. Used to build links between html pages.
+    :type owner: str
+    :param repo: The name of the repo where the html files will be committed to. Used to build links between html pages.
+    :type repo: str
+    :param max_runs: Maximum number of (most recent) runs listed in the runs table. All runs are charted.
+    :type max_runs: int
+    :param max_regressions: Maximum number of (most recent) regressions listed.
+    :type max_regressions: int
+    :return: The HTML page.
+    :rtype: str
+    """
+    run_list = []
+    regressions = collections.deque(maxlen=max_regressions)
+    state = dict()
+    for run in read_runs(history_path):
+        run_list.append((run["run"], run["summary"], len(run["changes"]) + len(run.get("removed", []))))
+        for analysis_id, code in run["changes"].items():
+            if analysis_id in state:
+                old_status, new_status = decode_status(state[analysis_id]), decode_status(code)
+                if is_regression(old_status, new_status):
+                    regressions.append((run["run"], analysis_id, old_status, new_status))
+            state[analysis_id] = code
+        for analysis_id in run.get("removed", []):
+            state.pop(analysis_id, None)
+
+    statuses = list(constructor.MESSAGE_TO_LEVEL)
+    charts = [
+        render_chart([(status, status, [summary["status"].get(status, NO_COUNTS)[file_format] for _, summary, _ in run_list]) for status in statuses])
+        for file_format in ("txt", "json")
+    ]
+    charts.append(render_chart([
+        (status, status, [summary["comparison"][status] for _, summary, _ in run_list]) for status in ("Consistent", "Inconsistent", "Not Checked")
+    ]))
+
+    run_cells = []
+    for run_time, summary, num_changes in reversed(run_list[-max_runs:] if max_runs else run_list):
+        run_cells.append(CELL_TEMPLATE.format("", run_time))
+        run_cells.append(CELL_TEMPLATE.format("", summary["analyses"]))
+        for status in statuses:
+            counts = summary["status"].get(status, NO_COUNTS)
+            run_cells.append(CELL_TEMPLATE.format("", "{} / {}".format(counts["txt"], counts["json"])))
+        run_cells.append(CELL_TEMPLATE.format("", summary["comparison"]["Consistent"]))
+        run_cells.append(CELL_TEMPLATE.format("", summary["comparison"]["Inconsistent"]))
+        run_cells.append(CELL_TEMPLATE.format("", num_changes))
+
+    regression_cells = []
+    for run_time, analysis_id, old_status, new_status in reversed(regressions):
+        regression_cells.append(CELL_TEMPLATE.format("", run_time))
+        regression_cells.append(CELL_TEMPLATE.format("", analysis_id))
+        for status_dict in (old_status, new_status):
+            regression_cells.append(CELL_TEMPLATE.format(
+                " " + constructor.MESSAGE_COLOR.get(max(
+                    (status_dict["txt"], status_dict["json"]), key=lambda status: constructor.MESSAGE_TO_LEVEL.get(status, -1)
+                ), "lightgrey"),
+                " / ".join(str(status_dict[key]) for key in ("txt", "json", "comparison"))
+            ))
+
+    return constructor.get_template("INDEX_HEADER_TEMPLATE").format(owner, repo, str(datetime.now())) + constructor.get_template("TRENDS_TEMPLATE").format(
+        len(run_list),
+        run_list[0][0] if run_list else "-",
+        run_list[-1][0] if run_list else "-",
+        *charts,
+        "\n".join(run_cells),
+        "\n".join(regression_cells)
+    )
+
+
+def create_trends_html(history_path, owner, repo, output_filename, minify=False, max_runs=104):
+    """Creates and saves the trends page of a history archive.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :param owner: The GitHub account name that owns the repo where the html files will be committed to. Used to build links between html pages.
+    :type owner: str
+    :param repo: The name of the repo where the html files will be committed to. Used to build links between html pages.
+    :type repo: str
+    :param output_filename: Filename of HTML file to be created.
+    :type output_filename: str
+    :param minify: Whether to strip indentation and inter-tag whitespace from the page.
+    :type minify: bool
+    :param max_runs: Maximum number of (most recent) runs listed in the runs table. All runs are charted.
+    :type max_runs: int
+    :return: None
+    """
+    html_str = render_trends_html(history_path, owner, repo, max_runs=max_runs)
+    if minify:
+        html_str = compress.minify_html(html_str)
+
+    with open(output_filename, "w", encoding="utf-8") as fh:
+        fh.write(html_str)
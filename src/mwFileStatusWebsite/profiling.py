@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+profiling.py
+~~~~~~~~~~~~
+
+This script contains methods for profiling the validation hot path on a sample of analyses read from a local mirror
+(eg. the files saved by validate --to-path, or the test fixtures) instead of the Metabolomics Workbench REST API.
+
+Each sampled analysis is validated (validator._validate() of both formats) and compared (compare.compare()), and the
+html of the sample is rendered (constructor.create_html()). This is done twice: once under cProfile for the timings,
+and once under tracemalloc for the memory, so the tracing overhead of one does not skew the other.
+
+Report layout:
+{
+    "version": 1, "created": "2024-01-01T00:00:00", "mwtab_version": "1.2.5", "python": "3.11.7",
+    "analyses": [analysis_id, ...],
+    "phases": {"validate": {"seconds": 1.2, "functions": [{"function": "mwtab/validator.py:10(validate_file)",
+                                                          "calls": 2, "tottime": 0.01, "cumtime": 0.9}, ...]},
+               "compare": {...}, "html": {...}},
+    "allocations": [{"site": "mwtab/mwtab.py:120", "size": 1024, "count": 8}, ...],
+    "peak_memory": {analysis_id: bytes, ...}
+}
+"""
+import collections
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import mwtab
+
+from . import compare, constructor, validator
+
+
+PROFILE_REPORT_VERSION = 1
+PROFILE_SAMPLE_SIZE = 20
+PROFILE_TOP = 25
+# placeholder study ID of an analysis until its files are read
+PROFILE_STUDY_ID = "ST000000"
+PHASES = ("validate", "compare", "html")
+LINE_NUMBER_REGEX = re.compile(r":\d+\(")
+
+
+def sample_analyses(analysis_ids, sample_size=PROFILE_SAMPLE_SIZE, seed=0):
+    """Method for sampling analyses reproducibly.
+
+    :param analysis_ids: Analysis IDs to sample from.
+    :type analysis_ids: list
+    :param sample_size: Number of analyses to sample, all of them if there are fewer.
+    :type sample_size: int
+    :param seed: Seed of the random sample.
+    :type seed: int
+    :return: Sorted list of the sampled analysis IDs.
+    :rtype: list
+    """
+    analysis_ids = sorted(analysis_ids)
+    return sorted(random.Random(seed).sample(analysis_ids, min(sample_size, len(analysis_ids))))
+
+
+def short_path(filename):
+    """Method for shortening a source file path to its path relative to sys.path (eg. mwtab/validator.py), so the
+    reports of different environments can be diffed.
+
+    :param filename: Source file path.
+    :type filename: str
+    :return: Shortened path.
+    :rtype: str
+    """
+    for path in sorted((path for path in sys.path if path), key=len, reverse=True):
+        if filename.startswith(path.rstrip(os.sep) + os.sep):
+            return os.path.relpath(filename, path).replace(os.sep, "/")
+    return filename
+
+
+def function_name(function_key):
+    """Method for formatting a cProfile function key the way pstats does.
+
+    :param function_key: cProfile (filename, line number, function name) key.
+    :type function_key: tuple
+    :return: Function name (eg. mwtab/validator.py:10(validate_file)).
+    :rtype: str
+    """
+    filename, lineno, name = function_key
+    if filename == "~":  # built-in functions
+        return name
+    return "{}:{}({})".format(short_path(filename), lineno, name)
+
+
+def top_functions(profiler, top=PROFILE_TOP):
+    """Method for listing the functions of a profile with the highest cumulative time.
+
+    :param profiler: Profiler of a phase.
+    :type profiler: :py:class:`cProfile.Profile`
+    :param top: Number of functions to list.
+    :type top: int
+    :return: List of function dictionaries.
+    :rtype: list
+    """
+    profiler.create_stats()
+    functions = [
+        {"function": function_name(function_key), "calls": calls, "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)}
+        for function_key, (_, calls, tottime, cumtime, _) in profiler.stats.items()
+    ]
+    functions.sort(key=lambda function: function["cumtime"], reverse=True)
+    return functions[:top]
+
+
+def validate_and_compare(analysis_id, file_paths, run=None):
+    """Method for validating the files of an analysis and comparing its two formats.
+
+    :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+    :type analysis_id: str
+    :param file_paths: Dictionary of file formats and the file paths to read them from.
+    :type file_paths: dict
+    :param run: Function called as run(phase, function, *args, **kwargs) to call the validation and comparison functions,
+    eg. to profile them.
+    :type run: callable
+    :return: Tuple of the study ID, the STUDY parameters, the analysis' section of the validation dictionary, and the
+    validated mwTab files.
+    :rtype: tuple
+    """
+    run = run or (lambda phase, function, *args, **kwargs: function(*args, **kwargs))
+    validation_dict = validator.create_validation_dict({PROFILE_STUDY_ID: [analysis_id]})
+    analysis_dict = validation_dict[PROFILE_STUDY_ID]["analyses"][analysis_id]
+
+    mwtabfiles = dict()
+    for file_format in sorted(file_paths):
+        try:
+            mwtabfiles[file_format], _ = run("validate", validator._validate, validation_dict, PROFILE_STUDY_ID, analysis_id,
+                                             file_format, source=file_paths[file_format])
+        except Exception:
+            analysis_dict["status"][file_format] = "Parsing Error"
+
+    analysis_dict["status"]["comparison"] = "Not Checked"
+    if "txt" in mwtabfiles and "json" in mwtabfiles:
+        comparison_list = run("compare", compare.compare, mwtabfiles["txt"], mwtabfiles["json"])
+        analysis_dict["status"]["comparison"] = "Inconsistent" if comparison_list else "Consistent"
+
+    study_id = next((mwtabfile.study_id for mwtabfile in mwtabfiles.values()), PROFILE_STUDY_ID)
+    return study_id, validation_dict[PROFILE_STUDY_ID]["params"], analysis_dict, mwtabfiles
+
+
+def add_analysis(validation_dict, study_id, study_params, analysis_id, analysis_dict):
+    """Method for adding the result of validate_and_compare() to a validation dictionary.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param study_id: Metabolomics Workbench study ID string (eg. ST000001).
+    :type study_id: str
+    :param study_params: The STUDY parameters of the analysis' files.
+    :type study_params: dict
+    :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+    :type analysis_id: str
+    :param analysis_dict: The analysis' section of the validation dictionary.
+    :type analysis_dict: dict
+    :return: None
+    """
+    study_dict = validation_dict.setdefault(study_id, {"params": {}, "analyses": {}})
+    study_dict["params"] = study_dict["params"] or study_params
+    study_dict["analyses"][analysis_id] = analysis_dict
+
+
+def profile_time(mirror_files, analysis_ids, owner, repo, top=PROFILE_TOP, verbose=False):
+    """Method for profiling the validation, comparison, and html rendering of the sampled analyses with cProfile.
+
+    :param mirror_files: Dictionary of analysis IDs and their file paths (see validator.find_mirror_files()).
+    :type mirror_files: dict
+    :param analysis_ids: Sampled analysis IDs.
+    :type analysis_ids: list
+    :param owner: The GitHub account name used in the rendered html.
+    :type owner: str
+    :param repo: The name of the repo used in the rendered html.
+    :type repo: str
+    :param top: Number of functions to list per phase.
+    :type top: int
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: Dictionary of phases and their total seconds and top functions.
+    :rtype: dict
+    """
+    profilers = {phase: cProfile.Profile() for phase in PHASES}
+    seconds = dict.fromkeys(PHASES, 0.0)
+
+    def run(phase, function, *args, **kwargs):
+        start = time.perf_counter()
+        profilers[phase].enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profilers[phase].disable()
+            seconds[phase] += time.perf_counter() - start
+
+    validation_dict = dict()
+    for analysis_id in analysis_ids:
+        if verbose:
+            print("Profiling:", analysis_id)
+        study_id, study_params, analysis_dict, _ = validate_and_compare(analysis_id, mirror_files[analysis_id], run)
+        add_analysis(validation_dict, study_id, study_params, analysis_id, analysis_dict)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        run("html", constructor.create_html, validation_dict, owner, repo, os.path.join(tmp_dir, "index.html"))
+
+    return {phase: {"seconds": round(seconds[phase], 6), "functions": top_functions(profilers[phase], top)} for phase in PHASES}
+
+
+def profile_memory(mirror_files, analysis_ids, top=PROFILE_TOP, verbose=False):
+    """Method for measuring the peak memory of validating and comparing each sampled analysis with tracemalloc, and the
+    sites that allocated the memory still held at the end of each analysis (mostly the parsed mwTab files).
+
+    :param mirror_files: Dictionary of analysis IDs and their file paths (see validator.find_mirror_files()).
+    :type mirror_files: dict
+    :param analysis_ids: Sampled analysis IDs.
+    :type analysis_ids: list
+    :param top: Number of allocation sites to list.
+    :type top: int
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: Tuple of the dictionary of analysis IDs and their peak memory in bytes, and the list of top allocation sites.
+    :rtype: tuple
+    """
+    peak_memory = dict()
+    sizes = collections.Counter()
+    counts = collections.Counter()
+    trace_filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+
+    for analysis_id in analysis_ids:
+        if verbose:
+            print("Measuring memory:", analysis_id)
+        # tracing is restarted for every analysis, so its peak only counts the analysis' own allocations
+        tracemalloc.start()
+        try:
+            result = validate_and_compare(analysis_id, mirror_files[analysis_id])
+            peak_memory[analysis_id] = tracemalloc.get_traced_memory()[1]
+            snapshot = tracemalloc.take_snapshot().filter_traces(trace_filters)
+        finally:
+            tracemalloc.stop()
+        del result
+
+        for statistic in snapshot.statistics("lineno"):
+            site = "{}:{}".format(short_path(statistic.traceback[0].filename), statistic.traceback[0].lineno)
+            sizes[site] += statistic.size
+            counts[site] += statistic.count
+
+    allocations = [{"site": site, "size": size, "count": counts[site]} for site, size in sizes.most_common(top)]
+    return peak_memory, allocations
+
+
+def create_report(mirror_path, sample_size=PROFILE_SAMPLE_SIZE, seed=0, owner="MoseleyBioinformaticsLab",
+                  repo="mwFileStatusWebsite", top=PROFILE_TOP, verbose=False):
+    """Method for profiling a sample of the analyses of a mirror directory.
+
+    :param mirror_path: Directory path of the mirror (see validator.find_mirror_files()).
+    :type mirror_path: str
+    :param sample_size: Number of analyses to sample.
+    :type sample_size: int
+    :param seed: Seed of the random sample.
+    :type seed: int
+    :param owner: The GitHub account name used in the rendered html.
+    :type owner: str
+    :param repo: The name of the repo used in the rendered html.
+    :type repo: str
+    :param top: Number of functions and allocation sites to list.
+    :type top: int
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: Report dictionary (see the module docstring for its layout).
+    :rtype: dict
+    """
+    mirror_files = validator.find_mirror_files(mirror_path)
+    if not mirror_files:
+        raise ValueError("No mwTab files found in {}".format(mirror_path))
+    analysis_ids = sample_analyses(mirror_files, sample_size, seed)
+
+    phases = profile_time(mirror_files, analysis_ids, owner, repo, top, verbose)
+    peak_memory, allocations = profile_memory(mirror_files, analysis_ids, top, verbose)
+    return {
+        "version": PROFILE_REPORT_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "mwtab_version": mwtab.__version__,
+        "python": "{}.{}.{}".format(*sys.version_info[:3]),
+        "analyses": analysis_ids,
+        "phases": phases,
+        "allocations": allocations,
+        "peak_memory": peak_memory,
+    }
+
+
+def load_report(filepath):
+    """Method for loading a saved report.
+
+    :param filepath: Path to the report JSON file.
+    :type filepath: str
+    :return: Report dictionary.
+    :rtype: dict
+    """
+    with open(filepath, "r") as fh:
+        report = json.loads(fh.read())
+    if report.get("version") != PROFILE_REPORT_VERSION:
+        raise ValueError("{} is not a version {} profile report.".format(filepath, PROFILE_REPORT_VERSION))
+    return report
+
+
+def _delta(old, new):
+    return {"old": old, "new": new, "delta": new - old, "ratio": round(new / old, 4) if old else None}
+
+
+def diff_reports(old_report, new_report, top=PROFILE_TOP):
+    """Method for diffing two reports. Functions are matched on their file and name, ignoring line numbers, so reports
+    of different mwtab releases can be diffed. A function or site missing from the top list of a report counts as 0.
+    Times are totals over the sample, so only reports of the same sample (sample size and seed) should be diffed.
+
+    :param old_report: Report dictionary of the baseline.
+    :type old_report: dict
+    :param new_report: Report dictionary to compare to the baseline.
+    :type new_report: dict
+    :param top: Number of functions per phase and allocation sites to list, by largest absolute change.
+    :type top: int
+    :return: Diff dictionary.
+    :rtype: dict
+    """
+    def by_largest_change(rows):
+        return sorted(rows, key=lambda row: abs(row["delta"]), reverse=True)[:top]
+
+    phases = dict()
+    for phase in PHASES:
+        old_phase = old_report["phases"].get(phase, {"seconds": 0, "functions": []})
+        new_phase = new_report["phases"].get(phase, {"seconds": 0, "functions": []})
+        old_functions = {LINE_NUMBER_REGEX.sub("(", function["function"]): function["cumtime"] for function in old_phase["functions"]}
+        new_functions = {LINE_NUMBER_REGEX.sub("(", function["function"]): function["cumtime"] for function in new_phase["functions"]}
+        phases[phase] = dict(_delta(old_phase["seconds"], new_phase["seconds"]), functions=by_largest_change(
+            [dict(_delta(old_functions.get(name, 0), new_functions.get(name, 0)), function=name)
+             for name in sorted(set(old_functions) | set(new_functions))]
+        ))
+
+    common_analyses = sorted(set(old_report["peak_memory"]) & set(new_report["peak_memory"]))
+    peak_memory = {analysis_id: _delta(old_report["peak_memory"][analysis_id], new_report["peak_memory"][analysis_id])
+                   for analysis_id in common_analyses}
+    peak_memory_total = _delta(sum(old_report["peak_memory"][analysis_id] for analysis_id in common_analyses),
+                               sum(new_report["peak_memory"][analysis_id] for analysis_id in common_analyses))
+
+    old_sites = {allocation["site"]: allocation["size"] for allocation in old_report["allocations"]}
+    new_sites = {allocation["site"]: allocation["size"] for allocation in new_report["allocations"]}
+    allocations = by_largest_change([dict(_delta(old_sites.get(site, 0), new_sites.get(site, 0)), site=site)
+                                     for site in sorted(set(old_sites) | set(new_sites))])
+
+    return {
+        "mwtab_version": {"old": old_report.get("mwtab_version"), "new": new_report.get("mwtab_version")},
+        "analyses": common_analyses,
+        "phases": phases,
+        "peak_memory": peak_memory,
+        "peak_memory_total": peak_memory_total,
+        "allocations": allocations,
+    }
+
+
+def format_report(report):
+    """Method for formatting a report as text.
+
+    :param report: Report dictionary.
+    :type report: dict
+    :return: Text report.
+    :rtype: str
+    """
+    lines = ["mwtab {}, Python {}, {} analyses".format(report["mwtab_version"], report["python"], len(report["analyses"]))]
+    for phase in PHASES:
+        phase_dict = report["phases"][phase]
+        lines.append("")
+        lines.append("{}: {:.3f} s".format(phase, phase_dict["seconds"]))
+        lines.append("{:>10} {:>10} {:>10}  {}".format("calls", "tottime", "cumtime", "function"))
+        lines.extend("{:>10} {:>10.4f} {:>10.4f}  {}".format(function["calls"], function["tottime"], function["cumtime"], function["function"])
+                     for function in phase_dict["functions"])
+
+    lines.append("")
+    lines.append("top allocation sites (memory held at the end of each analysis):")
+    lines.append("{:>12} {:>10}  {}".format("KiB", "blocks", "site"))
+    lines.extend("{:>12.1f} {:>10}  {}".format(allocation["size"] / 1024, allocation["count"], allocation["site"])
+                 for allocation in report["allocations"])
+
+    lines.append("")
+    lines.append("peak memory per analysis:")
+    lines.extend("{:>12.1f} KiB  {}".format(peak / 1024, analysis_id) for analysis_id, peak in sorted(report["peak_memory"].items()))
+    return "\n".join(lines)
+
+
+def _format_delta(delta_dict, scale=1, unit=""):
+    ratio = "{:.2f}x".format(delta_dict["ratio"]) if delta_dict["ratio"] is not None else "new"
+    return "{:>12.4f} -> {:>12.4f} {} ({:+.4f}, {})".format(delta_dict["old"] / scale, delta_dict["new"] / scale, unit,
+                                                            delta_dict["delta"] / scale, ratio)
+
+
+def format_diff(diff):
+    """Method for formatting a report diff as text.
+
+    :param diff: Diff dictionary (see diff_reports()).
+    :type diff: dict
+    :return: Text diff.
+    :rtype: str
+    """
+    lines = ["mwtab {} -> {}, {} common analyses".format(diff["mwtab_version"]["old"], diff["mwtab_version"]["new"], len(diff["analyses"]))]
+    for phase in PHASES:
+        lines.append("")
+        lines.append("{}: {}".format(phase, _format_delta(diff["phases"][phase], unit="s")))
+        lines.extend("    {}  {}".format(_format_delta(function, unit="s"), function["function"]) for function in diff["phases"][phase]["functions"])
+
+    lines.append("")
+    lines.append("peak memory total: {}".format(_format_delta(diff["peak_memory_total"], 1024, "KiB")))
+    lines.extend("    {}  {}".format(_format_delta(delta_dict, 1024, "KiB"), analysis_id) for analysis_id, delta_dict in diff["peak_memory"].items())
+
+    lines.append("")
+    lines.append("allocation sites:")
+    lines.extend("    {}  {}".format(_format_delta(allocation, 1024, "KiB"), allocation["site"]) for allocation in diff["allocations"])
+    return "\n".join(lines)
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+progress.py
+~~~~~~~~~~~
+
+This script contains a progress reporter for long validation runs. The validation loop feeds it fetch, retry, and
+analysis completion events (counter updates only), and a background thread reports every interval seconds, so a run
+that is stalled in a fetch still reports (its idle time grows while its throughput drops).
+
+Each report gives the completed and total number of analyses, the rolling throughput over the last analyses, the
+estimated time remaining, the fetches in flight, the number of retries, the current concurrency limit and request rate
+of the adaptive limiter (see throttle.py, null without one), and a histogram of the statuses so far, either as a human
+readable line, as a JSON line (for log shippers), or both.
+
+JSON line layout:
+{
+    "time": "2024-01-01T00:00:00", "elapsed": 12.3, "completed": 10, "total": 100, "throughput": 0.81, "eta": 111.1,
+    "in_flight": 1, "retries": 2, "idle": 0.4, "concurrency": 2.5, "rate": 1.8, "final": false,
+    "statuses": {"txt": {"Passing": 9, ...}, "json": {...}, "comparison": {...}}
+}
+"""
+import collections
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+
+
+PROGRESS_INTERVAL = 10
+THROUGHPUT_WINDOW = 50
+STATUS_KEYS = ("txt", "json", "comparison")
+
+
+def format_duration(seconds):
+    """Method for formatting a number of seconds as H:MM:SS.
+
+    :param seconds: Number of seconds, or None if unknown.
+    :type seconds: float
+    :return: Formatted duration.
+    :rtype: str
+    """
+    if seconds is None:
+        return "-:--:--"
+    seconds = int(round(seconds))
+    return "{}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+class Progress(object):
+    """Thread-safe progress reporter of a validation run."""
+
+    def __init__(self, total=0, stream=None, json_path=None, interval=PROGRESS_INTERVAL, window=THROUGHPUT_WINDOW,
+                 clock=time.monotonic, limiter=None):
+        """Progress initializer.
+
+        :param total: Number of analyses to validate.
+        :type total: int
+        :param stream: File object the human readable progress line is written to, sys.stdout if True, none if None.
+        :type stream: file or bool
+        :param json_path: Path of the file JSON lines are appended to, "-" for sys.stdout, none if None.
+        :type json_path: str
+        :param interval: Number of seconds between reports.
+        :type interval: float
+        :param window: Number of most recently completed analyses the throughput is computed over.
+        :type window: int
+        :param clock: Monotonic clock function.
+        :type clock: callable
+        :param limiter: Adaptive limiter whose concurrency limit and rate are reported.
+        :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+        """
+        self.total = total
+        self.stream = stream
+        self.json_path = json_path
+        self.interval = interval
+        self.clock = clock
+        self.limiter = limiter
+        self.completed = 0
+        self.in_flight = 0
+        self.retries = 0
+        self.statuses = {key: collections.Counter() for key in STATUS_KEYS}
+        self.start_time = clock()
+        self.last_completion = self.start_time
+        self._completions = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._json_fh = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self, total=None):
+        """Method for starting the run and its periodic reports.
+
+        :param total: Number of analyses to validate, keeps the current total if None.
+        :type total: int
+        :return: None
+        """
+        with self._lock:
+            if total is not None:
+                self.total = total
+            self.start_time = self.last_completion = self.clock()
+        if self.json_path and self._json_fh is None:
+            self._json_fh = sys.stdout if self.json_path == "-" else open(self.json_path, "a", encoding="utf-8")
+        if self.interval and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Method for stopping the periodic reports and writing the final report.
+
+        :return: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.report(final=True)
+        if self._json_fh is not None and self._json_fh is not sys.stdout:
+            self._json_fh.close()
+        self._json_fh = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def fetch_started(self):
+        """Method for recording the start of a file fetch."""
+        with self._lock:
+            self.in_flight += 1
+
+    def fetch_finished(self):
+        """Method for recording the end (successful or not) of a file fetch."""
+        with self._lock:
+            self.in_flight -= 1
+
+    def retried(self):
+        """Method for recording a retried file validation."""
+        with self._lock:
+            self.retries += 1
+
+    def analysis_done(self, status_dict):
+        """Method for recording a validated analysis.
+
+        :param status_dict: The analysis' statuses (eg. {"txt": "Passing", "json": "Passing", "comparison": "Consistent"}).
+        :type status_dict: dict
+        :return: None
+        """
+        now = self.clock()
+        with self._lock:
+            self.completed += 1
+            self.last_completion = now
+            self._completions.append(now)
+            for key in STATUS_KEYS:
+                if status_dict.get(key):
+                    self.statuses[key][status_dict[key]] += 1
+
+    def throughput(self, now=None):
+        """Method for computing the rolling throughput, the number of analyses per second over the last window analyses.
+        The time since the last completion is included, so the throughput drops while the run is stalled.
+
+        :param now: Current clock time.
+        :type now: float
+        :return: Analyses per second.
+        :rtype: float
+        """
+        now = self.clock() if now is None else now
+        with self._lock:
+            if len(self._completions) == self._completions.maxlen:
+                count, since = len(self._completions) - 1, self._completions[0]
+            else:
+                count, since = len(self._completions), self.start_time
+        return count / (now - since) if now > since else 0.0
+
+    def snapshot(self):
+        """Method for collecting the current progress.
+
+        :return: Progress dictionary (see the module docstring for its layout).
+        :rtype: dict
+        """
+        now = self.clock()
+        throughput = self.throughput(now)
+        limits = self.limiter.snapshot() if self.limiter is not None else {"concurrency": None, "rate": None}
+        with self._lock:
+            remaining = max(self.total - self.completed, 0)
+            return {
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "elapsed": round(now - self.start_time, 3),
+                "completed": self.completed,
+                "total": self.total,
+                "throughput": round(throughput, 4),
+                "eta": round(remaining / throughput, 1) if throughput else (0.0 if not remaining else None),
+                "in_flight": self.in_flight,
+                "retries": self.retries,
+                "idle": round(now - self.last_completion, 3),
+                "concurrency": limits["concurrency"],
+                "rate": limits["rate"],
+                "final": False,
+                "statuses": {key: dict(self.statuses[key]) for key in STATUS_KEYS},
+            }
+
+    @staticmethod
+    def format_line(progress_dict):
+        """Method for formatting a progress dictionary as a human readable line.
+
+        :param progress_dict: Progress dictionary (see snapshot()).
+        :type progress_dict: dict
+        :return: Progress line.
+        :rtype: str
+        """
+        total = progress_dict["total"]
+        line = "Progress: {}/{} ({:.1f}%), {:.2f} analyses/s, ETA {}, elapsed {}, {} in flight, {} retries".format(
+            progress_dict["completed"], total, 100 * progress_dict["completed"] / total if total else 100.0,
+            progress_dict["throughput"], format_duration(progress_dict["eta"]), format_duration(progress_dict["elapsed"]),
+            progress_dict["in_flight"], progress_dict["retries"]
+        )
+        if progress_dict.get("concurrency") is not None:
+            line += ", concurrency {:.1f}, {:.2f} requests/s".format(progress_dict["concurrency"], progress_dict["rate"])
+        histograms = ["{}: {}".format(key, ", ".join("{} {}".format(status, count) for status, count in sorted(progress_dict["statuses"][key].items())))
+                      for key in STATUS_KEYS if progress_dict["statuses"][key]]
+        return line + (" | " + "; ".join(histograms) if histograms else "")
+
+    def report(self, final=False):
+        """Method for writing the current progress to the progress stream and the JSON lines file.
+
+        :param final: Whether this is the final report of the run.
+        :type final: bool
+        :return: Progress dictionary.
+        :rtype: dict
+        """
+        progress_dict = self.snapshot()
+        progress_dict["final"] = final
+        if self.stream:
+            stream = sys.stdout if self.stream is True else self.stream
+            print(self.format_line(progress_dict), file=stream, flush=True)
+        if self._json_fh is not None:
+            self._json_fh.write(json.dumps(progress_dict, separators=(",", ":")) + "\n")
+            self._json_fh.flush()
+        return progress_dict
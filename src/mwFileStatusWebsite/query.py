@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+query.py
+~~~~~~~~
+
+This script contains a small query language for selecting analyses from a validation dictionary by status, issues,
+comparison status, and study parameters. Queries are evaluated against per-field bitset indexes built on top of a
+:py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`, so a new view does not need another scan of the
+dictionary.
+
+Grammar:
+    query      := term ("or" term)*
+    term       := factor ("and" factor)*
+    factor     := "not" factor | "(" query ")" | comparison
+    comparison := field ("=" | "!=" | "~") value
+
+Fields:
+    txt, json           Validation status of that file format (eg. txt = Passing).
+    status              Validation status of either file format.
+    issue               Issue type of either file format (value, consistency, or format).
+    txt.issue           Issue type of the txt file format.
+    json.issue          Issue type of the json file format.
+    comparison          Comparison status (Consistent, Inconsistent, or Not Checked).
+    study, analysis     Study or analysis ID.
+    params.<NAME>       STUDY block parameter (eg. params.INSTITUTE ~ kentucky).
+
+"=" matches exactly, "!=" is its negation, and "~" is a case-insensitive substring match. Values containing spaces or
+parentheses must be double quoted. Keywords are case-insensitive.
+
+Example:
+    txt = Passing and json = "Parsing Error"
+    comparison = Inconsistent and issue = value
+    not status = "Missing/Blank" and params.INSTITUTE ~ "kentucky"
+"""
+import json
+import re
+
+import numpy
+
+from .status_matrix import StatusMatrix, FILE_FORMATS, ISSUE_TYPES, COMPARISONS
+
+
+TOKEN_REGEX = re.compile(r'\s*(?:(?P<paren>[()])|(?P<op>!=|=|~)|"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<word>[^\s()=!~"]+))')
+KEYWORDS = {"and", "or", "not"}
+STATUS_FIELDS = ("txt", "json", "status")
+ISSUE_FIELDS = ("issue", "txt.issue", "json.issue")
+ID_FIELDS = ("study", "analysis")
+PARAMS_PREFIX = "params."
+# page file names are written as-is into the html directory, so no paths
+PAGE_FILENAME_REGEX = re.compile(r"^[\w.-]+\.html$")
+
+
+def tokenize(query_str):
+    """Method for splitting a query string into tokens.
+
+    :param query_str: Query string.
+    :type query_str: str
+    :return: List of (kind, text) tuples, where kind is one of 'paren', 'op', 'keyword', or 'value'.
+    :rtype: list
+    """
+    tokens = []
+    position = 0
+    query_str = query_str.rstrip()
+    while position < len(query_str):
+        match = TOKEN_REGEX.match(query_str, position)
+        if not match or match.end() == position:
+            raise ValueError("Invalid query at position {}: {!r}".format(position, query_str[position:]))
+        position = match.end()
+        if match.group("paren"):
+            tokens.append(("paren", match.group("paren")))
+        elif match.group("op"):
+            tokens.append(("op", match.group("op")))
+        elif match.group("quoted") is not None:
+            tokens.append(("value", re.sub(r"\\(.)", r"\1", match.group("quoted"))))
+        elif match.group("word").lower() in KEYWORDS:
+            tokens.append(("keyword", match.group("word").lower()))
+        else:
+            tokens.append(("value", match.group("word")))
+    return tokens
+
+
+def parse(query_str):
+    """Method for parsing a query string into a syntax tree.
+
+    The tree is made of nested tuples: ('or', left, right), ('and', left, right), ('not', operand), and
+    ('cmp', field, op, value).
+
+    :param query_str: Query string.
+    :type query_str: str
+    :return: Syntax tree.
+    :rtype: tuple
+    """
+    tokens = tokenize(query_str)
+    position = [0]
+
+    def peek():
+        return tokens[position[0]] if position[0] < len(tokens) else (None, None)
+
+    def take(kind, text=None):
+        token_kind, token_text = peek()
+        if token_kind != kind or (text is not None and token_text != text):
+            raise ValueError("Expected {} but found {!r} in query: {}".format(text or kind, token_text, query_str))
+        position[0] += 1
+        return token_text
+
+    def parse_query():
+        node = parse_term()
+        while peek() == ("keyword", "or"):
+            take("keyword", "or")
+            node = ("or", node, parse_term())
+        return node
+
+    def parse_term():
+        node = parse_factor()
+        while peek() == ("keyword", "and"):
+            take("keyword", "and")
+            node = ("and", node, parse_factor())
+        return node
+
+    def parse_factor():
+        if peek() == ("keyword", "not"):
+            take("keyword", "not")
+            return ("not", parse_factor())
+        if peek() == ("paren", "("):
+            take("paren", "(")
+            node = parse_query()
+            take("paren", ")")
+            return node
+        field = take("value")
+        op = take("op")
+        return ("cmp", field, op, take("value"))
+
+    if not tokens:
+        raise ValueError("Empty query.")
+    tree = parse_query()
+    if position[0] != len(tokens):
+        raise ValueError("Unexpected {!r} in query: {}".format(peek()[1], query_str))
+    return tree
+
+
+class QueryIndex(object):
+    """Per-field bitset indexes of a validation dictionary that queries are evaluated against.
+
+    Bitsets are boolean masks packed with ``numpy.packbits`` (one bit per analysis). The status, issue, and comparison
+    bitsets are built up front; ID and params bitsets are built on first use and cached.
+    """
+
+    def __init__(self, validation_dict, status_matrix=None):
+        """Build the bitset indexes.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        :param status_matrix: Columnar view of validation_dict, built if not given.
+        :type status_matrix: :py:class:`~mwFileStatusWebsite.status_matrix.StatusMatrix`
+        """
+        self.status_matrix = status_matrix if status_matrix is not None else StatusMatrix(validation_dict)
+        self.bitsets = dict()
+
+        for status_str in self.status_matrix.status_names:
+            for file_format in FILE_FORMATS:
+                self.bitsets[(file_format, status_str)] = numpy.packbits(self.status_matrix.status_mask(status_str, file_format))
+            self.bitsets[("status", status_str)] = numpy.packbits(self.status_matrix.status_mask(status_str))
+        for issue_type in ISSUE_TYPES:
+            for file_format in FILE_FORMATS:
+                self.bitsets[(file_format + ".issue", issue_type)] = numpy.packbits(self.status_matrix.issue_mask(issue_type, file_format))
+            self.bitsets[("issue", issue_type)] = numpy.packbits(self.status_matrix.issue_mask(issue_type))
+        for comparison_str in COMPARISONS:
+            self.bitsets[("comparison", comparison_str)] = numpy.packbits(self.status_matrix.comparison_mask(comparison_str))
+
+    def empty(self):
+        """Method for creating a bitset with no analyses set.
+
+        :return: Packed bitset.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        return numpy.zeros((len(self.status_matrix) + 7) // 8, dtype=numpy.uint8)
+
+    def values(self, field):
+        """Method for listing the values a field can be compared against with "~".
+
+        :param field: Field name.
+        :type field: str
+        :return: List of values.
+        :rtype: list
+        """
+        if field in STATUS_FIELDS:
+            return self.status_matrix.status_names
+        if field in ISSUE_FIELDS:
+            return list(ISSUE_TYPES)
+        if field == "comparison":
+            return list(COMPARISONS)
+        raise ValueError("Unknown query field: {}".format(field))
+
+    def bitset(self, field, value):
+        """Method for getting the bitset of the analyses whose field equals value.
+
+        :param field: Field name.
+        :type field: str
+        :param value: Value to compare against.
+        :type value: str
+        :return: Packed bitset.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        key = (field, value)
+        if key in self.bitsets:
+            return self.bitsets[key]
+
+        if field in STATUS_FIELDS or field == "comparison":
+            bits = self.empty()
+        elif field in ISSUE_FIELDS:
+            raise ValueError("Unknown issue type: {}".format(value))
+        elif field == "study":
+            bits = numpy.packbits(self.status_matrix.study_mask([value]))
+        elif field == "analysis":
+            mask = numpy.zeros(len(self.status_matrix), dtype=bool)
+            if value in self.status_matrix.analysis_index:
+                mask[self.status_matrix.analysis_index[value]] = True
+            bits = numpy.packbits(mask)
+        elif field.startswith(PARAMS_PREFIX):
+            bits = self._params_bitset(field[len(PARAMS_PREFIX):], lambda param: param is not None and str(param) == value)
+        else:
+            raise ValueError("Unknown query field: {}".format(field))
+
+        self.bitsets[key] = bits
+        return bits
+
+    def contains_bitset(self, field, value):
+        """Method for getting the bitset of the analyses whose field contains value (case-insensitive).
+
+        :param field: Field name.
+        :type field: str
+        :param value: Substring to search for.
+        :type value: str
+        :return: Packed bitset.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        key = (field, "~", value.lower())
+        if key in self.bitsets:
+            return self.bitsets[key]
+
+        if field in ID_FIELDS:
+            ids = self.status_matrix.study_ids if field == "study" else self.status_matrix.analysis_ids
+            mask = numpy.array([value.lower() in item.lower() for item in ids], dtype=bool)
+            bits = numpy.packbits(mask[self.status_matrix.study_index] if field == "study" else mask)
+        elif field.startswith(PARAMS_PREFIX):
+            bits = self._params_bitset(field[len(PARAMS_PREFIX):], lambda param: param is not None and value.lower() in str(param).lower())
+        else:
+            bits = self.empty()
+            for field_value in self.values(field):
+                if field_value is not None and value.lower() in field_value.lower():
+                    bits = bits | self.bitset(field, field_value)
+
+        self.bitsets[key] = bits
+        return bits
+
+    def _params_bitset(self, name, predicate):
+        validation_dict = self.status_matrix.validation_dict
+        study_mask = numpy.array([predicate(validation_dict[study_id]["params"].get(name)) for study_id in self.status_matrix.study_ids], dtype=bool)
+        return numpy.packbits(study_mask[self.status_matrix.study_index])
+
+    def evaluate(self, query):
+        """Method for evaluating a query.
+
+        :param query: Query string or syntax tree returned by parse().
+        :type query: str or tuple
+        :return: Boolean mask with one element per analysis (see StatusMatrix).
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        tree = parse(query) if isinstance(query, str) else query
+        return numpy.unpackbits(self._evaluate(tree), count=len(self.status_matrix)).astype(bool)
+
+    def _evaluate(self, node):
+        if node[0] == "or":
+            return self._evaluate(node[1]) | self._evaluate(node[2])
+        if node[0] == "and":
+            return self._evaluate(node[1]) & self._evaluate(node[2])
+        if node[0] == "not":
+            # padding bits past the last analysis are dropped by evaluate()
+            return ~self._evaluate(node[1])
+
+        _, field, op, value = node
+        if op == "=":
+            return self.bitset(field, value)
+        if op == "!=":
+            return ~self.bitset(field, value)
+        return self.contains_bitset(field, value)
+
+    def select(self, query):
+        """Method for creating a validation dictionary containing only the analyses matching a query.
+
+        :param query: Query string or syntax tree returned by parse().
+        :type query: str or tuple
+        :return: Structured dictionary containing analyses statuses and other study information.
+        :rtype: dict
+        """
+        return self.status_matrix.select(self.evaluate(query))
+
+
+def load_page_config(filepath):
+    """Method for loading a JSON page configuration file listing named pages built from queries.
+
+    Example:
+    {
+        "pages": [
+            {"filename": "txt_passing_json_parsing_error.html", "query": "txt = Passing and json = \\"Parsing Error\\""},
+            ...
+        ]
+    }
+
+    :param filepath: Path to the page configuration file.
+    :type filepath: str
+    :return: List of (filename, syntax tree) tuples. Every query is parsed and every filename checked (a plain html file
+    name, see PAGE_FILENAME_REGEX) up front so errors surface before any page is generated.
+    :rtype: list
+    """
+    with open(filepath, "r") as fh:
+        config = json.loads(fh.read())
+
+    pages = []
+    for page in config["pages"]:
+        if not PAGE_FILENAME_REGEX.fullmatch(str(page.get("filename"))):
+            raise ValueError("Page \"{}\": the filename must be an html file name without a directory.".format(
+                page.get("filename")))
+        try:
+            pages.append((page["filename"], parse(page["query"])))
+        except ValueError as e:
+            raise ValueError("Page \"{}\": {}".format(page.get("filename"), e))
+    return pages
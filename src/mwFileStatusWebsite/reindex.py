@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+reindex.py
+~~~~~~~~~~
+
+This script contains methods for rebuilding the validation JSON (tmp.json) from the validation logs, e.g. when it is
+lost or corrupted, without validating every analysis against the Metabolomics Workbench again.
+
+The txt and json logs of an analysis give its study ID and status, parsed with the rules of validator._validate() (see
+validator.parse_status()), or the status the validator wrote for a missing or unparsable file. The comparison log gives
+the comparison status, which only counts when both formats could be parsed (a stale comparison log is otherwise left
+from an earlier run). mwtab writes "Study ID: None" into the header of txt and json logs of files whose study ID it
+could not find, in which case the study ID of the comparison log is used.
+
+The issue flags of tmp.json only count errors, while the per tag counts of a log ("Number of Value Errors") also count
+warnings. A flag is set when the count of its tag is larger than the number of warnings carrying that tag, which are
+recognized by their message: mwtab's warnings about column names carry no tag, its warnings about missing sections carry
+"format", and all its other warnings carry "value".
+
+The logs do not contain the STUDY parameters of a study. They are read from a mirror of the mwTab files (eg. the files
+saved by validate --to-path) when one is given, and are otherwise left empty.
+"""
+import collections
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import mwtab
+
+from . import validator
+
+
+LOG_SUFFIXES = ("_txt.log", "_json.log", "_comparison.log")
+WRITTEN_STATUSES = ("Missing/Blank", "Parsing Error", "Timed Out")
+# status of the logs of mwtab 1.x, which have no issue or warning counts
+LEGACY_STATUSES = {"Contains Validation Errors": "Validation Error"}
+UNTAGGED_WARNING_PREFIXES = ("Warning: The column ", "Warning: The column, ", "Warning: The standard column")
+FORMAT_WARNING_PREFIX = "Warning: Missing "
+# header values mwtab writes when it could not find an ID
+MISSING_IDS = ("", "None")
+REINDEX_CHUNKSIZE = 256
+
+
+def find_logs(logs_path):
+    """Method for listing the validation logs of a directory.
+
+    :param logs_path: Directory path of the validation logs.
+    :type logs_path: str
+    :return: Sorted list of log file paths.
+    :rtype: list
+    """
+    with os.scandir(logs_path) as entries:
+        return sorted(entry.path for entry in entries if entry.name.endswith(LOG_SUFFIXES) and entry.is_file())
+
+
+def parse_header(log):
+    """Method for parsing the "Name: value" header lines of a log, up to its first blank line. The first line of a
+    name wins, so a traceback following the header of a missing or unparsable file is ignored.
+
+    :param log: Validation or comparison log.
+    :type log: str
+    :return: Dictionary of header names and values.
+    :rtype: dict
+    """
+    header = dict()
+    for line in log.split("\n\n", 1)[0].splitlines():
+        name, separator, value = line.partition(":")
+        if separator:
+            header.setdefault(name, value.strip())
+    return header
+
+
+def parse_issue_flags(validation_log):
+    """Method for parsing the types of the errors (not warnings) found from a validation log (see the module docstring).
+
+    :param validation_log: Validation log written by mwtab.validate_file().
+    :type validation_log: str
+    :return: Dictionary of issue types (keys) and whether an error of that type was found (values).
+    :rtype: dict
+    """
+    issues = dict.fromkeys(validator.ISSUE_TYPES, False)
+    header, _, issue_log = validation_log.partition("Issue Log:")
+    counts = {issue_type: int(value) for issue_type, value in (
+        (line.split(" ")[2].lower(), line.rsplit(" ", 1)[1]) for line in header.splitlines()
+        if line.startswith("Number of ") and line.split(" ")[2].lower() in issues and line.endswith(tuple("0123456789"))
+    )}
+    if not any(counts.values()):
+        return issues
+
+    warnings = collections.Counter()
+    for line in issue_log.splitlines():
+        if line.startswith("Warning"):
+            if line.startswith(UNTAGGED_WARNING_PREFIXES):
+                continue
+            warnings["format" if line.startswith(FORMAT_WARNING_PREFIX) else "value"] += 1
+    for issue_type in issues:
+        issues[issue_type] = counts.get(issue_type, 0) > warnings[issue_type]
+    return issues
+
+
+def parse_log(filepath):
+    """Method for parsing a validation or comparison log.
+
+    :param filepath: Path of the log, named <analysis ID>_<txt, json, or comparison>.log.
+    :type filepath: str
+    :return: Tuple of the analysis ID, the file format ("txt", "json", or "comparison"), the study ID (None if the log
+    does not name one), the status, and the issue flags (None for comparison logs and logs of missing or unparsable
+    files).
+    :rtype: tuple
+    """
+    analysis_id, file_format = os.path.basename(filepath)[:-len(".log")].rsplit("_", 1)
+    with open(filepath, "r", encoding="utf-8", errors="replace") as fh:
+        log = fh.read()
+    header = parse_header(log)
+    study_id = header.get("Study ID")
+    if study_id in MISSING_IDS:
+        study_id = None
+    status_value = header.get("Status")
+
+    if file_format == "comparison":
+        return analysis_id, file_format, study_id, status_value, None
+    if status_value in WRITTEN_STATUSES:
+        return analysis_id, file_format, study_id, status_value, None
+    if status_value in LEGACY_STATUSES:
+        return analysis_id, file_format, study_id, LEGACY_STATUSES[status_value], None
+    return analysis_id, file_format, study_id, validator.parse_status(log), parse_issue_flags(log)
+
+
+def parse_logs(filepaths, processes=None):
+    """Method for parsing logs in parallel.
+
+    :param filepaths: Paths of the logs.
+    :type filepaths: list
+    :param processes: Number of processes, the number of CPUs if None. Logs are parsed in this process when 1.
+    :type processes: int
+    :return: List of parse_log() results, in the order of filepaths.
+    :rtype: list
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(filepaths) <= REINDEX_CHUNKSIZE:
+        return [parse_log(filepath) for filepath in filepaths]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(parse_log, filepaths, chunksize=REINDEX_CHUNKSIZE))
+
+
+def build_validation_dict(parsed_logs):
+    """Method for building the validation dictionary from parsed logs.
+
+    :param parsed_logs: List of parse_log() results.
+    :type parsed_logs: list
+    :return: Structured dictionary containing analyses statuses and other study information, with empty STUDY parameters.
+    :rtype: dict
+    """
+    analyses = collections.defaultdict(dict)
+    study_ids = dict()
+    for analysis_id, file_format, study_id, status, issues in parsed_logs:
+        analyses[analysis_id][file_format] = (status, issues)
+        # the txt and json logs name the study the analysis was last validated under
+        if study_id and (file_format != "comparison" or analysis_id not in study_ids):
+            study_ids[analysis_id] = study_id
+
+    study_analysis_dict = collections.defaultdict(list)
+    for analysis_id in analyses:
+        if analysis_id in study_ids:
+            study_analysis_dict[study_ids[analysis_id]].append(analysis_id)
+    validation_dict = validator.create_validation_dict(study_analysis_dict)
+
+    for study_id, analysis_ids in study_analysis_dict.items():
+        for analysis_id in analysis_ids:
+            analysis_dict = validation_dict[study_id]["analyses"][analysis_id]
+            for file_format in ("txt", "json"):
+                status, issues = analyses[analysis_id].get(file_format, (None, None))
+                analysis_dict["status"][file_format] = status
+                if issues:
+                    analysis_dict["issues"][file_format].update(issues)
+
+            # same as validator.validate_analysis(), files are only compared when both could be parsed
+            analysis_dict["status"]["comparison"] = "Not Checked"
+            comparison_status = analyses[analysis_id].get("comparison", (None, None))[0]
+            if comparison_status and all(analysis_dict["status"][file_format] not in WRITTEN_STATUSES + (None,)
+                                         for file_format in ("txt", "json")):
+                analysis_dict["status"]["comparison"] = comparison_status
+
+    return validation_dict
+
+
+def read_study_params(filepath):
+    """Method for reading the STUDY parameters of an mwTab file.
+
+    :param filepath: Path of the mwTab file (txt or json).
+    :type filepath: str
+    :return: STUDY parameters, empty if the file cannot be read.
+    :rtype: dict
+    """
+    try:
+        if filepath.endswith(".json"):
+            # the STUDY block is the same as mwtab reads it, without parsing the data blocks
+            with open(filepath, "r", encoding="utf-8") as fh:
+                return dict(json.loads(fh.read())["STUDY"])
+        return dict(next(mwtab.read_files(filepath))["STUDY"])
+    except Exception:
+        return {}
+
+
+def fill_study_params(validation_dict, mirror_path, processes=None):
+    """Method for filling the STUDY parameters of a validation dictionary from a mirror of mwTab files. One file per
+    study is read, a json file when available.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information. Updated in
+    place.
+    :type validation_dict: dict
+    :param mirror_path: Directory path of the mirror (see validator.find_mirror_files()).
+    :type mirror_path: str
+    :param processes: Number of processes, the number of CPUs if None.
+    :type processes: int
+    :return: Number of studies whose parameters were filled.
+    :rtype: int
+    """
+    mirror_files = validator.find_mirror_files(mirror_path)
+    study_files = dict()
+    for study_id, study_dict in validation_dict.items():
+        if study_dict["params"]:
+            continue
+        filepaths = [mirror_files[analysis_id][file_format] for analysis_id in study_dict["analyses"] if analysis_id in mirror_files
+                     for file_format in ("json", "txt") if file_format in mirror_files[analysis_id]]
+        if filepaths:
+            study_files[study_id] = filepaths[0]
+
+    study_ids = list(study_files)
+    filepaths = [study_files[study_id] for study_id in study_ids]
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(filepaths) < 2:
+        study_params = [read_study_params(filepath) for filepath in filepaths]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            study_params = list(executor.map(read_study_params, filepaths, chunksize=8))
+
+    filled = 0
+    for study_id, params in zip(study_ids, study_params):
+        if params:
+            validation_dict[study_id]["params"] = params
+            filled += 1
+    return filled
+
+
+def reindex(logs_path, mirror_path=None, processes=None, verbose=False):
+    """Method for rebuilding the validation dictionary from the validation logs.
+
+    :param logs_path: Directory path of the validation logs.
+    :type logs_path: str
+    :param mirror_path: Directory path of a mirror of the mwTab files to read the STUDY parameters from.
+    :type mirror_path: str
+    :param processes: Number of processes, the number of CPUs if None.
+    :type processes: int
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: Structured dictionary containing analyses statuses and other study information.
+    :rtype: dict
+    """
+    filepaths = find_logs(logs_path)
+    validation_dict = build_validation_dict(parse_logs(filepaths, processes))
+    if verbose:
+        print("{} logs parsed: {} studies, {} analyses".format(
+            len(filepaths), len(validation_dict), sum(len(study_dict["analyses"]) for study_dict in validation_dict.values())))
+
+    if mirror_path:
+        filled = fill_study_params(validation_dict, mirror_path, processes)
+        if verbose:
+            print("STUDY parameters of {} studies read from {}".format(filled, mirror_path))
+    return validation_dict
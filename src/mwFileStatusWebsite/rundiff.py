@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+rundiff.py
+~~~~~~~~~~
+
+This script contains methods for comparing two validation results files (eg. the tmp.json of last week's run and of
+this week's): which analyses changed status, were added or removed, and which pages need to be regenerated.
+
+Neither file is loaded as a whole. The JSON text is read in chunks and decoded one study at a time, and the text of a
+decoded study is dropped from the buffer. The old file is reduced to an index of every analysis's study ID, status code
+(see mwFileStatusWebsite.history) and a fingerprint of its record, and the new file is checked against that index as it
+is read. Both files are read once, so the diff takes time linear in their size, and memory for one study plus the index.
+
+Analyses are matched by analysis ID, and the changes are listed in the order of the new file. An analysis whose record
+changed without a status change (eg. its issues or parameters) is "updated": its pages need to be regenerated, but it is
+not a transition. An analysis listed under another study than before is "moved", whatever its status and record: the
+pages of both studies need to be regenerated. A study whose STUDY parameters changed needs its details regenerated too.
+"""
+import collections
+import hashlib
+import json
+import re
+
+from . import history
+
+
+STATUS_KEYS = ("txt", "json", "comparison")
+WHITESPACE_REGEX = re.compile(r"\s*")
+DECODER = json.JSONDecoder()
+CHUNK_SIZE = 1 << 16
+
+
+def iter_studies(json_path, chunk_size=CHUNK_SIZE):
+    """Method for decoding the studies of a validation JSON file one at a time, reading it in chunks.
+
+    :param json_path: Path to the validation JSON file.
+    :type json_path: str
+    :param chunk_size: Number of characters read at a time (more while a study does not fit in the buffer).
+    :type chunk_size: int
+    :return: Iterator of (study ID, study dictionary) tuples, in file order.
+    :rtype: iterator
+    """
+    with open(json_path, "r") as fh:
+        # the buffer holds the file text from character offset on, position is the next character to decode
+        text, offset, position, eof = "", 0, 0, False
+
+        def fill(size):
+            nonlocal text, eof
+            chunk = fh.read(size)
+            eof = not chunk
+            text += chunk
+
+        def skip(expected=None):
+            nonlocal position
+            position = WHITESPACE_REGEX.match(text, position).end()
+            while position == len(text) and not eof:
+                fill(chunk_size)
+                position = WHITESPACE_REGEX.match(text, position).end()
+            if expected is not None and (position == len(text) or text[position] not in expected):
+                raise ValueError("{} is not a validation JSON file: expected {!r} at character {}.".format(
+                    json_path, expected, offset + position))
+
+        def decode():
+            nonlocal position
+            while True:
+                try:
+                    value, position = DECODER.raw_decode(text, position)
+                    return value
+                except json.JSONDecodeError:
+                    # the value does not end in the buffer yet, doubling it keeps the retries linear in its size
+                    if eof:
+                        raise
+                    fill(max(chunk_size, len(text)))
+
+        skip("{")
+        position += 1
+        skip()
+        if text[position:position + 1] == "}":
+            return
+        while True:
+            skip('"')
+            study_id = decode()
+            skip(":")
+            position += 1
+            skip()
+            study_dict = decode()
+            yield study_id, study_dict
+            text, offset, position = text[position:], offset + position, 0
+            skip(",}")
+            if text[position] == "}":
+                return
+            position += 1
+
+
+def fingerprint(record):
+    """Method for fingerprinting a record of the validation dictionary, to tell whether it changed.
+
+    :param record: Analysis dictionary or STUDY parameters.
+    :type record: dict
+    :return: Hex digest of the record's canonical JSON.
+    :rtype: str
+    """
+    return hashlib.blake2b(json.dumps(record, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def index_results(json_path):
+    """Method for reducing a validation results file to the statuses and fingerprints of its records.
+
+    :param json_path: Path to the validation JSON file (eg. tmp.json).
+    :type json_path: str
+    :return: Tuple of the dictionary of analysis IDs (keys) and their (study ID, status code, fingerprint) tuples
+    (values), and the dictionary of study IDs (keys) and the fingerprints of their STUDY parameters (values).
+    :rtype: tuple
+    """
+    analyses = {}
+    params = {}
+    for study_id, study_dict in iter_studies(json_path):
+        params[study_id] = fingerprint(study_dict["params"])
+        for analysis_id, analysis_dict in study_dict["analyses"].items():
+            analyses[analysis_id] = (study_id, history.encode_status(analysis_dict["status"]), fingerprint(analysis_dict))
+    return analyses, params
+
+
+def diff_results(old_path, new_path):
+    """Method for comparing two validation results files.
+
+    :param old_path: Path to the earlier validation JSON file.
+    :type old_path: str
+    :param new_path: Path to the later validation JSON file.
+    :type new_path: str
+    :return: Report dictionary.
+    :rtype: dict
+    """
+    old_analyses, old_params = index_results(old_path)
+    num_old = len(old_analyses)
+
+    counts = {status_key: collections.Counter() for status_key in STATUS_KEYS}
+    changes, added, updated, moved, params_changed = [], [], [], [], []
+    num_new = 0
+    for study_id, study_dict in iter_studies(new_path):
+        if study_id in old_params and old_params.pop(study_id) != fingerprint(study_dict["params"]):
+            params_changed.append(study_id)
+        for analysis_id, analysis_dict in study_dict["analyses"].items():
+            num_new += 1
+            new_code = history.encode_status(analysis_dict["status"])
+            if analysis_id not in old_analyses:
+                added.append({"study_id": study_id, "analysis_id": analysis_id, "to": new_code})
+                continue
+            old_study_id, old_code, old_fingerprint = old_analyses.pop(analysis_id)
+            if old_study_id != study_id:
+                moved.append({"study_id": study_id, "analysis_id": analysis_id, "from_study_id": old_study_id})
+            if old_code != new_code:
+                old_status, new_status = history.decode_status(old_code), history.decode_status(new_code)
+                for status_key in STATUS_KEYS:
+                    if old_status[status_key] != new_status[status_key]:
+                        counts[status_key]["{} -> {}".format(old_status[status_key], new_status[status_key])] += 1
+                changes.append({"study_id": study_id, "analysis_id": analysis_id, "from": old_code, "to": new_code,
+                                "regression": history.is_regression(old_status, new_status)})
+            elif old_fingerprint != fingerprint(analysis_dict):
+                updated.append({"study_id": study_id, "analysis_id": analysis_id})
+
+    # whatever is left of the old index is not in the new file
+    removed = [{"study_id": study_id, "analysis_id": analysis_id, "from": code}
+               for analysis_id, (study_id, code, _) in old_analyses.items()]
+
+    return {
+        "old": old_path,
+        "new": new_path,
+        "old_analyses": num_old,
+        "analyses": num_new,
+        "changed": len(changes),
+        "regressions": sum(change["regression"] for change in changes),
+        "transitions": {status_key: dict(counts[status_key].most_common()) for status_key in STATUS_KEYS},
+        "changes": changes,
+        "added": added,
+        "removed": removed,
+        "updated": updated,
+        "moved": moved,
+        "params_changed": params_changed,
+    }
+
+
+def changed_ids(report, by_study=False):
+    """Method for listing the IDs whose pages need to be regenerated, or that need a notification.
+
+    :param report: Report dictionary (see diff_results()).
+    :type report: dict
+    :param by_study: List the study IDs instead of the analysis IDs.
+    :type by_study: bool
+    :return: List of the analysis IDs that changed status, were added, removed, updated or moved, or the IDs of their
+    studies (both studies of a moved analysis) and of the studies whose STUDY parameters changed, without duplicates.
+    :rtype: list
+    """
+    entries = report["changes"] + report["added"] + report["removed"] + report["updated"] + report["moved"]
+    if by_study:
+        return list(dict.fromkeys([entry["study_id"] for entry in entries] +
+                                  [entry["from_study_id"] for entry in report["moved"]] + report["params_changed"]))
+    return list(dict.fromkeys(entry["analysis_id"] for entry in entries))
+
+
+def format_report(report):
+    """Method for formatting a diff report as human readable text.
+
+    :param report: Report dictionary (see diff_results()).
+    :type report: dict
+    :return: Report text.
+    :rtype: str
+    """
+    lines = ["{} -> {}: {} of {} analyses changed status, {} regressions, {} added, {} removed, {} updated, {} moved".format(
+        report["old"], report["new"], report["changed"], report["analyses"], report["regressions"],
+        len(report["added"]), len(report["removed"]), len(report["updated"]), len(report["moved"]))]
+    for status_key in STATUS_KEYS:
+        for transition, count in report["transitions"][status_key].items():
+            lines.append("\t{}: {} ({})".format(status_key, transition, count))
+    regressions = [change["analysis_id"] for change in report["changes"] if change["regression"]]
+    if regressions:
+        lines.append("Regressions: " + ", ".join(regressions))
+    if report["moved"]:
+        lines.append("Moved: " + ", ".join("{} ({} -> {})".format(entry["analysis_id"], entry["from_study_id"], entry["study_id"])
+                                           for entry in report["moved"]))
+    if report["params_changed"]:
+        lines.append("STUDY parameters changed: " + ", ".join(report["params_changed"]))
+    return "\n".join(lines)
+
+
+def save_report(report, report_file):
+    """Method for saving a diff report as JSON.
+
+    :param report: Report dictionary (see diff_results()).
+    :type report: dict
+    :param report_file: File path for the report to be saved to.
+    :type report_file: str
+    :return: None
+    """
+    with open(report_file, "w") as fh:
+        fh.write(json.dumps(report, indent=4))
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+sampling.py
+~~~~~~~~~~~
+
+This script contains methods for a quick health check of the corpus: validating a stratified random sample of the
+analyses and estimating the corpus-wide proportions of every status from it, with confidence intervals.
+
+The analyses are stratified by their status in the previous run (the worse of their txt and json statuses, or "New"
+for analyses without previous results), so a sample of a few hundred analyses still covers the rare statuses. The
+sample is allocated to the strata in proportion to their size (at least one analysis each, as long as the sample is
+large enough), and within a stratum it is a simple random sample, so every analysis of a stratum is equally likely to
+be sampled, whatever the size of its study. (Spreading the sample over the studies would make the analyses of large
+studies less likely to be sampled, and as statuses cluster by study, bias the estimates below.)
+
+The estimates are the usual stratified estimates: the proportion of a status is the mean of its proportions in the
+strata, weighted by their sizes, and its variance is the weighted sum of the variances of those proportions (with the
+finite population correction). The confidence intervals are normal approximations, clipped to [0, 1].
+"""
+import collections
+import json
+import math
+import random
+
+from . import constructor
+
+
+BUCKETS = ("New",) + tuple(constructor.MESSAGE_TO_LEVEL)
+STATUS_KEYS = {
+    "txt": tuple(constructor.MESSAGE_TO_LEVEL),
+    "json": tuple(constructor.MESSAGE_TO_LEVEL),
+    "comparison": ("Consistent", "Inconsistent", "Not Checked"),
+}
+SAMPLE_FILENAME = "sample.json"
+# directory of the sample's validation logs in the logs directory, so they do not overwrite the logs of tmp.json
+LOGS_DIRNAME = "sample"
+ESTIMATES_FILENAME = "sample_estimates.json"
+CONFIDENCE = 0.95
+Z_SCORE = 1.959964
+# variance of a proportion in a stratum with a single validated analysis, where it cannot be estimated
+MAX_VARIANCE = 0.25
+
+
+def previous_bucket(analysis_dict):
+    """Method for finding the stratum of an analysis from its previous results.
+
+    :param analysis_dict: Previous results of the analysis, None if it has none.
+    :type analysis_dict: dict
+    :return: The worse of the previous txt and json statuses, or "New".
+    :rtype: str
+    """
+    if not analysis_dict:
+        return "New"
+    statuses = [analysis_dict["status"].get(file_format) for file_format in ("txt", "json")]
+    statuses = [status for status in statuses if status in constructor.MESSAGE_TO_LEVEL]
+    if not statuses:
+        return "New"
+    return max(statuses, key=constructor.MESSAGE_TO_LEVEL.get)
+
+
+def stratify(study_analysis_dict, previous_dict=None):
+    """Method for dividing the analyses into strata by their previous status.
+
+    :param study_analysis_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis IDs
+    (value).
+    :type study_analysis_dict: dict
+    :param previous_dict: Structured dictionary containing the analyses statuses of the previous run.
+    :type previous_dict: dict
+    :return: Dictionary of the non-empty strata (keys, in BUCKETS order) and their sorted lists of (study ID, analysis ID)
+    tuples (values).
+    :rtype: dict
+    """
+    previous_analyses = {analysis_id: analysis_dict for study_dict in (previous_dict or {}).values()
+                         for analysis_id, analysis_dict in study_dict["analyses"].items()}
+    strata = collections.defaultdict(list)
+    for study_id in sorted(study_analysis_dict):
+        for analysis_id in study_analysis_dict[study_id]:
+            strata[previous_bucket(previous_analyses.get(analysis_id))].append((study_id, analysis_id))
+    return {bucket: strata[bucket] for bucket in BUCKETS if bucket in strata}
+
+
+def allocate(stratum_sizes, sample_size):
+    """Method for allocating a sample to strata in proportion to their sizes, with at least one analysis per stratum.
+
+    :param stratum_sizes: Dictionary of strata (keys) and their numbers of analyses (values).
+    :type stratum_sizes: dict
+    :param sample_size: Number of analyses to sample, all of them if there are fewer.
+    :type sample_size: int
+    :return: Dictionary of strata (keys) and their numbers of sampled analyses (values).
+    :rtype: dict
+    """
+    total = sum(stratum_sizes.values())
+    sample_size = min(sample_size, total)
+    allocation = dict.fromkeys(stratum_sizes, 0)
+    # one analysis for each stratum first, the largest strata first if the sample is too small for all of them
+    for bucket in sorted(stratum_sizes, key=lambda bucket: -stratum_sizes[bucket])[:sample_size]:
+        allocation[bucket] = 1
+    # then one at a time to the stratum furthest below its proportional share
+    for _ in range(sample_size - sum(allocation.values())):
+        bucket = max((bucket for bucket in stratum_sizes if allocation[bucket] < stratum_sizes[bucket]),
+                     key=lambda bucket: sample_size * stratum_sizes[bucket] / total - allocation[bucket])
+        allocation[bucket] += 1
+    return allocation
+
+
+def draw_sample(study_analysis_dict, sample_size, seed=0, previous_dict=None):
+    """Method for drawing a reproducible stratified random sample of the analyses.
+
+    :param study_analysis_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis IDs
+    (value).
+    :type study_analysis_dict: dict
+    :param sample_size: Number of analyses to sample.
+    :type sample_size: int
+    :param seed: Seed of the random sample.
+    :type seed: int
+    :param previous_dict: Structured dictionary containing the analyses statuses of the previous run.
+    :type previous_dict: dict
+    :return: Tuple of the sampled analyses, as a dictionary of study IDs (keys) and lists of their analysis IDs (values),
+    and the dictionary of strata (keys) and their numbers of analyses and sampled analysis IDs (values).
+    :rtype: tuple
+    """
+    strata = stratify(study_analysis_dict, previous_dict)
+    allocation = allocate({bucket: len(members) for bucket, members in strata.items()}, sample_size)
+    rng = random.Random(seed)
+
+    sampled = collections.defaultdict(list)
+    strata_dict = {}
+    for bucket, members in strata.items():
+        chosen = rng.sample(members, allocation[bucket])
+        for study_id, analysis_id in chosen:
+            sampled[study_id].append(analysis_id)
+        strata_dict[bucket] = {"population": len(members), "sampled": sorted(analysis_id for _, analysis_id in chosen)}
+
+    # keep the order of the analyses of every study
+    order = {analysis_id: index for analysis_ids in study_analysis_dict.values() for index, analysis_id in enumerate(analysis_ids)}
+    sample_dict = {study_id: sorted(sampled[study_id], key=order.get) for study_id in sorted(sampled)}
+    return sample_dict, strata_dict
+
+
+def estimate_proportions(validation_dict, strata_dict, seed=0):
+    """Method for estimating the corpus-wide proportion of every status from the validated sample.
+
+    :param validation_dict: Structured dictionary containing the analyses statuses of the sample.
+    :type validation_dict: dict
+    :param strata_dict: Dictionary of strata (keys) and their numbers of analyses and sampled analysis IDs (values), see
+    draw_sample().
+    :type strata_dict: dict
+    :param seed: Seed the sample was drawn with.
+    :type seed: int
+    :return: Estimates dictionary.
+    :rtype: dict
+    """
+    statuses = {analysis_id: analysis_dict["status"] for study_dict in validation_dict.values()
+                for analysis_id, analysis_dict in study_dict["analyses"].items() if not analysis_dict.get("carried_over")}
+    # strata without validated analyses (eg. cut off by a time budget) cannot be estimated from
+    validated = {bucket: [statuses[analysis_id] for analysis_id in stratum["sampled"] if analysis_id in statuses]
+                 for bucket, stratum in strata_dict.items()}
+    covered = sum(stratum["population"] for bucket, stratum in strata_dict.items() if validated[bucket])
+
+    estimates = {}
+    for status_key, status_list in STATUS_KEYS.items():
+        estimates[status_key] = {}
+        for status in status_list:
+            proportion = variance = 0.0
+            for bucket, stratum in strata_dict.items():
+                sample = validated[bucket]
+                if not sample:
+                    continue
+                weight = stratum["population"] / covered
+                stratum_proportion = sum(status_dict.get(status_key) == status for status_dict in sample) / len(sample)
+                if len(sample) > 1:
+                    stratum_variance = stratum_proportion * (1 - stratum_proportion) * len(sample) / (len(sample) - 1)
+                else:
+                    stratum_variance = MAX_VARIANCE
+                proportion += weight * stratum_proportion
+                variance += weight ** 2 * (1 - len(sample) / stratum["population"]) * stratum_variance / len(sample)
+            margin = Z_SCORE * math.sqrt(variance)
+            estimates[status_key][status] = {
+                "proportion": round(proportion, 4),
+                "low": round(max(0.0, proportion - margin), 4),
+                "high": round(min(1.0, proportion + margin), 4),
+                "analyses": int(round(proportion * covered)),
+            }
+
+    return {
+        "seed": seed,
+        "confidence": CONFIDENCE,
+        "population": sum(stratum["population"] for stratum in strata_dict.values()),
+        "sampled": sum(len(stratum["sampled"]) for stratum in strata_dict.values()),
+        "validated": sum(len(sample) for sample in validated.values()),
+        "strata": {bucket: {"population": stratum["population"], "sampled": len(stratum["sampled"]),
+                            "validated": len(validated[bucket])} for bucket, stratum in strata_dict.items()},
+        "estimates": estimates,
+    }
+
+
+def format_estimates(estimates_dict):
+    """Method for formatting the estimates as human readable text.
+
+    :param estimates_dict: Estimates dictionary (see estimate_proportions()).
+    :type estimates_dict: dict
+    :return: Estimates text.
+    :rtype: str
+    """
+    lines = ["Validated {} of {} sampled analyses (seed {}), out of {}".format(
+        estimates_dict["validated"], estimates_dict["sampled"], estimates_dict["seed"], estimates_dict["population"])]
+    lines.append("\tstrata: " + ", ".join("{} {}/{}".format(bucket, stratum["validated"], stratum["population"])
+                                         for bucket, stratum in estimates_dict["strata"].items()))
+    lines.append("Estimated statuses ({:g}% confidence intervals):".format(100 * estimates_dict["confidence"]))
+    for status_key, status_estimates in estimates_dict["estimates"].items():
+        for status, estimate in status_estimates.items():
+            if estimate["high"] > 0:
+                lines.append("\t{} {}: {:.1f}% ({:.1f}% - {:.1f}%), ~{} analyses".format(
+                    status_key, status, 100 * estimate["proportion"], 100 * estimate["low"], 100 * estimate["high"],
+                    estimate["analyses"]))
+    return "\n".join(lines)
+
+
+def save_estimates(estimates_dict, estimates_file):
+    """Method for saving the estimates as JSON.
+
+    :param estimates_dict: Estimates dictionary (see estimate_proportions()).
+    :type estimates_dict: dict
+    :param estimates_file: File path for the estimates to be saved to.
+    :type estimates_file: str
+    :return: None
+    """
+    with open(estimates_file, "w") as fh:
+        fh.write(json.dumps(estimates_dict, indent=4))
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+schedule.py
+~~~~~~~~~~~
+
+This script contains a deadline-aware scheduler for validation runs that do not fit into their time budget. Analyses are
+validated in priority order instead of study ID order:
+
+    1. new         analyses without results in the previous run
+    2. failing     analyses whose txt or json file was missing/blank or could not be parsed in the previous run (what a
+                   transient server error ends up as after the retries)
+    3. modified    analyses whose statuses changed in the last few runs of the history archive, i.e. whose files were
+                   recently modified on the Metabolomics Workbench
+    4. stale       every other analysis, the longest since it was validated (the time its validation log was written)
+                   first
+
+The run stops before the next analysis would exceed the budget, estimated from the durations of the last analyses. The
+analyses it did not reach keep their results from the previous run and are marked with "carried_over": true.
+"""
+import collections
+import copy
+import os
+import time
+
+from . import history
+from .progress import format_duration
+
+
+PRIORITIES = ("new", "failing", "modified", "stale")
+FAILING_STATUSES = ("Parsing Error", "Missing/Blank", "Timed Out")
+RECENT_RUNS = 5
+DURATION_WINDOW = 20
+
+
+def recently_changed(history_path, runs=RECENT_RUNS):
+    """Method for finding the analyses whose statuses changed in the last runs of a history archive.
+
+    :param history_path: Path to the history archive.
+    :type history_path: str
+    :param runs: Number of most recent runs.
+    :type runs: int
+    :return: Set of analysis IDs.
+    :rtype: set
+    """
+    run_times = [run["run"] for run in history.read_runs(history_path)][-runs:] if runs else []
+    if not run_times:
+        return set()
+    return {analysis_id for run_time, analysis_id, _, _ in history.transitions(history_path) if run_time >= run_times[0]}
+
+
+def last_validated(logs_path):
+    """Method for finding when every analysis was last validated, from the modification times of its txt validation log.
+
+    :param logs_path: Directory path of the validation logs.
+    :type logs_path: str
+    :return: Dictionary of analysis IDs (keys) and their timestamps (values).
+    :rtype: dict
+    """
+    if not logs_path or not os.path.isdir(logs_path):
+        return {}
+    with os.scandir(logs_path) as entries:
+        return {entry.name[:-len("_txt.log")]: entry.stat().st_mtime for entry in entries if entry.name.endswith("_txt.log")}
+
+
+class Schedule(object):
+    """Priority order and time budget of a validation run."""
+
+    def __init__(self, time_budget, previous_dict=None, logs_path=None, history_path=None, recent_runs=RECENT_RUNS,
+                 failing_statuses=FAILING_STATUSES, clock=time.monotonic):
+        """Schedule initializer.
+
+        :param time_budget: Number of seconds the run may take, unlimited if None.
+        :type time_budget: float
+        :param previous_dict: Structured dictionary containing the analyses statuses of the previous run.
+        :type previous_dict: dict
+        :param logs_path: Directory path of the validation logs, whose modification times give the staleness.
+        :type logs_path: str
+        :param history_path: Path to the history archive, whose last runs give the recently modified analyses.
+        :type history_path: str
+        :param recent_runs: Number of most recent runs of the history archive whose changes count as recent.
+        :type recent_runs: int
+        :param failing_statuses: txt or json statuses of the previous run that make an analysis failing.
+        :type failing_statuses: tuple
+        :param clock: Monotonic clock function.
+        :type clock: callable
+        """
+        self.time_budget = time_budget
+        self.previous_dict = previous_dict or {}
+        self.logs_path = logs_path
+        self.history_path = history_path
+        self.recent_runs = recent_runs
+        self.failing_statuses = set(failing_statuses)
+        self.clock = clock
+        self.queue = []
+        self.validated = collections.Counter()
+        self.carried_over = 0
+        self.dropped = 0
+        self.start_time = None
+        self.end_time = None
+        self._durations = collections.deque(maxlen=DURATION_WINDOW)
+
+    def prioritize(self, study_analysis_dict):
+        """Method for ordering the analyses of a run by priority.
+
+        :param study_analysis_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis
+        IDs (value).
+        :type study_analysis_dict: dict
+        :return: List of (priority, study ID, analysis ID) tuples, in the order they are to be validated.
+        :rtype: list
+        """
+        previous_analyses = {analysis_id: analysis_dict for study_dict in self.previous_dict.values()
+                             for analysis_id, analysis_dict in study_dict["analyses"].items()}
+        changed = recently_changed(self.history_path, self.recent_runs) if self.history_path else set()
+        validated_times = last_validated(self.logs_path)
+
+        keyed = []
+        for study_id in study_analysis_dict:
+            for analysis_id in study_analysis_dict[study_id]:
+                previous = previous_analyses.get(analysis_id)
+                if previous is None:
+                    priority = "new"
+                elif self.failing_statuses.intersection((previous["status"].get("txt"), previous["status"].get("json"))):
+                    priority = "failing"
+                elif analysis_id in changed:
+                    priority = "modified"
+                else:
+                    priority = "stale"
+                keyed.append((PRIORITIES.index(priority), validated_times.get(analysis_id, 0.0), study_id, analysis_id))
+
+        self.queue = [(PRIORITIES[index], study_id, analysis_id) for index, _, study_id, analysis_id in sorted(keyed)]
+        return self.queue
+
+    def elapsed(self):
+        """Method for getting the number of seconds since the run started.
+
+        :return: Elapsed seconds.
+        :rtype: float
+        """
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time if self.end_time is not None else self.clock()) - self.start_time
+
+    def has_time(self):
+        """Method for checking whether the next analysis is expected to finish within the budget, given the mean
+        duration of the last analyses.
+
+        :return: Whether to validate the next analysis.
+        :rtype: bool
+        """
+        if self.time_budget is None:
+            return True
+        estimate = sum(self._durations) / len(self._durations) if self._durations else 0.0
+        return self.elapsed() + estimate < self.time_budget
+
+    def run(self, study_analysis_dict):
+        """Method for iterating over the analyses of a run in priority order until the budget is spent.
+
+        :param study_analysis_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis
+        IDs (value).
+        :type study_analysis_dict: dict
+        :return: Generator of (study ID, analysis ID) tuples.
+        """
+        self.prioritize(study_analysis_dict)
+        self.start_time = self.clock()
+        for priority, study_id, analysis_id in self.queue:
+            if not self.has_time():
+                break
+            started = self.clock()
+            yield study_id, analysis_id
+            self._durations.append(self.clock() - started)
+            self.validated[priority] += 1
+        self.end_time = self.clock()
+
+    def carry_over(self, validation_dict):
+        """Method for copying the previous results of the analyses the run did not reach into the run's validation
+        dictionary. Analyses without previous results are removed, and so are studies left without analyses.
+
+        :param validation_dict: Structured dictionary containing the analyses statuses of the run. Updated in place.
+        :type validation_dict: dict
+        :return: Structured dictionary containing analyses statuses and other study information.
+        :rtype: dict
+        """
+        for _, study_id, analysis_id in self.queue[sum(self.validated.values()):]:
+            previous_study = self.previous_dict.get(study_id, {})
+            if analysis_id in previous_study.get("analyses", {}):
+                validation_dict[study_id]["analyses"][analysis_id] = copy.deepcopy(previous_study["analyses"][analysis_id])
+                validation_dict[study_id]["analyses"][analysis_id]["carried_over"] = True
+                if not validation_dict[study_id]["params"]:
+                    validation_dict[study_id]["params"] = copy.deepcopy(previous_study["params"])
+                self.carried_over += 1
+            else:
+                del validation_dict[study_id]["analyses"][analysis_id]
+                self.dropped += 1
+            if not validation_dict[study_id]["analyses"]:
+                del validation_dict[study_id]
+        return validation_dict
+
+    def summary(self):
+        """Method for summarizing the coverage achieved within the budget.
+
+        :return: Summary dictionary.
+        :rtype: dict
+        """
+        totals = collections.Counter(priority for priority, _, _ in self.queue)
+        validated = sum(self.validated.values())
+        return {
+            "time_budget": self.time_budget,
+            "elapsed": round(self.elapsed(), 3),
+            "validated": validated,
+            "total": len(self.queue),
+            "coverage": round(validated / len(self.queue), 4) if self.queue else 1.0,
+            "priorities": {priority: {"validated": self.validated[priority], "total": totals[priority]} for priority in PRIORITIES},
+            "carried_over": self.carried_over,
+            "dropped": self.dropped,
+        }
+
+    @staticmethod
+    def format_summary(summary_dict):
+        """Method for formatting a schedule summary as human readable text.
+
+        :param summary_dict: Summary dictionary (see summary()).
+        :type summary_dict: dict
+        :return: Summary text.
+        :rtype: str
+        """
+        lines = ["Validated {} of {} analyses ({:.1f}%) in {} of a {} budget".format(
+            summary_dict["validated"], summary_dict["total"], 100 * summary_dict["coverage"],
+            format_duration(summary_dict["elapsed"]), format_duration(summary_dict["time_budget"]))]
+        lines.append("\t" + ", ".join("{} {}/{}".format(priority, counts["validated"], counts["total"])
+                                      for priority, counts in summary_dict["priorities"].items()))
+        if summary_dict["carried_over"] or summary_dict["dropped"]:
+            lines.append("\t{} analyses carried over from the previous run, {} new analyses left for the next run".format(
+                summary_dict["carried_over"], summary_dict["dropped"]))
+        return "\n".join(lines)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+search.py
+~~~~~~~~~
+
+This script contains methods for building a prebuilt inverted index of the studies and analyses in a validation
+dictionary. The index is saved as compact JSON and queried client-side by search.js, so finding a study does not require
+scanning the (multi-megabyte) status pages.
+
+Index layout:
+{
+    "version": 1,
+    "studies": [[study_id, STUDY_TITLE, INSTITUTE, "LAST_NAME, FIRST_NAME"], ...],
+    "analyses": [[analysis_id, study index, txt status, json status, comparison status], ...],
+    "terms": {term: [gap encoded, ascending analysis indexes], ...}
+}
+"""
+import json
+import pkgutil
+import re
+
+
+SEARCH_INDEX_VERSION = 1
+SEARCH_INDEX_FILENAME = "search_index.json"
+SEARCH_SCRIPT_FILENAME = "search.js"
+STUDY_FIELDS = ("STUDY_TITLE", "INSTITUTE", "LAST_NAME", "FIRST_NAME")
+ISSUE_TYPES = ("value", "consistency", "format")
+STOP_WORDS = {"a", "an", "and", "as", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "with"}
+TOKEN_REGEX = re.compile(r"[a-z0-9_]+(?::[a-z0-9_]+)?")
+
+
+def tokenize(text):
+    """Method for splitting a string into lowercase index terms. search.js uses the same rules for queries.
+
+    :param text: String to be tokenized.
+    :type text: str
+    :return: List of terms.
+    :rtype: list
+    """
+    return [token for token in TOKEN_REGEX.findall(str(text).lower()) if token not in STOP_WORDS]
+
+
+def tag(prefix, value):
+    """Method for creating a tag term (eg. "json:parsing_error") from a status or issue.
+
+    :param prefix: Tag prefix (eg. "txt", "json", "status", "comparison", "issue").
+    :type prefix: str
+    :param value: Status or issue string (eg. "Parsing Error").
+    :type value: str
+    :return: Tag term.
+    :rtype: str
+    """
+    return prefix + ":" + re.sub(r"[^a-z0-9]+", "_", str(value).lower()).strip("_")
+
+
+def analysis_terms(study_id, study_params, analysis_id, analysis_dict):
+    """Method for collecting every index term of a single analysis.
+
+    :param study_id: Metabolomics Workbench study ID string (eg. ST000001).
+    :type study_id: str
+    :param study_params: STUDY block parameters of the study.
+    :type study_params: dict
+    :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+    :type analysis_id: str
+    :param analysis_dict: The analysis' section of the validation dictionary.
+    :type analysis_dict: dict
+    :return: Set of terms.
+    :rtype: set
+    """
+    terms = {study_id.lower(), analysis_id.lower()}
+    for field in STUDY_FIELDS:
+        if study_params.get(field):
+            terms.update(tokenize(study_params[field]))
+
+    for file_format, status in analysis_dict.get("status", {}).items():
+        if status is None:
+            continue
+        if file_format == "comparison":
+            terms.add(tag("comparison", status))
+        else:
+            terms.add(tag(file_format, status))
+            terms.add(tag("status", status))
+
+    for file_format, issues in analysis_dict.get("issues", {}).items():
+        for issue_type in ISSUE_TYPES:
+            if issues.get(issue_type):
+                terms.add(tag(file_format, issue_type))
+                terms.add(tag("issue", issue_type))
+
+    return terms
+
+
+def build_search_index(validation_dict):
+    """Method for building the inverted index of a validation dictionary.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :return: Search index dictionary (see the module docstring for its layout).
+    :rtype: dict
+    """
+    studies = []
+    analyses = []
+    postings = dict()
+
+    for study_id in validation_dict:
+        study_params = validation_dict[study_id]["params"]
+        studies.append([
+            study_id,
+            study_params.get("STUDY_TITLE", ""),
+            study_params.get("INSTITUTE", ""),
+            ", ".join(name for name in (study_params.get("LAST_NAME"), study_params.get("FIRST_NAME")) if name),
+        ])
+
+        for analysis_id, analysis_dict in validation_dict[study_id]["analyses"].items():
+            analysis_index = len(analyses)
+            status = analysis_dict.get("status", {})
+            analyses.append([analysis_id, len(studies) - 1, status.get("txt"), status.get("json"), status.get("comparison")])
+
+            for term in analysis_terms(study_id, study_params, analysis_id, analysis_dict):
+                postings.setdefault(term, []).append(analysis_index)
+
+    # analysis indexes are appended in ascending order, so the gaps are always positive
+    terms = dict()
+    for term in sorted(postings):
+        previous = 0
+        gaps = []
+        for analysis_index in postings[term]:
+            gaps.append(analysis_index - previous)
+            previous = analysis_index
+        terms[term] = gaps
+
+    return {"version": SEARCH_INDEX_VERSION, "studies": studies, "analyses": analyses, "terms": terms}
+
+
+def decode_postings(gaps):
+    """Method for decoding a gap encoded postings list.
+
+    :param gaps: Gap encoded postings list.
+    :type gaps: list
+    :return: List of analysis indexes.
+    :rtype: list
+    """
+    analysis_indexes = []
+    previous = 0
+    for gap in gaps:
+        previous += gap
+        analysis_indexes.append(previous)
+    return analysis_indexes
+
+
+def query_search_index(search_index, query_str, limit=None):
+    """Method for querying a search index the same way search.js does. Every query term must match; the last term is
+    also matched as a prefix so partially typed words find results.
+
+    :param search_index: Search index dictionary created by build_search_index().
+    :type search_index: dict
+    :param query_str: Query string (eg. "ST000001", "smith json:parsing_error").
+    :type query_str: str
+    :param limit: Maximum number of results to return.
+    :type limit: int
+    :return: List of matching analysis records (see "analyses" in the module docstring).
+    :rtype: list
+    """
+    query_terms = tokenize(query_str)
+    if not query_terms:
+        return []
+
+    matches = None
+    for position, query_term in enumerate(query_terms):
+        if position == len(query_terms) - 1:
+            term_matches = set()
+            for term in search_index["terms"]:
+                if term.startswith(query_term):
+                    term_matches.update(decode_postings(search_index["terms"][term]))
+        else:
+            term_matches = set(decode_postings(search_index["terms"].get(query_term, [])))
+        matches = term_matches if matches is None else matches & term_matches
+        if not matches:
+            return []
+
+    return [search_index["analyses"][analysis_index] for analysis_index in sorted(matches)[:limit]]
+
+
+def save_search_index(search_index, filepath):
+    """Method for saving a search index as compact JSON.
+
+    :param search_index: Search index dictionary created by build_search_index().
+    :type search_index: dict
+    :param filepath: Path to the JSON file.
+    :type filepath: str
+    :return: None
+    """
+    with open(filepath, "w", encoding="utf-8") as fh:
+        fh.write(json.dumps(search_index, separators=(",", ":"), ensure_ascii=False))
+
+
+def write_search_script(filepath):
+    """Method for writing the client-side search script that queries the saved search index.
+
+    :param filepath: Path to the JavaScript file.
+    :type filepath: str
+    :return: None
+    """
+    with open(filepath, "wb") as fh:
+        fh.write(pkgutil.get_data(__name__, "templates/search.js"))
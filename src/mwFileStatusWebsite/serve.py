@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+serve.py
+~~~~~~~~
+
+This script contains a local HTTP server for the website. Pages, filtered views, study details, the search index, and
+the JSON API are rendered from the validation results on request instead of being generated ahead of time, and
+validation logs are served directly from the logs directory.
+
+Rendered responses are kept in an in-memory LRU cache keyed by the version of the validation results, which are
+reloaded (and the cache invalidated) when the validation JSON changes. /trends is rendered from the history archive
+instead, so its key also holds the version of that file. Every response carries an ETag so clients can revalidate with
+If-None-Match, and is gzip compressed when the client accepts it. The gzip compressed body has an ETag of its own, as
+the two are different representations.
+
+Routes:
+    /, /<page>, /<page>.html        The generated pages (eg. /parsing_error), and /trends when a history archive exists.
+    /view?q=<query>                 A page of the analyses matching a query (see mwFileStatusWebsite.query).
+    /studies/<study ID>.html        STUDY parameters of a study, loaded by details.js.
+    /search_index.json, /search.js, /details.js
+    /api/summary.json, /api/manifest.json, /api/studies/<study ID>.json
+    /validation_logs/<file>.log     Validation and comparison logs.
+    /styles/<file>                  Stylesheets, served from the html path.
+"""
+import hashlib
+import json
+import os
+import pkgutil
+import re
+import threading
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from . import constructor, compress, search, history, api, snapshot
+from .status_matrix import StatusMatrix
+from .query import QueryIndex
+
+
+SERVE_CACHE_SIZE = 256
+MIN_GZIP_SIZE = 512
+FILENAME_REGEX = re.compile(r"^[A-Za-z0-9_.-]+$")
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+    ".json": "application/json; charset=utf-8",
+    ".log": "text/plain; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+}
+
+
+class LRUCache(object):
+    """Thread-safe least recently used cache."""
+
+    def __init__(self, max_size=SERVE_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Method for getting a cached value.
+
+        :param key: Cache key.
+        :return: The cached value, or None if it is not cached.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Method for caching a value, evicting the least recently used value when the cache is full.
+
+        :param key: Cache key.
+        :param value: Value to be cached.
+        :return: None
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Method for emptying the cache.
+
+        :return: None
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+def file_version(path):
+    """Method for getting the version of a file, ie. its modification time and size.
+
+    :param path: Path to the file.
+    :type path: str
+    :return: Tuple of the modification time in nanoseconds and the size, or None if the file does not exist.
+    :rtype: tuple
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def parse_etags(header):
+    """Method for parsing an If-None-Match header. Weak ETags (W/"...") match their strong counterparts, as
+    If-None-Match uses the weak comparison.
+
+    :param header: Value of the If-None-Match header.
+    :type header: str
+    :return: List of the ETags, without their weakness indicators.
+    :rtype: list
+    """
+    etags = []
+    for etag in header.split(","):
+        etag = etag.strip()
+        if etag.startswith("W/"):
+            etag = etag[len("W/"):]
+        if etag:
+            etags.append(etag)
+    return etags
+
+
+class CachedResponse(object):
+    """Body of a response along with its content type, ETags, and (lazily created) gzip compressed body."""
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.content_type = content_type
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etag = "\"" + digest + "\""
+        self.gzip_etag = "\"" + digest + "-gzip\""
+        self._gzip_body = None
+
+    def gzip_body(self):
+        if self._gzip_body is None:
+            self._gzip_body = compress.gzip_bytes(self.body)
+        return self._gzip_body
+
+
+class Site(object):
+    """The website rendered on request from a validation JSON file."""
+
+    def __init__(self, validation_path, owner, repo, logs_path="validation_logs", static_path="", history_path=None,
+                 create_pages=None, pages_path=None, cache_size=SERVE_CACHE_SIZE):
+        """Set up the site. The validation results are loaded on the first request.
+
+        :param validation_path: The path to the validation JSON summary output by the validate command.
+        :type validation_path: str
+        :param owner: The GitHub account name that owns the repo the website is committed to.
+        :type owner: str
+        :param repo: The name of the repo the website is committed to.
+        :type repo: str
+        :param logs_path: Directory the validation logs are served from.
+        :type logs_path: str
+        :param static_path: Directory the styles directory is served from.
+        :type static_path: str
+        :param history_path: The path to the history archive the trends page is rendered from.
+        :type history_path: str
+        :param create_pages: Function returning the (filename, page dictionary) tuples of the pages, given the
+        validation dictionary, its StatusMatrix, and pages_path (see cli.create_pages()). Only /view and the other
+        routes are served when None.
+        :type create_pages: callable
+        :param pages_path: Path to a page configuration file listing additional pages.
+        :type pages_path: str
+        :param cache_size: Maximum number of rendered responses kept in memory.
+        :type cache_size: int
+        """
+        self.validation_path = validation_path
+        self.owner = owner
+        self.repo = repo
+        self.logs_path = logs_path
+        self.static_path = static_path
+        self.history_path = history_path
+        self.create_pages = create_pages
+        self.pages_path = pages_path
+        self.cache = LRUCache(cache_size)
+        self._state = None
+        self._lock = threading.Lock()
+        self._link_rewrites = [
+            ("https://{}.github.io/{}/".format(owner, repo), "/"),
+            ("https://raw.githubusercontent.com/{}/{}/master/validation_logs/".format(owner, repo), "/validation_logs/"),
+        ]
+
+    def state(self):
+        """Method for getting the loaded validation results, reloading them when the validation JSON changed since they
+        were loaded.
+
+        :return: Dictionary with the results "version", "validation_dict", "status_matrix", "query_index", and "pages".
+        :rtype: dict
+        """
+        version = file_version(self.validation_path)
+        with self._lock:
+            if self._state is None or self._state["version"] != version:
+                validation_dict = snapshot.load_validation_dict(self.validation_path)
+                status_matrix = StatusMatrix(validation_dict)
+                pages = self.create_pages(validation_dict, status_matrix, self.pages_path) if self.create_pages else []
+                self._state = {
+                    "version": version,
+                    "validation_dict": validation_dict,
+                    "status_matrix": status_matrix,
+                    "query_index": QueryIndex(validation_dict, status_matrix),
+                    "pages": {filename[:-len(".html")]: page_dict for filename, page_dict in pages},
+                }
+                self.cache.clear()
+            return self._state
+
+    def render_page(self, page_dict, status_matrix=None):
+        html_str = constructor.render_html(page_dict, self.owner, self.repo, lazy_details=True, status_matrix=status_matrix)
+        for old, new in self._link_rewrites:
+            html_str = html_str.replace(old, new)
+        return html_str.encode("utf-8")
+
+    def render(self, path, params):
+        """Method for rendering a route.
+
+        :param path: Decoded URL path.
+        :type path: str
+        :param params: Parsed URL query parameters.
+        :type params: dict
+        :return: Tuple of the HTTP status code and a CachedResponse (None for errors), or None if the route is not found.
+        :rtype: tuple
+        """
+        state = self.state()
+        validation_dict = state["validation_dict"]
+        name, extension = os.path.splitext(path.strip("/") or "index")
+        parts = path.strip("/").split("/")
+
+        if len(parts) == 1 and extension in ("", ".html") and name in state["pages"]:
+            return 200, CachedResponse(self.render_page(state["pages"][name], state["status_matrix"]), CONTENT_TYPES[".html"])
+        if len(parts) == 1 and extension in ("", ".html") and name == "view":
+            try:
+                page_dict = state["query_index"].select(params.get("q", [""])[0])
+            except ValueError as e:
+                return 400, CachedResponse(str(e).encode("utf-8"), CONTENT_TYPES[".log"])
+            return 200, CachedResponse(self.render_page(page_dict, state["status_matrix"]), CONTENT_TYPES[".html"])
+        if len(parts) == 1 and extension in ("", ".html") and name == "trends" and self.history_path and os.path.isfile(self.history_path):
+            html_str = history.render_trends_html(self.history_path, self.owner, self.repo)
+            for old, new in self._link_rewrites:
+                html_str = html_str.replace(old, new)
+            return 200, CachedResponse(html_str.encode("utf-8"), CONTENT_TYPES[".html"])
+        if path == "/" + search.SEARCH_INDEX_FILENAME:
+            return 200, CachedResponse(json.dumps(search.build_search_index(validation_dict), separators=(",", ":"), ensure_ascii=False).encode("utf-8"),
+                                       CONTENT_TYPES[".json"])
+        if path in ("/" + search.SEARCH_SCRIPT_FILENAME, "/" + constructor.DETAILS_SCRIPT_FILENAME):
+            return 200, CachedResponse(pkgutil.get_data(__name__, "templates" + path), CONTENT_TYPES[".js"])
+        if len(parts) == 2 and parts[0] == constructor.STUDY_DETAILS_DIRNAME and extension == ".html":
+            study_id = parts[1][:-len(".html")]
+            if study_id in validation_dict:
+                return 200, CachedResponse((constructor.create_desc(validation_dict[study_id]["params"], tabs="") + "\n").encode("utf-8"),
+                                           CONTENT_TYPES[".html"])
+        if parts[0] == api.API_DIRNAME and extension == ".json":
+            json_dict = None
+            if parts[1:] == [api.SUMMARY_FILENAME]:
+                json_dict = api.create_summary(validation_dict, state["status_matrix"])
+            elif parts[1:] == [api.SHARD_MANIFEST_FILENAME]:
+                json_dict = api.create_shard_manifest(validation_dict)
+            elif len(parts) == 3 and parts[1] == api.STUDY_SHARD_DIRNAME and parts[2][:-len(".json")] in validation_dict:
+                study_id = parts[2][:-len(".json")]
+                json_dict = api.create_study_shard(study_id, validation_dict[study_id], self.owner, self.repo)
+            if json_dict is not None:
+                return 200, CachedResponse(json.dumps(json_dict, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), CONTENT_TYPES[".json"])
+        return None
+
+    def file_response(self, directory, filename):
+        """Method for reading a file from disk (logs and stylesheets), cached by its modification time and size.
+
+        :param directory: Directory the file is served from.
+        :type directory: str
+        :param filename: Name of the file, without any directory components.
+        :type filename: str
+        :return: CachedResponse, or None if the file does not exist.
+        :rtype: :py:class:`CachedResponse`
+        """
+        if not FILENAME_REGEX.match(filename) or filename.startswith("."):
+            return None
+        filepath = os.path.join(directory, filename)
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+
+        key = ("file", filepath, stat.st_mtime_ns, stat.st_size)
+        response = self.cache.get(key)
+        if response is None:
+            with open(filepath, "rb") as fh:
+                response = CachedResponse(fh.read(), CONTENT_TYPES.get(os.path.splitext(filename)[1], "application/octet-stream"))
+            self.cache.put(key, response)
+        return response
+
+    def respond(self, target, headers=None):
+        """Method for creating the response to a GET request.
+
+        :param target: Request target (path and query string).
+        :type target: str
+        :param headers: Request headers.
+        :type headers: dict
+        :return: Tuple of the HTTP status code, the response headers, and the response body.
+        :rtype: tuple
+        """
+        headers = headers or {}
+        url = urlsplit(target)
+        path = unquote(url.path)
+        parts = path.strip("/").split("/")
+
+        status = 200
+        if len(parts) == 2 and parts[0] == "validation_logs":
+            response = self.file_response(self.logs_path, parts[1])
+        elif len(parts) == 2 and parts[0] == "styles":
+            response = self.file_response(os.path.join(self.static_path, "styles"), parts[1])
+        else:
+            key = (self.state()["version"], path, url.query)
+            if path.strip("/") in ("trends", "trends.html") and self.history_path:
+                # validate saves the validation JSON before appending the run to the history archive
+                key += (file_version(self.history_path),)
+            response = self.cache.get(key)
+            if response is None:
+                result = self.render(path, parse_qs(url.query))
+                if result:
+                    status, response = result
+                    if status == 200:
+                        self.cache.put(key, response)
+
+        if response is None:
+            return 404, {"Content-Type": CONTENT_TYPES[".log"], "Content-Length": "9"}, b"Not Found"
+
+        gzipped = "gzip" in headers.get("Accept-Encoding", "") and len(response.body) >= MIN_GZIP_SIZE
+        etag = response.gzip_etag if gzipped else response.etag
+        response_headers = {"Content-Type": response.content_type, "ETag": etag, "Cache-Control": "no-cache",
+                            "Vary": "Accept-Encoding"}
+        if status == 200:
+            etags = parse_etags(headers.get("If-None-Match", ""))
+            if etag in etags or "*" in etags:
+                return 304, response_headers, b""
+
+        body = response.body
+        if gzipped:
+            body = response.gzip_body()
+            response_headers["Content-Encoding"] = "gzip"
+        response_headers["Content-Length"] = str(len(body))
+        return status, response_headers, body
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Request handler serving a Site (self.server.site)."""
+
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately, without TCP_NODELAY keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self, send_body=True):
+        try:
+            status, headers, body = self.server.site.respond(self.path, self.headers)
+        except Exception as e:
+            status, headers, body = 500, {"Content-Type": CONTENT_TYPES[".log"]}, str(e).encode("utf-8")
+            headers["Content-Length"] = str(len(body))
+
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.end_headers()
+        if send_body and status != 304:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.do_GET(send_body=False)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def create_server(site, host="127.0.0.1", port=8000, verbose=False):
+    """Method for creating a threaded HTTP server for a Site.
+
+    :param site: The site to serve.
+    :type site: :py:class:`Site`
+    :param host: Host name or address to listen on.
+    :type host: str
+    :param port: Port to listen on (0 picks a free port).
+    :type port: int
+    :param verbose: Log every request.
+    :type verbose: bool
+    :return: The server, call serve_forever() to start serving.
+    :rtype: :py:class:`http.server.ThreadingHTTPServer`
+    """
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.site = site
+    server.verbose = verbose
+    return server
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+snapshot.py
+~~~~~~~~~~~
+
+This script contains methods for saving and loading a binary snapshot of a validation dictionary. The validator writes
+the snapshot next to the validation JSON (tmp.json -> tmp.snapshot) every time it saves the JSON. The snapshot is
+memory-mapped when it is opened. Only the header and the study index are read then, and the record of a study is decoded
+when the study is accessed, so one study can be read without decoding the rest of the file.
+
+A record is stored as columns, not as JSON. The statuses of its analyses are one byte codes into the status table of
+the header. Their issues are bits, and their parameters and IDs are a single utf-8 blob of NUL separated strings.
+Decoding a record takes one utf-8 decode, one split, and building the dictionaries, without scanning for quotes and
+escapes. An analysis of another shape (eg. an extra "carried_over" key) is kept as compact JSON in the record's fallback
+list. A study whose STUDY parameters are not all strings, or that has a NUL character in one of its strings, is stored as
+compact JSON as a whole. Either way the decoded dictionaries compare equal to those of tmp.json, in the same key order,
+so pages and page digests do not depend on which file was loaded.
+
+The header holds the size and modification time of the validation JSON the snapshot was written with.
+load_validation_dict() only uses the snapshot while the JSON file still matches them, and reads the JSON file
+otherwise (eg. after a tool that only writes JSON rewrote it). The JSON file remains the authoritative copy.
+
+Snapshot layout (little-endian):
+    header          magic (b"MWFS"), schema version (uint16), 2 pad bytes, number of studies (uint32), JSON file size
+                    (uint64) and modification time in ns (int64), status table size (uint32), index offset (uint64)
+    status table    compact utf-8 JSON list of the status values the status codes refer to (eg. [null, "Passing"])
+    records         one per study, see below
+    index           study ID lengths (uint16 each), study IDs (utf-8), record offsets (uint64 each), record sizes
+                    (uint32 each), record kinds (uint8 each: CODED or FALLBACK)
+
+CODED record:
+    header          number of STUDY parameters, analyses, strings, string bytes, fallback bytes (uint32 each)
+    strings         utf-8 blob of NUL separated strings: the STUDY parameter keys and values, then per analysis its ID
+                    and, if it is coded, its parameter keys and values
+    kinds           per analysis (uint8): CODED, or FALLBACK for an analysis kept as JSON
+    statuses        per analysis, three columns (uint8 each): txt, json and comparison status codes, ABSENT without a
+                    comparison
+    issues          per analysis (uint8): bit f * 3 + i is set if file format f (txt, json) has issue type i (value,
+                    consistency, format)
+    param counts    per analysis (uint16): number of parameters
+    fallback        compact utf-8 JSON list of the analyses kept as JSON, in order
+
+Example:
+    with Snapshot("tmp.snapshot") as snapshot:
+        study_dict = snapshot["ST000001"]
+"""
+import array
+import itertools
+import json
+import mmap
+import os
+import struct
+import sys
+
+from collections.abc import Mapping
+
+
+SNAPSHOT_MAGIC = b"MWFS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".snapshot"
+HEADER_STRUCT = struct.Struct("<4sHxxIQqIQ")
+STRING_SEPARATOR = "\0"
+RECORD_HEADER_STRUCT = struct.Struct("<IIIII")
+CODED = 0
+FALLBACK = 1
+ABSENT = 255
+MAX_STATUSES = ABSENT
+MAX_PARAMS = 0xFFFF
+STATUS_KEYS = ("txt", "json", "comparison")
+FILE_FORMATS = ("txt", "json")
+ISSUE_TYPES = ("value", "consistency", "format")
+ANALYSIS_KEYS = ["params", "status", "issues"]
+ISSUES_KEYS = [list(FILE_FORMATS), list(ISSUE_TYPES)]
+ISSUE_FLAGS = [tuple(bool(bits >> bit & 1) for bit in range(len(FILE_FORMATS) * len(ISSUE_TYPES)))
+               for bits in range(1 << len(FILE_FORMATS) * len(ISSUE_TYPES))]
+
+
+def snapshot_path(json_path):
+    """Method for getting the path of the snapshot belonging to a validation JSON file.
+
+    :param json_path: Path to the validation JSON file (eg. tmp.json).
+    :type json_path: str
+    :return: Path to the snapshot file (eg. tmp.snapshot).
+    :rtype: str
+    """
+    return os.path.splitext(json_path)[0] + SNAPSHOT_EXTENSION
+
+
+def json_stamp(json_path):
+    """Method for getting the size and modification time of a validation JSON file, which tell whether a snapshot was
+    written with its current contents.
+
+    :param json_path: Path to the validation JSON file.
+    :type json_path: str
+    :return: Tuple of the size in bytes and the modification time in nanoseconds, (0, 0) if the file does not exist.
+    :rtype: tuple
+    """
+    try:
+        stat = os.stat(json_path)
+    except FileNotFoundError:
+        return 0, 0
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _pack_array(typecode, values):
+    """Method for packing unsigned integers as a little-endian array.
+
+    :param typecode: Array type code ('H', 'I', or 'Q').
+    :type typecode: str
+    :param values: Integers.
+    :type values: iterable
+    :return: Packed bytes.
+    :rtype: bytes
+    """
+    values = array.array(typecode, values)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _unpack_array(typecode, data):
+    """Method for unpacking a little-endian array of unsigned integers.
+
+    :param typecode: Array type code ('H', 'I', or 'Q').
+    :type typecode: str
+    :param data: Packed bytes.
+    :type data: bytes
+    :return: Unpacked integers.
+    :rtype: :py:class:`array.array`
+    """
+    values = array.array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _is_string_dict(dictionary):
+    """Method for checking that a dictionary only has string keys and values.
+
+    :param dictionary: Dictionary to check.
+    :type dictionary: dict
+    :return: Whether it is a dict of strings.
+    :rtype: bool
+    """
+    return type(dictionary) is dict and all(type(key) is str and type(value) is str for key, value in dictionary.items())
+
+
+def _encode_analysis(analysis_dict, status_codes):
+    """Method for encoding the statuses and issues of an analysis, if it has the shape create_validation_dict() gives.
+
+    :param analysis_dict: Analysis dictionary.
+    :type analysis_dict: dict
+    :param status_codes: Dictionary of status values (keys) and their codes (values), extended with new values.
+    :type status_codes: dict
+    :return: Tuple of the three status codes and the issue bits, or None if the analysis has to be kept as JSON.
+    :rtype: tuple
+    """
+    if type(analysis_dict) is not dict or list(analysis_dict) != ANALYSIS_KEYS:
+        return None
+    params, status, issues = analysis_dict["params"], analysis_dict["status"], analysis_dict["issues"]
+    if not _is_string_dict(params) or len(params) > MAX_PARAMS:
+        return None
+    if type(status) is not dict or list(status) not in (list(STATUS_KEYS[:2]), list(STATUS_KEYS)):
+        return None
+    if type(issues) is not dict or list(issues) != ISSUES_KEYS[0] or \
+            any(type(issues[file_format]) is not dict or list(issues[file_format]) != ISSUES_KEYS[1] for file_format in FILE_FORMATS):
+        return None
+
+    codes = []
+    for status_key in STATUS_KEYS:
+        if status_key not in status:
+            codes.append(ABSENT)
+            continue
+        value = status[status_key]
+        if not (value is None or type(value) is str):
+            return None
+        if value not in status_codes:
+            if len(status_codes) == MAX_STATUSES:
+                return None
+            status_codes[value] = len(status_codes)
+        codes.append(status_codes[value])
+
+    bits = 0
+    for format_number, file_format in enumerate(FILE_FORMATS):
+        for issue_number, issue_type in enumerate(ISSUE_TYPES):
+            value = issues[file_format][issue_type]
+            if type(value) is not bool:
+                return None
+            if value:
+                bits |= 1 << (format_number * len(ISSUE_TYPES) + issue_number)
+    return codes, bits
+
+
+def encode_study(study_dict, status_codes):
+    """Method for encoding the record of a study.
+
+    :param study_dict: Study dictionary (STUDY parameters and analyses).
+    :type study_dict: dict
+    :param status_codes: Dictionary of status values (keys) and their codes (values), extended with new values.
+    :type status_codes: dict
+    :return: Tuple of the record kind (CODED or FALLBACK) and the record bytes.
+    :rtype: tuple
+    """
+    if type(study_dict) is not dict or list(study_dict) != ["params", "analyses"] or \
+            not _is_string_dict(study_dict["params"]) or type(study_dict["analyses"]) is not dict:
+        return FALLBACK, json.dumps(study_dict, separators=(",", ":")).encode("utf-8")
+
+    strings = [string for item in study_dict["params"].items() for string in item]
+    kinds, issues, param_counts, fallback = bytearray(), bytearray(), [], []
+    statuses = [bytearray() for _ in STATUS_KEYS]
+    for analysis_id, analysis_dict in study_dict["analyses"].items():
+        strings.append(analysis_id)
+        encoded = _encode_analysis(analysis_dict, status_codes)
+        if encoded is None:
+            codes, bits, count = (ABSENT,) * len(STATUS_KEYS), 0, 0
+            fallback.append(analysis_dict)
+        else:
+            (codes, bits), count = encoded, len(analysis_dict["params"])
+            strings.extend(string for item in analysis_dict["params"].items() for string in item)
+        kinds.append(FALLBACK if encoded is None else CODED)
+        for column, code in zip(statuses, codes):
+            column.append(code)
+        issues.append(bits)
+        param_counts.append(count)
+
+    text = STRING_SEPARATOR.join(strings)
+    if text.count(STRING_SEPARATOR) != len(strings) - 1:
+        return FALLBACK, json.dumps(study_dict, separators=(",", ":")).encode("utf-8")
+    blob = text.encode("utf-8")
+    fallback_bytes = json.dumps(fallback, separators=(",", ":")).encode("utf-8") if fallback else b""
+    return CODED, b"".join([
+        RECORD_HEADER_STRUCT.pack(len(study_dict["params"]), len(kinds), len(strings), len(blob), len(fallback_bytes)),
+        blob,
+        bytes(kinds),
+        *statuses,
+        bytes(issues),
+        _pack_array("H", param_counts),
+        fallback_bytes,
+    ])
+
+
+def decode_study(record, kind, status_table):
+    """Method for decoding the record of a study.
+
+    :param record: Record bytes.
+    :type record: bytes
+    :param kind: Record kind (CODED or FALLBACK).
+    :type kind: int
+    :param status_table: Status values the status codes refer to.
+    :type status_table: list
+    :return: Study dictionary (STUDY parameters and analyses).
+    :rtype: dict
+    """
+    if kind == FALLBACK:
+        return json.loads(record)
+
+    num_params, num_analyses, num_strings, num_bytes, fallback_size = RECORD_HEADER_STRUCT.unpack_from(record, 0)
+    position = RECORD_HEADER_STRUCT.size
+    strings = record[position:position + num_bytes].decode("utf-8").split(STRING_SEPARATOR)
+    if len(strings) != num_strings:
+        raise ValueError("Corrupt study record: expected {} strings, found {}.".format(num_strings, len(strings)))
+    position += num_bytes
+    kinds, txt_codes, json_codes, comparison_codes, issues = \
+        [record[start:start + num_analyses] for start in range(position, position + 5 * num_analyses, num_analyses)]
+    position += 5 * num_analyses
+    param_counts = _unpack_array("H", record[position:position + 2 * num_analyses])
+    position += 2 * num_analyses
+    fallback = iter(json.loads(record[position:position + fallback_size]) if fallback_size else [])
+
+    end = 2 * num_params
+    study_params = dict(zip(strings[0:end:2], strings[1:end:2]))
+    analyses = {}
+    for kind, txt, json_code, comparison, bits, count in \
+            zip(kinds, txt_codes, json_codes, comparison_codes, issues, param_counts):
+        analysis_id = strings[end]
+        end += 1
+        if kind == FALLBACK:
+            analyses[analysis_id] = next(fallback)
+            continue
+        if count == 1:
+            params = {strings[end]: strings[end + 1]}
+        else:
+            params = dict(zip(strings[end:end + 2 * count:2], strings[end + 1:end + 2 * count:2]))
+        end += 2 * count
+        if comparison == ABSENT:
+            status = {"txt": status_table[txt], "json": status_table[json_code]}
+        else:
+            status = {"txt": status_table[txt], "json": status_table[json_code], "comparison": status_table[comparison]}
+        txt_value, txt_consistency, txt_format, json_value, json_consistency, json_format = ISSUE_FLAGS[bits]
+        analyses[analysis_id] = {
+            "params": params,
+            "status": status,
+            "issues": {
+                "txt": {"value": txt_value, "consistency": txt_consistency, "format": txt_format},
+                "json": {"value": json_value, "consistency": json_consistency, "format": json_format},
+            },
+        }
+    return {"params": study_params, "analyses": analyses}
+
+
+def save_snapshot(validation_dict, filepath, json_path=None):
+    """Method for saving a validation dictionary as a binary snapshot. The file is replaced atomically.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param filepath: Path to the snapshot file.
+    :type filepath: str
+    :param json_path: Path to the validation JSON file the dictionary was just saved to, whose size and modification
+    time are recorded (see load_validation_dict()).
+    :type json_path: str
+    :return: None
+    """
+    status_codes = {}
+    study_ids, kinds, records = [], [], []
+    for study_id, study_dict in validation_dict.items():
+        kind, record = encode_study(study_dict, status_codes)
+        study_ids.append(study_id.encode("utf-8"))
+        kinds.append(kind)
+        records.append(record)
+
+    status_table = json.dumps(list(status_codes), separators=(",", ":")).encode("utf-8")
+    offsets = list(itertools.accumulate([HEADER_STRUCT.size + len(status_table)] + [len(record) for record in records]))
+    json_size, json_mtime = json_stamp(json_path) if json_path else (0, 0)
+
+    tmp_path = filepath + ".tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(HEADER_STRUCT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(study_ids), json_size, json_mtime,
+                                    len(status_table), offsets[-1]))
+        fh.write(status_table)
+        for record in records:
+            fh.write(record)
+        fh.write(_pack_array("H", (len(study_id) for study_id in study_ids)))
+        fh.write(b"".join(study_ids))
+        fh.write(_pack_array("Q", offsets[:-1]))
+        fh.write(_pack_array("I", (len(record) for record in records)))
+        fh.write(bytes(kinds))
+    os.replace(tmp_path, filepath)
+
+
+class Snapshot(Mapping):
+    """Read-only, memory-mapped view of a snapshot file. Behaves like a validation dictionary (study IDs as keys, in
+    the order they were saved), but each study's record is only decoded when it is accessed.
+
+    :ivar json_stamp: Size and modification time of the validation JSON file the snapshot was written with.
+    """
+
+    def __init__(self, filepath):
+        """Open the snapshot and read its header and index.
+
+        :param filepath: Path to the snapshot file.
+        :type filepath: str
+        """
+        self.filepath = filepath
+        with open(filepath, "rb") as fh:
+            size = os.fstat(fh.fileno()).st_size
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+        try:
+            if size < HEADER_STRUCT.size:
+                raise ValueError("{} is not a validation snapshot.".format(filepath))
+            magic, version, num_studies, json_size, json_mtime, table_size, index_offset = \
+                HEADER_STRUCT.unpack_from(self._mmap, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError("{} is not a validation snapshot.".format(filepath))
+            if version != SNAPSHOT_VERSION:
+                raise ValueError("{} has snapshot schema version {}, expected {}.".format(filepath, version, SNAPSHOT_VERSION))
+            self.json_stamp = (json_size, json_mtime)
+            self._status_table = json.loads(self._mmap[HEADER_STRUCT.size:HEADER_STRUCT.size + table_size])
+
+            position = index_offset
+            id_lengths = _unpack_array("H", self._mmap[position:position + 2 * num_studies])
+            position += 2 * num_studies
+            id_ends = list(itertools.accumulate(id_lengths))
+            ids = self._mmap[position:position + (id_ends[-1] if id_ends else 0)]
+            position += len(ids)
+            offsets = _unpack_array("Q", self._mmap[position:position + 8 * num_studies])
+            position += 8 * num_studies
+            sizes = _unpack_array("I", self._mmap[position:position + 4 * num_studies])
+            position += 4 * num_studies
+            kinds = self._mmap[position:position + num_studies]
+            if len(kinds) != num_studies or position + num_studies != size or \
+                    any(offset + record_size > index_offset for offset, record_size in zip(offsets, sizes)):
+                raise ValueError("{} has a corrupt index.".format(filepath))
+            self._index = {ids[start:end].decode("utf-8"): record
+                           for start, end, record in zip([0] + id_ends, id_ends, zip(offsets, sizes, kinds))}
+        except (ValueError, struct.error):
+            self.close()
+            raise
+
+    def __getitem__(self, study_id):
+        offset, size, kind = self._index[study_id]
+        return decode_study(self._mmap[offset:offset + size], kind, self._status_table)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, study_id):
+        return study_id in self._index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Method for unmapping the snapshot file.
+
+        :return: None
+        """
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+
+    def to_dict(self):
+        """Method for decoding every study's record.
+
+        :return: Structured dictionary containing analyses statuses and other study information.
+        :rtype: dict
+        """
+        return {study_id: self[study_id] for study_id in self._index}
+
+
+def load_snapshot(filepath):
+    """Method for loading a whole snapshot file into a validation dictionary.
+
+    :param filepath: Path to the snapshot file.
+    :type filepath: str
+    :return: Structured dictionary containing analyses statuses and other study information.
+    :rtype: dict
+    """
+    with Snapshot(filepath) as snapshot:
+        return snapshot.to_dict()
+
+
+def open_snapshot(json_path):
+    """Method for opening the snapshot of a validation JSON file, if it was written with the file's current contents.
+
+    :param json_path: Path to the validation JSON file (eg. tmp.json).
+    :type json_path: str
+    :return: The opened snapshot, or None if there is none, it is out of date, or it is unreadable (eg. written with
+    another schema version).
+    :rtype: :py:class:`~mwFileStatusWebsite.snapshot.Snapshot`
+    """
+    path = snapshot_path(json_path)
+    if not os.path.isfile(path):
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError):
+        return None
+    if snapshot.json_stamp != json_stamp(json_path):
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def load_validation_dict(json_path):
+    """Method for loading a validation dictionary, from its snapshot when the snapshot is up to date (see
+    open_snapshot()) and from the validation JSON file otherwise.
+
+    :param json_path: Path to the validation JSON file (eg. tmp.json).
+    :type json_path: str
+    :return: Structured dictionary containing analyses statuses and other study information.
+    :rtype: dict
+    """
+    snapshot = open_snapshot(json_path)
+    if snapshot is not None:
+        with snapshot:
+            return snapshot.to_dict()
+
+    with open(json_path, "r") as fh:
+        return json.loads(fh.read())
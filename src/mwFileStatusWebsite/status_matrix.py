@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+status_matrix.py
+~~~~~~~~~~~~~~~~
+
+This script contains a columnar view of a validation dictionary. The statuses, issues, and comparison status of every
+analysis are encoded once into NumPy arrays (one row per analysis), so statistics come from ``numpy.bincount`` and
+filters from boolean masks instead of nested loops over the dictionary.
+
+Example:
+    status_matrix = StatusMatrix(validation_dict)
+    mask = status_matrix.status_mask("Passing", "txt") & status_matrix.status_mask("Parsing Error", "json")
+    status_matrix.analysis_ids_of(mask)
+"""
+import numpy
+
+
+FILE_FORMATS = ("txt", "json")
+STATUSES = ("Passing", "Warnings Only", "Validation Error", "Parsing Error", "Missing/Blank", "Timed Out")
+ISSUE_TYPES = ("value", "consistency", "format")
+COMPARISONS = ("Consistent", "Inconsistent", "Not Checked")
+# comparison codes of an analysis without a comparison status or with an unknown one
+ABSENT = 255
+UNKNOWN = len(COMPARISONS)
+
+
+class StatusMatrix(object):
+    """Columnar view of a validation dictionary.
+
+    :ivar study_ids: Study IDs, in validation dictionary order.
+    :ivar analysis_ids: Analysis IDs, in validation dictionary order (one per row).
+    :ivar study_index: Row index (into study_ids) of each analysis' study.
+    :ivar status_names: Status strings the status codes refer to. The standard statuses (STATUSES) come first, others are
+    appended as they are encountered.
+    :ivar status: Array of status codes, shape (number of analyses, 2), columns in FILE_FORMATS order.
+    :ivar issues: Array of issue bitmasks. Bit ``f * len(ISSUE_TYPES) + i`` is set if file format f has issue type i.
+    :ivar comparison: Array of comparison codes (indexes into COMPARISONS, UNKNOWN, or ABSENT).
+    """
+
+    def __init__(self, validation_dict):
+        """Build the columnar view.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        """
+        self.validation_dict = validation_dict
+        self.study_ids = list(validation_dict)
+        self.analysis_ids = []
+        self.status_names = list(STATUSES)
+        self._analysis_dicts = []
+
+        status_codes = {name: code for code, name in enumerate(self.status_names)}
+        comparison_codes = {name: code for code, name in enumerate(COMPARISONS)}
+        study_index, status, issues, comparison = [], [], [], []
+
+        for study_number, study_id in enumerate(self.study_ids):
+            for analysis_id, analysis_dict in validation_dict[study_id]["analyses"].items():
+                self.analysis_ids.append(analysis_id)
+                self._analysis_dicts.append(analysis_dict)
+                study_index.append(study_number)
+
+                status_dict = analysis_dict.get("status", {})
+                row = []
+                for file_format in FILE_FORMATS:
+                    name = status_dict.get(file_format)
+                    if name not in status_codes:
+                        status_codes[name] = len(self.status_names)
+                        self.status_names.append(name)
+                    row.append(status_codes[name])
+                status.append(row)
+
+                bits = 0
+                issues_dict = analysis_dict.get("issues", {})
+                for format_number, file_format in enumerate(FILE_FORMATS):
+                    for issue_number, issue_type in enumerate(ISSUE_TYPES):
+                        if issues_dict.get(file_format, {}).get(issue_type):
+                            bits |= 1 << (format_number * len(ISSUE_TYPES) + issue_number)
+                issues.append(bits)
+
+                comparison.append(comparison_codes.get(status_dict["comparison"], UNKNOWN) if "comparison" in status_dict else ABSENT)
+
+        self.analysis_index = {analysis_id: row for row, analysis_id in enumerate(self.analysis_ids)}
+        self.study_index = numpy.array(study_index, dtype=numpy.int32)
+        self.status = numpy.array(status, dtype=numpy.uint8).reshape(len(self.analysis_ids), len(FILE_FORMATS))
+        self.issues = numpy.array(issues, dtype=numpy.uint8)
+        self.comparison = numpy.array(comparison, dtype=numpy.uint8)
+
+    def __len__(self):
+        return len(self.analysis_ids)
+
+    def status_mask(self, status_str, file_format=None):
+        """Method for selecting the analyses with the given status.
+
+        :param status_str: Validation status (eg. "Passing").
+        :type status_str: str
+        :param file_format: File format to check ('txt' or 'json'). Either format matches when None.
+        :type file_format: str
+        :return: Boolean mask with one element per analysis.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        if status_str not in self.status_names:
+            return numpy.zeros(len(self), dtype=bool)
+        code = self.status_names.index(status_str)
+        if file_format:
+            return self.status[:, FILE_FORMATS.index(file_format)] == code
+        return (self.status[:, 0] == code) | (self.status[:, 1] == code)
+
+    def issue_mask(self, issue_str, file_format=None):
+        """Method for selecting the analyses with the given issue type.
+
+        :param issue_str: Issue type ('value', 'consistency', or 'format').
+        :type issue_str: str
+        :param file_format: File format to check ('txt' or 'json'). Either format matches when None.
+        :type file_format: str
+        :return: Boolean mask with one element per analysis.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        issue_number = ISSUE_TYPES.index(issue_str)
+        formats = [file_format] if file_format else FILE_FORMATS
+        bits = sum(1 << (FILE_FORMATS.index(fmt) * len(ISSUE_TYPES) + issue_number) for fmt in formats)
+        return (self.issues & bits) != 0
+
+    def comparison_mask(self, comparison_str):
+        """Method for selecting the analyses with the given comparison status.
+
+        :param comparison_str: Comparison status ('Consistent', 'Inconsistent', or 'Not Checked').
+        :type comparison_str: str
+        :return: Boolean mask with one element per analysis.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        if comparison_str not in COMPARISONS:
+            return numpy.zeros(len(self), dtype=bool)
+        return self.comparison == COMPARISONS.index(comparison_str)
+
+    def study_mask(self, study_ids):
+        """Method for selecting the analyses of the given studies.
+
+        :param study_ids: Study IDs.
+        :type study_ids: iterable
+        :return: Boolean mask with one element per analysis.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        study_ids = set(study_ids)
+        selected = numpy.array([study_id in study_ids for study_id in self.study_ids], dtype=bool)
+        return selected[self.study_index]
+
+    def mask_of(self, validation_dict):
+        """Method for selecting the analyses of a validation dictionary filtered from this one (eg. a page of
+        cli.create_pages()).
+
+        :param validation_dict: Structured dictionary containing a subset of the analyses.
+        :type validation_dict: dict
+        :return: Boolean mask with one element per analysis, or None if validation_dict is the whole dictionary.
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        if validation_dict is self.validation_dict:
+            return None
+        mask = numpy.zeros(len(self), dtype=bool)
+        rows = [self.analysis_index[analysis_id] for study_dict in validation_dict.values() for analysis_id in study_dict["analyses"]]
+        mask[rows] = True
+        return mask
+
+    def validation_stats_summary(self, mask=None):
+        """Method for computing the same statistics as constructor.generate_validation_stats_summary().
+
+        :param mask: Only count the analyses selected by this boolean mask.
+        :type mask: :py:class:`numpy.ndarray`
+        :return: Tuple containing the number of studies, number of analyses, the dictionary of status counts, and the
+        dictionary of issue counts.
+        :rtype: tuple
+        """
+        status = self.status if mask is None else self.status[mask]
+        issues = self.issues if mask is None else self.issues[mask]
+        study_index = self.study_index if mask is None else self.study_index[mask]
+
+        error_num_dict = {name: {} for name in STATUSES}
+        for format_number, file_format in enumerate(FILE_FORMATS):
+            counts = numpy.bincount(status[:, format_number], minlength=len(self.status_names))
+            for code, name in enumerate(STATUSES):
+                error_num_dict[name][file_format] = int(counts[code])
+
+        issue_num_dict = {issue_type: {} for issue_type in ISSUE_TYPES}
+        for format_number, file_format in enumerate(FILE_FORMATS):
+            for issue_number, issue_type in enumerate(ISSUE_TYPES):
+                bit = format_number * len(ISSUE_TYPES) + issue_number
+                issue_num_dict[issue_type][file_format] = int(numpy.count_nonzero((issues >> bit) & 1))
+
+        num_studies = len(self.study_ids) if mask is None else int(numpy.unique(study_index).size)
+        return num_studies, int(status.shape[0]), error_num_dict, issue_num_dict
+
+    def comparison_stats_summary(self, mask=None):
+        """Method for computing the same statistics as constructor.generate_comparison_stats_summary().
+
+        :param mask: Only count the analyses selected by this boolean mask.
+        :type mask: :py:class:`numpy.ndarray`
+        :return: Tuple containing the number of consistent, inconsistent, and not checked analyses.
+        :rtype: tuple
+        """
+        comparison = self.comparison if mask is None else self.comparison[mask]
+        counts = numpy.bincount(comparison[comparison < UNKNOWN], minlength=len(COMPARISONS))
+        return tuple(int(count) for count in counts[:len(COMPARISONS)])
+
+    def analysis_ids_of(self, mask):
+        """Method for listing the analysis IDs selected by a mask.
+
+        :param mask: Boolean mask with one element per analysis.
+        :type mask: :py:class:`numpy.ndarray`
+        :return: List of analysis IDs, in validation dictionary order.
+        :rtype: list
+        """
+        return [self.analysis_ids[row] for row in numpy.flatnonzero(mask)]
+
+    def select(self, mask):
+        """Method for creating a validation dictionary containing only the analyses selected by a mask, in the same
+        format as constructor.filter_analyses_by_status() returns. Study params and analysis dictionaries are shared
+        with the original validation dictionary, not copied.
+
+        :param mask: Boolean mask with one element per analysis.
+        :type mask: :py:class:`numpy.ndarray`
+        :return: Structured dictionary containing analyses statuses and other study information.
+        :rtype: dict
+        """
+        selected_dict = dict()
+        for row in numpy.flatnonzero(mask):
+            study_id = self.study_ids[self.study_index[row]]
+            if study_id not in selected_dict:
+                selected_dict[study_id] = {"params": self.validation_dict[study_id]["params"], "analyses": dict()}
+            selected_dict[study_id]["analyses"][self.analysis_ids[row]] = self._analysis_dicts[row]
+        return selected_dict
+
+    def filter_analyses_by_status(self, status_str, match_all_formats=False):
+        """Vectorized equivalent of constructor.filter_analyses_by_status(). As there, the comparison status counts as
+        one of the analysis' statuses, so match_all_formats only matches analyses without one.
+
+        :param status_str: Analysis validation status to be searched for.
+        :type status_str: str
+        :param match_all_formats: Whether all file formats must have the indicated status_str or just one.
+        :type match_all_formats: bool
+        :return: Structured dictionary containing analyses statuses and other study information for analyses with
+        indicated validation status.
+        :rtype: dict
+        """
+        if match_all_formats:
+            mask = self.status_mask(status_str, "txt") & self.status_mask(status_str, "json") & (self.comparison == ABSENT)
+        else:
+            mask = self.status_mask(status_str)
+        return self.select(mask)
+
+    def filter_analyses_by_issues(self, issues_str, match_all_formats=False):
+        """Vectorized equivalent of constructor.filter_analyses_by_issues().
+
+        :param issues_str: Analysis validation issues to be searched for. Should only ever be 'value', consistency', or 'format'.
+        :type issues_str: str
+        :param match_all_formats: Whether all file formats must have the indicated issue or just one.
+        :type match_all_formats: bool
+        :return: Structured dictionary containing analyses statuses and other study information for analyses with
+        indicated validation issues.
+        :rtype: dict
+        """
+        if match_all_formats:
+            mask = self.issue_mask(issues_str, "txt") & self.issue_mask(issues_str, "json")
+        else:
+            mask = self.issue_mask(issues_str)
+        return self.select(mask)
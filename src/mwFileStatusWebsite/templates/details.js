@@ -0,0 +1,22 @@
+// Loads the STUDY parameters of a study (studies/<study id>.html, written by the generate command) the first time
+// its header is expanded, so they are not inlined into every page that lists the study.
+(function () {
+    "use strict";
+
+    document.addEventListener("change", function (event) {
+        var checkbox = event.target;
+        if (!checkbox.classList || !checkbox.classList.contains("study_checkbox") || !checkbox.checked) { return; }
+        var grid = checkbox.parentNode.querySelector(".desc__grid[data-details]");
+        if (!grid || grid.dataset.loaded) { return; }
+        grid.dataset.loaded = "true";
+        fetch(grid.dataset.details).then(function (response) {
+            if (!response.ok) { throw new Error(response.statusText); }
+            return response.text();
+        }).then(function (html) {
+            grid.innerHTML = html;
+        }).catch(function () {
+            delete grid.dataset.loaded;
+            grid.textContent = "Unable to load the study details.";
+        });
+    });
+})();
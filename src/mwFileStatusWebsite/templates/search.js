@@ -0,0 +1,140 @@
+// Client-side search over the prebuilt inverted index (search_index.json) written by the generate command.
+// Tokenization and matching mirror mwFileStatusWebsite.search.query_search_index().
+(function () {
+    "use strict";
+
+    var STOP_WORDS = ["a", "an", "and", "as", "at", "by", "for", "from", "in", "of", "on", "or", "the", "to", "with"];
+    var TOKEN_REGEX = /[a-z0-9_]+(?::[a-z0-9_]+)?/g;
+    var MAX_RESULTS = 50;
+    var COLORS = {
+        "Passing": "brightgreen",
+        "Warnings Only": "yellow",
+        "Validation Error": "orange",
+        "Parsing Error": "red",
+        "Missing/Blank": "brightred",
+        "Timed Out": "purple",
+        "Consistent": "brightgreen",
+        "Inconsistent": "orange",
+        "Not Checked": "lightgrey"
+    };
+
+    var index = null;
+    var loading = null;
+    // maps keyed by query terms have no prototype, so terms like "constructor" or "__proto__" are not inherited
+    var decoded = Object.create(null);
+    var sortedTerms = null;
+
+    function tokenize(text) {
+        return (text.toLowerCase().match(TOKEN_REGEX) || []).filter(function (token) {
+            return STOP_WORDS.indexOf(token) === -1;
+        });
+    }
+
+    function loadIndex() {
+        if (!loading) {
+            loading = fetch("search_index.json").then(function (response) {
+                return response.json();
+            }).then(function (data) {
+                index = data;
+                sortedTerms = Object.keys(index.terms).sort();
+                return index;
+            });
+        }
+        return loading;
+    }
+
+    function postings(term) {
+        if (!(term in decoded)) {
+            var gaps = Object.prototype.hasOwnProperty.call(index.terms, term) ? index.terms[term] : [];
+            var result = new Array(gaps.length);
+            var previous = 0;
+            for (var i = 0; i < gaps.length; i++) {
+                previous += gaps[i];
+                result[i] = previous;
+            }
+            decoded[term] = result;
+        }
+        return decoded[term];
+    }
+
+    // binary search for the first term >= prefix, then walk forward while the prefix matches
+    function prefixPostings(prefix) {
+        var low = 0, high = sortedTerms.length;
+        while (low < high) {
+            var middle = (low + high) >>> 1;
+            if (sortedTerms[middle] < prefix) { low = middle + 1; } else { high = middle; }
+        }
+        var matches = Object.create(null);
+        for (var i = low; i < sortedTerms.length && sortedTerms[i].lastIndexOf(prefix, 0) === 0; i++) {
+            postings(sortedTerms[i]).forEach(function (analysisIndex) { matches[analysisIndex] = true; });
+        }
+        return matches;
+    }
+
+    function search(query) {
+        var terms = tokenize(query);
+        if (!terms.length) { return []; }
+        var matches = null;
+        for (var i = 0; i < terms.length; i++) {
+            var termMatches = Object.create(null);
+            if (i === terms.length - 1) {
+                termMatches = prefixPostings(terms[i]);
+            } else {
+                postings(terms[i]).forEach(function (analysisIndex) { termMatches[analysisIndex] = true; });
+            }
+            if (matches === null) {
+                matches = termMatches;
+            } else {
+                for (var key in matches) {
+                    if (!(key in termMatches)) { delete matches[key]; }
+                }
+            }
+        }
+        return Object.keys(matches).map(Number).sort(function (a, b) { return a - b; });
+    }
+
+    function element(tag, className, text) {
+        var node = document.createElement(tag);
+        if (className) { node.className = className; }
+        if (text) { node.textContent = text; }
+        return node;
+    }
+
+    function render(results, container, owner, repo) {
+        container.textContent = "";
+        results.slice(0, MAX_RESULTS).forEach(function (analysisIndex) {
+            var analysis = index.analyses[analysisIndex];
+            var study = index.studies[analysis[1]];
+            var row = element("div", "search__result");
+            row.appendChild(element("span", "search__result__id", study[0] + " / " + analysis[0]));
+            ["txt", "json", "comparison"].forEach(function (fileFormat, position) {
+                var status = analysis[2 + position];
+                if (!status) { return; }
+                var link = element("a", "search__badge " + (COLORS[status] || "lightgrey"), fileFormat + ": " + status);
+                link.href = "https://raw.githubusercontent.com/" + owner + "/" + repo + "/master/validation_logs/" + analysis[0] + "_" + fileFormat + ".log";
+                link.target = "_blank";
+                row.appendChild(link);
+            });
+            row.appendChild(element("span", "search__result__desc", study[1] + " - " + study[2] + " - " + study[3]));
+            container.appendChild(row);
+        });
+        if (results.length > MAX_RESULTS) {
+            container.appendChild(element("div", "search__result", (results.length - MAX_RESULTS) + " more matches, refine the search."));
+        }
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        var input = document.getElementById("search__input");
+        var container = document.getElementById("search__results");
+        if (!input || !container) { return; }
+        input.addEventListener("focus", loadIndex);
+        input.addEventListener("input", function () {
+            var query = input.value;
+            loadIndex().then(function () {
+                if (input.value === query) {
+                    render(search(query), container, input.dataset.owner, input.dataset.repo);
+                }
+            });
+        });
+    });
+})();
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+throttle.py
+~~~~~~~~~~~
+
+This script contains an adaptive limiter for the requests made to the Metabolomics Workbench REST API, replacing the
+fixed validator.SLEEP_TIME pause between requests. It bounds both the number of requests in flight (the concurrency
+limit) and the rate requests are started at, and adapts both with AIMD (additive increase, multiplicative decrease):
+
+    * every successful request increases the concurrency limit by 1 / limit (about one per round of requests) and the
+      rate by RATE_STEP / rate (about RATE_STEP requests/s per second of requests)
+    * a congestion signal, ie. an HTTP 5xx or 429 response, a timeout, a refused or reset connection, or a latency
+      above LATENCY_TOLERANCE times its baseline, multiplies both by BACKOFF
+
+Both are kept between a floor and a ceiling. Only one decrease is made per round of requests, so the requests that were
+in flight when the server started struggling do not drive the limits down to their floors. A limit is only increased
+while it is what holds the requests back (all its slots are in use, or requests wait for the rate), so it does not
+grow without bound while the client itself is the bottleneck (eg. parsing the files).
+
+The latency is the time to first byte, from the start of a request until its response headers arrive (see download()).
+The time to download a file and parse it grows with its size, and the files range from a few KB to tens of MB, so
+neither tells how busy the server is. The latencies are smoothed with an exponentially weighted moving average
+(LATENCY_SMOOTHING) and compared to a baseline that moves slower (BASELINE_SMOOTHING), so one slow response does not
+halve the limits, but a sustained rise does, and the baseline follows a server that is lastingly slower.
+
+fetch_mwtab() also takes separate connect and read timeouts (see download()), which mwtab.read_files() has none of, so a
+server that accepts the connection but never answers fails the request instead of hanging the run.
+"""
+import io
+import socket
+import threading
+import time
+from http.client import HTTPConnection, HTTPSConnection
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import urlopen
+
+import mwtab
+
+
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 8
+MIN_RATE = 0.2
+MAX_RATE = 10.0
+INITIAL_RATE = 1.0
+RATE_STEP = 0.5
+BACKOFF = 0.5
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.2
+BASELINE_SMOOTHING = 0.01
+CONGESTION_STATUS_CODES = (429,)
+REDIRECT_STATUS_CODES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+def is_congestion_error(error):
+    """Method for checking whether a failed request signals an overloaded server.
+
+    :param error: Exception raised by the request.
+    :type error: Exception
+    :return: Whether the error is an HTTP 5xx or 429 response, a timeout, or a refused or reset connection.
+    :rtype: bool
+    """
+    if isinstance(error, HTTPError):
+        return error.code >= 500 or error.code in CONGESTION_STATUS_CODES
+    if isinstance(error, URLError):
+        error = error.reason
+    return isinstance(error, (socket.timeout, TimeoutError, ConnectionError))
+
+
+def parse_limits(limits_str, cast=float):
+    """Method for parsing a "<floor>,<ceiling>" command line option.
+
+    :param limits_str: Comma separated floor and ceiling (eg. "1,8").
+    :type limits_str: str
+    :param cast: Type of the limits.
+    :type cast: type
+    :return: Tuple of the floor and the ceiling.
+    :rtype: tuple
+    """
+    floor, ceiling = (cast(limit) for limit in limits_str.split(","))
+    if not 0 < floor <= ceiling:
+        raise ValueError("Invalid limits {!r}, expected 0 < floor <= ceiling.".format(limits_str))
+    return floor, ceiling
+
+
+class AdaptiveLimiter(object):
+    """Thread-safe AIMD limiter of the concurrency and rate of requests."""
+
+    def __init__(self, min_concurrency=MIN_CONCURRENCY, max_concurrency=MAX_CONCURRENCY, min_rate=MIN_RATE,
+                 max_rate=MAX_RATE, rate=INITIAL_RATE, rate_step=RATE_STEP, backoff=BACKOFF,
+                 latency_tolerance=LATENCY_TOLERANCE, latency_smoothing=LATENCY_SMOOTHING,
+                 baseline_smoothing=BASELINE_SMOOTHING):
+        """AdaptiveLimiter initializer.
+
+        :param min_concurrency: Floor of the number of requests in flight, also the initial limit.
+        :type min_concurrency: int
+        :param max_concurrency: Ceiling of the number of requests in flight.
+        :type max_concurrency: int
+        :param min_rate: Floor of the number of requests started per second.
+        :type min_rate: float
+        :param max_rate: Ceiling of the number of requests started per second.
+        :type max_rate: float
+        :param rate: Initial number of requests started per second.
+        :type rate: float
+        :param rate_step: Additive increase of the rate per second of successful requests.
+        :type rate_step: float
+        :param backoff: Multiplicative decrease of the limits on a congestion signal.
+        :type backoff: float
+        :param latency_tolerance: Multiple of the baseline latency above which the smoothed latency is a congestion signal.
+        :type latency_tolerance: float
+        :param latency_smoothing: Weight of the latest latency in the smoothed latency.
+        :type latency_smoothing: float
+        :param baseline_smoothing: Weight of the latest latency in the baseline latency.
+        :type baseline_smoothing: float
+        """
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate_step = rate_step
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+        self.baseline_smoothing = baseline_smoothing
+        self.limit = float(min_concurrency)
+        self.rate = min(max(float(rate), min_rate), max_rate)
+        self.in_flight = 0
+        self.requests = 0
+        self.congestion_signals = 0
+        self.latency = None
+        self.baseline_latency = None
+        self.last_latency = None
+        self._next_start = 0.0
+        self._last_decrease = float("-inf")
+        self._rate_limited = False
+        self._condition = threading.Condition()
+
+    @property
+    def concurrency(self):
+        """Current number of requests allowed in flight."""
+        return max(1, int(self.limit))
+
+    def acquire(self):
+        """Method for waiting until a request may be started, ie. fewer than the concurrency limit are in flight and
+        1 / rate seconds passed since the last request was started.
+
+        :return: Start time of the request, to be given to release().
+        :rtype: float
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                timeout = None
+                if self.in_flight < self.concurrency:
+                    timeout = self._next_start - now
+                    if timeout <= 0:
+                        self.in_flight += 1
+                        self._next_start = now + 1.0 / self.rate
+                        return now
+                    self._rate_limited = True
+                self._condition.wait(timeout)
+
+    def release(self, started, error=None, latency=None):
+        """Method for recording the end of a request and adapting the limits to it.
+
+        :param started: Start time returned by acquire().
+        :type started: float
+        :param error: Exception raised by the request, None if it succeeded.
+        :type error: Exception
+        :param latency: Seconds from the start of the request to its first byte, the time since started if None.
+        :type latency: float
+        :return: Whether the request was a congestion signal.
+        :rtype: bool
+        """
+        now = time.monotonic()
+        latency = now - started if latency is None else latency
+        with self._condition:
+            saturated = self.in_flight >= self.concurrency
+            self.in_flight -= 1
+            self.requests += 1
+            congested = error is not None and is_congestion_error(error)
+            if error is None:
+                self.last_latency = latency
+                if self.latency is None:
+                    self.latency = self.baseline_latency = latency
+                else:
+                    self.latency += self.latency_smoothing * (latency - self.latency)
+                    self.baseline_latency += self.baseline_smoothing * (latency - self.baseline_latency)
+                congested = self.latency > self.latency_tolerance * self.baseline_latency
+
+            if congested:
+                self.congestion_signals += 1
+                # requests started before the last decrease saw the old limits
+                if started > self._last_decrease:
+                    self.limit = max(float(self.min_concurrency), self.limit * self.backoff)
+                    self.rate = max(self.min_rate, self.rate * self.backoff)
+                    self._last_decrease = now
+            elif error is None:
+                if saturated:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                if self._rate_limited:
+                    self.rate = min(self.max_rate, self.rate + self.rate_step / self.rate)
+                    self._rate_limited = False
+            self._condition.notify_all()
+        return congested
+
+    def snapshot(self):
+        """Method for collecting the current limits.
+
+        :return: Dictionary of the concurrency limit, the rate, the requests in flight, and the number of requests and
+        congestion signals so far.
+        :rtype: dict
+        """
+        with self._condition:
+            return {"concurrency": round(self.limit, 2), "rate": round(self.rate, 3), "in_flight": self.in_flight,
+                    "requests": self.requests, "congestion_signals": self.congestion_signals}
+
+
+def download(url, timeouts=None, on_response=None):
+    """Method for downloading a file, with separate timeouts for connecting and for reading the response.
+
+    The read timeout bounds every wait for data from the server (not the whole download), so a slow but steady response
+    is not cut off while a stalled one is.
+
+    :param url: URL of the file.
+    :type url: str
+    :param timeouts: Tuple of the connect and read timeouts in seconds, urlopen() without a timeout is used if None.
+    :type timeouts: tuple
+    :param on_response: Function called without arguments when the response headers arrived, before the body is read.
+    :type on_response: callable
+    :return: Content of the file.
+    :rtype: bytes
+    """
+    if timeouts is None:
+        with urlopen(url) as response:
+            if on_response is not None:
+                on_response()
+            return response.read()
+
+    connect_timeout, read_timeout = timeouts
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        connection_class = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        connection = connection_class(parts.hostname, parts.port, timeout=connect_timeout)
+        try:
+            connection.connect()
+            connection.sock.settimeout(read_timeout)
+            connection.request("GET", (parts.path or "/") + ("?" + parts.query if parts.query else ""))
+            response = connection.getresponse()
+            if response.status in REDIRECT_STATUS_CODES and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            if response.status >= 400:
+                raise HTTPError(url, response.status, response.reason, response.headers, None)
+            if on_response is not None:
+                on_response()
+            return response.read()
+        finally:
+            connection.close()
+    raise HTTPError(url, response.status, "Too many redirects", response.headers, None)
+
+
+def fetch_mwtab(url, limiter=None, progress=None, timeouts=None):
+    """Method for fetching and parsing an mwTab file, through an adaptive limiter and with connect and read timeouts.
+
+    :param url: URL of the mwTab file (txt or json).
+    :type url: str
+    :param limiter: Limiter the request waits for and reports to, the request is not limited if None.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :param progress: Progress reporter the fetch is recorded in.
+    :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+    :param timeouts: Tuple of the connect and read timeouts in seconds, None for no timeouts.
+    :type timeouts: tuple
+    :return: The parsed mwTab file.
+    :rtype: :py:class:`~mwtab.mwtab.MWTabFile`
+    """
+    started = limiter.acquire() if limiter is not None else None
+    first_byte = []
+    if progress is not None:
+        progress.fetch_started()
+    try:
+        content = download(url, timeouts, on_response=lambda: first_byte.append(time.monotonic()))
+    except Exception as e:
+        if limiter is not None:
+            limiter.release(started, e)
+        raise
+    else:
+        if limiter is not None:
+            limiter.release(started, latency=first_byte[0] - started if first_byte else None)
+    finally:
+        if progress is not None:
+            progress.fetch_finished()
+
+    # the same reader mwtab.read_files() uses
+    mwtabfile = mwtab.mwtab.MWTabFile(url, duplicate_keys=True)
+    mwtabfile.read(io.BytesIO(content))
+    return mwtabfile
@@ -8,17 +8,30 @@ This script contains methods for validating all available mwTab data files, crea
 file containing the validation metadata.
 """
 import mwFileStatusWebsite.compare
+import mwFileStatusWebsite.snapshot
+import mwFileStatusWebsite.throttle
+import mwFileStatusWebsite.writer
 import mwtab
+import collections
 import json
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
-from os.path import join
+from os.path import join, isfile
 from time import sleep
 
 
 MW_REST_URL = "https://www.metabolomicsworkbench.org/rest/study/analysis_id/{}/mwtab/{}"
 SLEEP_TIME = 1
 NUM_TRIES = 3
+ID_RANGE_REGEX = re.compile(r"^([A-Za-z]+)(\d+)-(?:\1)?(\d+)$")
+STATUS_REGEX = re.compile(r'Status.*')
+NUM_ISSUES_REGEX = re.compile(r'Number of Issues: (\d+)')
+NUM_WARNINGS_REGEX = re.compile(r'Number of Warnings: (\d+)')
+ISSUE_TYPES = ('value', 'consistency', 'format')
+# mwTab files of a mirror directory, eg. saved by validate --to-path as AN000001.txt and AN000001.json
+MIRROR_FILE_REGEX = re.compile(r"(AN\d{6}).*\.(txt|json)$")
 
 
 def retrieve_mwtab_files(verbose=False):
@@ -97,7 +110,146 @@ def create_validation_dict(study_analysis_dict):
     return validation_dict
 
 
-def _validate(validation_dict, study_id, analysis_id, file_format, save_path=None):
+def parse_id_list(id_str):
+    """Method for expanding a comma separated list of study or analysis IDs and ID ranges.
+
+    Example:
+    "ST000001,ST000100-ST000103" -> ['ST000001', 'ST000100', 'ST000101', 'ST000102', 'ST000103']
+
+    :param id_str: Comma separated IDs and inclusive ID ranges (eg. "ST000100-ST000150" or "ST000100-150").
+    :type id_str: str
+    :return: List of IDs, in the given order and without duplicates.
+    :rtype: list
+    """
+    id_list = []
+    for item in id_str.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        match = ID_RANGE_REGEX.match(item)
+        if match:
+            prefix, start, end = match.group(1), int(match.group(2)), int(match.group(3))
+            if end < start:
+                raise ValueError("Invalid ID range: {}".format(item))
+            id_list.extend("{}{:0{}d}".format(prefix, number, len(match.group(2))) for number in range(start, end + 1))
+        else:
+            id_list.append(item)
+    return list(dict.fromkeys(id_list))
+
+
+def select_analyses(study_analysis_dict, study_ids=None, analysis_ids=None, status_dict=None, statuses=None):
+    """Method for selecting a subset of the available analyses. Every given criterion must match.
+
+    :param study_analysis_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis IDs
+    (value).
+    :type study_analysis_dict: dict
+    :param study_ids: Only select analyses of these studies.
+    :type study_ids: list
+    :param analysis_ids: Only select these analyses.
+    :type analysis_ids: list
+    :param status_dict: Structured dictionary containing the analyses statuses of a previous run.
+    :type status_dict: dict
+    :param statuses: Only select analyses whose txt, json, or comparison status in status_dict is one of these.
+    :type statuses: list
+    :return: Dictionary of the selected study IDs (keys) and lists of their selected analysis IDs (values).
+    :rtype: dict
+    """
+    study_ids = set(study_ids) if study_ids else None
+    analysis_ids = set(analysis_ids) if analysis_ids else None
+    statuses = set(statuses) if statuses else None
+
+    selected_dict = dict()
+    for study_id in study_analysis_dict:
+        if study_ids is not None and study_id not in study_ids:
+            continue
+        for analysis_id in study_analysis_dict[study_id]:
+            if analysis_ids is not None and analysis_id not in analysis_ids:
+                continue
+            if statuses is not None:
+                analysis_dict = (status_dict or {}).get(study_id, {}).get("analyses", {}).get(analysis_id)
+                if not analysis_dict or not statuses.intersection(analysis_dict["status"].values()):
+                    continue
+            selected_dict.setdefault(study_id, []).append(analysis_id)
+    return selected_dict
+
+
+def merge_validation_dict(validation_dict, subset_dict):
+    """Method for merging the results of a subset of analyses into a validation dictionary. Analyses that are not in
+    subset_dict are left untouched.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information. Updated in
+    place.
+    :type validation_dict: dict
+    :param subset_dict: Structured dictionary containing the statuses of the re-validated analyses.
+    :type subset_dict: dict
+    :return: The updated validation_dict.
+    :rtype: dict
+    """
+    new_studies = False
+    for study_id in subset_dict:
+        if study_id not in validation_dict:
+            validation_dict[study_id] = {"params": {}, "analyses": {}}
+            new_studies = True
+        study_dict = validation_dict[study_id]
+        if subset_dict[study_id]["params"]:
+            study_dict["params"] = subset_dict[study_id]["params"]
+        new_analyses = not set(subset_dict[study_id]["analyses"]).issubset(study_dict["analyses"])
+        study_dict["analyses"].update(subset_dict[study_id]["analyses"])
+        if new_analyses:
+            study_dict["analyses"] = dict(sorted(study_dict["analyses"].items()))
+
+    # keep the sorted order create_validation_dict() produces
+    if new_studies:
+        study_items = sorted(validation_dict.items())
+        validation_dict.clear()
+        validation_dict.update(study_items)
+    return validation_dict
+
+
+def parse_status(validation_log):
+    """Method for parsing the validation status from a validation log written by mwtab.validate_file().
+
+    :param validation_log: Validation log.
+    :type validation_log: str
+    :return: The status (eg. "Passing"), None if the log's status is not recognized.
+    :rtype: str
+    """
+    # parse validation status (e.g. "Passing") from validation log
+    status_str = STATUS_REGEX.search(validation_log).group(0).split(': ')[1]
+    if status_str == 'Passing':
+        return "Passing"
+    elif NUM_ISSUES_REGEX.search(validation_log).group(1) == NUM_WARNINGS_REGEX.search(validation_log).group(1):
+        return "Warnings Only"
+    elif status_str == 'Contains Validation Issues':
+        return "Validation Error"
+    return None
+
+
+def parse_validation_status(validation_log, validation_json):
+    """Method for parsing the validation status and the types of the errors found from the output of
+    mwtab.validate_file().
+
+    :param validation_log: Validation log.
+    :type validation_log: str
+    :param validation_json: List of issue dictionaries (with "message" and "tags" keys).
+    :type validation_json: list
+    :return: Tuple of the status (see parse_status()) and the dictionary of issue types (keys) and whether an error of
+    that type was found (values).
+    :rtype: tuple
+    """
+    status = parse_status(validation_log)
+
+    issues = dict.fromkeys(ISSUE_TYPES, False)
+    for issue in validation_json:
+        if issue['message'].startswith('Error'):
+            for issue_type in ISSUE_TYPES:
+                if issue_type in issue['tags']:
+                    issues[issue_type] = True
+    return status, issues
+
+
+def _validate(validation_dict, study_id, analysis_id, file_format, save_path=None, progress=None, source=None,
+              limiter=None, timeouts=None, writer=None):
     """Helper function for performing validation of a specified mwTab data file given the files; study ID, analysis ID,
     and file format (.txt or .json).
 
@@ -111,38 +263,49 @@ def _validate(validation_dict, study_id, analysis_id, file_format, save_path=Non
     :type file_format: str
     :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
     :type save_path: str
+    :param progress: Progress reporter the fetch is recorded in.
+    :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+    :param source: File path (eg. of a local mirror) to read the file from instead of the Metabolomics Workbench REST API.
+    :type source: str
+    :param limiter: Adaptive limiter pacing the requests to the REST API instead of the fixed SLEEP_TIME.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :param timeouts: Tuple of the connect and read timeouts in seconds of the request to the REST API.
+    :type timeouts: tuple
+    :param writer: Background writer the retrieved file is saved through, instead of writing it right away.
+    :type writer: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
 
     :return: Tuple containing of the validated mwtab file object and the string validation log.
     :rtype: tuple
     """
-    mwtabfile = next(mwtab.read_files(MW_REST_URL.format(analysis_id, file_format)))
+    if (limiter is not None or timeouts is not None) and not source:
+        mwtabfile = mwFileStatusWebsite.throttle.fetch_mwtab(MW_REST_URL.format(analysis_id, file_format), limiter,
+                                                             progress=progress, timeouts=timeouts)
+    else:
+        if progress is not None:
+            progress.fetch_started()
+        try:
+            mwtabfile = next(mwtab.read_files(source or MW_REST_URL.format(analysis_id, file_format)))
+        finally:
+            if progress is not None:
+                progress.fetch_finished()
 
     # allows saving out the retrieved non-validated mwTab analysis files.
     if save_path:
-        with open(join(save_path, analysis_id + '.' + file_format), 'w', encoding='utf-8') as fh:
-            mwtabfile.write(fh, 'mwtab' if file_format == 'txt' else 'json')
+        write_file = writer.write if writer is not None else mwFileStatusWebsite.writer.write_file
+        write_file(join(save_path, analysis_id + '.' + file_format), mwFileStatusWebsite.writer.render(mwtabfile, file_format))
 
-    sleep(SLEEP_TIME)
+    # throttle requests to the REST API
+    if not source and limiter is None:
+        sleep(SLEEP_TIME)
 
     validation_log, validation_json = mwtab.validate_file(mwtabfile)
 
-    # parse validation status (e.g. "Passing") from validation log
-    status_str = re.search(r'Status.*', validation_log).group(0).split(': ')[1]
-    if status_str == 'Passing':
-        validation_dict[study_id]["analyses"][analysis_id]["status"][file_format] = "Passing"
-    elif re.search(r'Number of Issues: (\d+)', validation_log).group(1) == re.search(r'Number of Warnings: (\d+)', validation_log).group(1):
-        validation_dict[study_id]["analyses"][analysis_id]["status"][file_format] = "Warnings Only"
-    elif status_str == 'Contains Validation Issues':
-        validation_dict[study_id]["analyses"][analysis_id]["status"][file_format] = "Validation Error"
-    
-    for issue in validation_json:
-        if issue['message'].startswith('Error'):
-            if 'value' in issue['tags']:
-                validation_dict[study_id]["analyses"][analysis_id]["issues"][file_format]['value'] = True
-            if 'consistency' in issue['tags']:
-                validation_dict[study_id]["analyses"][analysis_id]["issues"][file_format]['consistency'] = True
-            if 'format' in issue['tags']:
-                validation_dict[study_id]["analyses"][analysis_id]["issues"][file_format]['format'] = True
+    status, issues = parse_validation_status(validation_log, validation_json)
+    if status:
+        validation_dict[study_id]["analyses"][analysis_id]["status"][file_format] = status
+    for issue_type in ISSUE_TYPES:
+        if issues[issue_type]:
+            validation_dict[study_id]["analyses"][analysis_id]["issues"][file_format][issue_type] = True
 
     # parse out STUDY block parameters
     if not validation_dict[study_id]["params"]:
@@ -151,7 +314,8 @@ def _validate(validation_dict, study_id, analysis_id, file_format, save_path=Non
     return mwtabfile, validation_log
 
 
-def validate(validation_dict, study_id, analysis_id, file_format, save_path=None):
+def validate(validation_dict, study_id, analysis_id, file_format, save_path=None, progress=None, limiter=None,
+             timeouts=None, source=None, writer=None):
     """Method for validating a given Metabolomics Workbench mwTab file.
 
     Creates a validation log and adds validation status to the given validation_dict dictionary. Fetches files using the
@@ -168,6 +332,17 @@ def validate(validation_dict, study_id, analysis_id, file_format, save_path=None
     :type file_format: str
     :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
     :type save_path: str
+    :param progress: Progress reporter fetches and retries are recorded in.
+    :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+    :param limiter: Adaptive limiter the requests (and their retries) go through.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :param timeouts: Tuple of the connect and read timeouts in seconds of every request.
+    :type timeouts: tuple
+    :param source: File path (eg. of a local mirror) to read the file from instead of the Metabolomics Workbench REST API.
+    A local file is not retried.
+    :type source: str
+    :param writer: Background writer the retrieved file is saved through, instead of writing it right away.
+    :type writer: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
 
     :return: Tuple containing of the validated mwtab file object and the string validation log.
     :rtype: tuple
@@ -175,16 +350,21 @@ def validate(validation_dict, study_id, analysis_id, file_format, save_path=None
     error = False
 
     try:
-        validated_mwtabfile, validation_log = _validate(validation_dict, study_id, analysis_id, file_format, save_path)
+        validated_mwtabfile, validation_log = _validate(validation_dict, study_id, analysis_id, file_format, save_path,
+                                                        progress=progress, source=source, limiter=limiter,
+                                                        timeouts=timeouts, writer=writer)
 
     except Exception as e:
         # error is one of; 1) temporary server error, 2) source is blank, or 3) source cannot be parsed
 
         # check to see if temporary server error
         error = True
-        for x in range(NUM_TRIES):  # try three times to see if there is a temporary server error
+        for x in range(NUM_TRIES if not source else 0):  # try three times to see if there is a temporary server error
+            if progress is not None:
+                progress.retried()
             try:
-                validated_mwtabfile, validation_log = _validate(validation_dict, study_id, analysis_id, file_format)
+                validated_mwtabfile, validation_log = _validate(validation_dict, study_id, analysis_id, file_format,
+                                                                progress=progress, limiter=limiter, timeouts=timeouts)
                 error = False
                 break
             except Exception:
@@ -218,8 +398,125 @@ def validate(validation_dict, study_id, analysis_id, file_format, save_path=None
         return {}, validation_log
 
 
+def validate_analysis(validation_dict, study_id, analysis_id, logs_path, save_path=None, progress=None, limiter=None,
+                      timeouts=None, sources=None, writer=None):
+    """Method for validating both file formats of a single analysis, comparing them, and saving the validation logs.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param study_id: Metabolomics Workbench study ID string (eg. ST000001).
+    :type study_id: str
+    :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+    :type analysis_id: str
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
+    :type save_path: str
+    :param progress: Progress reporter the analysis is recorded in.
+    :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+    :param limiter: Adaptive limiter the requests go through.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :param timeouts: Tuple of the connect and read timeouts in seconds of every request.
+    :type timeouts: tuple
+    :param sources: Dictionary of file formats (keys) and the file paths (values, eg. of a local mirror) to read them from
+    instead of the Metabolomics Workbench REST API.
+    :type sources: dict
+    :param writer: Background writer the validation logs (and retrieved files) are saved through, instead of writing
+    them right away.
+    :type writer: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
+    :return: None
+    """
+    sources = sources or {}
+    write_file = writer.write if writer is not None else mwFileStatusWebsite.writer.write_file
+
+    # retrieve file in both its 'txt' and 'json' formats
+    txt_mwtab_file, txt_validation_log = validate(validation_dict, study_id, analysis_id, 'txt', save_path=save_path,
+                                                  progress=progress, limiter=limiter, timeouts=timeouts,
+                                                  source=sources.get('txt'), writer=writer)
+    json_mwtab_file, json_validation_log = validate(validation_dict, study_id, analysis_id, 'json', save_path=save_path,
+                                                    progress=progress, limiter=limiter, timeouts=timeouts,
+                                                    source=sources.get('json'), writer=writer)
+
+    # if both formats are available and parsable, compare the two files
+    validation_dict[study_id]["analyses"][analysis_id]["status"]['comparison'] = 'Not Checked'
+    if txt_mwtab_file and json_mwtab_file:  # both files passed validation and can be compared
+        comparison_list = mwFileStatusWebsite.compare.compare(txt_mwtab_file, json_mwtab_file)
+
+        if comparison_list:
+            comparison_status = 'Inconsistent'
+            error_str = '\n'.join([str(error) for error in comparison_list])
+        else:
+            comparison_status = 'Consistent'
+            error_str = ''
+
+        validation_dict[study_id]["analyses"][analysis_id]["status"]['comparison'] = comparison_status
+        comparison_log = mwFileStatusWebsite.compare.COMPARISON_LOG.format(
+            str(datetime.now()),
+            mwtab.__version__,
+            MW_REST_URL.format(analysis_id, '...'),
+            study_id,
+            analysis_id,
+            comparison_status
+        ) + error_str
+
+        write_file(join(logs_path, '{}_comparison.log').format(analysis_id), comparison_log)
+
+    # save out each files validation log
+    write_file(join(logs_path, '{}_{}.log'.format(analysis_id, 'txt')), txt_validation_log)
+    write_file(join(logs_path, '{}_{}.log'.format(analysis_id, 'json')), json_validation_log)
+
+    if progress is not None:
+        progress.analysis_done(validation_dict[study_id]["analyses"][analysis_id]["status"])
+
+
+def validate_concurrently(validation_dict, analyses, logs_path, limiter, save_path=None, progress=None, verbose=False,
+                          timeouts=None, writer=None):
+    """Method for validating analyses concurrently, with as many analyses in progress as the limiter's current
+    concurrency limit allows.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param analyses: Iterable of (study ID, analysis ID) tuples. The next analysis is only taken when a slot is free.
+    :type analyses: iterable
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param limiter: Adaptive limiter the requests go through.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
+    :type save_path: str
+    :param progress: Progress reporter the analyses are recorded in.
+    :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :param timeouts: Tuple of the connect and read timeouts in seconds of every request.
+    :type timeouts: tuple
+    :param writer: Background writer the validation logs are saved through.
+    :type writer: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
+    :return: None
+    """
+    # every analysis has its own entry in validation_dict, so the threads do not write to the same keys
+    futures = set()
+    with ThreadPoolExecutor(max_workers=limiter.max_concurrency) as executor:
+        for study_id, analysis_id in analyses:
+            while len(futures) >= limiter.concurrency:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+
+            if verbose:
+                print("Validating analysis:", study_id, analysis_id)
+
+            futures.add(executor.submit(validate_analysis, validation_dict, study_id, analysis_id, logs_path,
+                                        save_path=save_path, progress=progress, limiter=limiter, timeouts=timeouts,
+                                        writer=writer))
+
+        for future in wait(futures).done:
+            future.result()
+
+
 def validate_mwtab_rest(input_dict=None, logs_path='validation_logs', output_file="tmp.json",
-                        verbose=False, save_path=None):
+                        verbose=False, save_path=None, merge=False, progress=None, schedule=None, limiter=None,
+                        timeouts=None, watchdog=None, writer=None):
     """Method for validating all available Metabolomics Workbench mwTab formatted data files.
 
     :param input_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis IDs (value).
@@ -233,9 +530,33 @@ def validate_mwtab_rest(input_dict=None, logs_path='validation_logs', output_fil
     :type verbose: bool
     :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
     :type save_path: str
+    :param merge: Merge the results into the existing output_file instead of replacing it.
+    :type merge: bool
+    :param progress: Progress reporter, started with the number of analyses to validate and fed by the validation loop.
+    :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+    :param schedule: Priority order and time budget of the run. Analyses are validated in study ID order if None.
+    :type schedule: :py:class:`~mwFileStatusWebsite.schedule.Schedule`
+    :param limiter: Adaptive limiter of the requests to the REST API. Analyses are validated concurrently, up to the
+    limiter's concurrency limit, if given, and one at a time otherwise.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :param timeouts: Tuple of the connect and read timeouts in seconds of every request to the REST API.
+    :type timeouts: tuple
+    :param watchdog: Watchdog validating the analyses in worker processes it kills when an analysis exceeds its
+    deadline, and recycles to bound their memory. The analyses that exceeded the deadline are retried at the end of the
+    run. Cannot be combined with a limiter.
+    :type watchdog: :py:class:`~mwFileStatusWebsite.workers.Watchdog`
+    :param writer: Background writer the validation logs (and retrieved files) are saved through, instead of writing
+    them in the validation loop. Every queued file is on disk before output_file is saved. Cannot be combined with a
+    watchdog, whose workers write their own logs.
+    :type writer: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
     :return: Structured dictionary containing analyses statuses and other study information.
     :rtype: dict
     """
+    if watchdog is not None and limiter is not None:
+        raise ValueError("A watchdog cannot be combined with an adaptive limiter.")
+    if watchdog is not None and writer is not None:
+        raise ValueError("A watchdog cannot be combined with a background writer.")
+
     if verbose:
         print("Running mwTab file validation.")
         print("\tmwtab version:", mwtab.__version__)
@@ -248,55 +569,117 @@ def validate_mwtab_rest(input_dict=None, logs_path='validation_logs', output_fil
 
     # create the validation dict
     validation_dict = create_validation_dict(study_analysis_dict)
+    if progress is not None:
+        progress.start(sum(len(analysis_ids) for analysis_ids in study_analysis_dict.values()))
 
-    for study_id in sorted(study_analysis_dict.keys()):
+    if schedule is None and limiter is None and watchdog is None:
+        for study_id in sorted(study_analysis_dict.keys()):
 
-        if verbose:
-            print("Validating study:", study_id)
+            if verbose:
+                print("Validating study:", study_id)
 
-        for analysis_id in study_analysis_dict[study_id]:
+            for analysis_id in study_analysis_dict[study_id]:
 
-            if verbose:
-                print("\t", analysis_id)
-
-            # retrieve file in both its 'txt' and 'json' formats
-            txt_mwtab_file, txt_validation_log = validate(validation_dict, study_id, analysis_id, 'txt', save_path=save_path)
-            json_mwtab_file, json_validation_log = validate(validation_dict, study_id, analysis_id, 'json', save_path=save_path)
-
-            # if both formats are available and parsable, compare the two files
-            validation_dict[study_id]["analyses"][analysis_id]["status"]['comparison'] = 'Not Checked'
-            if txt_mwtab_file and json_mwtab_file:  # both files passed validation and can be compared
-                comparison_list = mwFileStatusWebsite.compare.compare(txt_mwtab_file, json_mwtab_file)
-
-                if comparison_list:
-                    comparison_status = 'Inconsistent'
-                    error_str = '\n'.join([str(error) for error in comparison_list])
-                else:
-                    comparison_status = 'Consistent'
-                    error_str = ''
-
-                validation_dict[study_id]["analyses"][analysis_id]["status"]['comparison'] = comparison_status
-                comparison_log = mwFileStatusWebsite.compare.COMPARISON_LOG.format(
-                    str(datetime.now()),
-                    mwtab.__version__,
-                    MW_REST_URL.format(analysis_id, '...'),
-                    study_id,
-                    analysis_id,
-                    comparison_status
-                ) + error_str
-
-                with open(join(logs_path, '{}_comparison.log').format(analysis_id), 'w', encoding='utf-8') as fh:
-                    fh.write(comparison_log)
-
-            # save out each files validation log
-            with open(join(logs_path, '{}_{}.log'.format(analysis_id, 'txt')), 'w', encoding='utf-8') as fh:
-                fh.write(txt_validation_log)
-            with open(join(logs_path, '{}_{}.log'.format(analysis_id, 'json')), 'w', encoding='utf-8') as fh:
-                fh.write(json_validation_log)
+                if verbose:
+                    print("\t", analysis_id)
+
+                validate_analysis(validation_dict, study_id, analysis_id, logs_path, save_path=save_path, progress=progress,
+                                  timeouts=timeouts, writer=writer)
+
+    else:
+        if schedule is not None:
+            # validate in priority order until the time budget is spent, the rest keeps its previous results
+            analyses = schedule.run(study_analysis_dict)
+        else:
+            analyses = ((study_id, analysis_id) for study_id in sorted(study_analysis_dict.keys())
+                        for analysis_id in study_analysis_dict[study_id])
+
+        if limiter is not None:
+            validate_concurrently(validation_dict, analyses, logs_path, limiter, save_path=save_path, progress=progress,
+                                  verbose=verbose, timeouts=timeouts, writer=writer)
+        elif watchdog is not None:
+            watchdog.run(validation_dict, analyses, logs_path, save_path=save_path, progress=progress, verbose=verbose,
+                         timeouts=timeouts)
+        else:
+            for study_id, analysis_id in analyses:
+
+                if verbose:
+                    print("Validating analysis:", study_id, analysis_id)
+
+                validate_analysis(validation_dict, study_id, analysis_id, logs_path, save_path=save_path,
+                                  progress=progress, timeouts=timeouts, writer=writer)
+
+        if watchdog is not None:
+            # the analyses that exceeded their deadline get a second chance, one at a time in a fresh worker
+            watchdog.run_quarantine(validation_dict, progress=progress, verbose=verbose, schedule=schedule)
+
+        if schedule is not None:
+            schedule.carry_over(validation_dict)
+
+    # the results are only saved once the logs they refer to are on disk
+    if writer is not None:
+        writer.checkpoint()
+
+    # merge the validated subset into the previous results
+    if merge and isfile(output_file):
+        with open(output_file, "r") as fh:
+            validation_dict = merge_validation_dict(json.loads(fh.read()), validation_dict)
 
     # export validation status dictionary
-    with open(output_file, "w") as fh:
-        fh.write(json.dumps(validation_dict, indent=4))
+    save_validation_dict(validation_dict, output_file, writer=writer)
 
     return validation_dict
 
+
+def load_validation_json(output_file):
+    """Method for loading a previously saved validation dictionary.
+
+    :param output_file: File path the structured dictionary was saved to.
+    :type output_file: str
+    :return: Structured dictionary containing analyses statuses and other study information, empty if it was never saved.
+    :rtype: dict
+    """
+    if not isfile(output_file):
+        return {}
+    with open(output_file, "r") as fh:
+        return json.loads(fh.read())
+
+
+def find_mirror_files(mirror_path):
+    """Method for finding the mwTab files of a mirror directory. Files are matched on the analysis ID in their name and
+    their extension (eg. AN000001.txt, AN000001.json).
+
+    :param mirror_path: Directory path of the mirror.
+    :type mirror_path: str
+    :return: Dictionary of analysis IDs (keys) and dictionaries of file formats and file paths (values).
+    :rtype: dict
+    """
+    mirror_files = collections.defaultdict(dict)
+    for filename in sorted(os.listdir(mirror_path)):
+        match = MIRROR_FILE_REGEX.search(filename)
+        if match:
+            mirror_files[match.group(1)][match.group(2)] = os.path.join(mirror_path, filename)
+    return dict(mirror_files)
+
+
+def save_validation_dict(validation_dict, output_file, writer=None):
+    """Method for saving a validation dictionary as JSON, and as the binary snapshot next to it (see snapshot.py) once
+    the JSON file is written.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :param output_file: File path for the structured dictionary to be saved to.
+    :type output_file: str
+    :param writer: Background writer the file is saved through and fsynced by, instead of writing it right away.
+    :type writer: :py:class:`~mwFileStatusWebsite.writer.BackgroundWriter`
+    :return: None
+    """
+    if writer is not None:
+        writer.write(output_file, json.dumps(validation_dict, indent=4))
+        writer.checkpoint()
+    else:
+        with open(output_file, "w") as fh:
+            fh.write(json.dumps(validation_dict, indent=4))
+    mwFileStatusWebsite.snapshot.save_snapshot(
+        validation_dict, mwFileStatusWebsite.snapshot.snapshot_path(output_file), json_path=output_file)
+
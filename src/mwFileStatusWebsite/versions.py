@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+versions.py
+~~~~~~~~~~~
+
+This script contains methods for validating the analyses under several versions of the ``mwtab`` package from a single
+download, to see how an upgrade would change their statuses before making it.
+
+Every version is validated in its own Python process, run by the interpreter of an environment that has that version
+installed (the current interpreter for its own version, otherwise eg. mwtab_envs/mwtab-<version>/bin/python, or one
+given explicitly as <version>=<interpreter>). The validating process downloads every file once into a mirror directory
+and hands each analysis to all version processes as soon as both its files are in, so the versions parse and validate
+in parallel with each other and with the downloads. This package is put on the PYTHONPATH of the version processes, so
+their environments only need mwtab (and its dependencies).
+
+Each version gets its own validation JSON (tmp_mwtab-<version>.json) and logs directory (mwtab-<version>/ in the logs
+path). The first version is the baseline the others are compared to in the transition report, which counts the status
+transitions of every file format and lists the analyses whose statuses changed.
+
+Analyses whose files could not be downloaded are left out of every version, as that is not a difference between them.
+"""
+import collections
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from os.path import join
+
+import mwtab
+
+from . import history, throttle, validator
+
+
+MWTAB_ENVS_PATH = "mwtab_envs"
+VERSION_LABEL_REGEX = re.compile(r"^[\w.+-]+$")
+RESULTS_FILENAME = "tmp_mwtab-{}.json"
+LOGS_DIRNAME = "mwtab-{}"
+REPORT_FILENAME = "mwtab_versions.json"
+FILE_FORMATS = ("txt", "json")
+STATUS_KEYS = ("txt", "json", "comparison")
+
+
+def environment_python(envs_path, version):
+    """Method for finding the interpreter of the environment of an mwtab version.
+
+    :param envs_path: Directory path of the environments, named mwtab-<version>.
+    :type envs_path: str
+    :param version: mwtab version.
+    :type version: str
+    :return: File path of the interpreter.
+    :rtype: str
+    """
+    if os.name == "nt":
+        return join(envs_path, "mwtab-" + version, "Scripts", "python.exe")
+    return join(envs_path, "mwtab-" + version, "bin", "python")
+
+
+def installed_version(python):
+    """Method for asking an interpreter which mwtab version it has installed.
+
+    :param python: File path of the interpreter.
+    :type python: str
+    :return: mwtab version.
+    :rtype: str
+    """
+    completed = subprocess.run([python, "-c", "import mwtab; print(mwtab.__version__)"], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, universal_newlines=True)
+    if completed.returncode:
+        raise ValueError("Cannot import mwtab with {}: {}".format(python, (completed.stderr.strip().splitlines() or [""])[-1]))
+    return completed.stdout.strip()
+
+
+def resolve_versions(versions_str, envs_path=MWTAB_ENVS_PATH):
+    """Method for parsing a --mwtab-versions option into the interpreters validating every version.
+
+    :param versions_str: Comma separated mwtab versions (eg. "2.1.1,2.2.0"), each optionally followed by "=" and the
+    interpreter to run it with.
+    :type versions_str: str
+    :param envs_path: Directory path of the environments of the versions given without an interpreter.
+    :type envs_path: str
+    :return: Ordered dictionary of versions (keys) and interpreter file paths (values).
+    :rtype: dict
+    """
+    interpreters = collections.OrderedDict()
+    for entry in versions_str.split(","):
+        version, _, python = (part.strip() for part in entry.partition("="))
+        if not VERSION_LABEL_REGEX.match(version):
+            raise ValueError("Invalid mwtab version {!r}.".format(version))
+        if version in interpreters:
+            raise ValueError("mwtab version {} is given twice.".format(version))
+
+        if python:
+            installed_version(python)
+        elif version == mwtab.__version__:
+            python = sys.executable
+        else:
+            python = environment_python(envs_path, version)
+            if not os.path.isfile(python):
+                raise ValueError("No environment with mwtab {0} found at {1}. Create it with: python -m venv {2} && "
+                                 "{2}/bin/pip install mwtab=={0}".format(version, python, join(envs_path, "mwtab-" + version)))
+            if installed_version(python) != version:
+                raise ValueError("The environment at {} does not have mwtab {} installed.".format(python, version))
+        interpreters[version] = python
+
+    if len(interpreters) < 2:
+        raise ValueError("At least two mwtab versions are needed to compare.")
+    return interpreters
+
+
+def fetch_analysis(analysis_id, mirror_path, timeouts=None):
+    """Method for downloading both files of an analysis into the mirror directory, retrying each like validate() does.
+
+    :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+    :type analysis_id: str
+    :param mirror_path: Directory path the files are saved to, as <analysis ID>.<file format>.
+    :type mirror_path: str
+    :param timeouts: Tuple of the connect and read timeouts in seconds of every request.
+    :type timeouts: tuple
+    :return: Dictionary of the file formats that could not be downloaded (keys) and their errors (values).
+    :rtype: dict
+    """
+    errors = {}
+    for file_format in FILE_FORMATS:
+        for _ in range(validator.NUM_TRIES + 1):
+            try:
+                content = throttle.download(validator.MW_REST_URL.format(analysis_id, file_format), timeouts)
+                break
+            except Exception as e:
+                error = e
+        else:
+            errors[file_format] = "{}: {}".format(type(error).__name__, error)
+            continue
+
+        with open(join(mirror_path, "{}.{}".format(analysis_id, file_format)), "wb") as fh:
+            fh.write(content)
+
+        # throttle requests to the REST API
+        validator.sleep(validator.SLEEP_TIME)
+    return errors
+
+
+def work(mirror_path, logs_path, output_file):
+    """Method run by a version process: validates the analyses whose "<study ID>\\t<analysis ID>" lines arrive on stdin
+    from the files in the mirror directory, and saves their validation JSON once stdin is closed.
+
+    :param mirror_path: Directory path of the downloaded files.
+    :type mirror_path: str
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param output_file: File path for the structured dictionary to be saved to.
+    :type output_file: str
+    :return: None
+    """
+    os.makedirs(logs_path, exist_ok=True)
+    validation_dict = {}
+    # the analyses arrive in the order of create_validation_dict(), so they are appended
+    for line in sys.stdin:
+        study_id, analysis_id = line.rstrip("\n").split("\t")
+        study_dict = validation_dict.setdefault(study_id, {"params": {}, "analyses": {}})
+        study_dict["analyses"].update(validator.create_validation_dict({study_id: [analysis_id]})[study_id]["analyses"])
+        validator.validate_analysis(validation_dict, study_id, analysis_id, logs_path, sources={
+            file_format: join(mirror_path, "{}.{}".format(analysis_id, file_format)) for file_format in FILE_FORMATS})
+    validator.save_validation_dict(validation_dict, output_file)
+
+
+def start_version_process(python, mirror_path, logs_path, output_file):
+    """Method for starting the process validating the analyses under one mwtab version.
+
+    :param python: File path of the interpreter of the version's environment.
+    :type python: str
+    :param mirror_path: Directory path of the downloaded files.
+    :type mirror_path: str
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param output_file: File path for the version's validation JSON to be saved to.
+    :type output_file: str
+    :return: The process, reading analyses from its stdin.
+    :rtype: :py:class:`subprocess.Popen`
+    """
+    package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_path, env.get("PYTHONPATH")]))
+    return subprocess.Popen([python, "-m", "mwFileStatusWebsite.versions", mirror_path, logs_path, output_file],
+                            stdin=subprocess.PIPE, env=env, universal_newlines=True)
+
+
+def validate_versions(study_analysis_dict, interpreters, logs_path="validation_logs", output_path="", mirror_path=None,
+                      timeouts=None, verbose=False):
+    """Method for downloading the files of the analyses once and validating them under every mwtab version in parallel.
+
+    :param study_analysis_dict: Dictionary of Metabolomics study IDs (key) and lists of their associated analysis IDs
+    (value).
+    :type study_analysis_dict: dict
+    :param interpreters: Ordered dictionary of mwtab versions (keys) and interpreter file paths (values), see
+    resolve_versions().
+    :type interpreters: dict
+    :param logs_path: Directory path the logs directory of every version is created in.
+    :type logs_path: str
+    :param output_path: Directory path the validation JSON of every version is saved to.
+    :type output_path: str
+    :param mirror_path: Directory path to save the downloaded files to, a temporary directory removed afterwards if None.
+    :type mirror_path: str
+    :param timeouts: Tuple of the connect and read timeouts in seconds of every request.
+    :type timeouts: tuple
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: Tuple of the ordered dictionary of versions (keys) and their validation dictionaries (values), and the
+    dictionary of the analyses that could not be downloaded (keys) and their errors (values).
+    :rtype: tuple
+    """
+    temporary = mirror_path is None
+    mirror_path = tempfile.mkdtemp(prefix="mwtab_versions_") if temporary else mirror_path
+    os.makedirs(mirror_path, exist_ok=True)
+    output_files = {version: join(output_path, RESULTS_FILENAME.format(version)) for version in interpreters}
+
+    processes = collections.OrderedDict(
+        (version, start_version_process(python, mirror_path, join(logs_path, LOGS_DIRNAME.format(version)),
+                                        output_files[version]))
+        for version, python in interpreters.items())
+    fetch_errors = {}
+    try:
+        for study_id in sorted(study_analysis_dict):
+            for analysis_id in study_analysis_dict[study_id]:
+                if verbose:
+                    print("Fetching analysis:", study_id, analysis_id)
+
+                errors = fetch_analysis(analysis_id, mirror_path, timeouts)
+                if errors:
+                    fetch_errors[analysis_id] = errors
+                    continue
+                for process in processes.values():
+                    # a process that exited is reported once all are done
+                    try:
+                        process.stdin.write("{}\t{}\n".format(study_id, analysis_id))
+                        process.stdin.flush()
+                    except OSError:
+                        pass
+    finally:
+        for process in processes.values():
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+        failed = [version for version, process in processes.items() if process.wait()]
+        if temporary:
+            shutil.rmtree(mirror_path, ignore_errors=True)
+
+    if failed:
+        raise RuntimeError("Validation under mwtab {} failed.".format(", ".join(failed)))
+    results = collections.OrderedDict((version, validator.load_validation_json(output_files[version]))
+                                      for version in interpreters)
+    return results, fetch_errors
+
+
+def transition_report(results, fetch_errors=None):
+    """Method for comparing the statuses of every version to those of the first (baseline) version.
+
+    :param results: Ordered dictionary of mwtab versions (keys) and their validation dictionaries (values).
+    :type results: dict
+    :param fetch_errors: Dictionary of the analyses that could not be downloaded (keys) and their errors (values).
+    :type fetch_errors: dict
+    :return: Report dictionary.
+    :rtype: dict
+    """
+    versions = list(results)
+    baseline = {analysis_id: (study_id, analysis_dict["status"]) for study_id, study_dict in results[versions[0]].items()
+                for analysis_id, analysis_dict in study_dict["analyses"].items()}
+
+    comparisons = []
+    for version in versions[1:]:
+        counts = {status_key: collections.Counter() for status_key in STATUS_KEYS}
+        changes = []
+        for study_id, study_dict in results[version].items():
+            for analysis_id, analysis_dict in study_dict["analyses"].items():
+                if analysis_id not in baseline:
+                    continue
+                old_status, new_status = baseline[analysis_id][1], analysis_dict["status"]
+                old_code, new_code = history.encode_status(old_status), history.encode_status(new_status)
+                if old_code == new_code:
+                    continue
+                for status_key in STATUS_KEYS:
+                    if old_status.get(status_key) != new_status.get(status_key):
+                        counts[status_key]["{} -> {}".format(old_status.get(status_key), new_status.get(status_key))] += 1
+                changes.append({"study_id": study_id, "analysis_id": analysis_id, "from": old_code, "to": new_code,
+                                "regression": history.is_regression(history.decode_status(old_code),
+                                                                    history.decode_status(new_code))})
+        comparisons.append({
+            "from": versions[0],
+            "to": version,
+            "analyses": sum(len(study_dict["analyses"]) for study_dict in results[version].values()),
+            "changed": len(changes),
+            "regressions": sum(change["regression"] for change in changes),
+            "transitions": {status_key: dict(counts[status_key].most_common()) for status_key in STATUS_KEYS},
+            "changes": sorted(changes, key=lambda change: change["analysis_id"]),
+        })
+
+    return {"versions": versions, "comparisons": comparisons, "fetch_errors": fetch_errors or {}}
+
+
+def format_report(report):
+    """Method for formatting a transition report as human readable text.
+
+    :param report: Report dictionary (see transition_report()).
+    :type report: dict
+    :return: Report text.
+    :rtype: str
+    """
+    lines = []
+    for comparison in report["comparisons"]:
+        lines.append("mwtab {} -> {}: {} of {} analyses changed status, {} regressions".format(
+            comparison["from"], comparison["to"], comparison["changed"], comparison["analyses"],
+            comparison["regressions"]))
+        for status_key in STATUS_KEYS:
+            for transition, count in comparison["transitions"][status_key].items():
+                lines.append("\t{}: {} ({})".format(status_key, transition, count))
+    if report["fetch_errors"]:
+        lines.append("{} analyses could not be downloaded: {}".format(len(report["fetch_errors"]),
+                                                                     ", ".join(sorted(report["fetch_errors"]))))
+    return "\n".join(lines)
+
+
+def save_report(report, report_file):
+    """Method for saving a transition report as JSON.
+
+    :param report: Report dictionary (see transition_report()).
+    :type report: dict
+    :param report_file: File path for the report to be saved to.
+    :type report_file: str
+    :return: None
+    """
+    with open(report_file, "w") as fh:
+        fh.write(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    work(*sys.argv[1:])
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+watch.py
+~~~~~~~~
+
+This script contains methods for continuously validating analyses as they appear on the Metabolomics Workbench. The
+list of available analyses is polled periodically and diffed against the analyses already known. New analyses, and
+analyses whose previous status suggests their files may since have been deposited or fixed (recheck statuses), are
+validated and merged into the validation JSON, then the website is regenerated (only pages whose content changed are
+rewritten, see constructor.create_html()).
+
+The listing only holds IDs, so changed files are not detected by their content: a known analysis is only validated
+again when its status is one of the recheck statuses. With a concurrency above 1, the threads share one adaptive limiter
+(see mwFileStatusWebsite.throttle) capped at the request rate of a sequential run, 1 / validator.SLEEP_TIME, instead of
+each pausing on its own.
+
+The known analyses and the queue of analyses still to be validated are persisted in a state file, so the watcher
+resumes where it stopped after a restart.
+
+State file layout:
+{
+    "version": 1,
+    "last_poll": "2024-01-01T00:00:00",
+    "known": {study_id: [analysis_id, ...], ...},
+    "pending": [[study_id, analysis_id], ...]
+}
+"""
+import json
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import mwtab
+
+from . import validator, throttle
+
+
+WATCH_STATE_VERSION = 1
+WATCH_STATE_FILENAME = "watch_state.json"
+RECHECK_STATUSES = ("Missing/Blank",)
+
+
+def load_state(state_path):
+    """Method for loading the watcher state.
+
+    :param state_path: Path to the state file.
+    :type state_path: str
+    :return: State dictionary (see the module docstring for its layout), empty if the file does not exist or is from
+    another version.
+    :rtype: dict
+    """
+    try:
+        with open(state_path, "r") as fh:
+            state = json.loads(fh.read())
+        if state.get("version") == WATCH_STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return {"version": WATCH_STATE_VERSION, "last_poll": None, "known": {}, "pending": []}
+
+
+def save_state(state_path, state):
+    """Method for saving the watcher state. The file is replaced atomically.
+
+    :param state_path: Path to the state file.
+    :type state_path: str
+    :param state: State dictionary.
+    :type state: dict
+    :return: None
+    """
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as fh:
+        fh.write(json.dumps(state, separators=(",", ":")))
+    os.replace(tmp_path, state_path)
+
+
+def known_analyses(validation_dict):
+    """Method for listing the analyses of a validation dictionary in the layout of _pull_study_analysis().
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+    :type validation_dict: dict
+    :return: Dictionary of study IDs (keys) and their lists of analysis IDs (values).
+    :rtype: dict
+    """
+    return {study_id: list(validation_dict[study_id]["analyses"]) for study_id in validation_dict}
+
+
+def diff_analyses(known_dict, study_analysis_dict, validation_dict=None, recheck_statuses=RECHECK_STATUSES):
+    """Method for finding the analyses that need to be validated and the analyses that were removed.
+
+    :param known_dict: Dictionary of the already known study IDs (keys) and their lists of analysis IDs (values).
+    :type known_dict: dict
+    :param study_analysis_dict: Dictionary of the currently available study IDs (keys) and their lists of analysis IDs
+    (values).
+    :type study_analysis_dict: dict
+    :param validation_dict: Structured dictionary containing the current analyses statuses. Known analyses with one of
+    the recheck_statuses in it are validated again.
+    :type validation_dict: dict
+    :param recheck_statuses: Statuses of known analyses to validate again.
+    :type recheck_statuses: tuple
+    :return: Tuple of the list of (study ID, analysis ID) pairs to validate and the list of removed pairs.
+    :rtype: tuple
+    """
+    known = {(study_id, analysis_id) for study_id in known_dict for analysis_id in known_dict[study_id]}
+    available = {(study_id, analysis_id) for study_id in study_analysis_dict for analysis_id in study_analysis_dict[study_id]}
+
+    queue = available - known
+    for study_id, analysis_id in available & known:
+        analysis_dict = (validation_dict or {}).get(study_id, {}).get("analyses", {}).get(analysis_id)
+        if analysis_dict and set(recheck_statuses).intersection(analysis_dict["status"].values()):
+            queue.add((study_id, analysis_id))
+
+    return sorted(queue), sorted(known - available)
+
+
+def remove_analyses(validation_dict, removed):
+    """Method for removing analyses (and studies left without analyses) from a validation dictionary.
+
+    :param validation_dict: Structured dictionary containing analyses statuses and other study information. Updated in
+    place.
+    :type validation_dict: dict
+    :param removed: List of (study ID, analysis ID) pairs to remove.
+    :type removed: list
+    :return: The updated validation_dict.
+    :rtype: dict
+    """
+    for study_id, analysis_id in removed:
+        if study_id in validation_dict:
+            validation_dict[study_id]["analyses"].pop(analysis_id, None)
+            if not validation_dict[study_id]["analyses"]:
+                del validation_dict[study_id]
+    return validation_dict
+
+
+def create_limiter(concurrency):
+    """Method for creating the limiter shared by the threads validating analyses concurrently.
+
+    :param concurrency: Number of analyses validated at the same time.
+    :type concurrency: int
+    :return: Adaptive limiter of at most concurrency requests in flight and the request rate of a sequential run, or
+    None when analyses are validated one at a time (and paced by validator.SLEEP_TIME).
+    :rtype: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    """
+    if concurrency <= 1:
+        return None
+    max_rate = 1.0 / validator.SLEEP_TIME
+    return throttle.AdaptiveLimiter(max_concurrency=concurrency, min_rate=min(throttle.MIN_RATE, max_rate),
+                                    max_rate=max_rate, rate=max_rate)
+
+
+def validate_pending(pending, logs_path, concurrency=1, save_path=None, limiter=None):
+    """Method for validating a list of analyses.
+
+    :param pending: List of (study ID, analysis ID) pairs to validate.
+    :type pending: list
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param concurrency: Number of analyses to validate at the same time. Analyses are validated in the calling thread
+    when 1.
+    :type concurrency: int
+    :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
+    :type save_path: str
+    :param limiter: Limiter the requests of all threads go through (see create_limiter()). Created if not given and
+    concurrency is above 1.
+    :type limiter: :py:class:`~mwFileStatusWebsite.throttle.AdaptiveLimiter`
+    :return: Structured dictionary containing the analyses statuses and study information of the validated analyses.
+    :rtype: dict
+    """
+    if limiter is None:
+        limiter = create_limiter(concurrency)
+
+    def validate_one(study_analysis):
+        study_id, analysis_id = study_analysis
+        # every analysis gets its own dictionary, so threads never share one
+        analysis_validation_dict = validator.create_validation_dict({study_id: [analysis_id]})
+        validator.validate_analysis(analysis_validation_dict, study_id, analysis_id, logs_path, save_path=save_path,
+                                    limiter=limiter)
+        return analysis_validation_dict
+
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(validate_one, pending))
+    else:
+        results = [validate_one(study_analysis) for study_analysis in pending]
+
+    validated_dict = dict()
+    for analysis_validation_dict in results:
+        validator.merge_validation_dict(validated_dict, analysis_validation_dict)
+    return validated_dict
+
+
+def poll(state, output_file, logs_path, concurrency=1, batch_size=50, recheck_statuses=RECHECK_STATUSES,
+         state_path=None, save_path=None, verbose=False):
+    """Method for performing a single poll: diff the available analyses against the known ones, validate the queued
+    analyses in batches, and merge the results into the validation JSON.
+
+    :param state: State dictionary (see load_state()). Updated in place.
+    :type state: dict
+    :param output_file: File path of the validation JSON the results are merged into.
+    :type output_file: str
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param concurrency: Number of analyses to validate at the same time.
+    :type concurrency: int
+    :param batch_size: Number of analyses validated between saves of the validation JSON and the state.
+    :type batch_size: int
+    :param recheck_statuses: Statuses of known analyses to validate again.
+    :type recheck_statuses: tuple
+    :param state_path: Path to the state file. The state is saved after every batch when given.
+    :type state_path: str
+    :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
+    :type save_path: str
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: Whether the validation JSON changed.
+    :rtype: bool
+    """
+    try:
+        study_analysis_dict = mwtab.mwrest._pull_study_analysis()
+    except Exception as e:
+        # the Workbench being unreachable should not stop the watcher, try again on the next poll
+        print("Unable to access https://www.metabolomicsworkbench.org/")
+        print(e)
+        return False
+
+    validation_dict = validator.load_validation_json(output_file)
+    if not state["known"] and not state["pending"]:
+        state["known"] = known_analyses(validation_dict)
+
+    queue, removed = diff_analyses(state["known"], study_analysis_dict, validation_dict, recheck_statuses)
+    # analyses left pending by an interrupted poll come first
+    pending = [tuple(study_analysis) for study_analysis in state["pending"]]
+    pending_set = set(pending)
+    pending += [study_analysis for study_analysis in queue if study_analysis not in pending_set]
+    removed = [study_analysis for study_analysis in removed if study_analysis not in pending_set]
+    state["pending"] = pending
+    state["last_poll"] = datetime.now().isoformat(timespec="seconds")
+    if verbose:
+        print("{} analyses to validate, {} removed".format(len(pending), len(removed)))
+
+    changed = bool(removed)
+    remove_analyses(validation_dict, removed)
+    if removed:
+        validator.save_validation_dict(validation_dict, output_file)
+    state["known"] = known_analyses(validation_dict)
+    if state_path:
+        save_state(state_path, state)
+
+    # one limiter for the whole poll, so its limits carry over from batch to batch
+    limiter = create_limiter(concurrency)
+    while state["pending"]:
+        batch = [tuple(study_analysis) for study_analysis in state["pending"][:batch_size]]
+        if verbose:
+            print("Validating:", ", ".join(analysis_id for _, analysis_id in batch))
+        validator.merge_validation_dict(validation_dict, validate_pending(batch, logs_path, concurrency, save_path, limiter))
+        validator.save_validation_dict(validation_dict, output_file)
+        changed = True
+
+        state["pending"] = state["pending"][len(batch):]
+        state["known"] = known_analyses(validation_dict)
+        if state_path:
+            save_state(state_path, state)
+
+    return changed
+
+
+def watch(output_file, logs_path, state_path, interval=3600, concurrency=1, recheck_statuses=RECHECK_STATUSES,
+          regenerate=None, once=False, save_path=None, verbose=False):
+    """Method for polling the Metabolomics Workbench until interrupted.
+
+    :param output_file: File path of the validation JSON the results are merged into.
+    :type output_file: str
+    :param logs_path: File path to the directory validation logs are to be saved to.
+    :type logs_path: str
+    :param state_path: Path to the state file.
+    :type state_path: str
+    :param interval: Number of seconds between the start of two polls.
+    :type interval: float
+    :param concurrency: Number of analyses to validate at the same time.
+    :type concurrency: int
+    :param recheck_statuses: Statuses of known analyses to validate again.
+    :type recheck_statuses: tuple
+    :param regenerate: Function called without arguments to regenerate the website after the results changed.
+    :type regenerate: callable
+    :param once: Poll once and return instead of polling until interrupted.
+    :type once: bool
+    :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
+    :type save_path: str
+    :param verbose: Run in verbose mode.
+    :type verbose: bool
+    :return: None
+    """
+    state = load_state(state_path)
+    while True:
+        start = time.monotonic()
+        if verbose:
+            print("Polling the Metabolomics Workbench:", datetime.now().isoformat(timespec="seconds"))
+        changed = poll(state, output_file, logs_path, concurrency=concurrency, recheck_statuses=recheck_statuses,
+                       state_path=state_path, save_path=save_path, verbose=verbose)
+        save_state(state_path, state)
+        if changed and regenerate:
+            regenerate()
+        if once:
+            return
+        time.sleep(max(0, interval - (time.monotonic() - start)))
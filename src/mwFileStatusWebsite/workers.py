@@ -0,0 +1,583 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+workers.py
+~~~~~~~~~~
+
+This script contains a watchdog that validates analyses in killable worker processes, so a single analysis can neither
+hang a validation run nor push the host into swap. The connect and read timeouts of the requests (see
+throttle.download()) catch a stalled server, but not a file that sends mwtab's parser or validator into a (near)
+endless loop, which only a separate process can be stopped from.
+
+Every analysis has a wall-clock deadline. A worker validates one analysis at a time and sends back its part of the
+validation dictionary; when an analysis exceeds its deadline (or the worker dies on it), the worker is killed, the
+analysis is quarantined, and a fresh worker takes the next analysis. At the end of the run the quarantined analyses are
+retried in an isolated lane: one at a time, each in its own worker, with QUARANTINE_FACTOR times the deadline. An
+analysis that exceeds that too is recorded with a "Timed Out" status for both formats, "Not Checked" for the comparison,
+and validation logs saying so, instead of hanging the run. It gets its own page (timed_out.html) and is scheduled with
+the failing analyses (see schedule.FAILING_STATUSES). An analysis whose worker died on it is recorded
+with a "Parsing Error" status (what the validator records for any file it could not retrieve and parse).
+
+The workers report their resident set size (RSS) with every result. A worker is recycled (replaced by a fresh one)
+after a number of analyses or once its RSS crosses a ceiling, which returns the memory a parsed MWTabFile leaves behind
+to the system. While the memory in use (the RSS of the validating process plus what the workers added to the pages they
+share with it since they were forked) is above a threshold, idle workers are recycled and large analyses (by the size
+of their files saved by an earlier run, see validate --to-path) are deferred until the others finished.
+
+The workers are forked from the validating process, so they see its configuration (eg. validator.MW_REST_URL).
+"""
+import collections
+import multiprocessing
+import multiprocessing.connection
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+from os.path import join
+
+import mwtab
+
+from . import validator
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+QUARANTINE_FACTOR = 3
+KILL_TIMEOUT = 5
+LARGE_ANALYSIS_SIZE = 32 * 1024 ** 2
+TIMED_OUT_MESSAGE = "Timed Out: validation of the analysis did not finish within {:g} seconds."
+RECYCLE_REASONS = ("task limit", "memory ceiling", "memory pressure")
+
+
+def memory_usage():
+    """Method for measuring the memory of the current process.
+
+    :return: Tuple of the current and the peak resident set size in bytes, None where the platform does not tell.
+    :rtype: tuple
+    """
+    peak = None
+    if resource is not None:
+        # kilobytes, except on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            current = int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        current = peak
+    return current, peak
+
+
+def format_memory(size):
+    """Method for formatting a number of bytes as megabytes.
+
+    :param size: Number of bytes, or None if unknown.
+    :type size: int
+    :return: Formatted size.
+    :rtype: str
+    """
+    return "{:.1f} MB".format(size / 1024 ** 2) if size is not None else "- MB"
+
+
+def _work(connection):
+    """Method run by a worker process: validates the analyses sent through the connection, until it receives None.
+    Every result is sent along with the worker's current and peak RSS, and how much the current RSS grew since the
+    worker started.
+
+    :param connection: Worker end of the pipe to the validating process.
+    :type connection: :py:class:`multiprocessing.connection.Connection`
+    :return: None
+    """
+    baseline = memory_usage()[0]
+    while True:
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        study_id, analysis_id, logs_path, save_path, timeouts = task
+        validation_dict = validator.create_validation_dict({study_id: [analysis_id]})
+        try:
+            validator.validate_analysis(validation_dict, study_id, analysis_id, logs_path, save_path=save_path,
+                                        timeouts=timeouts)
+            result = (validation_dict[study_id], None)
+        except Exception:
+            result = (None, traceback.format_exc())
+        current, peak = memory_usage()
+        growth = current - baseline if current is not None and baseline is not None else None
+        connection.send(result + ((current, peak, growth),))
+
+
+class Worker(object):
+    """Worker process validating one analysis at a time, killed when an analysis exceeds its deadline."""
+
+    def __init__(self, number=1):
+        """Worker initializer, starts the worker process.
+
+        :param number: Number of the worker in the run summary.
+        :type number: int
+        """
+        self.number = number
+        self._connection, worker_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_work, args=(worker_connection,), daemon=True)
+        self.process.start()
+        worker_connection.close()
+        self.tasks = 0
+        self.task = None
+        self.started = None
+        self.rss = None
+        self.peak_rss = None
+        self.growth = None
+
+    @property
+    def alive(self):
+        """Whether the worker process can take another analysis."""
+        return self.process.is_alive()
+
+    @property
+    def connection(self):
+        """Connection the results of the worker are received from."""
+        return self._connection
+
+    def submit(self, task):
+        """Method for sending an analysis to the worker process.
+
+        :param task: Tuple of the study ID, analysis ID, logs path, save path, and request timeouts of the analysis (see
+        validator.validate_analysis()).
+        :type task: tuple
+        :return: None
+        """
+        self.tasks += 1
+        self.task = task
+        self.started = time.monotonic()
+        self._connection.send(task)
+
+    def result(self):
+        """Method for receiving the result of the submitted analysis, waiting for it if needed.
+
+        :return: The study's part of the validation dictionary, with the analysis only.
+        :rtype: dict
+        :raises RuntimeError: If the worker died or the validation raised an exception.
+        """
+        self.task = None
+        try:
+            study_dict, error, (self.rss, self.peak_rss, self.growth) = self._connection.recv()
+        except EOFError:
+            self.process.join()
+            raise RuntimeError("Worker process exited with code {} while validating the analysis.".format(
+                self.process.exitcode))
+        if error is not None:
+            raise RuntimeError(error)
+        return study_dict
+
+    def validate(self, task, deadline=None):
+        """Method for validating an analysis in the worker process.
+
+        :param task: Task tuple of the analysis (see submit()).
+        :type task: tuple
+        :param deadline: Number of seconds the analysis may take, unlimited if None.
+        :type deadline: float
+        :return: The study's part of the validation dictionary, with the analysis only.
+        :rtype: dict
+        :raises TimeoutError: If the analysis exceeded its deadline, the worker is killed.
+        :raises RuntimeError: If the worker died or the validation raised an exception.
+        """
+        self.submit(task)
+        if not self._connection.poll(deadline):
+            self.kill()
+            raise TimeoutError(TIMED_OUT_MESSAGE.format(deadline))
+        return self.result()
+
+    def kill(self):
+        """Method for stopping the worker process, however busy it is.
+
+        :return: None
+        """
+        self.process.terminate()
+        self.process.join(KILL_TIMEOUT)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self._connection.close()
+
+    def close(self):
+        """Method for stopping the worker process once it finished its analysis.
+
+        :return: None
+        """
+        if self.alive:
+            try:
+                self._connection.send(None)
+            except OSError:
+                pass
+            self.process.join(KILL_TIMEOUT)
+        self.kill()
+
+
+class Watchdog(object):
+    """Pool of killable worker processes validating the analyses of a run, with a per-analysis deadline, a quarantine of
+    the analyses exceeding it, and a guard on the memory of the workers."""
+
+    def __init__(self, deadline=None, processes=1, quarantine_factor=QUARANTINE_FACTOR, max_tasks=None,
+                 memory_ceiling=None, memory_threshold=None, sizes=None, large_size=LARGE_ANALYSIS_SIZE):
+        """Watchdog initializer.
+
+        :param deadline: Number of seconds an analysis may take, unlimited if None.
+        :type deadline: float
+        :param processes: Number of analyses validated at the same time, each in its own worker.
+        :type processes: int
+        :param quarantine_factor: Multiple of the deadline a quarantined analysis may take when it is retried.
+        :type quarantine_factor: float
+        :param max_tasks: Number of analyses after which a worker is recycled, unlimited if None.
+        :type max_tasks: int
+        :param memory_ceiling: RSS in bytes above which a worker is recycled after its analysis, unlimited if None.
+        :type memory_ceiling: int
+        :param memory_threshold: Memory in use in bytes above which idle workers are recycled and large analyses are
+        deferred, unlimited if None.
+        :type memory_threshold: int
+        :param sizes: Dictionary of analysis IDs (keys) and the size in bytes of their files (values), as far as known.
+        :type sizes: dict
+        :param large_size: Size in bytes of the files of an analysis above which it is deferred under memory pressure.
+        :type large_size: int
+        """
+        self.deadline = deadline
+        self.processes = processes
+        self.quarantine_factor = quarantine_factor
+        self.max_tasks = max_tasks
+        self.memory_ceiling = memory_ceiling
+        self.memory_threshold = memory_threshold
+        self.sizes = sizes or {}
+        self.large_size = large_size
+        self.quarantine = []
+        self.recovered = []
+        self.timed_out = []
+        self.failed = []
+        self.deferred = 0
+        self.workers = []
+        self._idle = []
+        self._busy = []
+        self._started_workers = 0
+
+    def memory_in_use(self):
+        """Method for estimating the memory in use by the validating process and its workers. The pages a worker shares
+        with the validating process it was forked from are only counted once.
+
+        :return: Number of bytes.
+        :rtype: int
+        """
+        return (memory_usage()[0] or 0) + sum(worker.growth or 0 for worker in self._idle + self._busy)
+
+    def under_pressure(self):
+        """Method for checking whether the memory in use is above the threshold.
+
+        :return: Whether to hold back large analyses.
+        :rtype: bool
+        """
+        return self.memory_threshold is not None and self.memory_in_use() > self.memory_threshold
+
+    def is_large(self, analysis_id):
+        """Method for checking whether an analysis is large, by the size of its files saved by an earlier run.
+
+        :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+        :type analysis_id: str
+        :return: Whether the analysis is large, False if its size is unknown.
+        :rtype: bool
+        """
+        return self.sizes.get(analysis_id, 0) > self.large_size
+
+    def run(self, validation_dict, analyses, logs_path, save_path=None, progress=None, verbose=False, timeouts=None):
+        """Method for validating analyses in the workers, quarantining the ones that exceed the deadline or fail.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        :param analyses: Iterable of (study ID, analysis ID) tuples. The next analysis is only taken when a worker is
+        free.
+        :type analyses: iterable
+        :param logs_path: File path to the directory validation logs are to be saved to.
+        :type logs_path: str
+        :param save_path: Directory path for retrieved Metabolomics Workbench analysis data files to be saved in.
+        :type save_path: str
+        :param progress: Progress reporter the analyses are recorded in.
+        :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+        :param verbose: Run in verbose mode.
+        :type verbose: bool
+        :param timeouts: Tuple of the connect and read timeouts in seconds of every request.
+        :type timeouts: tuple
+        :return: None
+        """
+        analyses = iter(analyses)
+        deferred = collections.deque()
+        exhausted = False
+        try:
+            while True:
+                while len(self._busy) < self.processes:
+                    analysis = None
+                    pressure = self.under_pressure()
+                    if pressure:
+                        self._retire_idle("memory pressure")
+                    # a deferred analysis waits for the pressure to ease, or for the other analyses to finish
+                    if deferred and (not pressure or not self._busy):
+                        analysis = deferred.popleft()
+                    while analysis is None and not exhausted:
+                        try:
+                            analysis = next(analyses)
+                        except StopIteration:
+                            exhausted = True
+                        else:
+                            if pressure and self.is_large(analysis[1]):
+                                deferred.append(analysis)
+                                self.deferred += 1
+                                analysis = None
+                    if analysis is None:
+                        break
+
+                    if verbose:
+                        print("Validating analysis:", *analysis)
+
+                    worker = self._idle.pop() if self._idle else self._start_worker()
+                    worker.submit(tuple(analysis) + (logs_path, save_path, timeouts))
+                    self._busy.append(worker)
+
+                if not self._busy:
+                    break
+                self._collect(validation_dict, progress)
+        finally:
+            self.close()
+
+    def run_quarantine(self, validation_dict, progress=None, verbose=False, schedule=None):
+        """Method for retrying the quarantined analyses, one at a time in a fresh worker with a longer deadline, and
+        recording the ones failing again.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        :param progress: Progress reporter the analyses are recorded in.
+        :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+        :param verbose: Run in verbose mode.
+        :type verbose: bool
+        :param schedule: Schedule whose time budget the retries have to fit into, they are skipped once it is spent.
+        :type schedule: :py:class:`~mwFileStatusWebsite.schedule.Schedule`
+        :return: None
+        """
+        self.close()
+        deadline = self.deadline * self.quarantine_factor if self.deadline is not None else None
+        for task, error in self.quarantine:
+            study_id, analysis_id = task[:2]
+            if schedule is not None and not schedule.has_time():
+                self._record_failure(validation_dict, task, error, progress)
+                continue
+
+            if verbose:
+                print("Retrying quarantined analysis:", study_id, analysis_id)
+
+            worker = self._start_worker()
+            try:
+                study_dict = worker.validate(task, deadline)
+            except TimeoutError as e:
+                self._record_failure(validation_dict, task, e, progress)
+                self._retire(worker, "deadline")
+            except RuntimeError as e:
+                self._record_failure(validation_dict, task, e, progress)
+                self._retire(worker, "failed" if worker.alive else "crashed")
+            else:
+                self.recovered.append(analysis_id)
+                self._merge(validation_dict, study_id, analysis_id, study_dict, progress)
+                self._retire(worker, "done")
+
+    def close(self):
+        """Method for stopping the workers.
+
+        :return: None
+        """
+        for worker in self._busy:
+            self._retire(worker, "killed")
+        self._retire_idle("done")
+        self._busy = []
+
+    def summary(self):
+        """Method for summarizing the quarantined analyses and the workers.
+
+        :return: Summary dictionary.
+        :rtype: dict
+        """
+        peaks = [worker["peak_rss"] for worker in self.workers if worker["peak_rss"] is not None]
+        return {
+            "deadline": self.deadline,
+            "quarantined": [task[1] for task, _ in self.quarantine],
+            "recovered": self.recovered,
+            "timed_out": self.timed_out,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "recycled": sum(worker["stopped"] in RECYCLE_REASONS for worker in self.workers),
+            "peak_rss": max(peaks) if peaks else None,
+            "workers": self.workers,
+        }
+
+    @staticmethod
+    def format_summary(summary_dict):
+        """Method for formatting a watchdog summary as human readable text.
+
+        :param summary_dict: Summary dictionary (see summary()).
+        :type summary_dict: dict
+        :return: Summary text.
+        :rtype: str
+        """
+        lines = []
+        if summary_dict["deadline"] is not None or summary_dict["quarantined"]:
+            lines.append("{} analyses exceeded the {} deadline or failed, {} of them passed on retry".format(
+                len(summary_dict["quarantined"]), "{:g} second".format(summary_dict["deadline"])
+                if summary_dict["deadline"] is not None else "(unlimited)", len(summary_dict["recovered"])))
+            if summary_dict["timed_out"]:
+                lines.append("\tTimed out: " + ", ".join(summary_dict["timed_out"]))
+            if summary_dict["failed"]:
+                lines.append("\tFailed: " + ", ".join(summary_dict["failed"]))
+
+        lines.append("{} workers, {} recycled, {} large analyses deferred, peak worker memory {}".format(
+            len(summary_dict["workers"]), summary_dict["recycled"], summary_dict["deferred"],
+            format_memory(summary_dict["peak_rss"])))
+        for worker in summary_dict["workers"]:
+            lines.append("\tWorker {}: {} analyses, peak {} ({})".format(
+                worker["worker"], worker["tasks"], format_memory(worker["peak_rss"]), worker["stopped"]))
+        return "\n".join(lines)
+
+    def _start_worker(self):
+        """Method for starting a worker.
+
+        :return: The worker.
+        :rtype: :py:class:`~mwFileStatusWebsite.workers.Worker`
+        """
+        self._started_workers += 1
+        return Worker(self._started_workers)
+
+    def _retire(self, worker, reason):
+        """Method for stopping a worker and recording it in the summary.
+
+        :param worker: The worker.
+        :type worker: :py:class:`~mwFileStatusWebsite.workers.Worker`
+        :param reason: Why the worker was stopped (eg. "task limit").
+        :type reason: str
+        :return: None
+        """
+        if worker.task is not None:
+            worker.kill()
+        else:
+            worker.close()
+        self.workers.append({"worker": worker.number, "tasks": worker.tasks, "peak_rss": worker.peak_rss,
+                             "stopped": reason})
+
+    def _retire_idle(self, reason):
+        """Method for stopping the idle workers.
+
+        :param reason: Why the workers were stopped.
+        :type reason: str
+        :return: None
+        """
+        while self._idle:
+            self._retire(self._idle.pop(), reason)
+
+    def _collect(self, validation_dict, progress):
+        """Method for waiting for the next result or the next deadline of the busy workers, merging the results, and
+        killing the workers whose analysis exceeded the deadline.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        :param progress: Progress reporter the analyses are recorded in.
+        :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+        :return: None
+        """
+        timeout = None
+        if self.deadline is not None:
+            timeout = max(0.0, min(worker.started for worker in self._busy) + self.deadline - time.monotonic())
+        ready = multiprocessing.connection.wait([worker.connection for worker in self._busy], timeout)
+
+        now = time.monotonic()
+        for worker in list(self._busy):
+            if worker.connection in ready:
+                self._busy.remove(worker)
+                task = worker.task
+                try:
+                    study_dict = worker.result()
+                except RuntimeError as e:
+                    self.quarantine.append((task, e))
+                    if not worker.alive:
+                        self._retire(worker, "crashed")
+                        continue
+                else:
+                    self._merge(validation_dict, task[0], task[1], study_dict, progress)
+
+                if self.max_tasks is not None and worker.tasks >= self.max_tasks:
+                    self._retire(worker, "task limit")
+                elif self.memory_ceiling is not None and worker.rss is not None and worker.rss > self.memory_ceiling:
+                    self._retire(worker, "memory ceiling")
+                else:
+                    self._idle.append(worker)
+
+            elif self.deadline is not None and now - worker.started >= self.deadline:
+                self._busy.remove(worker)
+                self.quarantine.append((worker.task, TimeoutError(TIMED_OUT_MESSAGE.format(self.deadline))))
+                self._retire(worker, "deadline")
+
+    def _merge(self, validation_dict, study_id, analysis_id, study_dict, progress):
+        """Method for copying the results of a worker into the validation dictionary.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        :param study_id: Metabolomics Workbench study ID string (eg. ST000001).
+        :type study_id: str
+        :param analysis_id: Metabolomics Workbench analysis ID string (eg. AN000001).
+        :type analysis_id: str
+        :param study_dict: The study's part of the validation dictionary returned by the worker.
+        :type study_dict: dict
+        :param progress: Progress reporter the analysis is recorded in.
+        :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+        :return: None
+        """
+        validation_dict[study_id]["analyses"][analysis_id] = study_dict["analyses"][analysis_id]
+        if not validation_dict[study_id]["params"]:
+            validation_dict[study_id]["params"] = study_dict["params"]
+        if progress is not None:
+            progress.analysis_done(validation_dict[study_id]["analyses"][analysis_id]["status"])
+
+    def _record_failure(self, validation_dict, task, error, progress):
+        """Method for recording an analysis that exceeded its deadline or failed in the quarantine lane too, with
+        "Timed Out" or "Parsing Error" statuses and validation logs giving the reason.
+
+        :param validation_dict: Structured dictionary containing analyses statuses and other study information.
+        :type validation_dict: dict
+        :param task: Task tuple of the analysis (see Worker.submit()).
+        :type task: tuple
+        :param error: Reason the analysis could not be validated.
+        :type error: :py:class:`TimeoutError` or :py:class:`RuntimeError`
+        :param progress: Progress reporter the analysis is recorded in.
+        :type progress: :py:class:`~mwFileStatusWebsite.progress.Progress`
+        :return: None
+        """
+        study_id, analysis_id, logs_path = task[:3]
+        analysis_dict = validation_dict[study_id]["analyses"][analysis_id]
+        if isinstance(error, TimeoutError):
+            status = "Timed Out"
+            self.timed_out.append(analysis_id)
+        else:
+            status = "Parsing Error"
+            self.failed.append(analysis_id)
+        analysis_dict["status"].update(txt=status, json=status, comparison="Not Checked")
+
+        for file_format in ("txt", "json"):
+            validation_log = mwtab.validator.VALIDATION_LOG_HEADER.format(
+                str(datetime.now()),
+                mwtab.__version__,
+                validator.MW_REST_URL.format(analysis_id, file_format),
+                study_id,
+                analysis_id,
+                file_format
+            )
+            validation_log += "\nStatus:{}\n".format(status) + str(error)
+            with open(join(logs_path, "{}_{}.log".format(analysis_id, file_format)), "w", encoding="utf-8") as fh:
+                fh.write(validation_log)
+
+        if progress is not None:
+            progress.analysis_done(analysis_dict["status"])
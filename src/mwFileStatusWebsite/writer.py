@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+writer.py
+~~~~~~~~~
+
+This script contains the background writer of validate, which takes the writing of the validation logs (and of the files
+saved to --to-path) off the validation loop, where the latency of a network file system adds to every analysis.
+
+The validation loop hands the text of every file to :class:`BackgroundWriter`, which queues it and returns. A single
+thread takes the queued files in batches and writes them in order, so the last text queued for a path is the one on
+disk. The queue is bounded: when the disk falls behind by more than max_pending files, the loop waits for it instead of
+holding the whole run in memory.
+
+Written files are not flushed to disk one by one. They are fsynced, along with their directories, every
+checkpoint_interval files, and at every checkpoint() call, which also waits for the queue to drain. validate_mwtab_rest()
+calls it before saving tmp.json, so tmp.json never refers to logs that are not on disk, and tmp.json itself is written
+through the writer and fsynced by a final checkpoint.
+
+A failed write is not lost in the thread: the error is raised by the next write(), checkpoint() or close() of the
+validation loop. The files queued after the failure are not written. close() does not raise it while the run is failing
+with an error of its own (see the raise_error parameter), which it would otherwise mask.
+"""
+import io
+import os
+import queue
+import threading
+import time
+
+
+MAX_PENDING = 256
+BATCH_SIZE = 32
+CHECKPOINT_INTERVAL = 300
+
+
+def write_file(path, text):
+    """Method for writing a text file.
+
+    :param path: File path.
+    :type path: str
+    :param text: Text of the file.
+    :type text: str
+    :return: Number of characters written.
+    :rtype: int
+    """
+    with open(path, "w", encoding="utf-8") as fh:
+        return fh.write(text)
+
+
+def sync_files(paths):
+    """Method for flushing written files, and the directory entries of the files, to disk.
+
+    :param paths: File paths.
+    :type paths: iterable
+    :return: None
+    """
+    directories = set()
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        directories.add(os.path.dirname(path) or ".")
+    # directories cannot be opened on Windows, where the entries do not need a separate flush
+    if os.name != "nt":
+        for directory in directories:
+            fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+class _Buffer(io.StringIO):
+    """Text buffer that stays readable after ~mwtab.mwtab.MWTabFile.write() closes it."""
+
+    def close(self):
+        pass
+
+
+def render(mwtabfile, file_format):
+    """Method for rendering an mwTab file as the text ~mwtab.mwtab.MWTabFile.write() writes.
+
+    :param mwtabfile: mwTab file.
+    :type mwtabfile: :py:class:`~mwtab.mwtab.MWTabFile`
+    :param file_format: File format extension string (either: 'txt' or 'json').
+    :type file_format: str
+    :return: Text of the file.
+    :rtype: str
+    """
+    buffer = _Buffer()
+    mwtabfile.write(buffer, "mwtab" if file_format == "txt" else "json")
+    return buffer.getvalue()
+
+
+class BackgroundWriter(object):
+    """Bounded queue of files written and periodically fsynced by a background thread."""
+
+    def __init__(self, max_pending=MAX_PENDING, batch_size=BATCH_SIZE, checkpoint_interval=CHECKPOINT_INTERVAL):
+        """BackgroundWriter initializer.
+
+        :param max_pending: Number of queued files beyond which write() waits for the thread.
+        :type max_pending: int
+        :param batch_size: Maximum number of files taken from the queue at once.
+        :type batch_size: int
+        :param checkpoint_interval: Number of written files after which they are fsynced.
+        :type checkpoint_interval: int
+        """
+        self.batch_size = batch_size
+        self.checkpoint_interval = checkpoint_interval
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.error = None
+        self.reported = False
+        self.closed = False
+        self.unsynced = {}
+
+        self.written = 0
+        self.characters = 0
+        self.batches = 0
+        self.checkpoints = 0
+        self.blocked = 0
+        self.blocked_seconds = 0.0
+        self.write_seconds = 0.0
+        self.sync_seconds = 0.0
+
+        self.thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(raise_error=exc_type is None)
+
+    def write(self, path, text):
+        """Method for queuing a file to be written, waiting while the queue is full.
+
+        :param path: File path.
+        :type path: str
+        :param text: Text of the file.
+        :type text: str
+        :return: None
+        """
+        self.raise_error()
+        try:
+            self.queue.put_nowait(("write", path, text))
+        except queue.Full:
+            start = time.perf_counter()
+            self.queue.put(("write", path, text))
+            with self.lock:
+                self.blocked += 1
+                self.blocked_seconds += time.perf_counter() - start
+
+    def checkpoint(self):
+        """Method for waiting until every queued file is written and fsynced.
+
+        :return: None
+        """
+        self.raise_error()
+        done = threading.Event()
+        self.queue.put(("checkpoint", done, None))
+        done.wait()
+        self.raise_error()
+
+    def close(self, raise_error=True):
+        """Method for writing and fsyncing the queued files and stopping the thread. Raises the error of a failed write
+        if it was not raised yet.
+
+        :param raise_error: Whether to raise the error of a failed write. False when an exception is already propagating,
+        which the error would mask.
+        :type raise_error: bool
+        :return: None
+        """
+        if not self.closed:
+            self.closed = True
+            self.queue.put(("stop", None, None))
+            self.thread.join()
+        if raise_error and not self.reported:
+            self.raise_error()
+
+    def raise_error(self):
+        """Method for raising the error of a failed write in the calling thread.
+
+        :return: None
+        """
+        if self.error is not None:
+            self.reported = True
+            path, error = self.error
+            raise RuntimeError("Background write of {} failed: {}".format(path, error)) from error
+
+    def _run(self):
+        """Method run by the thread: writes the queued files in batches and fsyncs them at checkpoints.
+
+        :return: None
+        """
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self.batches += 1
+
+            for kind, item, text in batch:
+                if kind == "write":
+                    self._write(item, text)
+                else:
+                    self._sync()
+                    if kind == "checkpoint":
+                        item.set()
+                    else:
+                        return
+            if len(self.unsynced) >= self.checkpoint_interval:
+                self._sync()
+
+    def _write(self, path, text):
+        """Method for writing a file in the thread, unless an earlier write failed.
+
+        :param path: File path.
+        :type path: str
+        :param text: Text of the file.
+        :type text: str
+        :return: None
+        """
+        if self.error is not None:
+            return
+        start = time.perf_counter()
+        try:
+            self.characters += write_file(path, text)
+            self.written += 1
+            self.unsynced[path] = None
+        except Exception as error:
+            self.error = (path, error)
+        self.write_seconds += time.perf_counter() - start
+
+    def _sync(self):
+        """Method for fsyncing the files written since the last checkpoint, in the thread.
+
+        :return: None
+        """
+        if self.error is not None or not self.unsynced:
+            return
+        start = time.perf_counter()
+        try:
+            sync_files(self.unsynced)
+            self.checkpoints += 1
+        except Exception as error:
+            self.error = (next(iter(self.unsynced)), error)
+        self.unsynced = {}
+        self.sync_seconds += time.perf_counter() - start
+
+    def summary(self):
+        """Method for summarizing the writes.
+
+        :return: Summary dictionary.
+        :rtype: dict
+        """
+        return {
+            "written": self.written,
+            "characters": self.characters,
+            "batches": self.batches,
+            "checkpoints": self.checkpoints,
+            "blocked": self.blocked,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "sync_seconds": round(self.sync_seconds, 3),
+            "failed": self.error is not None,
+        }
+
+    @staticmethod
+    def format_summary(summary_dict):
+        """Method for formatting a summary as human readable text.
+
+        :param summary_dict: Summary dictionary (see summary()).
+        :type summary_dict: dict
+        :return: Summary text.
+        :rtype: str
+        """
+        return ("Wrote {written} files in the background ({write_seconds:.1f} s writing, {sync_seconds:.1f} s in "
+                "{checkpoints} checkpoints); the run waited {blocked_seconds:.1f} s on a full queue {blocked} times"
+                ).format(**summary_dict)
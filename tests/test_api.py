@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import mwFileStatusWebsite
+from mwFileStatusWebsite import api
+
+
+VALIDATION_DICT = {
+    'ST000001': {'params': {'STUDY_TITLE': 'First'}, 'analyses': {
+        'AN000001': {'params': {}, 'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                     'issues': {fmt: {'value': False, 'consistency': False, 'format': False} for fmt in ('txt', 'json')}},
+        'AN000002': {'params': {}, 'status': {'txt': 'Parsing Error', 'json': 'Passing', 'comparison': 'Not Checked'},
+                     'issues': {'txt': {'value': True, 'consistency': False, 'format': False},
+                                'json': {'value': False, 'consistency': False, 'format': False}}}}},
+    'ST000002': {'params': {'STUDY_TITLE': 'Second'}, 'analyses': {
+        'AN000003': {'params': {}, 'status': {'txt': 'Missing/Blank', 'json': 'Missing/Blank', 'comparison': 'Not Checked'},
+                     'issues': {fmt: {'value': False, 'consistency': False, 'format': True} for fmt in ('txt', 'json')}}}},
+}
+
+
+def load(html_path, filename):
+    with open(os.path.join(html_path, api.API_DIRNAME, filename), encoding='utf-8') as fh:
+        return json.loads(fh.read())
+
+
+def test_create_api(tmpdir):
+    html_path = str(tmpdir)
+    written_files = api.create_api(VALIDATION_DICT, 'owner', 'repo', html_path)
+    assert len(written_files) == 4
+
+    summary = load(html_path, api.SUMMARY_FILENAME)
+    num_studies, num_analyses, error_num_dict, issue_num_dict = \
+        mwFileStatusWebsite.constructor.generate_validation_stats_summary(VALIDATION_DICT)
+    assert (summary['studies'], summary['analyses'], summary['status'], summary['issues']) == \
+        (num_studies, num_analyses, error_num_dict, issue_num_dict)
+    assert summary['comparison'] == {'Consistent': 1, 'Inconsistent': 0, 'Not Checked': 2}
+
+    # look up an analysis the way a consumer would
+    manifest = load(html_path, summary['manifest'])
+    shard = load(html_path, manifest['shard'].format(manifest['analyses']['AN000002']))
+    assert shard['study_id'] == 'ST000001'
+    assert shard['params'] == {'STUDY_TITLE': 'First'}
+    assert shard['analyses']['AN000002']['status']['txt'] == 'Parsing Error'
+    assert shard['analyses']['AN000002']['logs'] == {
+        'txt': 'https://raw.githubusercontent.com/owner/repo/master/validation_logs/AN000002_txt.log',
+        'json': 'https://raw.githubusercontent.com/owner/repo/master/validation_logs/AN000002_json.log',
+    }
+    assert 'comparison' in shard['analyses']['AN000001']['logs']
+
+
+def test_create_api_only_writes_changed_shards(tmpdir):
+    html_path = str(tmpdir)
+    manifest = {}
+    assert len(api.create_api(VALIDATION_DICT, 'owner', 'repo', html_path, manifest=manifest)) == 4
+    assert api.create_api(VALIDATION_DICT, 'owner', 'repo', html_path, manifest=manifest) == []
+
+    changed_dict = json.loads(json.dumps(VALIDATION_DICT))
+    changed_dict['ST000002']['analyses']['AN000003']['status']['txt'] = 'Passing'
+    assert api.create_api(changed_dict, 'owner', 'repo', html_path, manifest=manifest) == [
+        os.path.join(html_path, api.API_DIRNAME, api.SUMMARY_FILENAME),
+        os.path.join(html_path, api.API_DIRNAME, api.STUDY_SHARD_DIRNAME, 'ST000002.json'),
+    ]
+
+    # shards of removed studies are deleted
+    del changed_dict['ST000001']
+    api.create_api(changed_dict, 'owner', 'repo', html_path, manifest=manifest)
+    assert not os.path.exists(os.path.join(html_path, api.API_DIRNAME, api.STUDY_SHARD_DIRNAME, 'ST000001.json'))
+    assert 'api/studies/ST000001.json' not in manifest
@@ -109,7 +109,118 @@ def test_cli_generate(study_analysis_dict, mocker, disable_sleep, init_tmp_dir):
     assert pathlib.Path(TMP_PATH + 'warnings_only.html').exists()
 
 
+def test_cli_validate_subset(study_analysis_dict, mocker, capsys, disable_sleep, init_tmp_dir):
+    issues = {file_format: {'value': False, 'consistency': False, 'format': False} for file_format in ('txt', 'json')}
+    previous_dict = {
+        'ST000001': {'params': {'STUDY_TITLE': 'Untouched'}, 'analyses': {'AN000001': {'params': {'ANALYSIS_ID': 'AN000001'},
+            'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'}, 'issues': issues}}},
+        'ST000009': {'params': {}, 'analyses': {analysis_id: {'params': {'ANALYSIS_ID': analysis_id},
+            'status': {'txt': 'Parsing Error', 'json': 'Parsing Error', 'comparison': 'Not Checked'}, 'issues': issues}
+            for analysis_id in ('AN000023', 'AN000024')}},
+    }
+    with open(TMP_PATH + 'tmp.json', 'w') as fh:
+        fh.write(json.dumps(previous_dict))
 
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.mwrest._pull_study_analysis', side_effect = [study_analysis_dict])
+    read_files = mocker.patch('mwFileStatusWebsite.validator.mwtab.read_files', side_effect = [read_test_data('AN000023', 'txt'),
+                                                                                               read_test_data('AN000023', 'json')])
+
+    cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, '--verbose': True, 'validate': True,
+             '--studies': 'ST000002-ST000010', '--only-status': 'Parsing Error', '--analyses': 'AN000023'})
+    captured = capsys.readouterr()
+    assert '1 analyses selected' in captured.out
+    assert read_files.call_count == 2
+    assert not pathlib.Path(TMP_PATH + 'AN000001_txt.log').exists()
+    assert pathlib.Path(TMP_PATH + 'AN000023_txt.log').exists()
+
+    with open(TMP_PATH + 'tmp.json') as fh:
+        validation_dict = json.load(fh)
+    assert validation_dict['ST000001'] == previous_dict['ST000001']
+    assert validation_dict['ST000009']['analyses']['AN000024'] == previous_dict['ST000009']['analyses']['AN000024']
+    assert validation_dict['ST000009']['analyses']['AN000023']['status']['txt'] != 'Parsing Error'
+
+
+def test_cli_validate_subset_no_match(study_analysis_dict, mocker, capsys, init_tmp_dir):
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.mwrest._pull_study_analysis', side_effect = [study_analysis_dict])
+    cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--studies': 'ST000002'})
+    assert 'No analyses match the given selection.' in capsys.readouterr().out
+    assert not pathlib.Path(TMP_PATH + 'tmp.json').exists()
+
+    # --only-status without the results of a previous run
+    assert cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--only-status': 'Parsing Error'}) == 1
+    assert 'does not exist' in capsys.readouterr().out
+
+
+def test_cli_validate_incompatible_options(mocker, capsys):
+    pull = mocker.patch('mwFileStatusWebsite.validator.mwtab.mwrest._pull_study_analysis')
+    assert cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--deadline': '10',
+                    '--adaptive': True}) == 1
+    assert 'cannot be combined with --adaptive' in capsys.readouterr().out
+    assert cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--workers': '2',
+                    '--background-writes': True}) == 1
+    assert '--background-writes cannot be combined' in capsys.readouterr().out
+    pull.assert_not_called()
+
+
+def test_cli_validate_error_not_masked_by_writer(mocker, init_tmp_dir):
+    def failing_run(**kwargs):
+        kwargs['writer'].write(TMP_PATH + 'missing/AN000001_txt.log', 'log')
+        raise ValueError('validation failed')
+
+    mocker.patch('mwFileStatusWebsite.validator.validate_mwtab_rest', side_effect = failing_run)
+    with pytest.raises(ValueError, match='validation failed'):
+        cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--background-writes': True})
+
+
+def test_cli_validate_progress(study_analysis_dict, mocker, capsys, disable_sleep, init_tmp_dir):
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.mwrest._pull_study_analysis', side_effect = [study_analysis_dict])
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.read_files', side_effect = [read_test_data('AN000001', 'txt'),
+                                                                                  read_test_data('AN000001', 'json'),
+                                                                                  read_test_data('AN000023', 'txt'),
+                                                                                  read_test_data('AN000023', 'json'),
+                                                                                  read_test_data('AN000024', 'txt'),
+                                                                                  read_test_data('AN000024', 'json')])
 
+    cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--progress': True,
+             '--progress-json': TMP_PATH + 'progress.jsonl', '--progress-interval': '60'})
+    assert 'Progress: 3/3 (100.0%)' in capsys.readouterr().out
+    with open(TMP_PATH + 'progress.jsonl') as fh:
+        reports = [json.loads(line) for line in fh]
+    assert reports[-1]['final']
+    assert reports[-1]['completed'] == 3
 
 
+def test_cli_validate_time_budget(study_analysis_dict, mocker, capsys, disable_sleep, init_tmp_dir):
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.mwrest._pull_study_analysis', side_effect = [study_analysis_dict])
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.read_files', side_effect = [read_test_data('AN000001', 'txt'),
+                                                                                  read_test_data('AN000001', 'json'),
+                                                                                  read_test_data('AN000023', 'txt'),
+                                                                                  read_test_data('AN000023', 'json'),
+                                                                                  read_test_data('AN000024', 'txt'),
+                                                                                  read_test_data('AN000024', 'json')])
+
+    cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--time-budget': '3600'})
+    out = capsys.readouterr().out
+    assert 'Validated 3 of 3 analyses (100.0%)' in out
+    assert 'new 3/3' in out
+    with open(TMP_PATH + 'tmp.json') as fh:
+        assert not any('carried_over' in analysis_dict for study_dict in json.loads(fh.read()).values()
+                       for analysis_dict in study_dict['analyses'].values())
+
+
+def test_cli_validate_sample(study_analysis_dict, mocker, capsys, disable_sleep, init_tmp_dir):
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.mwrest._pull_study_analysis', side_effect = [study_analysis_dict])
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.read_files',
+                 side_effect = lambda url: read_test_data(url.split('/')[-4], url.split('/')[-2]))
+
+    cli.cli({'--logs-path': TMP_PATH, '--output-path': TMP_PATH, 'validate': True, '--sample': '2', '--seed': '1'})
+    out = capsys.readouterr().out
+    assert 'Validated 2 of 2 sampled analyses (seed 1), out of 3' in out
+    assert not pathlib.Path(TMP_PATH + 'tmp.json').exists()
+    # the logs of the published run are not overwritten
+    assert len(list(pathlib.Path(TMP_PATH + 'sample').glob('AN*_txt.log'))) == 2
+    assert not list(pathlib.Path(TMP_PATH).glob('AN*.log'))
+    with open(TMP_PATH + 'sample.json') as fh:
+        assert sum(len(study_dict['analyses']) for study_dict in json.loads(fh.read()).values()) == 2
+    with open(TMP_PATH + 'sample_estimates.json') as fh:
+        assert json.loads(fh.read())['strata'] == {'New': {'population': 3, 'sampled': 2, 'validated': 2}}
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+import gzip
+import pytest
+import mwFileStatusWebsite
+
+
+def test_minify_html():
+    html_str = "<html>\n\t<body>\n\t\t<div>  Some   text </div>\n\t</body>\n</html>\n"
+    assert mwFileStatusWebsite.compress.minify_html(html_str) == "<html><body><div>  Some   text </div></body></html>\n"
+
+
+def test_gzip_bytes_is_deterministic():
+    data = b"<html></html>" * 100
+    assert mwFileStatusWebsite.compress.gzip_bytes(data) == mwFileStatusWebsite.compress.gzip_bytes(data)
+    assert gzip.decompress(mwFileStatusWebsite.compress.gzip_bytes(data)) == data
+
+
+def test_precompress_file(tmp_path):
+    filepath = tmp_path / "index.html"
+    filepath.write_text("<div class=\"grid\"></div>\n" * 1000)
+    sizes = mwFileStatusWebsite.compress.precompress_file(str(filepath))
+    assert sizes["raw"] == filepath.stat().st_size
+    assert sizes["gz"] == (tmp_path / "index.html.gz").stat().st_size
+    assert sizes["gz"] < sizes["raw"]
+    if mwFileStatusWebsite.compress.brotli is not None:
+        assert sizes["br"] == (tmp_path / "index.html.br").stat().st_size
+    else:
+        assert sizes["br"] is None
+        assert not (tmp_path / "index.html.br").exists()
+
+
+def test_precompress_file_without_brotli(tmp_path, monkeypatch):
+    monkeypatch.setattr(mwFileStatusWebsite.compress, "brotli", None)
+    filepath = tmp_path / "index.html"
+    filepath.write_text("<div></div>\n" * 100)
+    sizes = mwFileStatusWebsite.compress.precompress_file(str(filepath))
+    assert sizes["br"] is None
+    assert "Total" in mwFileStatusWebsite.compress.format_size_report({str(filepath): sizes})
+
+
+def test_format_size_report_totals():
+    report = mwFileStatusWebsite.compress.format_size_report({
+        "index.html": {"raw": 100, "gz": 40, "br": None}, "missing.html": {"raw": 50, "gz": 20, "br": None}})
+    # no brotli size for any file, whether or not brotli is installed
+    assert report.splitlines()[-1].split() == ["Total", "150", "60", "-"]
+    report = mwFileStatusWebsite.compress.format_size_report({
+        "index.html": {"raw": 100, "gz": 40, "br": 30}, "missing.html": {"raw": 50, "gz": 20, "br": None}})
+    assert report.splitlines()[-1].split() == ["Total", "150", "60", "30"]
+    assert report.splitlines()[2].split() == ["missing.html", "50", "20", "-"]
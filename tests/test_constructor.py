@@ -25,3 +25,85 @@ def test_filter_analyses_by_issues():
     
     status_dict = mwFileStatusWebsite.constructor.filter_analyses_by_issues(validation_dict, 'value', True)
     assert status_dict == {'ST000001': {'params':{}, 'analyses':{'AN000001': {'issues': {'json': {'value': True}, 'txt': {'value': True}}}}}}
+
+
+def test_create_desc_uses_class():
+    desc = mwFileStatusWebsite.constructor.create_desc({'STUDY_TITLE': 'Title'}, tabs='')
+    assert desc == '<div class="desc__grid__item">STUDY_TITLE</div>\n<div class="desc__grid__item desc__grid__value">Title</div>'
+    assert 'style=' not in desc
+
+
+def test_create_html_minify(tmp_path):
+    validation_dict = {'ST000001': {'params': {'STUDY_TITLE': 'Title'},
+                                    'analyses': {'AN000001': {'params': {'ANALYSIS_ID': 'AN000001'},
+                                                              'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                                                              'issues': {'txt': {'value': False, 'consistency': False, 'format': False},
+                                                                         'json': {'value': False, 'consistency': False, 'format': False}}}}}}
+    raw_path = tmp_path / 'raw.html'
+    minified_path = tmp_path / 'minified.html'
+    mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(raw_path))
+    mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(minified_path), minify=True)
+    minified = minified_path.read_text(encoding='utf-8')
+    assert minified_path.stat().st_size < raw_path.stat().st_size
+    assert '\t' not in minified
+    assert 'AN000001' in minified
+
+
+def test_create_html_manifest(tmp_path):
+    validation_dict = {'ST000001': {'params': {'STUDY_TITLE': 'Title'},
+                                    'analyses': {'AN000001': {'params': {'ANALYSIS_ID': 'AN000001'},
+                                                              'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                                                              'issues': {'txt': {'value': False, 'consistency': False, 'format': False},
+                                                                         'json': {'value': False, 'consistency': False, 'format': False}}}}}}
+    output_path = tmp_path / 'index.html'
+    manifest_path = str(tmp_path / mwFileStatusWebsite.constructor.MANIFEST_FILENAME)
+    manifest = mwFileStatusWebsite.constructor.load_manifest(manifest_path)
+    assert manifest == {}
+
+    assert mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(output_path), manifest=manifest)
+    mwFileStatusWebsite.constructor.save_manifest(manifest_path, manifest)
+    manifest = mwFileStatusWebsite.constructor.load_manifest(manifest_path)
+    assert 'index.html' in manifest
+
+    # unchanged input is skipped
+    assert not mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(output_path), manifest=manifest)
+
+    # missing output is rewritten
+    output_path.unlink()
+    assert mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(output_path), manifest=manifest)
+
+    # changed input is rewritten
+    validation_dict['ST000001']['analyses']['AN000001']['status']['txt'] = 'Parsing Error'
+    assert mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(output_path), manifest=manifest)
+    assert 'Parsing Error' in output_path.read_text(encoding='utf-8')
+
+    # the same studies in another order render another page
+    validation_dict['ST000000'] = validation_dict['ST000001']
+    mwFileStatusWebsite.constructor.create_html(validation_dict, 'owner', 'repo', str(output_path), manifest=manifest)
+    reordered_dict = {study_id: validation_dict[study_id] for study_id in reversed(list(validation_dict))}
+    assert mwFileStatusWebsite.constructor.create_html(reordered_dict, 'owner', 'repo', str(output_path), manifest=manifest)
+
+
+def test_create_study_details(tmp_path):
+    validation_dict = {'ST000001': {'params': {'STUDY_TITLE': 'Title', 'STUDY_SUMMARY': 'A long summary'},
+                                    'analyses': {'AN000001': {'params': {'ANALYSIS_ID': 'AN000001'},
+                                                              'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                                                              'issues': {'txt': {'value': False, 'consistency': False, 'format': False},
+                                                                         'json': {'value': False, 'consistency': False, 'format': False}}}}}}
+    html_str = mwFileStatusWebsite.constructor.render_html(validation_dict, 'owner', 'repo', lazy_details=True)
+    assert 'A long summary' not in html_str
+    assert 'data-details="studies/ST000001.html"' in html_str
+    assert 'A long summary' in mwFileStatusWebsite.constructor.render_html(validation_dict, 'owner', 'repo')
+
+    manifest = {}
+    written = mwFileStatusWebsite.constructor.create_study_details(validation_dict, str(tmp_path), manifest=manifest)
+    assert written == [str(tmp_path / 'studies' / 'ST000001.html')]
+    assert 'A long summary' in (tmp_path / 'studies' / 'ST000001.html').read_text(encoding='utf-8')
+    assert mwFileStatusWebsite.constructor.create_study_details(validation_dict, str(tmp_path), manifest=manifest) == []
+
+    # fragments of removed studies are deleted
+    validation_dict['ST000002'] = validation_dict.pop('ST000001')
+    mwFileStatusWebsite.constructor.create_study_details(validation_dict, str(tmp_path), manifest=manifest)
+    assert not (tmp_path / 'studies' / 'ST000001.html').exists()
+    assert (tmp_path / 'studies' / 'ST000002.html').exists()
+    assert list(manifest) == ['studies/ST000002.html']
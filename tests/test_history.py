@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+from datetime import datetime
+import mwFileStatusWebsite
+
+
+def make_validation_dict():
+    issues = {'value': False, 'consistency': False, 'format': False}
+    return {'ST000001': {'params': {}, 'analyses': {
+        'AN000001': {'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                     'issues': {'txt': dict(issues), 'json': dict(issues)}},
+        'AN000002': {'status': {'txt': 'Parsing Error', 'json': 'Validation Error', 'comparison': 'Not Checked'},
+                     'issues': {'txt': dict(issues), 'json': dict(issues)}},
+    }}}
+
+
+def test_encode_decode_status():
+    status = {'txt': 'Warnings Only', 'json': 'Missing/Blank', 'comparison': 'Not Checked'}
+    assert mwFileStatusWebsite.history.encode_status(status) == 'WMN'
+    assert mwFileStatusWebsite.history.decode_status('WMN') == status
+
+
+def test_append_run_stores_deltas(tmp_path):
+    history_path = str(tmp_path / 'history.jsonl')
+    validation_dict = make_validation_dict()
+    first = mwFileStatusWebsite.history.append_run(history_path, validation_dict, datetime(2026, 1, 5))
+    assert first['changes'] == {'AN000001': 'PPC', 'AN000002': 'EVN'}
+    assert first['summary']['analyses'] == 2
+    assert first['summary']['status']['Passing'] == {'txt': 1, 'json': 1}
+
+    # an unchanged run stores no changes
+    assert mwFileStatusWebsite.history.append_run(history_path, validation_dict, datetime(2026, 1, 12))['changes'] == {}
+
+    regressed = copy.deepcopy(validation_dict)
+    regressed['ST000001']['analyses']['AN000001']['status']['json'] = 'Validation Error'
+    del regressed['ST000001']['analyses']['AN000002']
+    third = mwFileStatusWebsite.history.append_run(history_path, regressed, datetime(2026, 1, 19))
+    assert third['changes'] == {'AN000001': 'PVC'}
+    assert third['removed'] == ['AN000002']
+
+    with open(history_path) as fh:
+        assert len(fh.readlines()) == 3
+    assert mwFileStatusWebsite.history.replay(history_path) == (3, {'AN000001': 'PVC'})
+    assert mwFileStatusWebsite.history.load_state(history_path) == (3, {'AN000001': 'PVC'})
+
+    transitions = mwFileStatusWebsite.history.transitions(history_path)
+    assert [(run, analysis_id) for run, analysis_id, _, _ in transitions] == [('2026-01-19T00:00:00', 'AN000001')]
+    assert mwFileStatusWebsite.history.is_regression(transitions[0][2], transitions[0][3])
+
+
+def test_append_partial_run(tmp_path):
+    history_path = str(tmp_path / 'history.jsonl')
+    validation_dict = make_validation_dict()
+    mwFileStatusWebsite.history.append_run(history_path, validation_dict, datetime(2026, 1, 5))
+
+    # a subset run only records the analyses it validated
+    subset = copy.deepcopy(validation_dict)
+    subset['ST000001']['analyses']['AN000001']['status']['json'] = 'Validation Error'
+    del subset['ST000001']['analyses']['AN000002']
+    run = mwFileStatusWebsite.history.append_run(history_path, subset, datetime(2026, 1, 6), partial=True)
+    assert (run['changes'], run['removed']) == ({'AN000001': 'PVC'}, [])
+    assert mwFileStatusWebsite.history.load_state(history_path) == (2, {'AN000001': 'PVC', 'AN000002': 'EVN'})
+    assert mwFileStatusWebsite.history.replay(history_path) == (2, {'AN000001': 'PVC', 'AN000002': 'EVN'})
+
+
+def test_load_state_rebuilds_stale_sidecar(tmp_path):
+    history_path = str(tmp_path / 'history.jsonl')
+    mwFileStatusWebsite.history.append_run(history_path, make_validation_dict())
+    with open(history_path + mwFileStatusWebsite.history.STATE_SUFFIX, 'w') as fh:
+        fh.write(json.dumps({'runs': 7, 'size': 1, 'state': {}}))
+    assert mwFileStatusWebsite.history.load_state(history_path) == (1, {'AN000001': 'PPC', 'AN000002': 'EVN'})
+
+
+def test_is_regression():
+    is_regression = mwFileStatusWebsite.history.is_regression
+    decode = mwFileStatusWebsite.history.decode_status
+    assert is_regression(decode('PPC'), decode('PWC'))
+    assert is_regression(decode('PPC'), decode('PPI'))
+    assert not is_regression(decode('VVI'), decode('PVC'))
+    assert not is_regression(decode('--N'), decode('MMN'))
+
+
+def test_create_trends_html(tmp_path):
+    history_path = str(tmp_path / 'history.jsonl')
+    validation_dict = make_validation_dict()
+    mwFileStatusWebsite.history.append_run(history_path, validation_dict, datetime(2026, 1, 5))
+    validation_dict['ST000001']['analyses']['AN000001']['status']['comparison'] = 'Inconsistent'
+    mwFileStatusWebsite.history.append_run(history_path, validation_dict, datetime(2026, 1, 12))
+
+    output_path = tmp_path / 'trends.html'
+    mwFileStatusWebsite.history.create_trends_html(history_path, 'owner', 'repo', str(output_path))
+    html_str = output_path.read_text(encoding='utf-8')
+    assert 'Number of Runs: 2' in html_str
+    assert html_str.count('<svg') == 3
+    assert 'AN000001' in html_str
+
+    # runs recorded before the "Timed Out" status existed have no count for it
+    runs = [json.loads(line) for line in open(history_path)]
+    del runs[0]['summary']['status']['Timed Out']
+    with open(history_path, 'w') as fh:
+        fh.write(''.join(json.dumps(run) + '\n' for run in runs))
+    mwFileStatusWebsite.history.create_trends_html(history_path, 'owner', 'repo', str(output_path))
+    assert 'Number of Runs: 2' in output_path.read_text(encoding='utf-8')
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Cold start guards: each command must only import the modules it uses.
+
+Submodules are imported lazily through importlib, which python -X importtime does not report, so the commands are run
+in a fresh interpreter that prints sys.modules when done. Only the module sets are asserted, as wall-clock times depend
+on the machine running the tests. Use ``python -X importtime -c "import mwFileStatusWebsite.<module>"`` for a
+per-module breakdown.
+"""
+import json
+import subprocess
+import sys
+import pytest
+
+
+ISSUES = {file_format: {'value': False, 'consistency': False, 'format': False} for file_format in ('txt', 'json')}
+COMMAND_SCRIPT = """
+import json, sys
+from unittest import mock
+from mwFileStatusWebsite.__main__ import main
+sys.argv = ['mwFileStatusWebsite'] + {0!r}
+try:
+    with mock.patch('mwtab.mwrest._pull_study_analysis', return_value={{}}) if 'validate' in sys.argv else mock.MagicMock():
+        main()
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def run_command(args, cwd):
+    """Run the command line in a fresh interpreter and return the imported modules."""
+    process = subprocess.run([sys.executable, '-c', COMMAND_SCRIPT.format(args)], cwd=cwd, capture_output=True, encoding='utf-8')
+    assert process.returncode == 0, process.stderr
+    return set(json.loads(process.stdout.splitlines()[-1]))
+
+
+@pytest.fixture()
+def validation_json(tmpdir):
+    validation_dict = {'ST000001': {'params': {'STUDY_TITLE': 'First'}, 'analyses': {'AN000001': {
+        'params': {'ANALYSIS_ID': 'AN000001'}, 'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'}, 'issues': ISSUES}}}}
+    tmpdir.join('tmp.json').write(json.dumps(validation_dict))
+    return str(tmpdir.join('tmp.json'))
+
+
+def test_version(tmpdir):
+    modules = run_command(['--version'], str(tmpdir))
+    assert not {'mwtab', 'pandas', 'numpy', 'mwFileStatusWebsite.validator', 'mwFileStatusWebsite.constructor'} & modules
+
+
+def test_generate_help(tmpdir):
+    modules = run_command(['generate', '--help'], str(tmpdir))
+    assert not {'mwtab', 'pandas', 'numpy', 'mwFileStatusWebsite.constructor'} & modules
+
+
+def test_generate(tmpdir, validation_json):
+    modules = run_command(['generate', '--html-path=' + str(tmpdir), '--validation-json=' + validation_json,
+                                    '--history=' + str(tmpdir.join('history.jsonl'))], str(tmpdir))
+    assert 'mwFileStatusWebsite.constructor' in modules
+    assert not {'mwtab', 'pandas', 'setuptools_scm', 'mwFileStatusWebsite.validator', 'mwFileStatusWebsite.serve',
+                'mwFileStatusWebsite.watch', 'mwFileStatusWebsite.query', 'http.server'} & modules
+
+
+def test_validate(tmpdir):
+    modules = run_command(['validate', '--output-path=' + str(tmpdir), '--logs-path=' + str(tmpdir),
+                                    '--studies=ST000001'], str(tmpdir))
+    assert 'mwFileStatusWebsite.validator' in modules
+    # constructor and status_matrix are imported, as history summarizes each run with the StatusMatrix counts
+    assert not {'setuptools_scm', 'mwFileStatusWebsite.serve', 'mwFileStatusWebsite.watch',
+                'mwFileStatusWebsite.search', 'mwFileStatusWebsite.api', 'http.server'} & modules
+
+
+def test_diff(tmpdir, validation_json):
+    modules = run_command(['diff', validation_json, validation_json], str(tmpdir))
+    assert 'mwFileStatusWebsite.rundiff' in modules
+    assert not {'mwtab', 'pandas', 'setuptools_scm', 'mwFileStatusWebsite.validator', 'mwFileStatusWebsite.serve',
+                'http.server'} & modules
+
+
+def test_reindex(tmpdir):
+    tmpdir.mkdir('validation_logs')
+    modules = run_command(['reindex', '--logs-path=' + str(tmpdir.join('validation_logs')), '--output-path=' + str(tmpdir),
+                           '--processes=1'], str(tmpdir))
+    assert 'mwFileStatusWebsite.reindex' in modules
+    assert not {'mwFileStatusWebsite.profiling', 'cProfile', 'tracemalloc', 'mwFileStatusWebsite.serve',
+                'http.server'} & modules
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import pytest
+from mwFileStatusWebsite import cli, profiling, validator
+
+
+FIXTURE_PATH = 'tests/test_files'
+
+
+@pytest.fixture()
+def mirror_path(tmpdir):
+    # the two smallest fixture analyses, copied under the names validate --to-path saves them as
+    for filename in os.listdir(FIXTURE_PATH):
+        match = validator.MIRROR_FILE_REGEX.search(filename)
+        if match and match.group(1) in ('AN002319', 'AN003788'):
+            shutil.copy(os.path.join(FIXTURE_PATH, filename), str(tmpdir.join('{}.{}'.format(*match.groups()))))
+    return str(tmpdir)
+
+
+def report(seconds, functions, peak_memory, allocations):
+    return {
+        'version': profiling.PROFILE_REPORT_VERSION, 'mwtab_version': '1.0', 'python': '3.11.7', 'analyses': list(peak_memory),
+        'phases': {phase: {'seconds': seconds, 'functions': functions} for phase in profiling.PHASES},
+        'allocations': allocations, 'peak_memory': peak_memory,
+    }
+
+
+def test_sample_analyses():
+    analysis_ids = ['AN{:06d}'.format(number) for number in range(100)]
+    sample = profiling.sample_analyses(analysis_ids, 10, seed=3)
+    assert len(sample) == 10
+    assert sample == sorted(sample)
+    assert sample == profiling.sample_analyses(reversed(analysis_ids), 10, seed=3)
+    assert profiling.sample_analyses(analysis_ids[:5], 10) == analysis_ids[:5]
+
+
+def test_function_name():
+    assert profiling.function_name(('~', 0, "<built-in method builtins.next>")) == "<built-in method builtins.next>"
+    assert profiling.function_name((profiling.__file__, 10, 'find_mirror_files')) == \
+        "mwFileStatusWebsite/profiling.py:10(find_mirror_files)"
+
+
+def test_create_report(mirror_path):
+    profile_report = profiling.create_report(mirror_path, top=5)
+    assert profile_report['analyses'] == ['AN002319', 'AN003788']
+    assert sorted(profile_report['peak_memory']) == ['AN002319', 'AN003788']
+    assert all(peak > 0 for peak in profile_report['peak_memory'].values())
+    assert 0 < len(profile_report['allocations']) <= 5
+    functions = [function['function'] for function in profile_report['phases']['validate']['functions']]
+    assert any('(_validate)' in function for function in functions)
+    assert any('(compare)' in function['function'] for function in profile_report['phases']['compare']['functions'])
+    assert any('(create_html)' in function['function'] for function in profile_report['phases']['html']['functions'])
+    assert 'peak memory per analysis:' in profiling.format_report(profile_report)
+
+
+def test_create_report_empty_mirror(tmpdir):
+    with pytest.raises(ValueError):
+        profiling.create_report(str(tmpdir))
+
+
+def test_diff_reports():
+    old_report = report(2.0, [{'function': 'mwtab/validator.py:10(validate_file)', 'calls': 1, 'tottime': 1.0, 'cumtime': 1.5}],
+                        {'AN000001': 1000, 'AN000002': 500}, [{'site': 'mwtab/mwtab.py:5', 'size': 100, 'count': 1}])
+    new_report = report(3.0, [{'function': 'mwtab/validator.py:12(validate_file)', 'calls': 1, 'tottime': 1.0, 'cumtime': 2.5},
+                              {'function': 'mwtab/validator.py:40(new_check)', 'calls': 1, 'tottime': 0.5, 'cumtime': 0.5}],
+                        {'AN000001': 3000}, [{'site': 'mwtab/mwtab.py:5', 'size': 50, 'count': 1}])
+    diff = profiling.diff_reports(old_report, new_report)
+    assert diff['analyses'] == ['AN000001']
+    assert diff['phases']['validate']['delta'] == 1.0
+    assert diff['phases']['validate']['ratio'] == 1.5
+    # matched across line numbers, sorted by the largest change
+    assert diff['phases']['validate']['functions'] == [
+        {'function': 'mwtab/validator.py(validate_file)', 'old': 1.5, 'new': 2.5, 'delta': 1.0, 'ratio': 1.6667},
+        {'function': 'mwtab/validator.py(new_check)', 'old': 0, 'new': 0.5, 'delta': 0.5, 'ratio': None},
+    ]
+    assert diff['peak_memory'] == {'AN000001': {'old': 1000, 'new': 3000, 'delta': 2000, 'ratio': 3.0}}
+    assert diff['peak_memory_total']['delta'] == 2000
+    assert diff['allocations'] == [{'site': 'mwtab/mwtab.py:5', 'old': 100, 'new': 50, 'delta': -50, 'ratio': 0.5}]
+    assert 'mwtab 1.0 -> 1.0, 1 common analyses' in profiling.format_diff(diff)
+
+
+def test_load_report_invalid_version(tmpdir):
+    tmpdir.join('report.json').write(json.dumps({'version': 0}))
+    with pytest.raises(ValueError):
+        profiling.load_report(str(tmpdir.join('report.json')))
+
+
+def test_cli_profile(mirror_path, tmpdir, capsys):
+    report_path = str(tmpdir.join('report.json'))
+    cli.cli({'profile': True, '<mirror-path>': mirror_path, '--sample': '1', '--seed': '0', '--top': '3',
+             '--report': report_path, 'validate': False})
+    assert 'mwtab' in capsys.readouterr().out
+    assert len(profiling.load_report(report_path)['analyses']) == 1
+
+    cli.cli({'profile': True, '--diff': True, '<old-report>': report_path, '<new-report>': report_path, 'validate': False})
+    assert '1 common analyses' in capsys.readouterr().out
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import time
+import pytest
+import mwtab
+from mwFileStatusWebsite import progress, validator
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture()
+def disable_sleep(monkeypatch):
+    def no_sleep(arg):
+        pass
+    monkeypatch.setattr('mwFileStatusWebsite.validator.sleep', no_sleep)
+
+@pytest.fixture(scope='module')
+def study_analysis_dict():
+    with open('tests/test_files/study_analysis_dict.json', 'r') as jsonFile:
+        study_analysis_dict = json.load(jsonFile)
+    yield study_analysis_dict
+
+def read_test_data(an_id, file_format):
+    path = f'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{an_id}%2Fmwtab%2F{file_format}.{file_format}'
+    tabfile = mwtab.mwtab.MWTabFile(str(path), duplicate_keys=True)
+    with open(path, encoding="utf-8") as f:
+        tabfile.read(f)
+    yield tabfile
+
+
+@pytest.mark.parametrize("seconds, duration", [
+    (None, "-:--:--"),
+    (0, "0:00:00"),
+    (59.6, "0:01:00"),
+    (3725, "1:02:05"),
+    (90000, "25:00:00"),
+])
+def test_format_duration(seconds, duration):
+    assert progress.format_duration(seconds) == duration
+
+
+def test_snapshot():
+    clock = FakeClock()
+    reporter = progress.Progress(total=10, interval=0, window=3, clock=clock)
+    reporter.start()
+    reporter.fetch_started()
+    reporter.retried()
+    for status in ('Passing', 'Passing', 'Parsing Error'):
+        clock.now += 2
+        reporter.analysis_done({'txt': status, 'json': 'Passing', 'comparison': 'Not Checked'})
+    clock.now += 1
+    progress_dict = reporter.snapshot()
+    assert progress_dict['completed'] == 3
+    assert progress_dict['total'] == 10
+    assert progress_dict['in_flight'] == 1
+    assert progress_dict['retries'] == 1
+    assert progress_dict['elapsed'] == 7
+    assert progress_dict['idle'] == 1
+    # the window holds the last 3 completions, 2 analyses in the 5 seconds since the first of them
+    assert progress_dict['throughput'] == 0.4
+    assert progress_dict['eta'] == 17.5
+    assert progress_dict['statuses'] == {'txt': {'Passing': 2, 'Parsing Error': 1}, 'json': {'Passing': 3},
+                                         'comparison': {'Not Checked': 3}}
+
+
+def test_throughput_before_first_completion():
+    clock = FakeClock()
+    reporter = progress.Progress(total=2, interval=0, clock=clock)
+    assert reporter.throughput() == 0.0
+    assert reporter.snapshot()['eta'] is None
+    clock.now += 4
+    reporter.analysis_done({'txt': 'Passing'})
+    assert reporter.throughput() == 0.25
+
+
+def test_report(tmpdir):
+    clock = FakeClock()
+    stream = io.StringIO()
+    json_path = str(tmpdir.join('progress.jsonl'))
+    reporter = progress.Progress(total=2, stream=stream, json_path=json_path, interval=0, clock=clock)
+    reporter.start()
+    clock.now += 10
+    reporter.analysis_done({'txt': 'Passing', 'json': 'Validation Error', 'comparison': 'Not Checked'})
+    reporter.report()
+    clock.now += 10
+    reporter.analysis_done({'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'})
+    reporter.close()
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0] == "Progress: 1/2 (50.0%), 0.10 analyses/s, ETA 0:00:10, elapsed 0:00:10, 0 in flight, 0 retries | " \
+                       "txt: Passing 1; json: Validation Error 1; comparison: Not Checked 1"
+    assert lines[1].startswith("Progress: 2/2 (100.0%)")
+
+    with open(json_path) as fh:
+        reports = [json.loads(line) for line in fh]
+    assert [report['final'] for report in reports] == [False, True]
+    assert reports[1]['completed'] == 2
+    assert reports[1]['eta'] == 0.0
+    assert reports[1]['statuses']['json'] == {'Validation Error': 1, 'Passing': 1}
+
+
+def test_periodic_reports():
+    stream = io.StringIO()
+    with progress.Progress(total=1, stream=stream, interval=0.01) as reporter:
+        while stream.getvalue().count("\n") < 2:
+            time.sleep(0.001)
+        reporter.analysis_done({'txt': 'Passing'})
+    assert stream.getvalue().splitlines()[-1].startswith("Progress: 1/1")
+
+
+def test_validate_mwtab_rest_progress(study_analysis_dict, mocker, disable_sleep, tmpdir):
+    mocker.patch('mwFileStatusWebsite.validator.mwtab.read_files', side_effect = [Exception(),
+                                                                                  read_test_data('AN000001', 'txt'),
+                                                                                  read_test_data('AN000001', 'json'),
+                                                                                  read_test_data('AN000023', 'txt'),
+                                                                                  read_test_data('AN000023', 'json'),
+                                                                                  read_test_data('AN000024', 'txt'),
+                                                                                  read_test_data('AN000024', 'json')])
+    reporter = progress.Progress(interval=0)
+    validation_dict = validator.validate_mwtab_rest(input_dict = study_analysis_dict, logs_path = str(tmpdir),
+                                                    output_file = str(tmpdir.join('tmp.json')), progress = reporter)
+    progress_dict = reporter.report(final=True)
+    assert progress_dict['total'] == progress_dict['completed'] == 3
+    assert progress_dict['retries'] == 1
+    assert progress_dict['in_flight'] == 0
+    comparison_statuses = [validation_dict[study_id]['analyses'][analysis_id]['status']['comparison']
+                           for study_id in validation_dict for analysis_id in validation_dict[study_id]['analyses']]
+    assert sum(progress_dict['statuses']['comparison'].values()) == len(comparison_statuses)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+import pytest
+import mwFileStatusWebsite
+from mwFileStatusWebsite.query import QueryIndex, parse, load_page_config
+
+
+STATUSES = ["Passing", "Warnings Only", "Validation Error", "Parsing Error", "Missing/Blank"]
+
+
+@pytest.fixture(scope='module')
+def validation_dict():
+    rng = random.Random(1)
+    validation_dict = {}
+    analysis_number = 0
+    for study_number in range(1, 40):
+        study_id = 'ST{:06d}'.format(study_number)
+        validation_dict[study_id] = {'params': {'STUDY_TITLE': study_id, 'INSTITUTE': rng.choice(['University of Kentucky', 'UCSD'])},
+                                     'analyses': {}}
+        for _ in range(rng.randint(1, 4)):
+            analysis_number += 1
+            analysis_id = 'AN{:06d}'.format(analysis_number)
+            status = {'txt': rng.choice(STATUSES), 'json': rng.choice(STATUSES)}
+            if rng.random() < 0.8:
+                status['comparison'] = rng.choice(['Consistent', 'Inconsistent', 'Not Checked'])
+            validation_dict[study_id]['analyses'][analysis_id] = {
+                'params': {'ANALYSIS_ID': analysis_id},
+                'status': status,
+                'issues': {fmt: {issue: rng.random() < 0.3 for issue in ('value', 'consistency', 'format')} for fmt in ('txt', 'json')},
+            }
+    return validation_dict
+
+
+def matching(validation_dict, predicate):
+    """Brute force reference: analysis IDs whose (study params, analysis dict) satisfy predicate."""
+    return [analysis_id for study_id in validation_dict for analysis_id, analysis_dict in validation_dict[study_id]['analyses'].items()
+            if predicate(validation_dict[study_id]['params'], analysis_dict)]
+
+
+def issue(analysis_dict, issue_type, formats=('txt', 'json')):
+    return any(analysis_dict['issues'][fmt][issue_type] for fmt in formats)
+
+
+@pytest.mark.parametrize('query_str, predicate', [
+    ('txt = Passing and json = "Parsing Error"',
+     lambda params, a: a['status']['txt'] == 'Passing' and a['status']['json'] == 'Parsing Error'),
+    ('comparison = Inconsistent and issue = value',
+     lambda params, a: a['status'].get('comparison') == 'Inconsistent' and issue(a, 'value')),
+    ('status = "Missing/Blank" or json.issue = format',
+     lambda params, a: 'Missing/Blank' in (a['status']['txt'], a['status']['json']) or issue(a, 'format', ['json'])),
+    ('not (txt = Passing or txt = "Warnings Only") AND params.INSTITUTE ~ kentucky',
+     lambda params, a: a['status']['txt'] not in ('Passing', 'Warnings Only') and 'kentucky' in params['INSTITUTE'].lower()),
+    ('txt != Passing and comparison ~ "not"',
+     lambda params, a: a['status']['txt'] != 'Passing' and a['status'].get('comparison') == 'Not Checked'),
+    ('study = ST000003 or analysis = AN000010',
+     lambda params, a: params['STUDY_TITLE'] == 'ST000003' or a['params']['ANALYSIS_ID'] == 'AN000010'),
+    ('status ~ error and not txt.issue = consistency',
+     lambda params, a: ('Error' in a['status']['txt'] or 'Error' in a['status']['json']) and not issue(a, 'consistency', ['txt'])),
+])
+def test_evaluate_matches_brute_force(validation_dict, query_str, predicate):
+    query_index = QueryIndex(validation_dict)
+    assert query_index.status_matrix.analysis_ids_of(query_index.evaluate(query_str)) == matching(validation_dict, predicate)
+
+
+def test_select_matches_constructor_filters(validation_dict):
+    query_index = QueryIndex(validation_dict)
+    assert query_index.select('status = "Parsing Error"') == \
+        mwFileStatusWebsite.constructor.filter_analyses_by_status(validation_dict, 'Parsing Error')
+    assert query_index.select('txt.issue = value and json.issue = value') == \
+        mwFileStatusWebsite.constructor.filter_analyses_by_issues(validation_dict, 'value', True)
+
+
+def test_parse():
+    assert parse('not a = 1 or b ~ "x y" and (c != 2)') == \
+        ('or', ('not', ('cmp', 'a', '=', '1')), ('and', ('cmp', 'b', '~', 'x y'), ('cmp', 'c', '!=', '2')))
+
+
+@pytest.mark.parametrize('query_str', ['', 'txt =', 'txt Passing', '(txt = Passing', 'txt = Passing)', 'txt = Passing and'])
+def test_parse_errors(query_str):
+    with pytest.raises(ValueError):
+        parse(query_str)
+
+
+@pytest.mark.parametrize('query_str', ['unknown = 1', 'issue = warnings'])
+def test_evaluate_errors(validation_dict, query_str):
+    with pytest.raises(ValueError):
+        QueryIndex(validation_dict).evaluate(query_str)
+
+
+def test_load_page_config(tmpdir):
+    config_path = tmpdir.join('pages.json')
+    config_path.write(json.dumps({'pages': [{'filename': 'a.html', 'query': 'txt = Passing'}]}))
+    assert load_page_config(str(config_path)) == [('a.html', ('cmp', 'txt', '=', 'Passing'))]
+
+    config_path.write(json.dumps({'pages': [{'filename': 'b.html', 'query': 'txt = '}]}))
+    with pytest.raises(ValueError, match='b.html'):
+        load_page_config(str(config_path))
+
+    # the pages are written to the html directory, not elsewhere
+    for filename in ('../x.html', 'pages/x.html', '/tmp/x.html', 'x.htm', 'x.html\n', None):
+        config_path.write(json.dumps({'pages': [{'filename': filename, 'query': 'txt = Passing'}]}))
+        with pytest.raises(ValueError, match='without a directory'):
+            load_page_config(str(config_path))
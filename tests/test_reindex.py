@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import shutil
+import mwtab
+import pytest
+from mwFileStatusWebsite import cli, reindex, validator
+
+
+FIXTURE_PATH = 'tests/test_files'
+HEADER = """Validation Log
+2024-01-01 00:00:00.000000
+mwtab Python Library Version: 2.1.1
+Source:        https://www.metabolomicsworkbench.org/rest/study/analysis_id/{1}/mwtab/{2}
+Study ID:      {0}
+Analysis ID:   {1}
+File format:   {2}
+"""
+COUNTS = """Status: {}
+Number of Issues: {}
+
+Number of Warnings: {}
+
+Number of Value Errors: {}
+
+Number of Consistency Errors: {}
+
+Number of Format Errors: {}
+
+Issue Log:
+"""
+COMPARISON = """Comparison Log
+2024-01-01 00:00:00.000000
+mwtab Python Library Version: 2.1.1
+Source:      https://www.metabolomicsworkbench.org/rest/study/analysis_id/{1}/mwtab/...
+Study ID:    {0}
+Analysis ID: {1}
+Status:      {2}
+"""
+
+
+def validation_log(study_id, analysis_id, file_format, issues=(), warnings=(), value=0, consistency=0, format=0):
+    status = 'Passing' if not issues and not warnings else 'Contains Validation Issues'
+    return HEADER.format(study_id, analysis_id, file_format) + \
+        COUNTS.format(status, len(issues) + len(warnings), len(warnings), value, consistency, format) + \
+        '\n'.join(['Error: ' + issue for issue in issues] + ['Warning: ' + warning for warning in warnings])
+
+
+@pytest.fixture()
+def logs_path(tmpdir):
+    logs = {
+        'AN000001_txt.log': validation_log('ST000001', 'AN000001', 'txt'),
+        'AN000001_json.log': validation_log('ST000001', 'AN000001', 'json'),
+        'AN000001_comparison.log': COMPARISON.format('ST000001', 'AN000001', 'Consistent'),
+        # the column warning has no tag and the missing section warning is a format warning, so only value is an error
+        'AN000002_txt.log': validation_log('ST000001', 'AN000002', 'txt', issues=['A value is missing.'],
+                                           warnings=['The column "Samples" is duplicated.', 'Missing MS section.'],
+                                           value=1, format=1),
+        'AN000002_json.log': validation_log('ST000001', 'AN000002', 'json', warnings=['A value is odd.'], value=1),
+        'AN000002_comparison.log': COMPARISON.format('ST000001', 'AN000002', 'Inconsistent'),
+        # a stale comparison log of an analysis whose json file can no longer be parsed
+        'AN000003_txt.log': validation_log('ST000002', 'AN000003', 'txt', issues=['Factors differ.'], consistency=1),
+        'AN000003_json.log': HEADER.format('ST000002', 'AN000003', 'json') +
+                             'Status:Parsing Error\nTraceback (most recent call last):\nValueError: Status: bad\n',
+        'AN000003_comparison.log': COMPARISON.format('ST000002', 'AN000003', 'Consistent'),
+        'AN000004_txt.log': HEADER.format('ST000002', 'AN000004', 'txt') + 'Status:Missing/Blank\nBlank input string retrieved from source.',
+        'AN000004_json.log': HEADER.format('ST000002', 'AN000004', 'json').replace('2.1.1', '1.2.5') +
+                             'Status: Contains Validation Errors\nNumber Errors: 1\n\nError Log:\nSection missing sample ID(s).\n',
+        'README.md': 'not a log',
+    }
+    for filename, log in logs.items():
+        tmpdir.join(filename).write_text(log, encoding='utf-8')
+    return str(tmpdir)
+
+
+def test_parse_log(logs_path):
+    assert reindex.parse_log(os.path.join(logs_path, 'AN000002_txt.log')) == (
+        'AN000002', 'txt', 'ST000001', 'Validation Error', {'value': True, 'consistency': False, 'format': False})
+    assert reindex.parse_log(os.path.join(logs_path, 'AN000002_json.log')) == (
+        'AN000002', 'json', 'ST000001', 'Warnings Only', {'value': False, 'consistency': False, 'format': False})
+    assert reindex.parse_log(os.path.join(logs_path, 'AN000003_json.log')) == ('AN000003', 'json', 'ST000002', 'Parsing Error', None)
+    assert reindex.parse_log(os.path.join(logs_path, 'AN000004_json.log')) == ('AN000004', 'json', 'ST000002', 'Validation Error', None)
+    assert reindex.parse_log(os.path.join(logs_path, 'AN000001_comparison.log')) == ('AN000001', 'comparison', 'ST000001', 'Consistent', None)
+
+
+def test_reindex_missing_study_id(tmpdir):
+    # mwtab wrote "Study ID: None" into the txt and json logs of AN000614, its comparison log names the study
+    for file_format in ('txt', 'json', 'comparison'):
+        shutil.copy(os.path.join('validation_logs', 'AN000614_{}.log'.format(file_format)), str(tmpdir))
+    assert reindex.parse_log(str(tmpdir.join('AN000614_txt.log')))[2] is None
+    validation_dict = reindex.reindex(str(tmpdir), processes=1)
+    assert list(validation_dict) == ['ST000380']
+    assert validation_dict['ST000380']['analyses']['AN000614']['status']['comparison'] == 'Consistent'
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_reindex(logs_path, processes, monkeypatch):
+    # parse in a process pool even for a handful of logs
+    monkeypatch.setattr(reindex, 'REINDEX_CHUNKSIZE', 1)
+    validation_dict = reindex.reindex(logs_path, processes=processes)
+
+    assert sorted(validation_dict) == ['ST000001', 'ST000002']
+    assert all(study_dict['params'] == {} for study_dict in validation_dict.values())
+    analyses = {analysis_id: analysis_dict for study_dict in validation_dict.values() for analysis_id, analysis_dict in study_dict['analyses'].items()}
+    assert {analysis_id: analysis_dict['status'] for analysis_id, analysis_dict in analyses.items()} == {
+        'AN000001': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+        'AN000002': {'txt': 'Validation Error', 'json': 'Warnings Only', 'comparison': 'Inconsistent'},
+        'AN000003': {'txt': 'Validation Error', 'json': 'Parsing Error', 'comparison': 'Not Checked'},
+        'AN000004': {'txt': 'Missing/Blank', 'json': 'Validation Error', 'comparison': 'Not Checked'},
+    }
+    assert analyses['AN000002']['issues']['txt'] == {'value': True, 'consistency': False, 'format': False}
+    assert analyses['AN000003']['issues']['txt'] == {'value': False, 'consistency': True, 'format': False}
+    assert analyses['AN000004']['issues']['json'] == {'value': False, 'consistency': False, 'format': False}
+
+
+@pytest.mark.parametrize('analysis_id', ['AN000001', 'AN000023', 'AN002319', 'AN003788'])
+def test_parse_log_matches_validator(analysis_id, tmpdir):
+    # the statuses and issue flags parsed from a log are the ones the validator took from mwtab's issue list
+    for file_format in ('txt', 'json'):
+        filepath = os.path.join(FIXTURE_PATH, 'https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F'
+                                '{0}%2Fmwtab%2F{1}.{1}'.format(analysis_id, file_format))
+        log, validation_json = mwtab.validate_file(next(mwtab.read_files(filepath)))
+        tmpdir.join('{}_{}.log'.format(analysis_id, file_format)).write_text(log, encoding='utf-8')
+        assert reindex.parse_log(str(tmpdir.join('{}_{}.log'.format(analysis_id, file_format))))[3:] == \
+            validator.parse_validation_status(log, validation_json)
+
+
+def test_fill_study_params(logs_path, tmpdir_factory):
+    # AN000001 with both formats (the json file is read), and AN000023's txt file standing in for AN000004
+    mirror_path = tmpdir_factory.mktemp('mirror')
+    for filename in os.listdir(FIXTURE_PATH):
+        match = validator.MIRROR_FILE_REGEX.search(filename)
+        if match and (match.group(1) == 'AN000001' or match.groups() == ('AN000023', 'txt')):
+            shutil.copy(os.path.join(FIXTURE_PATH, filename),
+                        str(mirror_path.join('{}.{}'.format(match.group(1).replace('AN000023', 'AN000004'), match.group(2)))))
+
+    validation_dict = reindex.reindex(logs_path, mirror_path=str(mirror_path), processes=1)
+    assert validation_dict['ST000001']['params'] == dict(next(mwtab.read_files(str(mirror_path.join('AN000001.txt'))))['STUDY'])
+    assert validation_dict['ST000002']['params'] == dict(next(mwtab.read_files(str(mirror_path.join('AN000004.txt'))))['STUDY'])
+    assert reindex.fill_study_params(validation_dict, str(mirror_path), processes=1) == 0
+    assert reindex.read_study_params(str(mirror_path.join('missing.json'))) == {}
+
+
+def test_cli_reindex(logs_path, tmpdir_factory, capsys):
+    output_path = tmpdir_factory.mktemp('output')
+    cli.cli({'validate': False, 'reindex': True, '--logs-path': logs_path, '--output-path': str(output_path),
+             '--mirror': None, '--processes': '1', '--verbose': False})
+    with open(str(output_path.join('tmp.json'))) as fh:
+        assert json.loads(fh.read()) == reindex.reindex(logs_path, processes=1)
+    assert not output_path.join('history.jsonl').check()
+    assert 'Reindexed 2 studies, 4 analyses' in capsys.readouterr().out
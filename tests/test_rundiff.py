@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import copy
+import json
+import pytest
+from mwFileStatusWebsite import rundiff
+
+
+ISSUES = {file_format: {'value': False, 'consistency': False, 'format': False} for file_format in ('txt', 'json')}
+
+
+def analysis(txt, json='Passing', comparison='Consistent', value_issues=False):
+    issues = copy.deepcopy(ISSUES)
+    issues['txt']['value'] = value_issues
+    return {'status': {'txt': txt, 'json': json, 'comparison': comparison}, 'issues': issues}
+
+
+@pytest.fixture()
+def results_files(tmpdir):
+    old_dict = {
+        'ST000001': {'params': {'STUDY_TITLE': 'First'}, 'analyses': {
+            'AN000001': analysis('Passing'), 'AN000002': analysis('Validation Error'), 'AN000003': analysis('Passing')}},
+        'ST000002': {'params': {'STUDY_TITLE': 'Second'}, 'analyses': {
+            'AN000004': analysis('Passing'), 'AN000005': analysis('Passing')}},
+    }
+    new_dict = {
+        'ST000001': {'params': {'STUDY_TITLE': 'First'}, 'analyses': {
+            'AN000001': analysis('Validation Error', comparison='Inconsistent'), 'AN000002': analysis('Passing'),
+            'AN000003': analysis('Passing', value_issues=True)}},
+        'ST000002': {'params': {'STUDY_TITLE': 'Second, revised'}, 'analyses': {'AN000004': analysis('Passing')}},
+        'ST000003': {'params': {'STUDY_TITLE': 'Third'}, 'analyses': {'AN000006': analysis('Parsing Error')}},
+    }
+    old_path, new_path = str(tmpdir.join('old.json')), str(tmpdir.join('new.json'))
+    with open(old_path, 'w') as fh:
+        fh.write(json.dumps(old_dict, indent=4))
+    with open(new_path, 'w') as fh:
+        fh.write(json.dumps(new_dict))
+    return old_path, new_path, old_dict, new_dict
+
+
+def test_iter_studies(results_files, tmpdir):
+    old_path, new_path, old_dict, new_dict = results_files
+    assert list(rundiff.iter_studies(old_path)) == list(old_dict.items())
+    assert list(rundiff.iter_studies(new_path)) == list(new_dict.items())
+    # studies larger than a chunk, and chunks ending anywhere
+    for chunk_size in (1, 7, 100):
+        assert list(rundiff.iter_studies(old_path, chunk_size=chunk_size)) == list(old_dict.items())
+
+    tmpdir.join('truncated.json').write(json.dumps(old_dict)[:-10])
+    with pytest.raises(json.JSONDecodeError):
+        list(rundiff.iter_studies(str(tmpdir.join('truncated.json')), chunk_size=16))
+
+    tmpdir.join('empty.json').write(' {\n} ')
+    assert list(rundiff.iter_studies(str(tmpdir.join('empty.json')))) == []
+    tmpdir.join('list.json').write('[]')
+    with pytest.raises(ValueError, match='not a validation JSON file'):
+        list(rundiff.iter_studies(str(tmpdir.join('list.json'))))
+    tmpdir.join('blank.json').write('  ')
+    with pytest.raises(ValueError, match="expected '{' at character 2"):
+        list(rundiff.iter_studies(str(tmpdir.join('blank.json'))))
+    tmpdir.join('unterminated.json').write('{"ST000001": {}  ]')
+    with pytest.raises(ValueError, match="expected ',}' at character 17"):
+        list(rundiff.iter_studies(str(tmpdir.join('unterminated.json')), chunk_size=4))
+
+
+def test_diff_results(results_files):
+    old_path, new_path, _, _ = results_files
+    report = rundiff.diff_results(old_path, new_path)
+    assert (report['old_analyses'], report['analyses'], report['changed'], report['regressions']) == (5, 5, 2, 1)
+    assert report['transitions'] == {'txt': {'Passing -> Validation Error': 1, 'Validation Error -> Passing': 1},
+                                     'json': {}, 'comparison': {'Consistent -> Inconsistent': 1}}
+    assert report['changes'] == [
+        {'study_id': 'ST000001', 'analysis_id': 'AN000001', 'from': 'PPC', 'to': 'VPI', 'regression': True},
+        {'study_id': 'ST000001', 'analysis_id': 'AN000002', 'from': 'VPC', 'to': 'PPC', 'regression': False},
+    ]
+    assert report['added'] == [{'study_id': 'ST000003', 'analysis_id': 'AN000006', 'to': 'EPC'}]
+    assert report['removed'] == [{'study_id': 'ST000002', 'analysis_id': 'AN000005', 'from': 'PPC'}]
+    assert report['updated'] == [{'study_id': 'ST000001', 'analysis_id': 'AN000003'}]
+    assert report['moved'] == []
+    assert report['params_changed'] == ['ST000002']
+
+    assert rundiff.changed_ids(report) == ['AN000001', 'AN000002', 'AN000006', 'AN000005', 'AN000003']
+    assert rundiff.changed_ids(report, by_study=True) == ['ST000001', 'ST000003', 'ST000002']
+    assert rundiff.format_report(report).splitlines() == [
+        '{} -> {}: 2 of 5 analyses changed status, 1 regressions, 1 added, 1 removed, 1 updated, 0 moved'.format(old_path, new_path),
+        '\ttxt: Passing -> Validation Error (1)',
+        '\ttxt: Validation Error -> Passing (1)',
+        '\tcomparison: Consistent -> Inconsistent (1)',
+        'Regressions: AN000001',
+        'STUDY parameters changed: ST000002',
+    ]
+
+
+def test_diff_moved(results_files, tmpdir):
+    old_path, _, old_dict, _ = results_files
+    # AN000005 moved to the first study, unchanged otherwise
+    moved_dict = copy.deepcopy(old_dict)
+    moved_dict['ST000001']['analyses']['AN000005'] = moved_dict['ST000002']['analyses'].pop('AN000005')
+    moved_path = str(tmpdir.join('moved.json'))
+    with open(moved_path, 'w') as fh:
+        fh.write(json.dumps(moved_dict))
+
+    report = rundiff.diff_results(old_path, moved_path)
+    assert (report['changed'], report['added'], report['removed'], report['updated']) == (0, [], [], [])
+    assert report['moved'] == [{'study_id': 'ST000001', 'analysis_id': 'AN000005', 'from_study_id': 'ST000002'}]
+    assert rundiff.changed_ids(report) == ['AN000005']
+    assert rundiff.changed_ids(report, by_study=True) == ['ST000001', 'ST000002']
+    assert 'Moved: AN000005 (ST000002 -> ST000001)' in rundiff.format_report(report).splitlines()
+
+
+def test_diff_identical(results_files):
+    old_path, _, _, _ = results_files
+    report = rundiff.diff_results(old_path, old_path)
+    assert report['changed'] == 0
+    assert rundiff.changed_ids(report) == []
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import pytest
+from mwFileStatusWebsite import sampling
+
+
+def analysis(txt, json='Passing', comparison='Consistent', **kwargs):
+    return dict({'status': {'txt': txt, 'json': json, 'comparison': comparison}}, **kwargs)
+
+
+@pytest.fixture()
+def study_analysis_dict():
+    # 10 studies of 10 analyses each
+    return {'ST{:06d}'.format(study): ['AN{:06d}'.format(10 * study + analysis) for analysis in range(10)]
+            for study in range(10)}
+
+
+@pytest.fixture()
+def previous_dict(study_analysis_dict):
+    # 90 passing analyses, 5 with validation errors and 5 new ones
+    previous_dict = {}
+    for study_id, analysis_ids in study_analysis_dict.items():
+        previous_dict[study_id] = {'params': {}, 'analyses': {analysis_id: analysis('Passing') for analysis_id in analysis_ids}}
+    for analysis_id in ('AN000000', 'AN000011', 'AN000022', 'AN000033', 'AN000044'):
+        previous_dict['ST00000' + analysis_id[-2]]['analyses'][analysis_id] = analysis('Passing', json='Validation Error')
+    for analysis_id in ('AN000095', 'AN000096', 'AN000097', 'AN000098', 'AN000099'):
+        del previous_dict['ST000009']['analyses'][analysis_id]
+    return previous_dict
+
+
+def test_allocate():
+    assert sampling.allocate({'New': 5, 'Passing': 90, 'Validation Error': 5}, 20) == {'New': 1, 'Passing': 18, 'Validation Error': 1}
+    # every stratum gets an analysis, and no stratum more than it has
+    assert sampling.allocate({'New': 1, 'Passing': 1000}, 10) == {'New': 1, 'Passing': 9}
+    assert sampling.allocate({'New': 2, 'Passing': 3}, 10) == {'New': 2, 'Passing': 3}
+    # too small a sample for every stratum goes to the largest
+    assert sampling.allocate({'New': 1, 'Passing': 10, 'Parsing Error': 5}, 2) == {'New': 0, 'Passing': 1, 'Parsing Error': 1}
+
+
+def test_draw_sample(study_analysis_dict, previous_dict):
+    sample_dict, strata_dict = sampling.draw_sample(study_analysis_dict, 20, seed=3, previous_dict=previous_dict)
+    assert sampling.draw_sample(study_analysis_dict, 20, seed=3, previous_dict=previous_dict) == (sample_dict, strata_dict)
+    assert sampling.draw_sample(study_analysis_dict, 20, seed=4, previous_dict=previous_dict)[0] != sample_dict
+
+    assert list(strata_dict) == ['New', 'Passing', 'Validation Error']
+    assert {bucket: (stratum['population'], len(stratum['sampled'])) for bucket, stratum in strata_dict.items()} == \
+        {'New': (5, 1), 'Passing': (90, 18), 'Validation Error': (5, 1)}
+    assert sum(len(analysis_ids) for analysis_ids in sample_dict.values()) == 20
+    for study_id, analysis_ids in sample_dict.items():
+        assert analysis_ids == [analysis_id for analysis_id in study_analysis_dict[study_id] if analysis_id in analysis_ids]
+
+
+
+def test_draw_sample_equal_inclusion():
+    # one study of 20 analyses and 10 studies of one analysis each
+    study_analysis_dict = {'ST000000': ['AN{:06d}'.format(analysis) for analysis in range(20)]}
+    study_analysis_dict.update(('ST{:06d}'.format(study), ['AN{:06d}'.format(100 + study)]) for study in range(1, 11))
+    draws = 500
+    large = sum(len(sampling.draw_sample(study_analysis_dict, 10, seed=seed)[0].get('ST000000', [])) for seed in range(draws))
+    # every analysis has a 1/3 chance to be sampled, also those of the large study
+    assert large / (20 * draws) == pytest.approx(1 / 3, abs=0.05)
+
+
+def test_estimate_proportions():
+    strata_dict = {'Passing': {'population': 90, 'sampled': ['AN000001', 'AN000002', 'AN000003', 'AN000004']},
+                   'Validation Error': {'population': 10, 'sampled': ['AN000005', 'AN000006']},
+                   'New': {'population': 100, 'sampled': ['AN000007']}}
+    validation_dict = {'ST000001': {'params': {}, 'analyses': {
+        'AN000001': analysis('Passing'), 'AN000002': analysis('Passing'), 'AN000003': analysis('Passing'),
+        'AN000004': analysis('Validation Error'), 'AN000005': analysis('Validation Error'), 'AN000006': analysis('Validation Error'),
+        # carried over by a time budget, so not validated
+        'AN000007': analysis('Passing', carried_over=True)}}}
+    estimates = sampling.estimate_proportions(validation_dict, strata_dict, seed=5)
+
+    assert (estimates['population'], estimates['sampled'], estimates['validated']) == (200, 7, 6)
+    assert estimates['strata']['New'] == {'population': 100, 'sampled': 1, 'validated': 0}
+    passing = estimates['estimates']['txt']['Passing']
+    # 0.9 * 3/4 of the 100 analyses of the validated strata
+    assert passing['proportion'] == pytest.approx(0.675)
+    assert passing['analyses'] == 68
+    assert passing['low'] < passing['proportion'] < passing['high'] <= 1
+    assert estimates['estimates']['json']['Passing'] == {'proportion': 1.0, 'low': 1.0, 'high': 1.0, 'analyses': 100}
+    assert estimates['estimates']['txt']['Parsing Error']['high'] == 0
+
+    text = sampling.format_estimates(estimates)
+    assert text.splitlines()[0] == 'Validated 6 of 7 sampled analyses (seed 5), out of 200'
+    assert '\ttxt Passing: 67.5% (' in text
+    assert 'Parsing Error' not in text
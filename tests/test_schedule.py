@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+import os
+from datetime import datetime
+import pytest
+from mwFileStatusWebsite import history, schedule, validator
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def analysis(txt, json='Validation Error', comparison='Consistent'):
+    return {'status': {'txt': txt, 'json': json, 'comparison': comparison},
+            'issues': {file_format: {'value': False, 'consistency': False, 'format': False} for file_format in ('txt', 'json')}}
+
+
+@pytest.fixture()
+def previous_dict():
+    return {
+        'ST000001': {'params': {'STUDY_ID': 'ST000001'}, 'analyses': {
+            'AN000001': analysis('Validation Error'),
+            'AN000002': analysis('Parsing Error', comparison='Not Checked'),
+            'AN000003': analysis('Validation Error'),
+        }},
+        'ST000002': {'params': {'STUDY_ID': 'ST000002'}, 'analyses': {
+            'AN000004': analysis('Passing', 'Missing/Blank', 'Not Checked'),
+            'AN000005': analysis('Passing'),
+        }},
+    }
+
+
+@pytest.fixture()
+def study_analysis_dict():
+    return {'ST000001': ['AN000001', 'AN000002', 'AN000003'], 'ST000002': ['AN000004', 'AN000005'], 'ST000003': ['AN000006']}
+
+
+@pytest.fixture()
+def logs_path(tmpdir):
+    # AN000001 was validated longest ago, AN000005 most recently, AN000003 never has a log
+    for number, analysis_id in enumerate(['AN000001', 'AN000004', 'AN000002', 'AN000005']):
+        tmpdir.join(analysis_id + '_txt.log').write('log')
+        os.utime(str(tmpdir.join(analysis_id + '_txt.log')), (1000 + number, 1000 + number))
+    return str(tmpdir)
+
+
+@pytest.fixture()
+def history_path(tmpdir_factory, previous_dict):
+    history_path = str(tmpdir_factory.mktemp('history').join('history.jsonl'))
+    history.append_run(history_path, previous_dict, run_time=datetime(2026, 1, 1))
+    previous_dict['ST000002']['analyses']['AN000005']['status']['txt'] = 'Passing'
+    previous_dict['ST000002']['analyses']['AN000005']['status']['comparison'] = 'Inconsistent'
+    history.append_run(history_path, previous_dict, run_time=datetime(2026, 1, 2))
+    return history_path
+
+
+def test_prioritize(previous_dict, study_analysis_dict, logs_path, history_path):
+    run_schedule = schedule.Schedule(None, previous_dict, logs_path, history_path)
+    assert run_schedule.prioritize(study_analysis_dict) == [
+        ('new', 'ST000003', 'AN000006'),
+        ('failing', 'ST000002', 'AN000004'),
+        ('failing', 'ST000001', 'AN000002'),
+        ('modified', 'ST000002', 'AN000005'),
+        ('stale', 'ST000001', 'AN000003'),
+        ('stale', 'ST000001', 'AN000001'),
+    ]
+    # the changes of older runs are not recent
+    assert schedule.recently_changed(history_path, runs=1) == {'AN000005'}
+    assert schedule.recently_changed(history_path, runs=0) == set()
+
+
+def test_run_within_budget(previous_dict, study_analysis_dict, logs_path, history_path, monkeypatch):
+    clock = FakeClock()
+
+    def validate_analysis(validation_dict, study_id, analysis_id, logs_path, save_path=None, progress=None, timeouts=None,
+                          writer=None):
+        clock.now += 10
+        validation_dict[study_id]['analyses'][analysis_id]['status'].update(txt='Passing', json='Passing', comparison='Consistent')
+
+    monkeypatch.setattr(validator, 'validate_analysis', validate_analysis)
+    monkeypatch.setattr(validator, 'save_validation_dict', lambda validation_dict, output_file, writer=None: None)
+    # a fourth analysis would be expected to end at 40 seconds
+    run_schedule = schedule.Schedule(35, previous_dict, logs_path, history_path, clock=clock)
+    validation_dict = validator.validate_mwtab_rest(study_analysis_dict, logs_path, schedule=run_schedule)
+
+    validated = ['AN000006', 'AN000004', 'AN000002']
+    for study_id, study_dict in validation_dict.items():
+        for analysis_id, analysis_dict in study_dict['analyses'].items():
+            if analysis_id in validated:
+                assert analysis_dict['status']['txt'] == 'Passing'
+                assert 'carried_over' not in analysis_dict
+            else:
+                assert analysis_dict['carried_over']
+                assert analysis_dict['status'] == previous_dict[study_id]['analyses'][analysis_id]['status']
+    assert validation_dict['ST000001']['params'] == {'STUDY_ID': 'ST000001'}
+
+    summary = run_schedule.summary()
+    assert summary == {
+        'time_budget': 35, 'elapsed': 30.0, 'validated': 3, 'total': 6, 'coverage': 0.5,
+        'priorities': {'new': {'validated': 1, 'total': 1}, 'failing': {'validated': 2, 'total': 2},
+                       'modified': {'validated': 0, 'total': 1}, 'stale': {'validated': 0, 'total': 2}},
+        'carried_over': 3, 'dropped': 0,
+    }
+    assert schedule.Schedule.format_summary(summary).startswith('Validated 3 of 6 analyses (50.0%) in 0:00:30 of a 0:00:35 budget')
+
+
+def test_carry_over_drops_new_analyses(previous_dict, study_analysis_dict):
+    # nothing fits into the budget, so the new analysis (and its study) has no results to carry over
+    run_schedule = schedule.Schedule(0, previous_dict)
+    assert list(run_schedule.run(study_analysis_dict)) == []
+    validation_dict = run_schedule.carry_over(validator.create_validation_dict(study_analysis_dict))
+    assert sorted(validation_dict) == ['ST000001', 'ST000002']
+    assert run_schedule.summary()['carried_over'] == 5
+    assert run_schedule.summary()['dropped'] == 1
+    assert 'new analyses left for the next run' in schedule.Schedule.format_summary(run_schedule.summary())
+
+
+def test_unlimited_budget(study_analysis_dict):
+    run_schedule = schedule.Schedule(None)
+    assert len(list(run_schedule.run(study_analysis_dict))) == 6
+    assert run_schedule.summary()['coverage'] == 1.0
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import json
+import mwFileStatusWebsite
+
+
+VALIDATION_DICT = {
+    'ST000001': {'params': {'STUDY_TITLE': 'Metabolomics of the Mouse Liver', 'INSTITUTE': 'University of Kentucky',
+                            'LAST_NAME': 'Moseley', 'FIRST_NAME': 'Hunter', 'STUDY_SUMMARY': 'not indexed'},
+                 'analyses': {'AN000001': {'status': {'txt': 'Passing', 'json': 'Parsing Error', 'comparison': 'Not Checked'},
+                                           'issues': {'txt': {'value': False, 'consistency': False, 'format': False},
+                                                      'json': {'value': False, 'consistency': False, 'format': False}}},
+                              'AN000002': {'status': {'txt': 'Validation Error', 'json': 'Validation Error', 'comparison': 'Consistent'},
+                                           'issues': {'txt': {'value': True, 'consistency': False, 'format': False},
+                                                      'json': {'value': True, 'consistency': False, 'format': True}}}}},
+    'ST000002': {'params': {'STUDY_TITLE': 'Human Plasma', 'INSTITUTE': 'UC Davis', 'LAST_NAME': 'Smith', 'FIRST_NAME': 'Sam'},
+                 'analyses': {'AN000003': {'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                                           'issues': {'txt': {'value': False, 'consistency': False, 'format': False},
+                                                      'json': {'value': False, 'consistency': False, 'format': False}}}}},
+}
+
+
+def ids(results):
+    return [result[0] for result in results]
+
+
+def test_tokenize():
+    assert mwFileStatusWebsite.search.tokenize('Metabolomics of the Mouse, json:parsing_error') == ['metabolomics', 'mouse', 'json:parsing_error']
+
+
+def test_build_search_index():
+    search_index = mwFileStatusWebsite.search.build_search_index(VALIDATION_DICT)
+    assert search_index['studies'][0] == ['ST000001', 'Metabolomics of the Mouse Liver', 'University of Kentucky', 'Moseley, Hunter']
+    assert search_index['analyses'][2] == ['AN000003', 1, 'Passing', 'Passing', 'Consistent']
+    assert mwFileStatusWebsite.search.decode_postings(search_index['terms']['status:passing']) == [0, 2]
+    assert 'summary' not in search_index['terms']
+    # the index must survive a JSON round trip
+    assert json.loads(json.dumps(search_index)) == search_index
+
+
+def test_query_search_index():
+    search_index = mwFileStatusWebsite.search.build_search_index(VALIDATION_DICT)
+    query = mwFileStatusWebsite.search.query_search_index
+    assert ids(query(search_index, 'ST000001')) == ['AN000001', 'AN000002']
+    assert ids(query(search_index, 'an000003')) == ['AN000003']
+    assert ids(query(search_index, 'moseley json:parsing_error')) == ['AN000001']
+    assert ids(query(search_index, 'issue:value')) == ['AN000002']
+    assert ids(query(search_index, 'json:format')) == ['AN000002']
+    assert ids(query(search_index, 'pla')) == ['AN000003']
+    assert ids(query(search_index, 'st00000', limit=1)) == ['AN000001']
+    assert query(search_index, 'smith json:parsing_error') == []
+    assert query(search_index, '') == []
+
+
+def test_write_search_script(tmp_path):
+    filepath = tmp_path / mwFileStatusWebsite.search.SEARCH_SCRIPT_FILENAME
+    mwFileStatusWebsite.search.write_search_script(str(filepath))
+    assert 'search_index.json' in filepath.read_text(encoding='utf-8')
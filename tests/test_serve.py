@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+import gzip
+import http.client
+import json
+import os
+import threading
+import pytest
+from datetime import datetime
+from mwFileStatusWebsite import serve, history
+from mwFileStatusWebsite.cli import create_pages
+
+
+ISSUES = {file_format: {'value': False, 'consistency': False, 'format': False} for file_format in ('txt', 'json')}
+VALIDATION_DICT = {
+    'ST000001': {'params': {'STUDY_TITLE': 'First', 'INSTITUTE': 'UK', 'LAST_NAME': 'Smith', 'FIRST_NAME': 'A'}, 'analyses': {
+        'AN000001': {'params': {'ANALYSIS_ID': 'AN000001'}, 'status': {'txt': 'Passing', 'json': 'Parsing Error', 'comparison': 'Not Checked'},
+                     'issues': ISSUES}}},
+    'ST000002': {'params': {'STUDY_TITLE': 'Second', 'INSTITUTE': 'UK', 'LAST_NAME': 'Jones', 'FIRST_NAME': 'B'}, 'analyses': {
+        'AN000002': {'params': {'ANALYSIS_ID': 'AN000002'}, 'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                     'issues': ISSUES}}},
+}
+
+
+@pytest.fixture()
+def site(tmpdir):
+    validation_path = str(tmpdir.join('tmp.json'))
+    with open(validation_path, 'w') as fh:
+        fh.write(json.dumps(VALIDATION_DICT))
+    tmpdir.mkdir('validation_logs').join('AN000001_txt.log').write('Status: Passing\n' * 100)
+    return serve.Site(validation_path, 'owner', 'repo', logs_path=str(tmpdir.join('validation_logs')), create_pages=create_pages)
+
+
+@pytest.mark.parametrize('target, content', [
+    ('/', b'AN000002'),
+    ('/index.html', b'AN000002'),
+    ('/parsing_error', b'AN000001'),
+    ('/view?q=json%20%3D%20%22Parsing%20Error%22', b'AN000001'),
+    ('/studies/ST000002.html', b'Second'),
+    ('/api/studies/ST000001.json', b'"AN000001"'),
+    ('/api/manifest.json', b'"AN000002":"ST000002"'),
+    ('/search_index.json', b'"st000001"'),
+    ('/details.js', b'data-details'),
+    ('/validation_logs/AN000001_txt.log', b'Status: Passing'),
+])
+def test_routes(site, target, content):
+    status, headers, body = site.respond(target)
+    assert status == 200
+    assert content in body
+    assert headers['Content-Length'] == str(len(body))
+
+
+@pytest.mark.parametrize('target', ['/missing_page', '/studies/ST000009.html', '/api/studies/ST000009.json',
+                                    '/validation_logs/..%2Ftmp.json', '/validation_logs/AN000009_txt.log'])
+def test_not_found(site, target):
+    assert site.respond(target)[0] == 404
+
+
+def test_links_point_to_local_server(site):
+    body = site.respond('/parsing_error')[2]
+    assert b'owner.github.io' not in body and b'raw.githubusercontent.com' not in body
+    assert b'href="/validation_logs/AN000001_txt.log"' in body
+
+
+def test_bad_query(site):
+    status, headers, body = site.respond('/view?q=txt%20%3D')
+    assert status == 400
+
+
+def test_etag_gzip_and_cache(site):
+    status, headers, body = site.respond('/', {'Accept-Encoding': 'gzip, br'})
+    assert headers['Content-Encoding'] == 'gzip'
+    assert site.cache.misses == 1
+    assert site.respond('/', {'Accept-Encoding': 'gzip', 'If-None-Match': 'W/' + headers['ETag']})[0] == 304
+    assert site.cache.hits == 1
+    # the uncompressed body is another representation, with another ETag
+    status, identity_headers, identity_body = site.respond('/', {'If-None-Match': headers['ETag']})
+    assert status == 200 and identity_headers['ETag'] != headers['ETag']
+    assert gzip.decompress(body) == identity_body
+    assert site.respond('/', {'If-None-Match': '"other", ' + identity_headers['ETag']})[0] == 304
+
+
+def test_parse_etags():
+    assert serve.parse_etags('W/"abc", "Wde" ,W/"W/x"') == ['"abc"', '"Wde"', '"W/x"']
+    assert serve.parse_etags('') == []
+
+
+def test_trends_cache(site, tmpdir):
+    history_path = tmpdir.join('history.jsonl')
+    site.history_path = str(history_path)
+    assert site.respond('/trends')[0] == 404
+    # a run appended after the validation JSON was saved
+    history.append_run(str(history_path), VALIDATION_DICT, run_time=datetime(2026, 10, 1))
+    assert site.respond('/trends')[0] == 200
+    first = site.respond('/trends')[2]
+    history.append_run(str(history_path), VALIDATION_DICT, run_time=datetime(2026, 10, 8))
+    os.utime(str(history_path), (1, 1))
+    assert b'2026-10-08' in site.respond('/trends')[2] and b'2026-10-08' not in first
+
+
+def test_reload_on_change(site, tmpdir):
+    etag = site.respond('/')[1]['ETag']
+    changed_dict = json.loads(json.dumps(VALIDATION_DICT))
+    del changed_dict['ST000002']
+    with open(site.validation_path, 'w') as fh:
+        fh.write(json.dumps(changed_dict))
+    os.utime(site.validation_path, (1, 1))
+    status, headers, body = site.respond('/', {'If-None-Match': etag})
+    assert status == 200
+    assert b'AN000002' not in body
+
+
+def test_lru_cache():
+    cache = serve.LRUCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+
+
+def test_server(site):
+    server = serve.create_server(site, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        connection = http.client.HTTPConnection(*server.server_address[:2])
+        for _ in range(2):  # the connection is kept alive between requests
+            connection.request('GET', '/api/summary.json')
+            response = connection.getresponse()
+            assert response.status == 200
+            assert json.loads(response.read())['analyses'] == 2
+        connection.request('HEAD', '/')
+        response = connection.getresponse()
+        assert response.status == 200 and response.read() == b''
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
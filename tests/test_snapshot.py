@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import pytest
+from mwFileStatusWebsite.snapshot import Snapshot, save_snapshot, load_snapshot, load_validation_dict, open_snapshot, \
+    snapshot_path, encode_study, CODED, FALLBACK, HEADER_STRUCT, SNAPSHOT_MAGIC
+
+
+def issues(txt_value=False, json_format=False):
+    return {'txt': {'value': txt_value, 'consistency': False, 'format': False},
+            'json': {'value': False, 'consistency': True, 'format': json_format}}
+
+
+VALIDATION_DICT = {
+    'ST000002': {'params': {'STUDY_TITLE': 'Café study', 'STUDY_SUMMARY': 'Line one\nline "two"'}, 'analyses': {
+        'AN000003': {'params': {'ANALYSIS_ID': 'AN000003'},
+                     'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                     'issues': issues(txt_value=True)}}},
+    'ST000001': {'params': {'STUDY_TITLE': 'First'}, 'analyses': {
+        'AN000001': {'params': {'ANALYSIS_ID': 'AN000001', 'ANALYSIS_TYPE': ''},
+                     'status': {'txt': 'Parsing Error', 'json': None}, 'issues': issues(json_format=True)},
+        # analyses of another shape are kept as JSON
+        'AN000002': {'params': {'ANALYSIS_ID': 'AN000002'}, 'status': {'txt': 'Passing', 'json': 'Warnings Only'},
+                     'issues': issues(), 'carried_over': True},
+        'AN000004': {'params': {}, 'status': {'json': 'Passing', 'txt': 'Passing'}, 'issues': {}},
+        'AN000005': {'params': {}, 'status': {'txt': 'Passing', 'json': 'Passing'}, 'issues': issues()}}},
+    # studies of another shape are kept as JSON
+    'ST000003': {'params': {'STUDY_TITLE': None}, 'analyses': {}},
+    'ST000004': {'params': {'STUDY_TITLE': 'Nul \0 character'}, 'analyses': {}},
+}
+
+
+def test_round_trip(tmpdir):
+    filepath = str(tmpdir.join('tmp.snapshot'))
+    save_snapshot(VALIDATION_DICT, filepath)
+    loaded = load_snapshot(filepath)
+    assert loaded == VALIDATION_DICT
+    # page digests depend on the key order
+    assert json.dumps(loaded) == json.dumps(VALIDATION_DICT)
+
+    with Snapshot(filepath) as snapshot:
+        assert list(snapshot) == ['ST000002', 'ST000001', 'ST000003', 'ST000004']
+        assert len(snapshot) == 4
+        assert 'ST000001' in snapshot and 'ST000009' not in snapshot
+        assert snapshot['ST000001'] == VALIDATION_DICT['ST000001']
+        with pytest.raises(KeyError):
+            snapshot['ST000009']
+
+
+@pytest.mark.parametrize('study_id, kind', [('ST000001', CODED), ('ST000002', CODED), ('ST000003', FALLBACK),
+                                            ('ST000004', FALLBACK)])
+def test_encode_study(study_id, kind):
+    assert encode_study(VALIDATION_DICT[study_id], {})[0] == kind
+
+
+def test_empty(tmpdir):
+    filepath = str(tmpdir.join('tmp.snapshot'))
+    save_snapshot({}, filepath)
+    assert load_snapshot(filepath) == {}
+
+
+@pytest.mark.parametrize('contents', [b'', b'{"ST000001": {}}', HEADER_STRUCT.pack(b'MWFX', 1, 0, 0, 0, 2, 0) + b'[]',
+                                      HEADER_STRUCT.pack(SNAPSHOT_MAGIC, 99, 0, 0, 0, 2, 0) + b'[]',
+                                      HEADER_STRUCT.pack(SNAPSHOT_MAGIC, 1, 1, 0, 0, 2, 0) + b'[]'])
+def test_invalid(tmpdir, contents):
+    filepath = tmpdir.join('tmp.snapshot')
+    filepath.write_binary(contents)
+    with pytest.raises(ValueError):
+        Snapshot(str(filepath))
+
+
+def test_load_one_study(tmpdir):
+    filepath = str(tmpdir.join('tmp.snapshot'))
+    save_snapshot(VALIDATION_DICT, filepath)
+
+    # only the record of the study accessed is decoded
+    with open(filepath, 'r+b') as fh:
+        data = fh.read()
+        position = data.index('Café study'.encode('utf-8'))
+        fh.seek(position)
+        fh.write(b'\xff')
+    with Snapshot(filepath) as snapshot:
+        assert snapshot['ST000001'] == VALIDATION_DICT['ST000001']
+        with pytest.raises(ValueError):
+            snapshot['ST000002']
+
+
+def test_load_validation_dict(tmpdir):
+    json_path = str(tmpdir.join('tmp.json'))
+    assert snapshot_path(json_path) == str(tmpdir.join('tmp.snapshot'))
+    with open(json_path, 'w') as fh:
+        fh.write(json.dumps(VALIDATION_DICT, indent=4))
+    save_snapshot(VALIDATION_DICT, snapshot_path(json_path), json_path=json_path)
+
+    snapshot = open_snapshot(json_path)
+    assert snapshot is not None
+    snapshot.close()
+    assert load_validation_dict(json_path) == VALIDATION_DICT
+
+    # the JSON file rewritten without the snapshot wins, whatever the modification times
+    with open(json_path, 'w') as fh:
+        fh.write(json.dumps({'ST000009': {'params': {}, 'analyses': {}}}))
+    os.utime(json_path, (0, 0))
+    assert open_snapshot(json_path) is None
+    assert load_validation_dict(json_path) == {'ST000009': {'params': {}, 'analyses': {}}}
+
+
+def test_load_validation_dict_without_snapshot(tmpdir):
+    json_path = str(tmpdir.join('tmp.json'))
+    with open(json_path, 'w') as fh:
+        fh.write(json.dumps(VALIDATION_DICT))
+    tmpdir.join('tmp.snapshot').write_binary(b'not a snapshot')
+    assert load_validation_dict(json_path) == VALIDATION_DICT
+    tmpdir.join('tmp.snapshot').remove()
+    assert load_validation_dict(json_path) == VALIDATION_DICT
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import random
+import pytest
+import mwFileStatusWebsite
+from mwFileStatusWebsite.status_matrix import StatusMatrix
+
+
+STATUSES = ["Passing", "Warnings Only", "Validation Error", "Parsing Error", "Missing/Blank"]
+
+
+@pytest.fixture(scope='module')
+def validation_dict():
+    rng = random.Random(0)
+    validation_dict = {}
+    analysis_number = 0
+    for study_number in range(1, 40):
+        study_id = 'ST{:06d}'.format(study_number)
+        validation_dict[study_id] = {'params': {'STUDY_TITLE': study_id}, 'analyses': {}}
+        for _ in range(rng.randint(1, 4)):
+            analysis_number += 1
+            analysis_id = 'AN{:06d}'.format(analysis_number)
+            status = {'txt': rng.choice(STATUSES), 'json': rng.choice(STATUSES)}
+            # some analyses lack a comparison status, as in older validation dictionaries
+            if rng.random() < 0.8:
+                status['comparison'] = rng.choice(['Consistent', 'Inconsistent', 'Not Checked'])
+            validation_dict[study_id]['analyses'][analysis_id] = {
+                'params': {'ANALYSIS_ID': analysis_id},
+                'status': status,
+                'issues': {fmt: {issue: rng.random() < 0.3 for issue in ('value', 'consistency', 'format')} for fmt in ('txt', 'json')},
+            }
+    return validation_dict
+
+
+def test_stats_summaries_match_constructor(validation_dict):
+    status_matrix = StatusMatrix(validation_dict)
+    assert status_matrix.validation_stats_summary() == mwFileStatusWebsite.constructor.generate_validation_stats_summary(validation_dict)
+    assert status_matrix.comparison_stats_summary() == mwFileStatusWebsite.constructor.generate_comparison_stats_summary(
+        {study_id: {'analyses': {analysis_id: analysis_dict for analysis_id, analysis_dict in validation_dict[study_id]['analyses'].items()
+                                 if 'comparison' in analysis_dict['status']}} for study_id in validation_dict})
+
+
+def test_page_stats_match_constructor(validation_dict):
+    status_matrix = StatusMatrix(validation_dict)
+    assert status_matrix.mask_of(validation_dict) is None
+    page_dict = status_matrix.filter_analyses_by_status('Parsing Error')
+    assert status_matrix.validation_stats_summary(status_matrix.mask_of(page_dict)) == \
+        mwFileStatusWebsite.constructor.generate_validation_stats_summary(page_dict)
+
+
+@pytest.mark.parametrize('status_str', STATUSES + ['Unknown'])
+@pytest.mark.parametrize('match_all_formats', [False, True])
+def test_filter_analyses_by_status_matches_constructor(validation_dict, status_str, match_all_formats):
+    assert StatusMatrix(validation_dict).filter_analyses_by_status(status_str, match_all_formats) == \
+        mwFileStatusWebsite.constructor.filter_analyses_by_status(validation_dict, status_str, match_all_formats)
+
+
+@pytest.mark.parametrize('issues_str', ['value', 'consistency', 'format'])
+@pytest.mark.parametrize('match_all_formats', [False, True])
+def test_filter_analyses_by_issues_matches_constructor(validation_dict, issues_str, match_all_formats):
+    assert StatusMatrix(validation_dict).filter_analyses_by_issues(issues_str, match_all_formats) == \
+        mwFileStatusWebsite.constructor.filter_analyses_by_issues(validation_dict, issues_str, match_all_formats)
+
+
+def test_masks():
+    validation_dict = {
+        'ST000001': {'params': {}, 'analyses': {
+            'AN000001': {'status': {'txt': 'Passing', 'json': 'Parsing Error', 'comparison': 'Not Checked'},
+                         'issues': {'txt': {'value': True}, 'json': {}}},
+            'AN000002': {'status': {'txt': 'Warnings', 'json': 'Passing', 'comparison': 'Consistent'}, 'issues': {}}}},
+        'ST000002': {'params': {}, 'analyses': {
+            'AN000003': {'status': {'txt': 'Passing', 'json': 'Passing', 'comparison': 'Consistent'},
+                         'issues': {'txt': {}, 'json': {'value': True}}}}},
+    }
+    status_matrix = StatusMatrix(validation_dict)
+    assert len(status_matrix) == 3
+    assert status_matrix.analysis_ids_of(status_matrix.status_mask('Passing', 'txt') & status_matrix.status_mask('Parsing Error', 'json')) == ['AN000001']
+    assert status_matrix.analysis_ids_of(status_matrix.status_mask('Warnings')) == ['AN000002']
+    assert status_matrix.analysis_ids_of(status_matrix.issue_mask('value', 'json')) == ['AN000003']
+    assert status_matrix.analysis_ids_of(status_matrix.issue_mask('value')) == ['AN000001', 'AN000003']
+    assert status_matrix.analysis_ids_of(status_matrix.comparison_mask('Consistent')) == ['AN000002', 'AN000003']
+    assert status_matrix.analysis_ids_of(status_matrix.study_mask(['ST000002'])) == ['AN000003']
+    mask = status_matrix.comparison_mask('Consistent')
+    assert status_matrix.validation_stats_summary(mask)[:2] == (2, 2)
+    assert status_matrix.comparison_stats_summary(mask) == (2, 0, 0)
+    assert list(status_matrix.select(status_matrix.study_mask(['ST000002']))) == ['ST000002']
+
+
+def test_empty_validation_dict():
+    status_matrix = StatusMatrix({})
+    assert status_matrix.validation_stats_summary()[:2] == (0, 0)
+    assert status_matrix.filter_analyses_by_status('Passing') == {}
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+import pytest
+from mwFileStatusWebsite import throttle, validator
+from mwFileStatusWebsite.progress import Progress
+
+
+FIXTURE_FILENAME = 'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{0}%2Fmwtab%2F{1}.{1}'
+CHUNK_SIZE = 8192
+
+
+class StandInServer(ThreadingHTTPServer):
+    """Stand-in for the Metabolomics Workbench REST API, serving the fixture files. Each response starts after
+    base_latency seconds, plus base_latency for every request in flight beyond capacity, and requests beyond overload
+    are answered with 503. With a transfer_rate (bytes/s), the body is sent at that rate, so larger files take longer."""
+    daemon_threads = True
+
+    def __init__(self, base_latency=0.02, capacity=4, overload=None, transfer_rate=None):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.base_latency = base_latency
+        self.capacity = capacity
+        self.overload = overload
+        self.transfer_rate = transfer_rate
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.responses = {200: 0, 503: 0}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://{}:{}/rest/study/analysis_id/{{}}/mwtab/{{}}'.format(*self.server_address[:2])
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            in_flight = server.in_flight
+        try:
+            if server.overload is not None and in_flight > server.overload:
+                status, body = 503, b'Service Unavailable'
+            else:
+                time.sleep(server.base_latency * (1 + max(0, in_flight - server.capacity)))
+                analysis_id, file_format = self.path.rstrip('/').split('/')[-3::2]
+                with open(FIXTURE_FILENAME.format(analysis_id, file_format), 'rb') as fh:
+                    status, body = 200, fh.read()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        with server.lock:
+            server.responses[status] += 1
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if server.transfer_rate is None:
+            self.wfile.write(body)
+            return
+        for start in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[start:start + CHUNK_SIZE])
+            self.wfile.flush()
+            time.sleep(len(body[start:start + CHUNK_SIZE]) / server.transfer_rate)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def start_server():
+    servers = []
+
+    def start(**kwargs):
+        server = StandInServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch_until_done(urls, limiter, requests, threads):
+    # the urls are fetched in turn, and failed requests are retried, as validator.validate() does
+    def fetch(number):
+        while True:
+            try:
+                return throttle.fetch_mwtab(urls[number % len(urls)], limiter)
+            except HTTPError:
+                pass
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(fetch, range(requests)))
+
+
+@pytest.mark.parametrize('error, congestion', [
+    (HTTPError('url', 503, 'Service Unavailable', {}, None), True),
+    (HTTPError('url', 429, 'Too Many Requests', {}, None), True),
+    (HTTPError('url', 404, 'Not Found', {}, None), False),
+    (URLError(socket.timeout('timed out')), True),
+    (URLError(ConnectionRefusedError()), True),
+    (socket.timeout('timed out'), True),
+    (ConnectionResetError(), True),
+    (ValueError('Blank input string retrieved from source.'), False),
+])
+def test_is_congestion_error(error, congestion):
+    assert throttle.is_congestion_error(error) == congestion
+
+
+def test_parse_limits():
+    assert throttle.parse_limits('1,8', int) == (1, 8)
+    assert throttle.parse_limits('0.5,2') == (0.5, 2.0)
+    with pytest.raises(ValueError):
+        throttle.parse_limits('8,1')
+
+
+def test_aimd():
+    limiter = throttle.AdaptiveLimiter(min_concurrency=1, max_concurrency=4, min_rate=25, max_rate=100, rate=50, rate_step=500)
+    for _ in range(20):
+        # rounds that use every slot, each request waiting for the rate
+        started = [limiter.acquire() for _ in range(limiter.concurrency)]
+        for start in started:
+            limiter.release(start - 0.1)
+    # additive increase up to the ceilings
+    assert (limiter.limit, limiter.rate) == (4, 100)
+
+    # requests started before a decrease only decrease once
+    started = [limiter.acquire() for _ in range(3)]
+    assert limiter.release(started[0], HTTPError('url', 503, 'Service Unavailable', {}, None))
+    assert limiter.release(started[1], socket.timeout())
+    assert not limiter.release(started[2], HTTPError('url', 404, 'Not Found', {}, None))
+    assert (limiter.limit, limiter.rate) == (2, 50)
+    snapshot = limiter.snapshot()
+    assert (snapshot['concurrency'], snapshot['rate'], snapshot['in_flight'], snapshot['congestion_signals']) == (2, 50, 0, 2)
+
+    # a smoothed latency above twice the baseline is a congestion signal, and the limits do not go below their floors
+    limiter = throttle.AdaptiveLimiter(min_concurrency=1, max_concurrency=4, min_rate=25, max_rate=100, rate=50)
+    limiter.release(limiter.acquire(), latency=0.01)
+    congested = []
+    for _ in range(20):
+        started = limiter.acquire()
+        time.sleep(0.001)
+        congested.append(limiter.release(started, latency=0.05))
+    assert any(congested)
+    assert (limiter.limit, limiter.rate) == (1, 25)
+
+
+def test_latency_baseline():
+    limiter = throttle.AdaptiveLimiter(max_concurrency=4, min_rate=1000, rate=1000, max_rate=1000)
+    for _ in range(20):
+        assert not limiter.release(limiter.acquire(), latency=0.02)
+    # a single slow response is jitter, not congestion
+    assert not limiter.release(limiter.acquire(), latency=0.1)
+    for _ in range(10):
+        assert not limiter.release(limiter.acquire(), latency=0.02)
+    # a sustained rise is congestion
+    assert any([limiter.release(limiter.acquire(), latency=0.1) for _ in range(10)])
+    # and the baseline follows a server that stays slower
+    for _ in range(200):
+        limiter.release(limiter.acquire(), latency=0.1)
+    assert not limiter.release(limiter.acquire(), latency=0.1)
+    assert 0.08 < limiter.baseline_latency < 0.1
+
+
+def test_unsaturated_limit():
+    # requests one at a time never use a second slot, so the limit does not grow past it
+    limiter = throttle.AdaptiveLimiter(max_concurrency=8, rate=100, max_rate=100)
+    for _ in range(10):
+        limiter.release(limiter.acquire() - 0.1)
+    assert limiter.limit == 2
+
+
+def test_acquire_respects_limits():
+    limiter = throttle.AdaptiveLimiter(min_concurrency=2, max_concurrency=2, rate=20, max_rate=20)
+    started = [limiter.acquire(), limiter.acquire()]
+    # the second request waited 1 / rate seconds for the first
+    assert started[1] - started[0] >= 0.049
+    acquired = threading.Event()
+    threading.Thread(target=lambda: (limiter.acquire(), acquired.set()), daemon=True).start()
+    assert not acquired.wait(0.2)
+    limiter.release(started[0])
+    assert acquired.wait(1)
+
+
+def test_idle_server(start_server):
+    # a fast server lets the limits grow to their ceilings, though the 88 KB file takes several times longer to download
+    # than the 14 KB one
+    server = start_server(base_latency=0.05, capacity=100, transfer_rate=250000)
+    limiter = throttle.AdaptiveLimiter(max_concurrency=4, rate=50, max_rate=200)
+    urls = [server.url.format('AN003788', 'txt'), server.url.format('AN000001', 'json'), server.url.format('AN003788', 'json')]
+    mwtabfiles = fetch_until_done(urls, limiter, 60, 8)
+    assert {mwtabfile.study_id for mwtabfile in mwtabfiles} == {'ST002321', 'ST000001'}
+    assert limiter.limit == 4
+    assert limiter.congestion_signals == 0
+    assert 2 < server.max_in_flight <= 4
+
+
+def test_loaded_server(start_server):
+    # the latency grows with the requests in flight beyond 3 and more than 6 are refused, so the limit settles near 3
+    server = start_server(base_latency=0.05, capacity=3, overload=6)
+    limiter = throttle.AdaptiveLimiter(max_concurrency=16, rate=100, max_rate=400)
+    fetch_until_done([server.url.format('AN002319', 'json')], limiter, 100, 16)
+    assert limiter.congestion_signals > 0
+    assert limiter.limit < 6
+    assert server.max_in_flight < 10
+    assert server.responses[200] == 100
+    assert server.responses[503] < 10
+
+
+def test_validate_mwtab_rest_adaptive(start_server, monkeypatch, tmpdir):
+    server = start_server(base_latency=0.005)
+    monkeypatch.setattr(validator, 'MW_REST_URL', server.url)
+    monkeypatch.setattr(validator, 'sleep', lambda seconds: None)
+    study_analysis_dict = {'ST001390': ['AN002319'], 'ST002321': ['AN003788']}
+
+    sequential_dict = validator.validate_mwtab_rest(study_analysis_dict, str(tmpdir), str(tmpdir.join('sequential.json')))
+    limiter = throttle.AdaptiveLimiter(max_concurrency=4, rate=50, max_rate=100)
+    progress = Progress(interval=None, limiter=limiter)
+    adaptive_dict = validator.validate_mwtab_rest(study_analysis_dict, str(tmpdir), str(tmpdir.join('adaptive.json')),
+                                                  progress=progress, limiter=limiter)
+    assert adaptive_dict == sequential_dict
+    assert adaptive_dict['ST001390']['analyses']['AN002319']['status']['txt'] is not None
+    assert limiter.requests == 4
+    snapshot = progress.snapshot()
+    assert snapshot['completed'] == 2
+    assert snapshot['concurrency'] == limiter.snapshot()['concurrency']
+    assert ', concurrency ' in Progress.format_line(snapshot)
+
+
+def test_download_timeouts(start_server):
+    server = start_server(base_latency=0.5)
+    url = server.url.format('AN002319', 'json')
+    with open(FIXTURE_FILENAME.format('AN002319', 'json'), 'rb') as fh:
+        assert throttle.download(url, timeouts=(1, 5)) == fh.read()
+
+    # the server sends nothing for half a second
+    started = time.monotonic()
+    with pytest.raises(socket.timeout) as excinfo:
+        throttle.download(url, timeouts=(1, 0.1))
+    assert time.monotonic() - started < 0.4
+    assert throttle.is_congestion_error(excinfo.value)
+
+    mwtabfile = throttle.fetch_mwtab(url, timeouts=(1, 5))
+    assert mwtabfile.study_id == 'ST001390'
@@ -14,6 +14,7 @@ import pathlib
 import shutil
 import time
 import json
+import os
 
 
 TMP_PATH = "tests/tmp/"
@@ -212,3 +213,73 @@ def test_retrieve_mwtab_files_exception(capsys, mocker):
     assert "Unable to access https://www.metabolomicsworkbench.org/" in captured.out
 
 
+@pytest.mark.parametrize('id_str, id_list', [
+    ('ST000001', ['ST000001']),
+    ('ST000001, ST000100-ST000102', ['ST000001', 'ST000100', 'ST000101', 'ST000102']),
+    ('AN000009-11,AN000010', ['AN000009', 'AN000010', 'AN000011']),
+])
+def test_parse_id_list(id_str, id_list):
+    assert mwFileStatusWebsite.validator.parse_id_list(id_str) == id_list
+
+
+def test_parse_id_list_invalid_range():
+    with pytest.raises(ValueError):
+        mwFileStatusWebsite.validator.parse_id_list('ST000010-ST000001')
+
+
+def test_select_analyses(study_analysis_dict):
+    select_analyses = mwFileStatusWebsite.validator.select_analyses
+    status_dict = {'ST000009': {'analyses': {'AN000023': {'status': {'txt': 'Passing', 'json': 'Parsing Error'}},
+                                             'AN000024': {'status': {'txt': 'Passing', 'json': 'Passing'}}}}}
+    assert select_analyses(study_analysis_dict) == study_analysis_dict
+    assert select_analyses(study_analysis_dict, study_ids=['ST000009']) == {'ST000009': ['AN000023', 'AN000024']}
+    assert select_analyses(study_analysis_dict, analysis_ids=['AN000001', 'AN000024']) == {'ST000001': ['AN000001'], 'ST000009': ['AN000024']}
+    assert select_analyses(study_analysis_dict, status_dict=status_dict, statuses=['Parsing Error']) == {'ST000009': ['AN000023']}
+    assert select_analyses(study_analysis_dict, study_ids=['ST000001'], analysis_ids=['AN000024']) == {}
+
+
+def test_merge_validation_dict():
+    validation_dict = {
+        'ST000001': {'params': {'STUDY_TITLE': 'a'}, 'analyses': {'AN000001': {'status': {'txt': 'Passing'}},
+                                                                  'AN000002': {'status': {'txt': 'Passing'}}}},
+        'ST000003': {'params': {'STUDY_TITLE': 'c'}, 'analyses': {'AN000005': {'status': {'txt': 'Passing'}}}},
+    }
+    subset_dict = {
+        'ST000001': {'params': {}, 'analyses': {'AN000002': {'status': {'txt': 'Parsing Error'}}}},
+        'ST000002': {'params': {'STUDY_TITLE': 'b'}, 'analyses': {'AN000004': {'status': {'txt': 'Passing'}}}},
+    }
+    merged_dict = mwFileStatusWebsite.validator.merge_validation_dict(validation_dict, subset_dict)
+    assert merged_dict is validation_dict
+    assert list(merged_dict) == ['ST000001', 'ST000002', 'ST000003']
+    assert merged_dict['ST000001']['params'] == {'STUDY_TITLE': 'a'}
+    assert merged_dict['ST000001']['analyses'] == {'AN000001': {'status': {'txt': 'Passing'}}, 'AN000002': {'status': {'txt': 'Parsing Error'}}}
+    assert merged_dict['ST000002'] == subset_dict['ST000002']
+
+
+@pytest.mark.parametrize("counts, status", [
+    ("Status: Passing\nNumber of Issues: 0\nNumber of Warnings: 0", "Passing"),
+    ("Status: Contains Validation Issues\nNumber of Issues: 3\nNumber of Warnings: 3", "Warnings Only"),
+    ("Status: Contains Validation Issues\nNumber of Issues: 4\nNumber of Warnings: 3", "Validation Error"),
+])
+def test_parse_validation_status(counts, status):
+    validation_json = [{'message': 'Error: bad value', 'tags': ['value']},
+                       {'message': 'Warning: odd format', 'tags': ['format']}]
+    assert mwFileStatusWebsite.validator.parse_validation_status("Validation Log\n" + counts, validation_json) == \
+        (status, {'value': True, 'consistency': False, 'format': False})
+
+
+def test_find_mirror_files(tmpdir):
+    # the two smallest fixture analyses, copied under the names validate --to-path saves them as
+    mirror_path = str(tmpdir)
+    for analysis_id in ('AN002319', 'AN003788'):
+        for file_format in ('txt', 'json'):
+            shutil.copy(f'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{analysis_id}%2Fmwtab%2F{file_format}.{file_format}',
+                        os.path.join(mirror_path, analysis_id + '.' + file_format))
+
+    mirror_files = mwFileStatusWebsite.validator.find_mirror_files('tests/test_files')
+    assert sorted(mirror_files) == ['AN000001', 'AN000023', 'AN000024', 'AN002319', 'AN003788']
+    assert sorted(mirror_files['AN000001']) == ['json', 'txt']
+    assert mwFileStatusWebsite.validator.find_mirror_files(mirror_path) == {
+        analysis_id: {file_format: os.path.join(mirror_path, analysis_id + '.' + file_format) for file_format in ('json', 'txt')}
+        for analysis_id in ('AN002319', 'AN003788')
+    }
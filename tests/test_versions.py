@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from urllib.error import HTTPError
+import mwtab
+import pytest
+from mwFileStatusWebsite import throttle, validator, versions
+
+
+FIXTURE_FILENAME = 'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{0}%2Fmwtab%2F{1}.{1}'
+
+
+def analysis(txt, json='Passing', comparison='Consistent'):
+    return {'status': {'txt': txt, 'json': json, 'comparison': comparison}}
+
+
+@pytest.fixture()
+def mock_download(monkeypatch):
+    """Serves the fixture files, except for the json file of AN000024, and counts the downloads."""
+    downloads = []
+
+    def download(url, timeouts=None):
+        analysis_id, file_format = url.split('/')[-3::2]
+        downloads.append((analysis_id, file_format))
+        if (analysis_id, file_format) == ('AN000024', 'json'):
+            raise HTTPError(url, 500, 'Internal Server Error', {}, None)
+        with open(FIXTURE_FILENAME.format(analysis_id, file_format), 'rb') as fh:
+            return fh.read()
+
+    monkeypatch.setattr(throttle, 'download', download)
+    monkeypatch.setattr(validator, 'sleep', lambda seconds: None)
+    return downloads
+
+
+def test_resolve_versions(tmpdir):
+    interpreters = versions.resolve_versions('{},other={}'.format(mwtab.__version__, sys.executable), str(tmpdir))
+    assert interpreters == {mwtab.__version__: sys.executable, 'other': sys.executable}
+    assert list(interpreters) == [mwtab.__version__, 'other']
+
+    with pytest.raises(ValueError, match='No environment with mwtab 0.0.1 found'):
+        versions.resolve_versions('{},0.0.1'.format(mwtab.__version__), str(tmpdir))
+    with pytest.raises(ValueError, match='At least two'):
+        versions.resolve_versions(mwtab.__version__, str(tmpdir))
+    with pytest.raises(ValueError, match='Invalid'):
+        versions.resolve_versions('{},../up={}'.format(mwtab.__version__, sys.executable), str(tmpdir))
+
+
+def test_validate_versions(mock_download, tmpdir):
+    study_analysis_dict = {'ST000001': ['AN000001'], 'ST000009': ['AN000023', 'AN000024']}
+    interpreters = {'old': sys.executable, 'new': sys.executable}
+    results, fetch_errors = versions.validate_versions(study_analysis_dict, interpreters, logs_path=str(tmpdir.join('logs')),
+                                                       output_path=str(tmpdir), mirror_path=str(tmpdir.join('mirror')))
+
+    # every file is downloaded once, and failed downloads are retried
+    assert mock_download.count(('AN000001', 'txt')) == 1
+    assert mock_download.count(('AN000024', 'json')) == validator.NUM_TRIES + 1
+    assert fetch_errors == {'AN000024': {'json': 'HTTPError: HTTP Error 500: Internal Server Error'}}
+
+    assert list(results) == ['old', 'new']
+    assert results['old'] == results['new']
+    assert sorted(results['old']) == ['ST000001', 'ST000009']
+    assert list(results['old']['ST000009']['analyses']) == ['AN000023']
+    assert results['old']['ST000001']['params']['STUDY_TITLE']
+    assert results['old']['ST000001']['analyses']['AN000001']['status']['txt'] is not None
+    assert os.path.isfile(str(tmpdir.join('tmp_mwtab-new.json')))
+    assert tmpdir.join('logs', 'mwtab-old', 'AN000023_json.log').check()
+
+    report = versions.transition_report(results, fetch_errors)
+    assert report['comparisons'][0]['changed'] == 0
+    assert report['comparisons'][0]['analyses'] == 2
+
+
+def test_transition_report():
+    results = {
+        '2.0': {'ST000001': {'params': {}, 'analyses': {'AN000001': analysis('Passing'), 'AN000002': analysis('Validation Error'),
+                                                        'AN000003': analysis('Passing')}}},
+        '2.1': {'ST000001': {'params': {}, 'analyses': {'AN000001': analysis('Validation Error', comparison='Inconsistent'),
+                                                        'AN000002': analysis('Passing'), 'AN000003': analysis('Passing')}}},
+    }
+    report = versions.transition_report(results, {'AN000004': {'txt': 'timeout'}})
+    comparison = report['comparisons'][0]
+    assert (comparison['from'], comparison['to'], comparison['analyses'], comparison['changed'], comparison['regressions']) == \
+        ('2.0', '2.1', 3, 2, 1)
+    assert comparison['transitions'] == {'txt': {'Passing -> Validation Error': 1, 'Validation Error -> Passing': 1},
+                                         'json': {}, 'comparison': {'Consistent -> Inconsistent': 1}}
+    assert comparison['changes'] == [
+        {'study_id': 'ST000001', 'analysis_id': 'AN000001', 'from': 'PPC', 'to': 'VPI', 'regression': True},
+        {'study_id': 'ST000001', 'analysis_id': 'AN000002', 'from': 'VPC', 'to': 'PPC', 'regression': False},
+    ]
+    assert versions.format_report(report).splitlines() == [
+        'mwtab 2.0 -> 2.1: 2 of 3 analyses changed status, 1 regressions',
+        '\ttxt: Passing -> Validation Error (1)',
+        '\ttxt: Validation Error -> Passing (1)',
+        '\tcomparison: Consistent -> Inconsistent (1)',
+        '1 analyses could not be downloaded: AN000004',
+    ]
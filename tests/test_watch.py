@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import json
+import pytest
+import mwtab
+from mwFileStatusWebsite import watch, throttle, validator
+
+
+ISSUES = {file_format: {'value': False, 'consistency': False, 'format': False} for file_format in ('txt', 'json')}
+
+
+@pytest.fixture()
+def disable_sleep(monkeypatch):
+    def no_sleep(arg):
+        pass
+    monkeypatch.setattr('mwFileStatusWebsite.validator.sleep', no_sleep)
+
+@pytest.fixture(scope='module')
+def study_analysis_dict():
+    with open('tests/test_files/study_analysis_dict.json', 'r') as jsonFile:
+        study_analysis_dict = json.load(jsonFile)
+    yield study_analysis_dict
+
+def read_test_data(an_id, file_format):
+    path = f'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{an_id}%2Fmwtab%2F{file_format}.{file_format}'
+    tabfile = mwtab.mwtab.MWTabFile(str(path), duplicate_keys=True)
+    with open(path, encoding="utf-8") as f:
+        tabfile.read(f)
+    yield tabfile
+
+FIXTURE_FILENAME = 'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{0}%2Fmwtab%2F{1}.{1}'
+
+
+def analysis(analysis_id, status):
+    return {'params': {'ANALYSIS_ID': analysis_id}, 'status': {'txt': status, 'json': status, 'comparison': 'Not Checked'}, 'issues': ISSUES}
+
+
+def test_diff_analyses(study_analysis_dict):
+    known_dict = {'ST000001': ['AN000001'], 'ST000009': ['AN000023'], 'ST000002': ['AN000002']}
+    validation_dict = {'ST000009': {'analyses': {'AN000023': analysis('AN000023', 'Missing/Blank')}}}
+    assert watch.diff_analyses(known_dict, study_analysis_dict) == \
+        ([('ST000009', 'AN000024')], [('ST000002', 'AN000002')])
+    assert watch.diff_analyses(known_dict, study_analysis_dict, validation_dict) == \
+        ([('ST000009', 'AN000023'), ('ST000009', 'AN000024')], [('ST000002', 'AN000002')])
+    assert watch.diff_analyses(known_dict, study_analysis_dict, validation_dict, recheck_statuses=()) == \
+        ([('ST000009', 'AN000024')], [('ST000002', 'AN000002')])
+
+
+def test_poll_validates_new_analyses(study_analysis_dict, mocker, disable_sleep, tmpdir):
+    output_file = str(tmpdir.join('tmp.json'))
+    state_path = str(tmpdir.join('watch_state.json'))
+    previous_dict = {'ST000001': {'params': {'STUDY_TITLE': 'Untouched'}, 'analyses': {'AN000001': analysis('AN000001', 'Passing')}},
+                     'ST000005': {'params': {}, 'analyses': {'AN000009': analysis('AN000009', 'Passing')}}}
+    with open(output_file, 'w') as fh:
+        fh.write(json.dumps(previous_dict))
+
+    mocker.patch('mwFileStatusWebsite.watch.mwtab.mwrest._pull_study_analysis', side_effect=[study_analysis_dict])
+    read_files = mocker.patch('mwFileStatusWebsite.validator.mwtab.read_files', side_effect=[read_test_data('AN000023', 'txt'),
+                                                                                             read_test_data('AN000023', 'json'),
+                                                                                             read_test_data('AN000024', 'txt'),
+                                                                                             read_test_data('AN000024', 'json')])
+
+    state = watch.load_state(state_path)
+    assert watch.poll(state, output_file, str(tmpdir), state_path=state_path)
+    assert read_files.call_count == 4
+
+    with open(output_file) as fh:
+        validation_dict = json.load(fh)
+    assert list(validation_dict) == ['ST000001', 'ST000009']
+    assert validation_dict['ST000001'] == previous_dict['ST000001']
+    assert list(validation_dict['ST000009']['analyses']) == ['AN000023', 'AN000024']
+    assert tmpdir.join('AN000024_json.log').exists()
+
+    state = watch.load_state(state_path)
+    assert state['pending'] == []
+    assert state['known'] == {'ST000001': ['AN000001'], 'ST000009': ['AN000023', 'AN000024']}
+
+
+def test_watch_resumes_pending_and_regenerates(study_analysis_dict, mocker, disable_sleep, tmpdir):
+    output_file = str(tmpdir.join('tmp.json'))
+    state_path = str(tmpdir.join('watch_state.json'))
+    validation_dict = {'ST000001': {'params': {}, 'analyses': {'AN000001': analysis('AN000001', 'Passing')}},
+                       'ST000009': {'params': {}, 'analyses': {'AN000023': analysis('AN000023', 'Passing'),
+                                                               'AN000024': analysis('AN000024', 'Passing')}}}
+    with open(output_file, 'w') as fh:
+        fh.write(json.dumps(validation_dict))
+    # a previous run was interrupted before AN000001 was validated
+    watch.save_state(state_path, {'version': watch.WATCH_STATE_VERSION, 'last_poll': None,
+                                  'known': {study_id: list(validation_dict[study_id]['analyses']) for study_id in validation_dict},
+                                  'pending': [['ST000001', 'AN000001']]})
+
+    mocker.patch('mwFileStatusWebsite.watch.mwtab.mwrest._pull_study_analysis', side_effect=[study_analysis_dict])
+    # concurrent threads fetch through the shared limiter instead of mwtab.read_files()
+    downloads = []
+
+    def download(url, timeouts=None, on_response=None):
+        analysis_id, file_format = url.split('/')[-3::2]
+        downloads.append((analysis_id, file_format))
+        with open(FIXTURE_FILENAME.format(analysis_id, file_format), 'rb') as fh:
+            return fh.read()
+
+    mocker.patch('mwFileStatusWebsite.throttle.download', side_effect=download)
+    regenerate = mocker.Mock()
+
+    watch.watch(output_file, str(tmpdir), state_path, concurrency=2, regenerate=regenerate, once=True)
+    assert sorted(downloads) == [('AN000001', 'json'), ('AN000001', 'txt')]
+    regenerate.assert_called_once_with()
+    assert watch.load_state(state_path)['pending'] == []
+
+
+def test_create_limiter():
+    assert watch.create_limiter(1) is None
+    limiter = watch.create_limiter(4)
+    assert isinstance(limiter, throttle.AdaptiveLimiter)
+    # the threads together never start requests faster than a sequential run
+    assert limiter.max_concurrency == 4
+    assert limiter.rate == limiter.max_rate == 1.0 / validator.SLEEP_TIME
+
+
+def test_poll_unreachable(mocker, capsys, tmpdir):
+    mocker.patch('mwFileStatusWebsite.watch.mwtab.mwrest._pull_study_analysis', side_effect=[Exception('down')])
+    assert not watch.poll(watch.load_state(str(tmpdir.join('state.json'))), str(tmpdir.join('tmp.json')), str(tmpdir))
+    assert 'Unable to access' in capsys.readouterr().out
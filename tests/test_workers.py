@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import time
+import pytest
+import mwtab
+from mwFileStatusWebsite import throttle, validator, workers
+from mwFileStatusWebsite.progress import Progress
+
+
+FIXTURE_FILENAME = 'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{0}%2Fmwtab%2F{1}.{1}'
+
+# the workers see the mocks of the test process only when they are forked from it
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='requires forked workers')
+
+
+@pytest.fixture()
+def mock_read_files(monkeypatch, tmpdir):
+    """Serves the fixture files, except for the analyses given a behaviour: "hang" never returns, "hang once" only
+    hangs the first time (across processes), and "crash" kills the worker."""
+    behaviours = {}
+
+    def read_files(url):
+        analysis_id, file_format = url.split('/')[-3::2]
+        behaviour = behaviours.get(analysis_id)
+        if behaviour == 'hang' or (behaviour == 'hang once' and not tmpdir.join(analysis_id + '.hung').check()):
+            tmpdir.join(analysis_id + '.hung').write('')
+            time.sleep(60)
+        elif behaviour == 'crash':
+            os._exit(1)
+        mwtabfile = mwtab.mwtab.MWTabFile(url, duplicate_keys=True)
+        with open(FIXTURE_FILENAME.format(analysis_id, file_format), encoding='utf-8') as fh:
+            mwtabfile.read(fh)
+        yield mwtabfile
+
+    monkeypatch.setattr(validator.mwtab, 'read_files', read_files)
+    monkeypatch.setattr(validator, 'sleep', lambda seconds: None)
+    return behaviours
+
+
+def test_watchdog_quarantine(mock_read_files, tmpdir):
+    mock_read_files.update(AN000023='hang', AN000024='hang once')
+    study_analysis_dict = {'ST000001': ['AN000001'], 'ST000009': ['AN000023', 'AN000024']}
+    watchdog = workers.Watchdog(deadline=1, quarantine_factor=2)
+    progress = Progress(interval=None)
+    started = time.monotonic()
+    validation_dict = validator.validate_mwtab_rest(study_analysis_dict, str(tmpdir), str(tmpdir.join('tmp.json')),
+                                                    progress=progress, watchdog=watchdog)
+    # 1 second for each hung analysis, and 2 more for the retry of the one hanging again
+    assert time.monotonic() - started < 15
+
+    analyses = validation_dict['ST000009']['analyses']
+    assert validation_dict['ST000001']['analyses']['AN000001']['status']['comparison'] != 'Not Checked'
+    assert validation_dict['ST000001']['params']['STUDY_TITLE']
+    assert analyses['AN000023']['status'] == {'txt': 'Timed Out', 'json': 'Timed Out', 'comparison': 'Not Checked'}
+    assert 'Status:Timed Out\nTimed Out: validation of the analysis did not finish within 2 seconds.' in \
+        tmpdir.join('AN000023_txt.log').read()
+    assert analyses['AN000024']['status']['comparison'] != 'Not Checked'
+    assert analyses['AN000024']['status']['txt'] != 'Timed Out'
+    assert progress.snapshot()['completed'] == 3
+
+    summary = watchdog.summary()
+    assert (summary['quarantined'], summary['recovered'], summary['timed_out'], summary['failed']) == \
+        (['AN000023', 'AN000024'], ['AN000024'], ['AN000023'], [])
+    # the first worker took AN000001 and hung on AN000023, the next hung on AN000024, and the quarantine lane had two
+    assert [(worker['tasks'], worker['stopped']) for worker in summary['workers']] == \
+        [(2, 'deadline'), (1, 'deadline'), (1, 'deadline'), (1, 'done')]
+    assert workers.Watchdog.format_summary(summary).startswith('2 analyses exceeded the 1 second deadline or failed, 1 of them passed on retry')
+
+
+def test_watchdog_crashed_worker(mock_read_files, tmpdir):
+    mock_read_files.update(AN000001='crash')
+    watchdog = workers.Watchdog(deadline=30)
+    validation_dict = validator.validate_mwtab_rest({'ST000001': ['AN000001'], 'ST000009': ['AN000023']}, str(tmpdir),
+                                                    str(tmpdir.join('tmp.json')), watchdog=watchdog)
+    # the next analysis is validated by a fresh worker
+    assert validation_dict['ST000009']['analyses']['AN000023']['status']['txt'] != 'Parsing Error'
+    assert validation_dict['ST000001']['analyses']['AN000001']['status']['txt'] == 'Parsing Error'
+    assert 'exited with code 1' in tmpdir.join('AN000001_json.log').read()
+    assert watchdog.summary()['failed'] == ['AN000001']
+
+
+def test_watchdog_requires_sequential_run(tmpdir):
+    with pytest.raises(ValueError):
+        validator.validate_mwtab_rest({'ST000001': ['AN000001']}, str(tmpdir), str(tmpdir.join('tmp.json')),
+                                      watchdog=workers.Watchdog(1), limiter=throttle.AdaptiveLimiter())
+
+
+def test_worker_recycling(mock_read_files, tmpdir):
+    study_analysis_dict = {'ST000001': ['AN000001'], 'ST000009': ['AN000023', 'AN000024']}
+    sequential_dict = validator.validate_mwtab_rest(study_analysis_dict, str(tmpdir), str(tmpdir.join('sequential.json')))
+
+    watchdog = workers.Watchdog(processes=2, max_tasks=2)
+    assert validator.validate_mwtab_rest(study_analysis_dict, str(tmpdir), str(tmpdir.join('tmp.json')),
+                                         watchdog=watchdog) == sequential_dict
+    summary = watchdog.summary()
+    assert sorted((worker['tasks'], worker['stopped']) for worker in summary['workers']) == [(1, 'done'), (2, 'task limit')]
+    assert summary['recycled'] == 1
+    if workers.memory_usage()[1] is not None:
+        assert summary['peak_rss'] == max(worker['peak_rss'] for worker in summary['workers']) > 0
+    assert '\tWorker 1: ' in workers.Watchdog.format_summary(summary)
+
+    # every worker is over a ceiling of a byte
+    watchdog = workers.Watchdog(memory_ceiling=1)
+    validator.validate_mwtab_rest(study_analysis_dict, str(tmpdir), str(tmpdir.join('tmp.json')), watchdog=watchdog)
+    if workers.memory_usage()[0] is not None:
+        assert [worker['stopped'] for worker in watchdog.summary()['workers']] == ['memory ceiling'] * 3
+
+
+def test_memory_pressure_defers_large_analyses(mock_read_files, tmpdir, capsys):
+    # the memory in use is always above a threshold of a byte, so the large analysis is held back until the others are done
+    watchdog = workers.Watchdog(processes=2, memory_threshold=1, sizes={'AN000001': 2 * workers.LARGE_ANALYSIS_SIZE})
+    validation_dict = validator.validate_mwtab_rest({'ST000001': ['AN000001'], 'ST000009': ['AN000023', 'AN000024']},
+                                                    str(tmpdir), str(tmpdir.join('tmp.json')), verbose=True,
+                                                    watchdog=watchdog)
+    assert validation_dict['ST000001']['analyses']['AN000001']['status']['comparison'] != 'Not Checked'
+    if workers.memory_usage()[0] is not None:
+        dispatched = [line.split()[-1] for line in capsys.readouterr().out.splitlines() if line.startswith('Validating analysis:')]
+        assert dispatched == ['AN000023', 'AN000024', 'AN000001']
+        assert watchdog.summary()['deferred'] == 1
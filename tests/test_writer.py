@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import pytest
+from mwFileStatusWebsite import snapshot, validator, writer
+
+
+FIXTURE_FILENAME = 'tests/test_files/https%3A%2F%2Fwww_metabolomicsworkbench_org%2Frest%2Fstudy%2Fanalysis_id%2F{0}%2Fmwtab%2F{1}.{1}'
+
+
+@pytest.fixture()
+def synced(monkeypatch):
+    synced = []
+    monkeypatch.setattr(writer, 'sync_files', lambda paths: synced.append(sorted(paths)))
+    return synced
+
+
+def test_write_and_checkpoint(tmpdir, synced):
+    with writer.BackgroundWriter(checkpoint_interval=3) as background:
+        for number in range(4):
+            background.write(str(tmpdir.join('{}.log'.format(number))), 'log {}'.format(number))
+        # the last text queued for a path is the one written
+        background.write(str(tmpdir.join('0.log')), 'rewritten')
+        background.checkpoint()
+        assert tmpdir.join('0.log').read() == 'rewritten'
+        assert tmpdir.join('3.log').read() == 'log 3'
+        assert sorted(path for paths in synced for path in paths) == sorted(str(tmpdir.join('{}.log'.format(number)))
+                                                                            for number in range(4))
+    summary = background.summary()
+    assert (summary['written'], summary['failed']) == (5, False)
+    assert summary['checkpoints'] == len(synced)
+    assert not background.thread.is_alive()
+
+
+def test_full_queue_blocks(tmpdir, synced, monkeypatch):
+    release = threading.Event()
+    write_file = writer.write_file
+    monkeypatch.setattr(writer, 'write_file', lambda path, text: release.wait() and write_file(path, text))
+
+    background = writer.BackgroundWriter(max_pending=2, batch_size=1)
+    producer = threading.Thread(target=lambda: [background.write(str(tmpdir.join('{}.log'.format(number))), 'log')
+                                                for number in range(5)])
+    producer.start()
+    time.sleep(0.2)
+    # one file in the thread and two queued, the producer waits for room
+    assert producer.is_alive()
+    assert not tmpdir.listdir()
+    release.set()
+    producer.join()
+    background.close()
+    assert len(tmpdir.listdir()) == 5
+    assert background.summary()['blocked'] >= 1
+
+
+def test_write_error_is_raised(tmpdir, synced, monkeypatch):
+    write_file = writer.write_file
+
+    def failing_write(path, text):
+        if path.endswith('1.log'):
+            raise OSError('No space left on device')
+        return write_file(path, text)
+
+    monkeypatch.setattr(writer, 'write_file', failing_write)
+    background = writer.BackgroundWriter()
+    for number in range(3):
+        background.write(str(tmpdir.join('{}.log'.format(number))), 'log')
+    with pytest.raises(RuntimeError, match='1.log failed: No space left on device'):
+        background.checkpoint()
+    with pytest.raises(RuntimeError):
+        background.write(str(tmpdir.join('3.log')), 'log')
+    # already raised in the validation loop
+    background.close()
+    assert [path.basename for path in tmpdir.listdir()] == ['0.log']
+    assert background.summary()['failed']
+
+    # an error not raised yet is raised by close()
+    background = writer.BackgroundWriter()
+    background.write(str(tmpdir.join('1.log')), 'log')
+    with pytest.raises(RuntimeError):
+        background.close()
+
+    # but not while another error propagates, which it would mask
+    with pytest.raises(KeyError):
+        with writer.BackgroundWriter() as background:
+            background.write(str(tmpdir.join('1.log')), 'log')
+            raise KeyError('AN000001')
+    assert background.summary()['failed']
+
+
+def test_validate_analysis_with_writer(tmpdir, synced):
+    validation_dict = validator.create_validation_dict({'ST000009': ['AN000023']})
+    sources = {file_format: FIXTURE_FILENAME.format('AN000023', file_format) for file_format in ('txt', 'json')}
+    mirror = tmpdir.mkdir('mirror')
+    with writer.BackgroundWriter() as background:
+        validator.validate_analysis(validation_dict, 'ST000009', 'AN000023', str(tmpdir), save_path=str(mirror),
+                                    sources=sources, writer=background)
+        background.checkpoint()
+        assert tmpdir.join('AN000023_txt.log').read().startswith('Validation Log')
+        assert tmpdir.join('AN000023_comparison.log').check()
+        assert mirror.join('AN000023.json').read().startswith('{')
+        assert len(synced[-1]) == 5
+    assert validation_dict['ST000009']['analyses']['AN000023']['status']['comparison'] == 'Consistent'
+
+
+def test_save_validation_dict_with_writer(tmpdir, synced):
+    output_file = str(tmpdir.join('tmp.json'))
+    with writer.BackgroundWriter() as background:
+        validator.save_validation_dict({'ST000001': {'params': {}, 'analyses': {}}}, output_file, writer=background)
+        assert synced[-1] == [output_file]
+    assert validator.load_validation_json(output_file) == {'ST000001': {'params': {}, 'analyses': {}}}
+    # the snapshot is written once the JSON file is
+    assert snapshot.load_validation_dict(output_file) == {'ST000001': {'params': {}, 'analyses': {}}}
+    opened = snapshot.open_snapshot(output_file)
+    assert opened is not None
+    opened.close()